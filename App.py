@@ -1,4 +1,5 @@
 import os
+import uuid
 import logging
 import asyncio
 from typing import TypedDict, List, Dict
@@ -8,24 +9,43 @@ from dotenv import load_dotenv
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.exceptions import RequestEntityTooLarge
 
 # LangChain / LangGraph / Groq / Milvus
-from groq import AsyncGroq
+from groq import RateLimitError
+from llm_client import get_llm_client, LLMQueueTimeout, PRIORITY_ROUTER, PRIORITY_REWRITE
+from llm_transport import run_async, warm_up  # 공유 이벤트 루프 + 연결 풀 예열
+from tracing import span, traced, run_traced  # 노드/LLM/검색 단계별 지연 span (요청 ID로 묶음)
+# 요청 전체 시간 예산을 노드별 제한 시간으로 나눔 (라우터 / 전문가 / 합성)
+from deadline import Deadline, deadline_of, ROUTER_BUDGET_SECONDS, EXPERT_BUDGET_SECONDS, SYNTHESIS_RESERVE_SECONDS
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
-from pymilvus import connections, Collection
+from pymilvus import connections
 from langgraph.graph import StateGraph, END
 
+from embedding_backend import load_embeddings  # 임베딩 백엔드 선택 (EMBEDDING_BACKEND=torch|onnx-int8)
+from context_packer import get_context_packer  # 합성 프롬프트 자료를 토큰 예산 안으로 (중복 제거 + 관련도 배분)
+from model_cascade import choose_tier, acascade_complete, cascade_metrics  # 쉬운 질문은 8B, 어려운 질문만 70B
+from upload_ingest import UploadIngestor  # 업로드 파일 백그라운드 적재 (session_id 파티션 키)
+from vector_store import open_collection, use_memory_store  # VECTOR_STORE=memory면 Milvus 없이 실행
+# 업로드 스트리밍 저장 (크기 제한 + 해시 계산 + 내용 주소 저장 + 쿼터)
+from upload_store import UploadRequest, init_upload_store, discard_unsaved, MAX_UPLOAD_BYTES
+from pdf_extract import in_spawned_worker  # spawn 추출 프로세스 안에서는 서버 초기화 생략
+
 # --- 1. 초기 설정 ---
+# PDF 추출 프로세스(spawn)가 이 스크립트를 __mp_main__으로 다시 import한 경우: 모델/Milvus/Groq/업로드 초기화를 건너뜀
+SPAWNED_WORKER = in_spawned_worker()
+
 app = Flask(__name__)
 CORS(app)
 
 # 파일 저장 경로
 UPLOAD_FOLDER = 'uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# 업로드 본문은 파싱하면서 바로 디스크에 쓰고(해시 동시 계산), 최대 크기를 넘으면 413으로 중단
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 ** 2  # 파일 + 폼 필드 여유분
+upload_store = None if SPAWNED_WORKER else init_upload_store(UPLOAD_FOLDER)
 
 # 로깅
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -38,19 +58,26 @@ MILVUS_HOST = "localhost"
 MILVUS_PORT = "19530"
 EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"
 LLM_TEMPERATURE = 0.3
+REWRITE_MAX_WAIT_SECONDS = 3.0  # 재작성 호출이 사용량 한도로 이보다 오래 기다려야 하면 원래 질문으로 검색
+ROUTER_MAX_WAIT_SECONDS = 5.0  # 라우터 호출이 이보다 오래 기다려야 하면 전체 전문가 호출
+SEARCH_RESERVE_SECONDS = 1.5  # 전문가 예산 중 검색(임베딩 + Milvus)에 남겨 둘 시간
 
 # --- 클라이언트 초기화 ---
-try:
-    # Groq 클라이언트 (비동기)
-    async_groq_client = AsyncGroq()
-    # 임베딩 (동기)
-    embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
-    # Milvus 연결
-    if not connections.has_connection("default"):
-        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
-    logger.info("시스템 초기화 완료")
-except Exception as e:
-    logger.error(f"초기화 오류: {e}")
+if not SPAWNED_WORKER:
+    try:
+        # Groq 호출 스케줄러 (모델별 사용량 한도 + 우선순위 대기열 + 재시도, 모든 LLM 호출이 공유)
+        llm = get_llm_client()
+        warm_up(llm)  # 공유 이벤트 루프에서 연결을 미리 맺어 둠 (백그라운드, 실패해도 첫 호출 때 다시 연결)
+        # 임베딩 (동기)
+        embeddings = load_embeddings(EMBEDDING_MODEL)
+        # Milvus 연결 (메모리 저장소를 쓰는 부하 테스트에서는 생략)
+        if not use_memory_store() and not connections.has_connection("default"):
+            connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)
+        # 업로드 파일 적재기 (요청 스레드를 막지 않도록 백그라운드 작업자에서 임베딩/저장)
+        upload_ingestor = UploadIngestor(embeddings)  # VECTOR_STORE=memory면 기본 opener가 메모리 컬렉션을 씀
+        logger.info("시스템 초기화 완료")
+    except Exception as e:
+        logger.error(f"초기화 오류: {e}")
 
 
 # --- 2. 전문가 에이전트 클래스 ---
@@ -60,7 +87,7 @@ class BaseExpertAgent:
         self.collection_name = collection_name
         self.persona_prompt = persona_prompt
         try:
-            self.collection = Collection(self.collection_name)
+            self.collection = open_collection(self.collection_name)
             self.collection.load()
         except Exception as e:
             logger.warning(f"[{self.name}] 컬렉션 로드 실패 (생성되지 않았을 수 있음): {e}")
@@ -70,8 +97,8 @@ class BaseExpertAgent:
 
     def _build_workflow(self):
         workflow = StateGraph(dict)
-        workflow.add_node("rewriter", self._rewrite_query)
-        workflow.add_node("retriever", self._retrieve)
+        workflow.add_node("rewriter", traced(f"expert.{self.collection_name}.rewriter", expert=self.name)(self._rewrite_query))
+        workflow.add_node("retriever", traced(f"expert.{self.collection_name}.retriever", expert=self.name)(self._retrieve))
         workflow.set_entry_point("rewriter")
         workflow.add_edge("rewriter", "retriever")
         workflow.add_edge("retriever", END)
@@ -80,19 +107,29 @@ class BaseExpertAgent:
     async def _rewrite_query(self, state: dict) -> dict:
         messages = state['messages']
         last_message = messages[-1]
+        deadline = deadline_of(state)
         # 쿼리 재작성 로직
         prompt = f"""역할: {self.name} ({self.persona_prompt})
 질문: {last_message.content}
-지침: 관련 있으면 검색용 질문 1줄 작성, 관련 없으면 "pass" 출력. 설명 금지."""
+지침: 관련 있으면 검색용 질문 1줄 작성, 관련 없으면 "pass" 출력. 설명 금지.
+검색용 질문: """
         
         try:
-            response = await async_groq_client.chat.completions.create(
+            # 느린 응답은 p95를 넘기면 한 번 더 보내고(헤지), 검색 시간을 남기고 끊음
+            response = await llm.acomplete_hedged(
                 messages=[{"role": "user", "content": prompt}],
-                model="llama-3.1-8b-instant", temperature=0.0
+                model="llama-3.1-8b-instant", temperature=0.0,
+                priority=PRIORITY_REWRITE, max_wait=REWRITE_MAX_WAIT_SECONDS,
+                timeout=deadline.budget_for(reserve=SEARCH_RESERVE_SECONDS)
             )
-            rewritten = response.choices[0].message.content.strip()
-        except:
-            rewritten = "pass"
+            rewritten = response.choices[0].message.content.strip() or last_message.content  # 줄바꿈 stop으로 빈 출력이면 원래 질문
+        except (LLMQueueTimeout, asyncio.TimeoutError):
+            # 사용량 한도/제한 시간으로 재작성을 건너뛰어도 검색은 원래 질문으로 계속 진행
+            logger.info(f"[{self.name}] 재작성 대기/시간 초과, 원래 질문으로 검색합니다.")
+            rewritten = last_message.content
+        except Exception as e:
+            logger.warning(f"[{self.name}] 질문 재작성 실패, 원래 질문으로 검색합니다: {e}")
+            rewritten = last_message.content
             
         return {**state, "rewritten_query": rewritten}
 
@@ -102,23 +139,30 @@ class BaseExpertAgent:
             return {**state, "documents": []}
         
         try:
-            vector = embeddings.embed_query(query)
-            results = self.collection.search(
-                data=[vector], anns_field="vector", 
-                param={"metric_type": "L2", "params": {"nprobe": 10}}, 
-                limit=3, output_fields=["text"]
-            )
-            docs = [Document(page_content=h.entity.get("text")) for h in results[0]] if results else []
+            # 임베딩/Milvus 검색은 동기 호출이라 스레드에서 실행 (이벤트 루프를 막으면 다른 전문가와 제한 시간이 멈춤)
+            with span("embedding.query"):
+                vector = await asyncio.to_thread(embeddings.embed_query, query)
+            with span("vector.search", collection=self.collection_name) as sp:
+                results = await asyncio.to_thread(
+                    self.collection.search,
+                    data=[vector], anns_field="vector",
+                    param={"metric_type": "L2", "params": {"nprobe": 10}},
+                    limit=3, output_fields=["text"]
+                )
+                sp.set(hits=len(results[0]) if results else 0)
+            # score(L2 거리)는 합성 단계에서 전문가별 자료 예산을 나눌 때 사용
+            docs = [Document(page_content=h.entity.get("text"), metadata={"score": h.distance}) for h in results[0]] if results else []
             return {**state, "documents": docs}
-        except:
+        except Exception:  # 취소(CancelledError)는 제한 시간 처리를 위해 그대로 전파
             return {**state, "documents": []}
 
-    async def run(self, messages: List[BaseMessage]):
-        return await self.workflow.ainvoke({"messages": messages})
+    async def run(self, messages: List[BaseMessage], deadline: Deadline = None):
+        with span(f"expert.{self.collection_name}", expert=self.name):  # 제한 시간으로 취소되면 cancelled로 기록
+            return await self.workflow.ainvoke({"messages": messages, "deadline": deadline})
 
 
-# --- 3. 전역 인스턴스 ---
-expert_agents = {
+# --- 3. 전역 인스턴스 (PDF 추출 프로세스에서는 컬렉션을 열지 않음) ---
+expert_agents = {} if SPAWNED_WORKER else {
     "작물 전문가": BaseExpertAgent("작물 전문가", "farmer", "작물 추천, 재배법"),
     "레시피 전문가": BaseExpertAgent("레시피 전문가", "receipe", "요리법, 레시피"),
     "영양 전문가": BaseExpertAgent("영양 전문가", "nutrient", "영양 성분, 효능")
@@ -129,41 +173,85 @@ class MetaAgentState(TypedDict):
     messages: List[BaseMessage]
     expert_docs: Dict[str, List[Document]]
     experts_to_run: List[str]
+    session_id: str  # 업로드 문서 검색용 세션 ID
+    deadline: Deadline  # 요청 전체 시간 예산
+    model_tier: Dict  # 답변 합성에 사용한 모델 단계 (fast/large, 이유, 승격 여부)
 
+@traced("node.router")
 async def llm_router_node(state: MetaAgentState) -> dict:
     # 라우터 로직
     question = state["messages"][-1].content
     prompt = f"""질문: {question}
 전문가: {", ".join(expert_agents.keys())}
-지침: 필요한 전문가 이름만 쉼표로 구분해 출력. 없으면 전체 출력."""
+지침: 필요한 전문가 이름만 쉼표로 구분해 출력. 없으면 전체 출력.
+전문가 이름: """
     
+    deadline = deadline_of(state)
     try:
-        res = await async_groq_client.chat.completions.create(
+        # 제한 시간을 넘기면(헤지 포함) 아래 except에서 전체 전문가 호출
+        res = await llm.acomplete_hedged(
             messages=[{"role": "user", "content": prompt}],
-            model="llama-3.1-8b-instant", temperature=0.0
+            model="llama-3.1-8b-instant", temperature=0.0,
+            priority=PRIORITY_ROUTER, max_wait=ROUTER_MAX_WAIT_SECONDS,
+            timeout=deadline.budget_for(ROUTER_BUDGET_SECONDS, reserve=SYNTHESIS_RESERVE_SECONDS)
         )
         selected = [n.strip() for n in res.choices[0].message.content.split(',') if n.strip() in expert_agents]
         if not selected: selected = list(expert_agents.keys())
         return {"experts_to_run": selected}
-    except:
+    except Exception:  # 제한 시간 초과(asyncio.TimeoutError) 포함
         return {"experts_to_run": list(expert_agents.keys())}
 
+async def _search_uploads(session_id: str, question: str) -> List[Document]:
+    # 이 세션에서 업로드해 적재가 끝난 문서만 검색 (동기 Milvus 호출은 스레드에서)
+    try:
+        with span("vector.search_uploads") as sp:
+            docs = await asyncio.to_thread(upload_ingestor.search, session_id, question)
+            sp.set(hits=len(docs))
+            return docs
+    except Exception as e:
+        logger.warning(f"업로드 문서 검색 실패: {e}")
+        return []
+
+@traced("node.run_experts")
 async def run_selected_experts_node(state: MetaAgentState) -> dict:
-    targets = state["experts_to_run"]
-    tasks = [expert_agents[name].run(state["messages"]) for name in targets]
+    deadline = deadline_of(state)
+    # 전문가 단계 제한 시간: 합성에 쓸 시간을 남기고, 제한 안에 끝난 전문가의 자료만 사용
+    budget = deadline.budget_for(EXPERT_BUDGET_SECONDS, reserve=SYNTHESIS_RESERVE_SECONDS)
+    expert_deadline = Deadline(budget)
+    tasks = {asyncio.ensure_future(expert_agents[name].run(state["messages"], expert_deadline)): name
+             for name in state["experts_to_run"]}
+    session_id = state.get("session_id")
+    if session_id:
+        tasks[asyncio.ensure_future(_search_uploads(session_id, state["messages"][-1].content))] = "사용자 업로드 문서"
     if not tasks: return {"expert_docs": {}}
-    results = await asyncio.gather(*tasks)
-    
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(f"제한 시간({budget:.1f}s) 안에 끝나지 않은 전문가는 제외하고 답변합니다: {[tasks[t] for t in pending]}")
+
     expert_docs = {}
-    for name, res in zip(targets, results):
-        if res.get("documents"):
-            expert_docs[name] = res.get("documents")
+    for task in done:
+        name = tasks[task]
+        if task.exception() is not None:
+            logger.warning(f"[{name}] 실행 실패: {task.exception()}")
+            continue
+        res = task.result()
+        docs = res if isinstance(res, list) else res.get("documents")
+        if docs:
+            expert_docs[name] = docs
     return {"expert_docs": expert_docs}
 
+@traced("node.synthesizer")
 async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
+    # 전문가 간 중복 제거 후 관련도에 비례한 토큰 예산 안에서만 자료를 넣음
+    # (토큰 세기/첫 토크나이저 로드는 동기 작업이라 스레드에서: 공유 이벤트 루프를 막으면 다른 요청도 멈춤)
+    with span("context.pack") as sp:
+        packed, stats = await asyncio.to_thread(get_context_packer().pack, state["expert_docs"])
+        sp.set(tokens_in=stats["tokens_in"], tokens_packed=stats["tokens_packed"], duplicates=stats["duplicates"])
     docs_str = ""
-    for name, docs in state["expert_docs"].items():
-        docs_str += f"\n[{name}]\n" + "\n".join([f"- {d.page_content}" for d in docs])
+    for name, texts in packed.items():
+        docs_str += f"\n[{name}]\n" + "\n".join([f"- {t}" for t in texts])
     
     if not docs_str: docs_str = "관련 정보 없음."
     
@@ -171,11 +259,28 @@ async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
 자료: {docs_str}
 지침: 자료를 바탕으로 한국어로 답변."""
     
-    res = await async_groq_client.chat.completions.create(
-        messages=[{"role": "user", "content": prompt}],
-        model="llama-3.3-70b-versatile", temperature=0.3
-    )
-    return {**state, "messages": state["messages"] + [AIMessage(content=res.choices[0].message.content)]}
+    # 단일 전문가 + 짧은 자료 + 높은 검색 확신도면 8B, 아니면 70B (8B 답변이 점검에 걸리면 70B로 승격)
+    decision = choose_tier(state["experts_to_run"], state["expert_docs"], stats["tokens_packed"])
+    try:
+        # 합성은 남은 예산을 모두 사용. 그래도 늦으면 찾은 자료를 그대로 전달
+        answer, tier = await acascade_complete(
+            llm, [{"role": "user", "content": prompt}], decision, has_context=bool(packed),
+            timeout=deadline_of(state).budget_for(), temperature=0.3
+        )
+    except asyncio.TimeoutError:
+        logger.warning("답변 합성이 제한 시간을 넘겨 검색 자료로 대신 답합니다.")
+        answer, tier = _partial_answer(state["expert_docs"]), {**decision, "timed_out": True}
+    return {**state, "messages": state["messages"] + [AIMessage(content=answer)], "model_tier": tier}
+
+def _partial_answer(expert_docs: Dict[str, List[Document]]) -> str:
+    # 합성 시간 초과 시 전문가별 자료 일부를 그대로 보여주는 대체 답변
+    if not expert_docs:
+        return "답변 생성이 지연되고 있습니다. 잠시 후 다시 시도해 주세요."
+    lines = ["답변 생성이 지연되어 찾은 자료를 먼저 전해 드립니다."]
+    for name, docs in expert_docs.items():
+        lines.append(f"[{name}]")
+        lines += [f"- {d.page_content[:200]}" for d in docs[:2]]
+    return "\n".join(lines)
 
 # 그래프 컴파일
 workflow = StateGraph(MetaAgentState)
@@ -200,30 +305,41 @@ def chat():
         # 1. 요청 데이터 타입 확인 및 파싱 (방어 코드)
         user_message = ""
         file_info = ""
+        session_id = request.headers.get('X-Session-ID', '')
+        request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex  # 추적(trace) ID
+        upload_job = None
 
         # Case A: 순수 JSON 요청 (파일 없음)
         if request.is_json:
             data = request.get_json()
             user_message = data.get('message', '')
+            session_id = data.get('session_id') or session_id
         
         # Case B: Multipart/FormData 요청 (파일 포함 가능)
         elif request.mimetype.startswith('multipart/form-data'):
             user_message = request.form.get('message', '')
+            session_id = request.form.get('session_id') or session_id
             
             # 파일 처리
             if 'file' in request.files:
                 file = request.files['file']
                 if file and file.filename != '':
+                    session_id = session_id or uuid.uuid4().hex
                     filename = secure_filename(file.filename)
-                    save_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    file.save(save_path)
-                    file_info = f" [시스템: 사용자가 '{filename}' 파일을 업로드함]"
-                    print(f" >> 파일 저장 완료: {save_path}")
+                    # 내용 해시 경로로 저장 (같은 내용이면 다시 쓰지 않고, 이름이 같은 다른 파일과도 충돌하지 않음)
+                    stored = upload_store.save(file, filename)
+                    # 적재는 백그라운드에서 진행되고, 끝나면 이 세션의 다음 질문부터 검색 자료에 포함됨
+                    # (같은 세션에서 같은 내용을 다시 올리면 기존 작업을 그대로 반환)
+                    upload_job = upload_ingestor.submit(session_id, stored["path"], filename, content_hash=stored["sha256"])
+                    upload_store.enforce_quota(protect=upload_ingestor.active_paths())
+                    file_info = f" [시스템: 사용자가 '{filename}' 파일을 업로드함 (문서 분석 중)]"
+                    print(f" >> 파일 저장 완료: {stored['path']} (중복: {stored['duplicate']}, 적재 작업 {upload_job['job_id']})")
         
         # Case C: 알 수 없는 타입
         else:
             # 강제로 form이나 data에서 긁어오기 시도
             user_message = request.values.get('message', '')
+            session_id = request.values.get('session_id') or session_id
 
         # 메시지가 비어있으면 에러
         full_query = (user_message + file_info).strip()
@@ -232,25 +348,64 @@ def chat():
 
         print(f" >> 사용자 질문 수신: {full_query}")
 
-        # 2. LangGraph 실행 (비동기 함수를 동기 라우트에서 실행하기 위해 asyncio.run 사용)
-        # 매 요청마다 새로운 이벤트 루프를 생성하여 실행
+        # 2. LangGraph 실행 (비동기 그래프를 프로세스 공유 이벤트 루프에서 실행)
+        # 요청마다 asyncio.run으로 새 루프를 만들면 비동기 연결 풀을 재사용할 수 없으므로 run_async 사용
         initial_state = {
             "messages": [HumanMessage(content=full_query)],
             "expert_docs": {},
-            "experts_to_run": []
+            "experts_to_run": [],
+            "session_id": session_id,
+            "deadline": Deadline()  # 요청 전체 예산 (REQUEST_BUDGET_SECONDS)
         }
         
-        # 비동기 그래프 실행을 동기적으로 대기
-        final_state = asyncio.run(langgraph_app.ainvoke(initial_state))
+        # 비동기 그래프 실행을 동기적으로 대기 (요청 ID로 묶인 trace 안에서)
+        final_state = run_async(run_traced("chat", langgraph_app.ainvoke(initial_state), trace_id=request_id,
+                                           has_session=bool(session_id), has_upload=bool(upload_job)))
         
         bot_response = final_state["messages"][-1].content
         
-        return jsonify({'answer': bot_response})
+        # 클라이언트는 session_id를 다음 요청에 그대로 보내야 업로드 문서가 검색됨
+        response = {'answer': bot_response, 'session_id': session_id or None, 'request_id': request_id,
+                    'model_tier': final_state.get("model_tier")}  # 이 답변을 만든 모델 단계 (fast / large)
+        if upload_job:
+            response['upload_job'] = upload_job
+        return jsonify(response)
 
+    except RequestEntityTooLarge:
+        return jsonify({'error': f"업로드 파일은 최대 {MAX_UPLOAD_BYTES // 1024 ** 2}MB까지 가능합니다."}), 413
+    except RateLimitError:
+        # 재시도 후에도 답변 합성이 사용량 한도에 걸린 경우 (업로드 적재 작업은 그대로 진행됨)
+        logger.warning("Groq API 사용량 제한으로 답변을 생성하지 못했습니다.")
+        return jsonify({'error': "요청이 많아 잠시 후 다시 시도해 주세요.", 'session_id': session_id or None}), 429
     except Exception as e:
         logger.error(f"API 에러 발생: {e}", exc_info=True)
         # 에러 내용을 JSON으로 명확하게 반환
         return jsonify({'error': f"서버 내부 오류: {str(e)}"}), 500
 
+@app.teardown_request
+def _discard_unsaved_uploads(exc):
+    # 저장소로 옮기지 않은 업로드 임시 파일 삭제 (폼이 파싱된 요청만)
+    files = request.__dict__.get('files')
+    if files:
+        discard_unsaved(files)
+
+@app.route('/uploads/<job_id>', methods=['GET'])
+def upload_status(job_id):
+    """업로드 파일 적재 작업 상태 조회 (queued / running / done / failed)"""
+    job = upload_ingestor.job(job_id)
+    if job is None:
+        return jsonify({'error': '작업을 찾을 수 없습니다.'}), 404
+    return jsonify(job)
+
+@app.route('/sessions/<session_id>/uploads', methods=['GET'])
+def session_uploads(session_id):
+    """세션에서 업로드한 파일들의 적재 작업 목록"""
+    return jsonify({'session_id': session_id, 'jobs': upload_ingestor.session_jobs(session_id)})
+
+@app.route('/metrics/llm', methods=['GET'])
+def llm_metrics():
+    """LLM 호출 대기 시간(우선순위별)과 재시도/사용량 제한 횟수, 합성 모델 단계별 요청 수"""
+    return jsonify({**llm.metrics(), 'cascade': cascade_metrics()})
+
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
\ No newline at end of file
@@ -1,25 +1,30 @@
 # Version: 7.0 - 지능형 영양 분석 에이전트
 import os
+import sys
 import re
 import time
 import asyncio
 import logging
 from dotenv import load_dotenv
-from groq import Groq, RateLimitError
+from groq import RateLimitError
 from typing import TypedDict, List, Literal
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage
 from langchain_core.documents import Document
-from langchain_huggingface import HuggingFaceEmbeddings
 from pymilvus import connections, Collection
 from langgraph.graph import StateGraph, END
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+from embedding_backend import load_embeddings  # 임베딩 백엔드 선택 (EMBEDDING_BACKEND=torch|onnx-int8)
+from llm_client import get_llm_client, PRIORITY_SYNTHESIS, PRIORITY_REWRITE  # 사용량 한도 인식 LLM 호출 (재시도 포함)
+from conversation_memory import ConversationMemory  # 대화 기록 길이 제한 (최근 턴 + 백그라운드 요약)
+
 # --- 1. 로깅 및 초기 설정 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 load_dotenv()
 try:
-    groq_client = Groq()
+    llm = get_llm_client()
 except Exception as e:
     logger.error(f"Groq 클라이언트를 초기화할 수 없습니다: {e}")
     exit()
@@ -30,9 +35,10 @@ MILVUS_PORT = "19530"
 COLLECTION_NAME = "nutrient" 
 EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"
 LLM_TEMPERATURE = 0.7
+memory = ConversationMemory()  # 이 콘솔 세션의 대화 메모리
 
 logger.info("임베딩 모델을 로드합니다...")
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)
+embeddings = load_embeddings(EMBEDDING_MODEL)
 
 logger.info(f"Milvus에 연결하고 '{COLLECTION_NAME}' 컬렉션을 로드합니다...")
 try:
@@ -62,7 +68,7 @@ def rewrite_query(state: AgentState) -> AgentState:
         logger.info("첫 질문이므로 쿼리 재작성을 건너뜁니다.")
         return {"rewritten_query": original_query, "original_query": original_query}
 
-    history_str = "\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in messages[:-1]])
+    history_str = memory.history_str(messages)  # 최근 턴 원문 + 이전 대화 요약
     
     logger.info("\n--- Query Rewriter 실행 ---")
     # [수정] '영양 정보' 검색에 초점을 맞춘 프롬프트
@@ -95,15 +101,16 @@ def rewrite_query(state: AgentState) -> AgentState:
 - 예: "닭가슴살 요리" -> "닭가슴살 영양 성분"
 
 [실제 재작성 작업]
-[재작성된 검색용 질문]"""
+[재작성된 검색용 질문]: """
 
     try:
-        chat_completion = groq_client.chat.completions.create(
+        chat_completion = llm.complete(
             messages=[{"role": "user", "content": rewrite_prompt}],
             model="llama-3.1-8b-instant",
-            temperature=0.0
+            temperature=0.0,
+            priority=PRIORITY_REWRITE
         )
-        rewritten_query = chat_completion.choices[0].message.content.strip()
+        rewritten_query = chat_completion.choices[0].message.content.strip() or original_query  # 한 줄 출력(줄바꿈 stop)이 비면 원래 질문
         logger.info(f"재작성된 질문: {rewritten_query}")
         return {"rewritten_query": rewritten_query, "original_query": original_query}
     except Exception as e:
@@ -167,7 +174,7 @@ def generate_final_response(state: AgentState) -> dict:
         context_parts.append(f"[출처: {source_info}]\n{doc.page_content}")
     context = "\n\n".join(context_parts)
 
-    history_str = "\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in messages[:-1]])
+    history_str = memory.history_str(messages)  # 최근 턴 원문 + 이전 대화 요약
 
     # [수정] '영양 전문가' 페르소나에 맞춘 새로운 프롬프트
     final_prompt = f"""당신은 사용자의 질문에 대해 식품의 영양 성분, 칼로리, 건강 효과를 정확하게 분석해주는 'AI 식품 영양 전문가'입니다.
@@ -203,10 +210,11 @@ def generate_final_response(state: AgentState) -> dict:
     # --- 덮어쓸 새로운 프롬프트 끝 ---
 
     api_messages = [{"role": "user", "content": final_prompt}]
-    chat_completion = groq_client.chat.completions.create(
+    chat_completion = llm.complete(
         messages=api_messages, 
         model="llama-3.1-70b-versatile",
-        temperature=LLM_TEMPERATURE
+        temperature=LLM_TEMPERATURE,
+        priority=PRIORITY_SYNTHESIS
     )
     full_response = chat_completion.choices[0].message.content
     logger.info("최종 답변 생성 완료.")
@@ -277,11 +285,13 @@ def main():
             print("\n챗봇: 대화를 종료합니다. 이용해주셔서 감사합니다.")
             break
 
-        current_state["messages"].append(HumanMessage(content=user_input))
+        user_message = HumanMessage(content=user_input)
+        current_state["messages"].append(user_message)
         
         try:
             final_state = rag_app.invoke(current_state)
             current_state = final_state
+            memory.after_turn(current_state["messages"])  # 밀려난 턴은 백그라운드에서 요약 (다음 질문을 기다리게 하지 않음)
             final_bot_message = current_state["messages"][-1]
 
             print(f"챗봇: ", end="", flush=True)
@@ -295,13 +305,12 @@ def main():
         except RateLimitError:
             logger.warning("Groq API 사용량 제한에 도달했습니다.")
             print("\n챗봇: API 사용량 제한에 도달했습니다. 잠시 후 다시 시도해주세요.")
-            current_state["messages"].pop() # 실패한 입력 롤백
+            current_state["messages"][:] = [m for m in current_state["messages"] if m is not user_message]  # 실패한 입력 롤백 (이번에 넣은 질문만)
             
         except Exception as e:
             logger.error(f"예상치 못한 오류가 발생했습니다: {e}", exc_info=True)
             print(f"\n죄송합니다, 오류가 발생하여 답변을 생성할 수 없습니다. 잠시 후 다시 시도해주세요.")
-            if current_state["messages"]:
-                current_state["messages"].pop() # 실패한 입력 롤백
+            current_state["messages"][:] = [m for m in current_state["messages"] if m is not user_message]  # 실패한 입력 롤백 (이번에 넣은 질문만)
 
 if __name__ == "__main__": # 스크립트가 직접 실행될 때만 아래 코드 실행
     # 1) 워크플로우 시각화 PNG 파일 생성
@@ -0,0 +1,88 @@
+# [개요] Milvus 적재 경로별 소요 시간을 비교하는 벤치마크입니다.
+# - 증분(incremental): 인덱스 생성 + 로드된 컬렉션에 배치 삽입 → flush (기존 db_load 방식)
+# - 대량(bulk)       : 인덱스/로드 없이 배치 삽입 → flush 1회 → 인덱스 생성 → 로드 (db_load --bulk-load)
+# 임베딩 비용은 두 경로가 같으므로 제외하고, 무작위 벡터로 Milvus 쪽 시간만 측정합니다.
+# 사용법: python bench/bench_bulk_load.py [--rows 200000] [--dim 768] [--host localhost --port 19530]
+
+import os  # 경로
+import sys  # 상위 폴더 import 경로 추가
+import time  # 소요 시간 측정
+import json  # 결과 출력
+import argparse  # 명령행 인자
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+
+import numpy as np  # 무작위 벡터
+from pymilvus import utility, Collection
+
+import db_load  # setup_milvus_collection / finalize_bulk_load 재사용
+
+BENCH_PREFIX = "bench_bulk_"  # 벤치마크용 임시 컬렉션 접두어
+
+
+def make_batches(rows: int, dim: int, batch_size: int, seed: int = 0):
+    """(source, page, text, vector) 열 묶음을 배치 단위로 생성 (행 길이는 실제 조각과 비슷하게)"""
+    rng = np.random.default_rng(seed)
+    text = "가" * 300
+    for start in range(0, rows, batch_size):
+        n = min(batch_size, rows - start)
+        yield [
+            [f"bench_{(start + i) // 1000}.csv" for i in range(n)],
+            [start + i for i in range(n)],
+            [text] * n,
+            rng.random((n, dim), dtype=np.float32).tolist(),
+        ]
+
+
+def run_path(name: str, bulk: bool, rows: int, dim: int, batch_size: int, index_params: dict) -> dict:
+    if utility.has_collection(name):
+        utility.drop_collection(name)
+    started = time.perf_counter()
+    collection = db_load.setup_milvus_collection(name, dim, index_params, defer_index=bulk)
+    t_insert = time.perf_counter()
+    for batch in make_batches(rows, dim, batch_size):
+        collection.insert(batch)
+    insert_s = time.perf_counter() - t_insert
+    if bulk:
+        finalize_s = db_load.finalize_bulk_load(collection, index_params)
+    else:
+        t0 = time.perf_counter()
+        collection.flush()
+        utility.wait_for_index_building_complete(name)  # 증분 경로도 검색 가능한 상태까지 측정
+        finalize_s = time.perf_counter() - t0
+    total = time.perf_counter() - started
+    result = {
+        "path": "bulk" if bulk else "incremental",
+        "rows": rows,
+        "insert_seconds": round(insert_s, 2),
+        "flush_index_load_seconds": round(finalize_s, 2),
+        "total_seconds": round(total, 2),
+        "rows_per_second": round(rows / total, 1),
+    }
+    Collection(name).release()
+    utility.drop_collection(name)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Milvus 증분 적재 vs 대량 적재(인덱스 지연 생성) 비교")
+    parser.add_argument("--rows", type=int, default=200000, help="삽입할 행 수")
+    parser.add_argument("--dim", type=int, default=db_load.DIMENSION, help="벡터 차원")
+    parser.add_argument("--batch-size", type=int, default=db_load.MILVUS_BATCH_SIZE, help="삽입 배치 크기")
+    parser.add_argument("--host", default=db_load.MILVUS_HOST)
+    parser.add_argument("--port", default=db_load.MILVUS_PORT)
+    args = parser.parse_args()
+
+    db_load.connect_milvus(args.host, args.port)
+    index_params = dict(db_load.DEFAULT_INDEX_PARAMS)
+    incremental = run_path(BENCH_PREFIX + "incremental", False, args.rows, args.dim, args.batch_size, index_params)
+    bulk = run_path(BENCH_PREFIX + "bulk", True, args.rows, args.dim, args.batch_size, index_params)
+    report = {
+        "results": [incremental, bulk],
+        "speedup": round(incremental["total_seconds"] / bulk["total_seconds"], 2) if bulk["total_seconds"] else None,
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+# [개요] 임베딩 백엔드(torch vs onnx-int8)의 결과 일치도와 CPU 성능을 비교합니다.
+# 1) 일치도: 같은 문장에 대한 두 백엔드 벡터의 코사인 유사도, 검색 top-k 일치율
+# 2) 성능: 단일 질의 지연(p50/p95), 배치 적재 처리량(조각/s), 모델 로드 후 RSS 증가량
+# 코사인 유사도 최솟값이 --min-cosine보다 낮으면 종료 코드 1로 끝나므로 배포 전 확인용으로 쓸 수 있습니다.
+# 사용법: python bench/bench_embedding_backend.py [--docs 500] [--queries 50] [--min-cosine 0.98]
+
+import os  # 경로
+import sys  # 상위 폴더 import 경로 추가
+import time  # 지연 측정
+import json  # 결과 출력
+import argparse  # 명령행 인자
+from typing import Dict, List  # 타입 힌트
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+
+import numpy as np  # 통계
+
+from embedding_backend import load_embeddings, BACKEND_TORCH, BACKEND_ONNX_INT8, EMBEDDING_MODEL
+from bench_embed_bucketing import make_corpus  # 짧은 행 + 긴 조각 혼합 합성 코퍼스
+
+QUERIES = [
+    "김치찌개 맛있게 끓이는 방법 알려줘", "고추 재배할 때 병해충 관리는 어떻게 해?", "두부의 단백질 함량은?",
+    "감자 수확 시기", "저염식 된장국 레시피", "비타민 C가 많은 채소", "토양 산도 조절 방법", "돼지고기 볶음 양념",
+]
+
+
+def rss_mb() -> float:
+    """현재 프로세스 RSS(MB). psutil이 없으면 /proc에서 읽습니다. (Linux 외에는 0)"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / 1024 ** 2
+    except ImportError:
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            pass
+    return 0.0
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def bench_backend(backend: str, docs: List[str], queries: List[str], batch_size: int) -> Dict:
+    before = rss_mb()
+    started = time.perf_counter()
+    emb = load_embeddings(EMBEDDING_MODEL, backend=backend, device="cpu", batch_size=batch_size)
+    load_s = time.perf_counter() - started
+    emb.embed_query("워밍업")  # 첫 호출의 초기화 비용 제외
+    rss_delta = rss_mb() - before
+
+    latencies = []
+    q_vecs = []
+    for q in queries:
+        t0 = time.perf_counter()
+        q_vecs.append(emb.embed_query(q))
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    d_vecs = emb.embed_documents(docs)
+    doc_s = time.perf_counter() - t0
+    return {
+        "backend": backend,
+        "load_seconds": round(load_s, 2),
+        "rss_delta_mb": round(rss_delta, 1),
+        "query_p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "query_p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "docs_per_second": round(len(docs) / doc_s, 1),
+        "_q": np.asarray(q_vecs, dtype=np.float32),
+        "_d": np.asarray(d_vecs, dtype=np.float32),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="임베딩 백엔드 일치도/성능 비교 (torch vs onnx-int8)")
+    parser.add_argument("--docs", type=int, default=500, help="처리량 측정용 조각 수")
+    parser.add_argument("--queries", type=int, default=50, help="지연 측정용 질의 수")
+    parser.add_argument("--batch-size", type=int, default=64, help="배치 크기")
+    parser.add_argument("--top-k", type=int, default=5, help="검색 일치율 계산용 k")
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="허용하는 최소 코사인 유사도")
+    args = parser.parse_args()
+
+    docs = make_corpus(int(args.docs * 0.75), args.docs - int(args.docs * 0.75))
+    queries = [QUERIES[i % len(QUERIES)] + ("" if i < len(QUERIES) else f" {i}") for i in range(args.queries)]
+
+    # onnx를 먼저 로드해야 RSS 증가량이 torch 모델 메모리와 섞이지 않음 (내보내기 시에는 torch도 잠시 로드됨)
+    onnx = bench_backend(BACKEND_ONNX_INT8, docs, queries, args.batch_size)
+    torch_ = bench_backend(BACKEND_TORCH, docs, queries, args.batch_size)
+
+    cos_d = cosine_rows(torch_["_d"], onnx["_d"])
+    cos_q = cosine_rows(torch_["_q"], onnx["_q"])
+    # 검색 일치율: 각 질의의 top-k 문서 집합이 두 백엔드에서 얼마나 겹치는지
+    k = args.top_k
+    def top_k(q, d):
+        return np.argsort(-(q / np.linalg.norm(q, axis=1, keepdims=True)) @ (d / np.linalg.norm(d, axis=1, keepdims=True)).T, axis=1)[:, :k]
+    t_top, o_top = top_k(torch_["_q"], torch_["_d"]), top_k(onnx["_q"], onnx["_d"])
+    overlap = float(np.mean([len(set(a) & set(b)) / k for a, b in zip(t_top, o_top)]))
+
+    report = {
+        "parity": {
+            "doc_cosine_min": round(float(cos_d.min()), 4),
+            "doc_cosine_mean": round(float(cos_d.mean()), 4),
+            "query_cosine_min": round(float(cos_q.min()), 4),
+            f"top{k}_overlap": round(overlap, 3),
+        },
+        "performance": [{k_: v for k_, v in r.items() if not k_.startswith("_")} for r in (torch_, onnx)],
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    worst = min(report["parity"]["doc_cosine_min"], report["parity"]["query_cosine_min"])
+    if worst < args.min_cosine:
+        print(f"일치도 미달: 최소 코사인 {worst} < {args.min_cosine}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
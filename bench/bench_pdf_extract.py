@@ -0,0 +1,75 @@
+# [개요] PDF 텍스트 추출 속도(pages/s)를 경로별로 비교하는 벤치마크입니다.
+# - pypdf 순차 : 기존 PyPDFLoader와 같은 추출기를 한 프로세스에서 사용 (기준)
+# - pypdf 병렬 : pdf_extract의 페이지 구간 프로세스 병렬 추출
+# - pymupdf 병렬: 더 빠른 추출 백엔드 + 병렬 (PyMuPDF 설치 시)
+# --pdf를 생략하면 PyMuPDF로 한글 본문이 있는 합성 PDF를 만들어 사용합니다.
+# 사용법: python bench/bench_pdf_extract.py [--pdf manual.pdf ...] [--pages 400] [--workers 4]
+
+import os  # 경로
+import sys  # 상위 폴더 import 경로 추가
+import json  # 결과 출력
+import random  # 합성 본문 생성
+import argparse  # 명령행 인자
+import tempfile  # 합성 PDF 저장 위치
+from typing import Dict, List  # 타입 힌트
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+
+import pdf_extract  # 추출 경로
+from bench_embed_bucketing import _WORDS  # 합성 본문 단어
+
+
+def make_pdf(path: str, pages: int, seed: int = 0):
+    """페이지마다 ~1500자 한글 본문이 있는 합성 PDF (몇 쪽은 표지/빈 페이지처럼 반복)"""
+    rng = random.Random(seed)
+    doc = pdf_extract.pymupdf.open()
+    for i in range(pages):
+        page = doc.new_page()
+        if i % 50 == 0:
+            text = "영농 기술 매뉴얼\n농촌진흥청"  # 장마다 반복되는 간지
+        else:
+            text = "\n".join(" ".join(rng.choices(_WORDS, k=14)) for _ in range(40))
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text, fontname="korea", fontsize=9)
+    doc.save(path)
+    doc.close()
+
+
+def run(paths: List[str], backend: str, workers: int) -> Dict:
+    total = {"backend": backend, "workers": workers, "pages": 0, "skipped_pages": 0, "seconds": 0.0}
+    for p in paths:
+        stats = {}
+        pdf_extract.extract_pdf_pages(p, backend=backend, workers=workers, stats=stats)
+        for k in ("pages", "skipped_pages", "seconds"):
+            total[k] += stats[k]
+    pdf_extract.shutdown_pool()  # 다음 경로의 프로세스 수가 다를 수 있으므로 매번 새로 생성
+    total["pages_per_second"] = round(total["pages"] / total["seconds"], 1) if total["seconds"] else None
+    total["seconds"] = round(total["seconds"], 2)
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 추출 속도 비교 (pypdf 순차 vs 병렬 vs pymupdf)")
+    parser.add_argument("--pdf", nargs="*", help="측정할 PDF 파일 (생략 시 합성 PDF 생성)")
+    parser.add_argument("--pages", type=int, default=400, help="합성 PDF 페이지 수")
+    parser.add_argument("--workers", type=int, default=pdf_extract._default_workers(), help="병렬 추출 프로세스 수")
+    args = parser.parse_args()
+
+    paths = args.pdf
+    if not paths:
+        if not pdf_extract.HAS_PYMUPDF:
+            parser.error("합성 PDF 생성에는 PyMuPDF가 필요합니다 (또는 --pdf로 파일 지정)")
+        paths = [os.path.join(tempfile.mkdtemp(prefix="bench_pdf_"), "synthetic.pdf")]
+        make_pdf(paths[0], args.pages)
+
+    results = []
+    if pdf_extract.HAS_PYPDF:
+        results.append(run(paths, pdf_extract.BACKEND_PYPDF, 1))
+        results.append(run(paths, pdf_extract.BACKEND_PYPDF, args.workers))
+    if pdf_extract.HAS_PYMUPDF:
+        results.append(run(paths, pdf_extract.BACKEND_PYMUPDF, 1))
+        results.append(run(paths, pdf_extract.BACKEND_PYMUPDF, args.workers))
+    print(json.dumps({"files": paths, "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+# [개요] 조각 중복 제거의 소유 기록(chunk_dedup.chunk_owners)을 확인하는 시나리오 점검입니다.
+# 날짜별 TB_RECIPE_SEARCH 스냅샷처럼 행 대부분이 겹치는 두 파일 A, B를 적재하면 B의 겹치는 조각은 A의 행으로만 저장됩니다.
+# 이 상태에서 A를 삭제(remove_source)하거나 A를 다른 내용으로 바꿔 다시 적재해도, B의 모든 조각이 B 이름으로
+# 남아 있고 검색되는지 확인합니다. Milvus 대신 vector_store.MemoryCollection, 임베딩은 hash 백엔드를 씁니다.
+# 사용법: python bench/check_dedup_ownership.py [--rows 300]   (실패하면 종료 코드 1)
+
+import os  # 경로 / 환경 변수
+import sys  # 상위 폴더 import 경로 추가 / 종료 코드
+import argparse  # 명령행 인자
+import tempfile  # 작업 폴더 (매니페스트, 데이터 파일)
+
+os.environ.setdefault("EMBEDDING_BACKEND", "hash")  # 모델 없이 결정적 벡터
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # bench 모듈 import
+
+WORK_DIR = tempfile.mkdtemp(prefix="dedup_owner_")
+os.chdir(WORK_DIR)  # 매니페스트(ingest_manifest.sqlite3)와 임베딩 캐시를 임시 폴더에 만듦
+
+import db_load  # 적재 / 삭제 경로
+from chunk_dedup import normalize_text, text_hash
+from vector_store import MemoryCollection  # Milvus 대용 메모리 저장소
+from ingest_bench import _write_delimited  # 레시피 스키마 합성 CSV
+
+COLLECTION = "receipe"
+FILE_A = "TB_RECIPE_SEARCH-20231130.csv"
+FILE_B = "TB_RECIPE_SEARCH-20240131.csv"
+
+
+def _hashes(collection, source: str = None):
+    expr = db_load._source_expr(source) if source else "id >= 0"
+    return {text_hash(normalize_text(r["text"])) for r in collection.query(expr=expr, output_fields=["text"])}
+
+
+def _file_hashes(path: str, splitter):
+    return {text_hash(normalize_text(d.page_content)) for d in db_load.load_file_to_documents(path, splitter)}
+
+
+def _check_searchable(collection, resources, path: str, source: str, sample: int = 20) -> int:
+    """파일의 조각 텍스트로 검색했을 때 같은 텍스트가 source 이름으로 가장 가깝게 나오지 않는 수"""
+    docs = db_load.load_file_to_documents(path, resources.text_splitter)[:sample]
+    vectors = resources.embeddings.embed_documents([d.page_content for d in docs])
+    misses = 0
+    for doc, hits in zip(docs, collection.search(data=vectors, limit=1, output_fields=["text", "source"])):
+        if not hits or hits[0].entity.get("text") != doc.page_content or hits[0].entity.get("source") != source:
+            misses += 1
+    return misses
+
+
+def run(rows: int) -> bool:
+    data = os.path.join(WORK_DIR, "data")
+    os.makedirs(data)
+    path_a, path_b = os.path.join(data, FILE_A), os.path.join(data, FILE_B)
+    # 같은 시드 -> 앞부분 행이 같은 두 스냅샷 (B가 A보다 행이 많음)
+    _write_delimited(path_a, rows, "utf-8", ",", seed=7)
+    _write_delimited(path_b, rows + rows // 3, "utf-8", ",", seed=7)
+
+    collection = MemoryCollection(COLLECTION, db_load.DIMENSION)
+    resources = db_load.IngestResources(dimension=db_load.DIMENSION)
+    ok = True
+    try:
+        stats = db_load.process_and_ingest_data(collection, data, resources, COLLECTION, files=[FILE_A, FILE_B])
+        want_b = _file_hashes(path_b, resources.text_splitter)
+        print(f"[적재] 조각 {stats['chunks']}개 저장, 중복 {stats['duplicates']}개 제외 "
+              f"(B 조각 {len(want_b)}개 중 B 이름 행 {len(_hashes(collection, FILE_B))}개)")
+        ok &= stats["duplicates"] > 0
+
+        # 1) A 삭제: B가 중복으로 건너뛴 조각이 B 이름으로 옮겨져야 함
+        os.remove(path_a)
+        db_load.remove_source(collection, COLLECTION, FILE_A, resources.manifest)
+        missing = want_b - _hashes(collection, FILE_B)
+        misses = _check_searchable(collection, resources, path_b, FILE_B)
+        print(f"[A 삭제] B 조각 누락 {len(missing)}개, 검색 실패 {misses}개, 남은 행 {collection.num_entities}개")
+        ok &= not missing and not misses and not _hashes(collection, FILE_A)
+
+        # 2) A를 다시 만들어 적재한 뒤 B를 다른 내용으로 교체: 이번에는 A의 조각이 A 이름으로 남아야 함
+        _write_delimited(path_a, rows, "utf-8", ",", seed=7)
+        db_load.process_and_ingest_data(collection, data, resources, COLLECTION, files=[FILE_A])
+        want_a = _file_hashes(path_a, resources.text_splitter)
+        _write_delimited(path_b, rows // 2, "utf-8", ",", seed=99)
+        db_load.process_and_ingest_data(collection, data, resources, COLLECTION, files=[FILE_B])
+        missing = want_a - _hashes(collection, FILE_A)
+        stale = _hashes(collection, FILE_B) - _file_hashes(path_b, resources.text_splitter)
+        misses = _check_searchable(collection, resources, path_a, FILE_A)
+        print(f"[B 교체] A 조각 누락 {len(missing)}개, 검색 실패 {misses}개, B의 이전 조각 잔존 {len(stale)}개")
+        ok &= not missing and not misses and not stale
+    finally:
+        resources.close()
+    print("OK" if ok else "FAILED")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="중복 제거 소유 기록 점검 (공유 조각의 원본 파일 삭제/교체)")
+    parser.add_argument("--rows", type=int, default=300, help="첫 스냅샷의 행 수")
+    args = parser.parse_args()
+    sys.exit(0 if run(args.rows) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# [개요] db_load.py 적재 파이프라인의 단계별 처리량을 반복 측정하는 벤치마크입니다.
+# 실제 데이터와 비슷한 합성 코퍼스(레시피 스키마 CSV[cp949/utf-8], TSV, 여러 시트 xlsx, 본문 위주 PDF)를 만들고
+# 로더 → 분할 → 임베딩 → 삽입 단계를 db_load와 같은 함수로 실행합니다. 삽입 대상은 Milvus 대신
+# vector_store.MemoryCollection(메모리 저장소)이므로 서버 없이 돌릴 수 있습니다.
+# 단계마다 행/조각 수, rows/s, MB/s(입력 파일 크기 기준), 최대 RSS(단계 중 증가분 포함), CPU 사용률을 JSON으로 출력합니다.
+# excel_stream 단계는 적재 루프가 쓰는 Excel 행 배치 스트리밍 경로의 메모리 사용량을 따로 잽니다.
+# 임베딩은 기본 hash 백엔드(모델 없음)이며, --backend torch / onnx-int8 로 실제 모델 비용을 포함할 수 있습니다.
+# 사용법: python bench/ingest_bench.py [--rows 20000] [--pdf-pages 200] [--backend hash] [--output result.json]
+
+import os  # 경로 / CPU 수
+import sys  # 상위 폴더 import 경로 추가
+import csv  # 합성 CSV/TSV 작성
+import json  # 결과 출력
+import time  # 단계 시간 측정
+import random  # 합성 데이터
+import argparse  # 명령행 인자
+import platform  # 실행 환경 기록
+import tempfile  # 합성 코퍼스 위치
+import threading  # RSS 샘플링 스레드
+from typing import Dict, List  # 타입 힌트
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # 프로젝트 루트 모듈 import
+
+import db_load  # 로더 / 분할기 / 배치 크기 설정 재사용
+import pdf_extract  # 합성 PDF 생성 가능 여부
+from vector_store import MemoryCollection  # Milvus 대용 메모리 저장소
+from embedding_backend import load_embeddings, BACKEND_HASH, EMBEDDING_MODEL
+from embedding_batching import LengthBucketedEmbeddings
+from bench_embed_bucketing import _WORDS  # 합성 본문 단어
+from bench_embedding_backend import rss_mb  # 현재 RSS(MB)
+
+RECIPE_COLUMNS = ["RCP_SNO", "RCP_TTL", "CKG_NM", "RGTR_ID", "RGTR_NM", "INQ_CNT", "RCMM_CNT", "SRAP_CNT",
+                  "CKG_MTH_ACTO_NM", "CKG_STA_ACTO_NM", "CKG_MTRL_ACTO_NM", "CKG_KND_ACTO_NM",
+                  "CKG_IPDC", "CKG_MTRL_CN", "CKG_INBUN_NM", "CKG_DODF_NM", "CKG_TIME_NM", "FIRST_REG_DT"]
+
+
+# === 합성 코퍼스 ===
+def _recipe_row(rng: random.Random, i: int) -> List[str]:
+    name = rng.choice(_WORDS) + rng.choice(_WORDS)
+    return [
+        str(6800000 + i), f"{name} 만들기 {i}", name, f"user{rng.randint(1, 9999)}", "홍길동",
+        str(rng.randint(0, 50000)), str(rng.randint(0, 100)), str(rng.randint(0, 500)),
+        rng.choice(["끓이기", "볶음", "찜", "구이"]), rng.choice(["일상", "초스피드", "손님접대"]),
+        rng.choice(["돼지고기", "채소류", "해물류"]), rng.choice(["국/탕", "반찬", "메인반찬"]),
+        " ".join(rng.choices(_WORDS, k=rng.randint(10, 40))),
+        "[재료] " + " | ".join(f"{w} {rng.randint(1, 500)}g" for w in rng.choices(_WORDS, k=rng.randint(4, 12))),
+        f"{rng.randint(1, 6)}인분", rng.choice(["초급", "중급", "아무나"]), f"{rng.choice([10, 30, 60])}분이내",
+        f"2023{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+    ]
+
+
+def _write_delimited(path: str, rows: int, encoding: str, delimiter: str, seed: int):
+    rng = random.Random(seed)
+    with open(path, "w", encoding=encoding, errors="replace", newline="") as f:
+        w = csv.writer(f, delimiter=delimiter)
+        w.writerow(RECIPE_COLUMNS)
+        for i in range(rows):
+            w.writerow(_recipe_row(rng, i))
+
+
+def _write_xlsx(path: str, rows: int, sheets: int, seed: int):
+    import openpyxl  # xlsx 작성 (db_load의 선택적 의존성과 동일)
+    rng = random.Random(seed)
+    wb = openpyxl.Workbook(write_only=True)
+    for s in range(sheets):
+        ws = wb.create_sheet(f"시트{s + 1}")
+        ws.append(RECIPE_COLUMNS)
+        for i in range(rows // sheets):
+            ws.append(_recipe_row(rng, s * rows + i))
+    wb.save(path)
+
+
+def make_corpus(out_dir: str, rows: int, pdf_pages: int, seed: int = 0) -> List[str]:
+    """데이터 폴더와 비슷한 합성 파일들을 만들고 파일명 목록을 반환합니다. (행 수는 파일 형식별로 나눔)"""
+    os.makedirs(out_dir, exist_ok=True)
+    files = []
+    part = max(1, rows // 4)
+    _write_delimited(os.path.join(out_dir, "TB_RECIPE_SEARCH_utf8.csv"), part, "utf-8", ",", seed)
+    _write_delimited(os.path.join(out_dir, "TB_RECIPE_SEARCH_cp949.csv"), part, "cp949", ",", seed + 1)
+    _write_delimited(os.path.join(out_dir, "TB_RECIPE_SEARCH.tsv"), part, "utf-8", "\t", seed + 2)
+    files += ["TB_RECIPE_SEARCH_utf8.csv", "TB_RECIPE_SEARCH_cp949.csv", "TB_RECIPE_SEARCH.tsv"]
+    if db_load.HAS_OPENPYXL:
+        _write_xlsx(os.path.join(out_dir, "TB_RECIPE_SEARCH.xlsx"), part, 3, seed + 3)
+        files.append("TB_RECIPE_SEARCH.xlsx")
+    if pdf_pages and pdf_extract.HAS_PYMUPDF:
+        from bench_pdf_extract import make_pdf
+        make_pdf(os.path.join(out_dir, "영농매뉴얼.pdf"), pdf_pages, seed + 4)
+        files.append("영농매뉴얼.pdf")
+    return files
+
+
+# === 단계 측정 ===
+class StageMeter:
+    """
+    with 블록의 경과 시간, CPU 시간(자식 프로세스 포함), 최대 RSS(주기 샘플링)를 측정합니다.
+    os.times()의 자식 CPU 시간은 종료되어 회수된(join) 자식만 더하므로, 프로세스 풀은 블록 안에서 종료해야 잡힙니다.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+
+    def _cpu(self) -> float:
+        t = os.times()
+        return t.user + t.system + t.children_user + t.children_system
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, rss_mb())
+
+    def __enter__(self):
+        self.start_rss = self.peak_rss = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        self._cpu0, self._t0 = self._cpu(), time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.seconds = time.perf_counter() - self._t0
+        self.cpu_seconds = self._cpu() - self._cpu0
+        self._stop.set()
+        self._thread.join()
+        self.peak_rss = max(self.peak_rss, rss_mb())
+        return False
+
+    def report(self, stage: str, items: int, nbytes: int) -> Dict:
+        s = self.seconds or 1e-9
+        return {
+            "stage": stage,
+            "items": items,
+            "seconds": round(self.seconds, 3),
+            "rows_per_second": round(items / s, 1),
+            "mb_per_second": round(nbytes / 1024 ** 2 / s, 2),
+            "peak_rss_mb": round(self.peak_rss, 1),
+            "rss_growth_mb": round(self.peak_rss - self.start_rss, 1),  # 단계 중 늘어난 최대 RSS
+            "cpu_utilization": round(self.cpu_seconds / s, 2),  # 1.0 = 코어 1개를 꽉 씀
+        }
+
+
+class _NoSplit:
+    """로더 단계만 측정하기 위해 분할을 건너뛰는 분할기 (db_load 로더는 split_documents만 호출)"""
+
+    def split_documents(self, docs):
+        return list(docs)
+
+
+def run(data_dir: str, files: List[str], backend: str, embed_batch_size: int) -> Dict:
+    paths = [os.path.join(data_dir, f) for f in files]
+    sizes = {f: os.path.getsize(p) for f, p in zip(files, paths)}
+    total_bytes = sum(sizes.values())
+    splitter = db_load.RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100)  # IngestResources와 같은 설정
+
+    stages, per_file = [], []
+    # 0) Excel 스트리밍 (db_load 적재 루프와 같은 load_file_for_ingest): 행 배치마다 분할 조각을 받고 버림
+    #    전체를 리스트로 모으는 1) 로드보다 먼저 재야 최대 RSS가 섞이지 않음. 행 수를 늘려도 rss_growth_mb가 거의 같아야 함
+    excel = [(f, p) for f, p in zip(files, paths) if db_load._resolve_ext(p) in db_load.EXCEL_EXTS]
+    if excel:
+        n_chunks = 0
+        with StageMeter() as m:
+            for f, p in excel:
+                for part in db_load.load_file_for_ingest(p, splitter):
+                    n_chunks += len(part)
+        stages.append(m.report("excel_stream", n_chunks, sum(sizes[f] for f, _ in excel)))
+
+    # 1) 로드 (파일 → 행/페이지 Document)
+    loaded = {}
+    with StageMeter() as m:
+        for f, p in zip(files, paths):
+            t0 = time.perf_counter()
+            loaded[f] = db_load.load_file_to_documents(p, _NoSplit())
+            per_file.append({"file": f, "mb": round(sizes[f] / 1024 ** 2, 2), "documents": len(loaded[f]),
+                             "load_seconds": round(time.perf_counter() - t0, 3)})
+        db_load.shutdown_pdf_pool()  # PDF 추출 프로세스를 단계 안에서 회수해야 그 CPU 시간이 cpu_utilization에 들어감
+    n_docs = sum(len(d) for d in loaded.values())
+    stages.append(m.report("load", n_docs, total_bytes))
+
+    # 2) 분할 (Document → 조각)
+    with StageMeter() as m:
+        chunks = [c for f in files for c in splitter.split_documents(loaded[f])]
+    stages.append(m.report("split", len(chunks), total_bytes))
+    del loaded
+
+    # 3) 임베딩 (db_load와 같은 길이 버킷 배치)
+    embeddings = LengthBucketedEmbeddings(
+        load_embeddings(EMBEDDING_MODEL, backend=backend, device="cpu", batch_size=embed_batch_size),
+        batch_size=embed_batch_size, use_tokenizer=backend != BACKEND_HASH,
+    )
+    texts = [c.page_content for c in chunks]
+    text_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    with StageMeter() as m:
+        vectors = embeddings.embed_documents(texts)
+    stages.append(m.report("embed", len(texts), text_bytes))
+
+    # 4) 삽입 (db_load와 같은 열 구성, MILVUS_BATCH_SIZE 단위)
+    collection = MemoryCollection("bench_ingest", len(vectors[0]) if vectors else None)
+    step = db_load.MILVUS_BATCH_SIZE
+    with StageMeter() as m:
+        for s in range(0, len(chunks), step):
+            batch = chunks[s:s + step]
+            collection.insert([
+                [c.metadata.get("source", "") for c in batch],
+                [c.metadata.get("page", c.metadata.get("row", 0)) for c in batch],
+                texts[s:s + step],
+                vectors[s:s + step],
+            ])
+        collection.flush()
+    stages.append(m.report("insert", collection.num_entities, text_bytes))
+
+    total_s = sum(st["seconds"] for st in stages)
+    return {
+        "stages": stages,
+        "files": per_file,
+        "total": {"input_mb": round(total_bytes / 1024 ** 2, 2), "chunks": len(chunks), "seconds": round(total_s, 3),
+                  "chunks_per_second": round(len(chunks) / total_s, 1) if total_s else None},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="db_load 적재 파이프라인 단계별 벤치마크 (합성 코퍼스, 메모리 저장소)")
+    parser.add_argument("--rows", type=int, default=20000, help="CSV/TSV/xlsx 합성 행 수 (형식별로 나눔)")
+    parser.add_argument("--pdf-pages", type=int, default=200, help="합성 PDF 페이지 수 (0이면 PDF 제외)")
+    parser.add_argument("--backend", default=BACKEND_HASH, help="임베딩 백엔드 (hash, torch, onnx-int8)")
+    parser.add_argument("--embed-batch-size", type=int, default=db_load.EMBED_BATCH_SIZE, help="임베딩 배치 크기")
+    parser.add_argument("--data-dir", help="합성 코퍼스를 만들 폴더 (생략 시 임시 폴더)")
+    parser.add_argument("--seed", type=int, default=0, help="합성 데이터 시드 (같은 값이면 같은 코퍼스)")
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (생략 시 표준 출력만)")
+    args = parser.parse_args()
+
+    data_dir = args.data_dir or tempfile.mkdtemp(prefix="ingest_bench_")
+    files = make_corpus(data_dir, args.rows, args.pdf_pages, args.seed)
+    result = run(data_dir, files, args.backend, args.embed_batch_size)
+    report = {
+        "config": {"rows": args.rows, "pdf_pages": args.pdf_pages, "backend": args.backend,
+                   "embed_batch_size": args.embed_batch_size, "milvus_batch_size": db_load.MILVUS_BATCH_SIZE,
+                   "pdf_backend": pdf_extract.PDF_BACKEND, "seed": args.seed},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count()},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        **result,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+if __name__ == "__main__":
+    main()
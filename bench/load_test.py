@@ -0,0 +1,361 @@
+# [개요] App.py(/chat)와 run_test_server.py(/chat, /chat-stream)의 동시 사용자 처리량을 재는 종단 간 부하 테스트입니다.
+# - 질문 코퍼스로 세션(단일 턴 / 여러 턴 / 첫 턴에 파일 업로드)을 만들고, 목표 도착률(세션/초)의 포아송 도착으로
+#   열린 루프(open-loop) 부하를 겁니다. 같은 세션의 턴은 앞 턴의 응답을 받은 뒤 이어서 보냅니다.
+# - 요청마다 TTFB(응답 헤더까지), TTFT(첫 답변 내용까지: SSE는 answer 이벤트, /chat은 본문 첫 바이트),
+#   전체 지연을 재고, 백분위수(p50/p90/p95/p99), 오류율(상태 코드/예외별), 처리량을 JSON 보고서로 씁니다.
+# - 기본은 외부 의존성 없이 한 프로세스에서 실행합니다: 모의 Groq 서버(mock_groq_server), 메모리 벡터 저장소
+#   (VECTOR_STORE=memory, 합성 문서를 미리 적재), hash 임베딩을 띄운 뒤 대상 Flask 앱을 스레드 서버로 올립니다.
+#   --url을 주면 이미 떠 있는 서버에 부하만 겁니다. (대용품 준비는 직접)
+# - 모의 Groq 서버를 쓸 때는 llm_client의 로컬 한도(기본: 무료 계정 30 RPM)를 모의 서버 값(--mock-rpm, 0이면 제한 없음)으로
+#   올립니다. 그대로 두면 대상 앱이 아니라 클라이언트 쪽 한도 대기를 재게 됨. 적용한 한도는 보고서 config.llm_limits에 씁니다.
+# - --compare a.json b.json 으로 두 보고서의 주요 지표를 나란히 비교합니다.
+# 사용법: python bench/load_test.py [--target app|test-server] [--endpoint chat|chat-stream] [--rate 2] [--duration 60]
+#         [--multi-turn-ratio 0.3] [--upload-ratio 0.1] [--mock-latency synthesis=0.8:0.5] [--mock-rpm 0] [--output report.json]
+#         python bench/load_test.py --compare before.json after.json
+
+import os  # 환경 변수 / 경로
+import sys  # 상위 폴더 import 경로 추가
+import json  # 보고서 / 요청 본문
+import time  # 지연 측정
+import uuid  # 세션 ID
+import random  # 세션 구성 / 도착 간격
+import asyncio  # 비동기 부하 생성
+import logging  # 로그 기록
+import argparse  # 명령행 인자
+import platform  # 보고서 환경 정보
+import tempfile  # 업로드 저장 폴더
+import threading  # 서버 스레드
+import subprocess  # git 커밋 (보고서 비교용)
+from typing import Dict, List, Optional  # 타입 힌트
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # 프로젝트 루트 모듈 import
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))  # bench 모듈 import
+
+import httpx  # 비동기 HTTP 클라이언트
+import numpy as np  # 백분위수
+
+logger = logging.getLogger(__name__)
+
+TARGET_APP = "app"
+TARGET_TEST_SERVER = "test-server"
+ENDPOINT_CHAT = "chat"
+ENDPOINT_CHAT_STREAM = "chat-stream"
+KIND_SINGLE = "single"
+KIND_MULTI = "multi"
+KIND_UPLOAD = "upload"
+PERCENTILES = (50, 90, 95, 99)
+SEED_DOCS_PER_COLLECTION = 200  # 메모리 저장소 컬렉션별 합성 문서 수
+
+# 전문가 분야별 질문 (라우터가 한 명 / 여러 명을 고르는 질문을 섞음)
+QUESTIONS = {
+    "farmer": ["고추 재배할 때 병해충 관리는 어떻게 해?", "감자 수확 시기는 언제야?", "토양 산도 조절 방법 알려줘",
+               "베란다에서 키우기 쉬운 작물 추천해줘", "상추 모종 심는 간격은?"],
+    "receipe": ["김치찌개 맛있게 끓이는 방법 알려줘", "두부 조림 레시피 알려줘", "저염식 된장국 만드는 법",
+                "돼지고기 볶음 양념 비율은?", "애호박 반찬 요리 추천해줘"],
+    "nutrient": ["두부의 단백질 함량은?", "비타민 C가 많은 채소는?", "현미의 GI 지수는 어느 정도야?",
+                 "당뇨에 좋은 식품 알려줘", "시금치의 영양 성분과 효능은?"],
+    "mixed": ["집에서 고추를 재배해서 고추장 찌개를 만들고 싶어", "상추를 키워서 칼로리 낮은 샐러드 레시피 알려줘",
+              "감자 수확 후 영양 성분을 살린 요리 방법은?"],
+}
+FOLLOW_UPS = ["그럼 그걸로 만들 수 있는 요리는?", "방금 말한 것의 영양 성분은?", "초보자도 할 수 있을까?", "더 자세히 알려줘"]
+SEED_TEXTS = {
+    "farmer": "{w}는 배수가 좋은 토양에서 잘 자라며 생육 적온은 20~25도입니다. 병해충은 초기에 방제하고 수확은 열매가 충분히 익었을 때 합니다.",
+    "receipe": "{w} 요리는 재료를 손질한 뒤 양념을 넣고 중불에서 끓이거나 볶습니다. 간은 마지막에 맞추고 취향에 따라 고춧가루를 더합니다.",
+    "nutrient": "{w} 100g에는 단백질, 탄수화물, 지방과 비타민, 무기질이 들어 있으며 칼로리와 GI 지수는 조리 방법에 따라 달라집니다.",
+}
+SEED_WORDS = ["고추", "감자", "상추", "두부", "시금치", "애호박", "현미", "돼지고기", "김치", "된장", "양파", "마늘"]
+UPLOAD_TEXT = "우리 집 텃밭 기록\n" + "\n".join(f"{i}주차: 상추와 고추에 물을 주고 웃거름을 주었다. 잎이 {i}장 더 났다." for i in range(1, 31))
+
+
+# === 세션 / 요청 ===
+def make_sessions(n: int, multi_turn_ratio: float, upload_ratio: float, seed: int = 0) -> List[Dict]:
+    """세션 목록: {"id", "kind", "turns": [질문...], "upload": bool}"""
+    rng = random.Random(seed)
+    pool = [q for qs in QUESTIONS.values() for q in qs]
+    sessions = []
+    for _ in range(n):
+        r = rng.random()
+        kind = KIND_UPLOAD if r < upload_ratio else KIND_MULTI if r < upload_ratio + multi_turn_ratio else KIND_SINGLE
+        turns = [rng.choice(pool)]
+        if kind != KIND_SINGLE:
+            turns += rng.sample(FOLLOW_UPS, rng.randint(1, 2))
+        sessions.append({"id": uuid.uuid4().hex, "kind": kind, "turns": turns, "upload": kind == KIND_UPLOAD})
+    return sessions
+
+
+async def _send(client: httpx.AsyncClient, base_url: str, target: str, endpoint: str, session: Dict,
+                question: str, first_turn: bool, timeout: float) -> Dict:
+    record = {"endpoint": endpoint, "kind": session["kind"], "status": None, "error": None,
+              "ttfb_s": None, "ttft_s": None, "latency_s": None}
+    started = time.perf_counter()
+    try:
+        if endpoint == ENDPOINT_CHAT_STREAM:
+            request = client.build_request("GET", f"{base_url}/chat-stream", params={"message": question}, timeout=timeout)
+        elif target == TARGET_APP and session["upload"] and first_turn:
+            request = client.build_request("POST", f"{base_url}/chat", timeout=timeout,
+                                           data={"message": question, "session_id": session["id"]},
+                                           files={"file": ("garden_notes.txt", UPLOAD_TEXT.encode("utf-8"), "text/plain")})
+        else:
+            body = {"message": question, "session_id": session["id"]} if target == TARGET_APP else {"message": question}
+            request = client.build_request("POST", f"{base_url}/chat", json=body, timeout=timeout)
+
+        response = await client.send(request, stream=True)
+        record["ttfb_s"] = time.perf_counter() - started
+        record["status"] = response.status_code
+        chunks = []
+        try:
+            async for chunk in response.aiter_text():
+                if record["ttft_s"] is None and endpoint == ENDPOINT_CHAT:
+                    record["ttft_s"] = time.perf_counter() - started
+                chunks.append(chunk)
+                if endpoint == ENDPOINT_CHAT_STREAM and record["ttft_s"] is None and "event: answer" in "".join(chunks[-2:]):
+                    record["ttft_s"] = time.perf_counter() - started
+        finally:
+            await response.aclose()
+        record["latency_s"] = time.perf_counter() - started
+        text = "".join(chunks)
+        if response.status_code >= 400:
+            record["error"] = f"http_{response.status_code}"
+        elif endpoint == ENDPOINT_CHAT_STREAM:
+            if "event: error" in text:
+                record["error"] = "sse_error"
+            elif record["ttft_s"] is None:
+                record["error"] = "no_answer"
+        else:
+            try:
+                payload = json.loads(text)
+                record["model_tier"] = (payload.get("model_tier") or {}).get("tier")
+                if not payload.get("answer"):
+                    record["error"] = "no_answer"
+            except ValueError:
+                record["error"] = "bad_json"
+    except httpx.TimeoutException:
+        record["error"] = "timeout"
+        record["latency_s"] = time.perf_counter() - started
+    except httpx.HTTPError as e:
+        record["error"] = type(e).__name__
+        record["latency_s"] = time.perf_counter() - started
+    return record
+
+
+async def _run_session(client, base_url, target, endpoint, session, timeout, records: List[Dict]):
+    for i, question in enumerate(session["turns"]):
+        record = await _send(client, base_url, target, endpoint, session, question, i == 0, timeout)
+        record["turn"] = i
+        records.append(record)
+        if record["error"]:
+            break  # 앞 턴이 실패하면 이어지는 턴은 보내지 않음
+
+
+async def run_load(base_url: str, target: str, endpoint: str, sessions: List[Dict], rate: float,
+                   timeout: float, seed: int = 0) -> Dict:
+    """포아송 도착(평균 rate 세션/초)으로 세션을 시작하고 모든 세션이 끝날 때까지 기다립니다."""
+    rng = random.Random(seed + 1)
+    records: List[Dict] = []
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+    async with httpx.AsyncClient(limits=limits) as client:
+        started = time.perf_counter()
+        tasks = []
+        next_at = 0.0
+        for session in sessions:
+            delay = next_at - (time.perf_counter() - started)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.ensure_future(_run_session(client, base_url, target, endpoint, session, timeout, records)))
+            next_at += rng.expovariate(rate) if rate > 0 else 0.0
+        offered_s = time.perf_counter() - started
+        await asyncio.gather(*tasks)
+        wall_s = time.perf_counter() - started
+    return {"records": records, "wall_s": wall_s, "offered_s": offered_s}
+
+
+# === 보고서 ===
+def _dist(values: List[float]) -> Optional[Dict]:
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    arr = np.asarray(values)
+    out = {f"p{p}": round(float(np.percentile(arr, p)), 4) for p in PERCENTILES}
+    out.update(mean=round(float(arr.mean()), 4), max=round(float(arr.max()), 4), n=len(values))
+    return out
+
+
+def summarize(records: List[Dict], wall_s: float) -> Dict:
+    ok = [r for r in records if not r["error"]]
+    errors: Dict[str, int] = {}
+    for r in records:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    tiers: Dict[str, int] = {}
+    for r in ok:
+        if r.get("model_tier"):
+            tiers[r["model_tier"]] = tiers.get(r["model_tier"], 0) + 1
+    return {
+        "requests": len(records), "ok": len(ok), "errors": errors,
+        "error_rate": round(1 - len(ok) / len(records), 4) if records else 0.0,
+        "throughput_rps": round(len(ok) / wall_s, 3) if wall_s else 0.0,
+        "ttfb_s": _dist([r["ttfb_s"] for r in ok]),
+        "ttft_s": _dist([r["ttft_s"] for r in ok]),
+        "latency_s": _dist([r["latency_s"] for r in ok]),
+        **({"model_tiers": tiers} if tiers else {}),
+    }
+
+
+def build_report(args, result: Dict, extra: Dict) -> Dict:
+    records = result["records"]
+    by_kind = {kind: summarize([r for r in records if r["kind"] == kind], result["wall_s"])
+               for kind in (KIND_SINGLE, KIND_MULTI, KIND_UPLOAD) if any(r["kind"] == kind for r in records)}
+    try:
+        commit = subprocess.run(["git", "-C", ROOT, "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "environment": {"git_commit": commit, "python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "offered_rate_sps": round(args.sessions / result["offered_s"], 3) if result["offered_s"] else None,
+        "wall_s": round(result["wall_s"], 3),
+        "summary": summarize(records, result["wall_s"]),
+        "by_kind": by_kind,
+        **extra,
+    }
+
+
+def compare(path_a: str, path_b: str):
+    """두 보고서의 주요 지표를 나란히 출력 (b의 a 대비 변화율)"""
+    with open(path_a, encoding="utf-8") as f:
+        a = json.load(f)["summary"]
+    with open(path_b, encoding="utf-8") as f:
+        b = json.load(f)["summary"]
+    rows = [("throughput_rps", a["throughput_rps"], b["throughput_rps"]), ("error_rate", a["error_rate"], b["error_rate"])]
+    for metric in ("ttfb_s", "ttft_s", "latency_s"):
+        for p in PERCENTILES:
+            key = f"p{p}"
+            rows.append((f"{metric}.{key}", (a.get(metric) or {}).get(key), (b.get(metric) or {}).get(key)))
+    print(f"{'지표':<20}{os.path.basename(path_a):>16}{os.path.basename(path_b):>16}{'변화':>10}")
+    for name, va, vb in rows:
+        change = f"{(vb - va) / va * 100:+.1f}%" if va and vb is not None else "-"
+        print(f"{name:<20}{str(va):>16}{str(vb):>16}{change:>10}")
+
+
+# === 대용품(모의 Groq / 메모리 벡터 저장소) + 대상 서버 ===
+def _serve(flask_app, name: str) -> str:
+    from werkzeug.serving import make_server  # Flask 개발 서버와 같은 스레드 서버
+    server = make_server("127.0.0.1", 0, flask_app, threaded=True)
+    threading.Thread(target=server.serve_forever, name=name, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def seed_memory_store(embeddings, docs_per_collection: int = SEED_DOCS_PER_COLLECTION, seed: int = 0):
+    """전문가 컬렉션(farmer / receipe / nutrient)에 합성 문서를 넣습니다. (검색 결과가 비지 않도록)"""
+    from vector_store import memory_collection
+    rng = random.Random(seed)
+    for name, template in SEED_TEXTS.items():
+        texts = [f"[{i}] " + template.format(w=rng.choice(SEED_WORDS)) for i in range(docs_per_collection)]
+        collection = memory_collection(name)
+        if collection.num_entities:
+            continue
+        collection.insert([[f"seed_{name}.txt"] * len(texts), list(range(len(texts))), texts,
+                           embeddings.embed_documents(texts)])
+
+
+def start_standins_and_target(args) -> Dict:
+    """모의 Groq 서버 / 메모리 저장소를 준비하고 대상 앱을 띄운 뒤 {"base_url", "mock_config"}를 반환합니다."""
+    mock_config = None
+    if args.groq_url:
+        os.environ["GROQ_BASE_URL"] = args.groq_url
+    else:
+        import mock_groq_server
+        mock_config = mock_groq_server.MockConfig(mock_groq_server.parse_latency(args.mock_latency), args.mock_tokens_per_sec,
+                                                  args.mock_rate_limit_rate, args.mock_error_rate, args.mock_rpm, seed=args.seed)
+        os.environ["GROQ_BASE_URL"] = _serve(mock_groq_server.create_app(mock_config), "mock-groq")
+    # 모의 서버의 한도에 맞춤 (직접 LLM_MODEL_LIMITS를 준 경우는 그대로). 모의 서버는 토큰 수를 제한하지 않음
+    os.environ.setdefault("LLM_MODEL_LIMITS", f"*={args.mock_rpm}:0")
+    os.environ.setdefault("GROQ_API_KEY", "mock")
+    os.environ["VECTOR_STORE"] = "memory"
+    os.environ.setdefault("EMBEDDING_BACKEND", "hash")
+    os.environ.setdefault("CONTEXT_TOKENIZER", "")  # 오프라인: 토크나이저 다운로드 대신 근사치로 토큰 세기
+    os.chdir(tempfile.mkdtemp(prefix="load_test_"))  # 업로드 파일은 임시 폴더에 저장
+
+    from embedding_backend import load_embeddings
+    seed_memory_store(load_embeddings(), seed=args.seed)
+    if args.target == TARGET_APP:
+        import App as target_module
+    else:
+        import run_test_server as target_module
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # 요청마다 찍히는 접근 로그 생략
+    from llm_client import get_llm_client
+    return {"base_url": _serve(target_module.app, "load-test-target"), "mock_config": mock_config,
+            "llm_limits": get_llm_client().limits()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="/chat, /chat-stream 종단 간 부하 테스트")
+    parser.add_argument("--target", choices=[TARGET_APP, TARGET_TEST_SERVER], default=TARGET_APP)
+    parser.add_argument("--endpoint", choices=[ENDPOINT_CHAT, ENDPOINT_CHAT_STREAM], default=ENDPOINT_CHAT)
+    parser.add_argument("--url", default=None, help="이미 떠 있는 서버 주소 (주면 대용품/서버를 띄우지 않음)")
+    parser.add_argument("--rate", type=float, default=2.0, help="세션 도착률 (세션/초)")
+    parser.add_argument("--duration", type=float, default=30.0, help="부하를 거는 시간(초) -> 세션 수 = rate x duration")
+    parser.add_argument("--sessions", type=int, default=None, help="세션 수 직접 지정 (--duration 대신)")
+    parser.add_argument("--multi-turn-ratio", type=float, default=0.3, help="여러 턴 세션 비율")
+    parser.add_argument("--upload-ratio", type=float, default=0.1, help="첫 턴에 파일을 올리는 세션 비율 (app /chat만)")
+    parser.add_argument("--timeout", type=float, default=60.0, help="요청 타임아웃(초)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--groq-url", default=None, help="외부 모의 Groq 서버 주소 (생략 시 프로세스 안에서 띄움)")
+    parser.add_argument("--mock-latency", default="", help="모의 Groq 지연 '종류=중앙값[:시그마],...'")
+    parser.add_argument("--mock-tokens-per-sec", type=float, default=250.0)
+    parser.add_argument("--mock-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--mock-error-rate", type=float, default=0.0)
+    parser.add_argument("--mock-rpm", type=int, default=0, help="모의 Groq의 모델별 분당 요청 한도 (0이면 제한 없음, 로컬 한도도 같게 맞춤)")
+    parser.add_argument("--output", default=None, help="JSON 보고서 경로 (생략 시 표준 출력)")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"), help="두 보고서 비교 후 종료")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.endpoint == ENDPOINT_CHAT_STREAM and args.target == TARGET_APP:
+        parser.error("App.py에는 /chat-stream이 없습니다. (--target test-server)")
+    if args.target == TARGET_TEST_SERVER and args.upload_ratio:
+        logger.warning("run_test_server.py는 업로드를 받지 않아 업로드 세션은 일반 질문으로 보냅니다.")
+    args.sessions = args.sessions or max(1, int(args.rate * args.duration))
+    output = os.path.abspath(args.output) if args.output else None  # 대용품 준비 중 작업 폴더가 바뀜
+
+    extra = {}
+    llm_limits = None
+    if args.url:
+        base_url, mock_config = args.url.rstrip("/"), None
+    else:
+        started = start_standins_and_target(args)
+        base_url, mock_config, llm_limits = started["base_url"], started["mock_config"], started["llm_limits"]
+
+    sessions = make_sessions(args.sessions, args.multi_turn_ratio, args.upload_ratio, args.seed)
+    print(f"부하 시작: {base_url} {args.endpoint} 세션 {len(sessions)}개 @ {args.rate}/s", file=sys.stderr)
+    result = asyncio.run(run_load(base_url, args.target, args.endpoint, sessions, args.rate, args.timeout, args.seed))
+
+    if mock_config is not None:
+        extra["mock_groq"] = mock_config.stats
+    if args.target == TARGET_APP:
+        try:
+            extra["llm_metrics"] = httpx.get(f"{base_url}/metrics/llm", timeout=5).json()  # 대기열/재시도/단계 지표
+        except (httpx.HTTPError, ValueError):
+            pass
+    report = build_report(args, result, extra)
+    report["config"]["llm_limits"] = llm_limits or extra.get("llm_metrics", {}).get("limits")  # 대상 앱의 로컬 한도 (RPM, TPM)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"보고서 저장: {output}", file=sys.stderr)
+    else:
+        print(text)
+    s = report["summary"]
+    print(f"요청 {s['requests']} / 성공 {s['ok']} / 오류율 {s['error_rate']:.2%} / 처리량 {s['throughput_rps']} req/s / "
+          f"지연 p50 {(s['latency_s'] or {}).get('p50')}s p95 {(s['latency_s'] or {}).get('p95')}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+# [개요] 실제 Groq 사용량을 쓰지 않고 부하/지연 테스트를 하기 위한 Groq(OpenAI) 호환 모의 LLM 서버입니다.
+# Groq SDK는 GROQ_BASE_URL 환경 변수를 그대로 쓰므로, 앱 코드를 고치지 않고 아래처럼 이 서버로 돌릴 수 있습니다.
+#   python bench/mock_groq_server.py --port 8600
+#   GROQ_BASE_URL=http://127.0.0.1:8600 GROQ_API_KEY=mock python App.py
+# - 출력은 프롬프트만으로 정해집니다(결정적): 라우터 -> 질문 키워드로 고른 전문가 이름,
+#   재작성 -> 관련 있으면 질문 그대로 / 없으면 "pass", 대화 요약 -> 고정 형식 요약, 그 외(합성) -> 질문과 자료 첫 줄을 담은 답변.
+# - 지연: 호출 종류별 첫 토큰 지연(로그 정규 분포, 중앙값/시그마)과 초당 출력 토큰 수로 응답 시간을 흉내 냅니다.
+# - stream=True면 SSE로 토큰 조각을 흘려보내고, max_tokens / stop("\n")은 실제 API처럼 자르고 finish_reason에 반영합니다.
+# - 장애 주입: --rate-limit-rate 비율만큼 429(retry-after 포함), --error-rate 비율만큼 500/503을 돌려주며,
+#   --rpm을 주면 모델별 분당 요청 수를 실제로 세어 넘으면 429를 냅니다. 응답에는 x-ratelimit-* 헤더를 붙입니다.
+# 토큰 수는 llm_client.estimate_tokens와 같은 근사치(2글자당 1토큰)이고, 출력 토큰 1개 = 어절/공백 조각 1개로 셉니다.
+# 사용법: python bench/mock_groq_server.py [--port 8600] [--latency router=0.15:0.4,synthesis=0.8:0.5]
+#         [--tokens-per-sec 250] [--rate-limit-rate 0.02] [--error-rate 0.01] [--rpm 0] [--seed 0]
+
+import re  # 프롬프트 파싱
+import sys  # 종료 코드
+import json  # 응답 본문
+import time  # 지연 / 타임스탬프
+import uuid  # 응답 ID
+import random  # 지연 분포 / 장애 주입
+import logging  # 로그 기록
+import argparse  # 명령행 인자
+import threading  # 지표 / 분당 요청 수 보호
+from collections import deque  # 분당 요청 시각
+from typing import Dict, List, Optional, Tuple  # 타입 힌트
+
+from flask import Flask, Response, jsonify, request, stream_with_context
+
+logger = logging.getLogger(__name__)
+
+CALL_ROUTER = "router"
+CALL_REWRITE = "rewrite"
+CALL_SUMMARY = "summary"
+CALL_SYNTHESIS = "synthesis"
+
+# 호출 종류별 첫 토큰 지연 (중앙값 초, 로그 정규 시그마). 실제 Groq 8B/70B 응답 시간과 비슷한 기본값
+DEFAULT_LATENCY = {CALL_ROUTER: (0.15, 0.4), CALL_REWRITE: (0.15, 0.4), CALL_SUMMARY: (0.3, 0.4), CALL_SYNTHESIS: (0.6, 0.5)}
+DEFAULT_TOKENS_PER_SEC = 250.0  # 출력 토큰 생성 속도
+SYNTHESIS_ANSWER_WORDS = 120  # 합성 답변 길이(어절 수)
+RATE_LIMIT_RETRY_AFTER = 1.0  # 주입한 429의 retry-after(초)
+
+# 전문가 이름(앞 두 글자)별 관련 키워드. 라우터와 재작성 판단에 사용
+EXPERT_KEYWORDS = {
+    "작물": ("작물", "재배", "심", "수확", "비료", "토양", "병해충", "농사", "씨앗", "모종", "기후", "키우"),
+    "레시피": ("레시피", "요리", "만드", "만들", "끓이", "볶", "굽", "조리", "반찬", "찌개", "양념", "먹"),
+    "영양": ("영양", "칼로리", "단백질", "비타민", "효능", "건강", "GI", "당뇨", "지방", "탄수화물", "나트륨", "성분"),
+}
+
+_QUESTION_RES = [re.compile(r"\[사용자의 최신 질문\]\s*\n(.+)"), re.compile(r"\[사용자 질문\]\s*\n(.+)"),
+                 re.compile(r"^질문:\s*(.+)$", re.M)]
+_REWRITE_ROLE_RES = [re.compile(r"당신은 '([^']+)'"), re.compile(r"^역할:\s*([^(\n]+?)\s*\(", re.M)]
+_TOKEN_RE = re.compile(r"\S+\s*")  # 출력 토큰 조각 (어절 + 뒤 공백)
+
+
+# === 프롬프트 -> 결정적 출력 ===
+def classify(prompt: str) -> str:
+    if "[갱신된 요약]" in prompt:
+        return CALL_SUMMARY
+    if "지능형 라우터" in prompt or "필요한 전문가 이름만" in prompt:
+        return CALL_ROUTER
+    if "검색용 질문" in prompt or "검색에 최적화된 질문" in prompt:
+        return CALL_REWRITE
+    return CALL_SYNTHESIS
+
+
+def extract_question(prompt: str) -> str:
+    for pattern in _QUESTION_RES:
+        m = pattern.search(prompt)
+        if m:
+            return m.group(1).strip()
+    return prompt.strip().splitlines()[-1] if prompt.strip() else ""
+
+
+def _expert_names(prompt: str) -> List[str]:
+    m = re.search(r"^전문가:\s*(.+)$", prompt, re.M)  # App.py 형식: "전문가: a, b, c"
+    if m:
+        return [n.strip() for n in m.group(1).split(",") if n.strip()]
+    block = prompt.split("[사용 가능한 전문가 목록]", 1)[-1].split("\n[", 1)[0]  # orchestrate 형식: 목록 블록의 "- 이름: 설명"
+    return [n.strip() for n in re.findall(r"^- ([^:\n]+):", block, re.M)]
+
+
+def _relevant(expert: str, question: str) -> bool:
+    keywords = next((kw for prefix, kw in EXPERT_KEYWORDS.items() if expert.startswith(prefix)), None)
+    return keywords is None or any(k in question for k in keywords)
+
+
+def route(prompt: str) -> str:
+    question, names = extract_question(prompt), _expert_names(prompt)
+    chosen = [n for n in names if _relevant(n, question)]
+    return ",".join(chosen or names)  # 어느 쪽도 아니면 전체 (실제 라우터 지침과 동일)
+
+
+def rewrite(prompt: str) -> str:
+    question = extract_question(prompt)
+    role = next((m.group(1).strip() for p in _REWRITE_ROLE_RES for m in [p.search(prompt)] if m), "")
+    return question if _relevant(role, question) else "pass"
+
+
+def summarize(prompt: str) -> str:
+    new_turns = prompt.split("[새 대화]", 1)[-1].split("[규칙]", 1)[0]
+    questions = [line.split(":", 1)[1].strip() for line in new_turns.splitlines() if line.startswith("사용자:")]
+    return "사용자는 " + ", ".join(f"'{q[:30]}'" for q in questions[-5:]) + " 에 대해 물었습니다." if questions \
+        else "이전 대화에서 특별한 조건은 없었습니다."
+
+
+def synthesize(prompt: str) -> str:
+    question = extract_question(prompt)
+    facts = [line.lstrip("- ").strip() for line in prompt.splitlines() if line.startswith("- ") and len(line) > 10][:3]
+    words = f"'{question}'에 대한 답변입니다.".split()
+    for fact in facts:
+        words += f"참고 자료에 따르면 {fact[:120]}".split()
+    filler = "재배 환경과 조리 방법, 영양 성분을 함께 고려하면 더 좋은 결과를 얻을 수 있습니다.".split()
+    while len(words) < SYNTHESIS_ANSWER_WORDS:
+        words += filler
+    return " ".join(words[:SYNTHESIS_ANSWER_WORDS])
+
+
+GENERATORS = {CALL_ROUTER: route, CALL_REWRITE: rewrite, CALL_SUMMARY: summarize, CALL_SYNTHESIS: synthesize}
+
+
+def apply_limits(text: str, max_tokens: Optional[int], stop) -> Tuple[List[str], str]:
+    """출력을 토큰 조각으로 나누고 stop / max_tokens를 적용합니다. (조각 목록, finish_reason)"""
+    for s in ([stop] if isinstance(stop, str) else stop or []):
+        if s and s in text:
+            text = text[:text.index(s)]
+    pieces = _TOKEN_RE.findall(text)
+    if max_tokens is not None and len(pieces) > max_tokens:
+        return pieces[:max_tokens], "length"
+    return pieces, "stop"
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 2)
+
+
+# === 지연 / 장애 주입 설정 ===
+class MockConfig:
+    def __init__(self, latency: Optional[Dict[str, Tuple[float, float]]] = None, tokens_per_sec: float = DEFAULT_TOKENS_PER_SEC,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, rpm: int = 0, seed: int = 0):
+        self.latency = dict(DEFAULT_LATENCY, **(latency or {}))
+        self.tokens_per_sec = tokens_per_sec
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.rpm = rpm
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._requests: Dict[str, deque] = {}  # 모델 -> 최근 1분 요청 시각
+        self.stats = {"requests": 0, "injected_429": 0, "rpm_429": 0, "injected_errors": 0, "streamed": 0,
+                      "by_call": {c: 0 for c in GENERATORS}}
+
+    def first_token_delay(self, call_type: str) -> float:
+        median, sigma = self.latency[call_type]
+        with self._lock:
+            return median * self._rng.lognormvariate(0.0, sigma) if sigma > 0 else median
+
+    def roll(self, rate: float) -> bool:
+        if rate <= 0:
+            return False
+        with self._lock:
+            return self._rng.random() < rate
+
+    def error_status(self) -> int:
+        with self._lock:
+            return self._rng.choice((500, 503))
+
+    def admit(self, model: str) -> Tuple[bool, int, float]:
+        """--rpm 한도 확인. (허용 여부, 남은 요청 수, 초기화까지 초)"""
+        now = time.monotonic()
+        with self._lock:
+            window = self._requests.setdefault(model, deque())
+            while window and now - window[0] >= 60.0:
+                window.popleft()
+            limit = self.rpm or 1_000_000
+            reset = 60.0 - (now - window[0]) if window else 0.0
+            if len(window) >= limit:
+                return False, 0, reset
+            window.append(now)
+            return True, limit - len(window), reset
+
+    def count(self, key: str, call_type: Optional[str] = None):
+        with self._lock:
+            self.stats[key] += 1
+            if call_type:
+                self.stats["by_call"][call_type] += 1
+
+
+def parse_latency(spec: str) -> Dict[str, Tuple[float, float]]:
+    """'router=0.15:0.4,synthesis=0.8' -> {호출 종류: (중앙값, 시그마)} (시그마 생략 시 0.4)"""
+    out = {}
+    for item in filter(None, (s.strip() for s in (spec or "").split(","))):
+        name, _, value = item.partition("=")
+        if name not in GENERATORS:
+            raise ValueError(f"알 수 없는 호출 종류: {name} (가능: {', '.join(GENERATORS)})")
+        median, _, sigma = value.partition(":")
+        out[name] = (float(median), float(sigma) if sigma else 0.4)
+    return out
+
+
+# === 서버 ===
+def create_app(config: MockConfig) -> Flask:
+    app = Flask(__name__)
+
+    def ratelimit_headers(remaining: int, reset: float) -> Dict[str, str]:
+        limit = config.rpm or 1_000_000
+        return {"x-ratelimit-limit-requests": str(limit), "x-ratelimit-remaining-requests": str(remaining),
+                "x-ratelimit-reset-requests": f"{reset:.2f}s", "x-ratelimit-limit-tokens": "1000000",
+                "x-ratelimit-remaining-tokens": "1000000", "x-ratelimit-reset-tokens": "0s"}
+
+    def error(status: int, message: str, kind: str, headers: Optional[Dict[str, str]] = None):
+        resp = jsonify({"error": {"message": message, "type": kind, "code": kind}})
+        resp.status_code = status
+        resp.headers.update(headers or {})
+        return resp
+
+    @app.get("/openai/v1/models")
+    def models():
+        return jsonify({"object": "list", "data": [
+            {"id": m, "object": "model", "created": 0, "owned_by": "mock"}
+            for m in ("llama-3.1-8b-instant", "llama-3.3-70b-versatile")]})
+
+    @app.get("/mock/stats")
+    def stats():
+        return jsonify(config.stats)
+
+    @app.post("/openai/v1/chat/completions")
+    def chat_completions():
+        body = request.get_json(force=True)
+        model = body.get("model", "mock")
+        prompt = "\n".join(m.get("content") or "" for m in body.get("messages", []) if isinstance(m.get("content"), str))
+        call_type = classify(prompt)
+        config.count("requests", call_type)
+
+        allowed, remaining, reset = config.admit(model)
+        if not allowed:
+            config.count("rpm_429")
+            return error(429, f"Rate limit reached for model `{model}` (mock rpm={config.rpm})", "rate_limit_exceeded",
+                         {"retry-after": f"{max(reset, 0.1):.2f}", **ratelimit_headers(0, reset)})
+        if config.roll(config.rate_limit_rate):
+            config.count("injected_429")
+            return error(429, "Rate limit reached (injected)", "rate_limit_exceeded",
+                         {"retry-after": str(RATE_LIMIT_RETRY_AFTER), **ratelimit_headers(0, RATE_LIMIT_RETRY_AFTER)})
+        if config.roll(config.error_rate):
+            config.count("injected_errors")
+            return error(config.error_status(), "Internal server error (injected)", "internal_server_error")
+
+        pieces, finish_reason = apply_limits(GENERATORS[call_type](prompt), body.get("max_tokens"), body.get("stop"))
+        usage = {"prompt_tokens": estimate_tokens(prompt), "completion_tokens": len(pieces)}
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        ttft = config.first_token_delay(call_type)
+        per_token = 1.0 / config.tokens_per_sec if config.tokens_per_sec > 0 else 0.0
+        completion_id, created = f"chatcmpl-{uuid.uuid4().hex[:24]}", int(time.time())
+        headers = ratelimit_headers(remaining, reset)
+
+        if body.get("stream"):
+            config.count("streamed")
+
+            def chunk(delta: Dict, finish: Optional[str] = None, extra: Optional[Dict] = None) -> str:
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                           "choices": [{"index": 0, "delta": delta, "finish_reason": finish}], **(extra or {})}
+                return f"data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+            @stream_with_context
+            def generate():
+                time.sleep(ttft)
+                yield chunk({"role": "assistant", "content": ""})
+                for piece in pieces:
+                    yield chunk({"content": piece})
+                    time.sleep(per_token)
+                yield chunk({}, finish_reason, {"x_groq": {"id": completion_id, "usage": usage}})
+                yield "data: [DONE]\n\n"
+
+            return Response(generate(), mimetype="text/event-stream", headers=headers)
+
+        time.sleep(ttft + per_token * len(pieces))
+        resp = jsonify({
+            "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(pieces)},
+                         "finish_reason": finish_reason, "logprobs": None}],
+            "usage": usage,
+        })
+        resp.headers.update(headers)
+        return resp
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Groq 호환 모의 LLM 서버 (부하/지연 테스트용)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8600)
+    parser.add_argument("--latency", default="", help="호출 종류별 첫 토큰 지연 '종류=중앙값[:시그마],...' "
+                                                      f"(종류: {', '.join(GENERATORS)})")
+    parser.add_argument("--tokens-per-sec", type=float, default=DEFAULT_TOKENS_PER_SEC, help="출력 토큰 생성 속도 (0이면 즉시)")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="429를 주입할 요청 비율 (0~1)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="500/503을 주입할 요청 비율 (0~1)")
+    parser.add_argument("--rpm", type=int, default=0, help="모델별 분당 요청 한도 (0이면 제한 없음)")
+    parser.add_argument("--seed", type=int, default=0, help="지연/장애 주입 난수 시드")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # 요청마다 찍히는 접근 로그 생략
+    try:
+        latency = parse_latency(args.latency)
+    except ValueError as e:
+        logger.error(f"--latency 형식 오류: {e}")
+        sys.exit(2)
+    config = MockConfig(latency, args.tokens_per_sec, args.rate_limit_rate, args.error_rate, args.rpm, args.seed)
+    logger.info(f"모의 Groq 서버 시작: http://{args.host}:{args.port} (GROQ_BASE_URL로 지정) 지연={config.latency}")
+    create_app(config).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# [개요] 텍스트 분할 후, 임베딩 전에 중복 조각(Chunk)을 걸러내는 단계입니다.
+# - 정확 중복: 정규화한 텍스트의 해시가 같으면 중복으로 판단합니다.
+# - 근접 중복(선택): 64비트 SimHash의 해밍 거리가 기준 이하이면 중복으로 판단합니다.
+# 본 해시는 적재 매니페스트(SQLite)에 함께 저장되므로, 같은 실행의 다른 파일뿐 아니라
+# 이전 실행에서 이미 저장한 조각(예: 날짜별 TB_RECIPE_SEARCH 스냅샷의 반복 행)과도 비교됩니다.
+# 조각 하나는 Milvus에 한 행(보관 파일의 source)으로만 저장되지만, 그 조각을 가진 파일은 모두 소유자로 기록합니다.
+# 보관 파일이 삭제/변경되면 db_load가 남은 소유자 이름으로 행을 옮기므로(plan_release / release_source),
+# 중복이라 건너뛴 다른 파일의 내용이 함께 사라지지 않습니다.
+# SQLite 연결은 IngestManifest와 함께 쓰므로, 모든 조회/저장은 매니페스트의 락(manifest.lock) 안에서 합니다.
+
+import re  # 공백/시트 접두어 정규화
+import hashlib  # 정규화 텍스트 해시
+import logging  # 로그 기록
+import unicodedata  # 유니코드 정규화(NFKC)
+from typing import Dict, List, Optional, Set, Tuple  # 타입 힌트
+
+import numpy as np  # SimHash 비트 집계 벡터화
+
+from langchain_core.documents import Document  # LangChain 표준 문서 객체
+
+logger = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64  # SimHash 비트 수
+SIMHASH_BANDS = 4  # LSH 밴드 수 (64비트를 16비트씩 4개로 나눔)
+SHINGLE_SIZE = 3  # SimHash에 사용하는 문자 n-gram 크기 (한글은 형태소 분석 없이 문자 단위가 안정적)
+SQL_IN_CHUNK = 500  # IN (...) 조회 한 번에 넣는 해시 수
+
+_SHEET_PREFIX_RE = re.compile(r"^\[sheet: [^\]]*\]\s*")  # Excel 시트 접두어 (시트만 다른 같은 행은 중복으로 봄)
+_WS_RE = re.compile(r"\s+")  # 연속 공백
+
+
+def normalize_text(text: str) -> str:
+    """중복 판정용 정규화: NFKC, 시트 접두어 제거, 소문자화, 연속 공백 축소"""
+    text = unicodedata.normalize("NFKC", text or "")
+    text = _SHEET_PREFIX_RE.sub("", text)
+    return _WS_RE.sub(" ", text).strip().lower()
+
+
+def text_hash(normalized: str) -> str:
+    """정규화된 텍스트의 128비트 해시(16진 32자)"""
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def simhash64(normalized: str) -> int:
+    """문자 n-gram 기반 64비트 SimHash (부호 없는 정수)"""
+    s = normalized.replace(" ", "")
+    if len(s) < SHINGLE_SIZE:
+        shingles = [s] if s else []
+    else:
+        shingles = [s[i:i + SHINGLE_SIZE] for i in range(len(s) - SHINGLE_SIZE + 1)]
+    if not shingles:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(sh.encode("utf-8"), digest_size=8).digest(), "little") for sh in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")  # (n, 64) 비트 행렬
+    votes = bits.sum(axis=0, dtype=np.int64) * 2 - len(shingles)  # 비트별 +1/-1 투표 합
+    value = 0
+    for i, v in enumerate(votes):
+        if v > 0:
+            value |= 1 << i
+    return value
+
+
+def _to_signed(v: int) -> int:
+    """SQLite INTEGER(부호 있는 64비트)에 저장하기 위해 변환"""
+    return v - (1 << 64) if v >= (1 << 63) else v
+
+
+def _bands(v: int) -> List[int]:
+    width = SIMHASH_BITS // SIMHASH_BANDS
+    mask = (1 << width) - 1
+    return [(v >> (i * width)) & mask for i in range(SIMHASH_BANDS)]
+
+
+class ChunkDeduplicator:
+    """
+    컬렉션 단위 조각 중복 제거기.
+    filter()로 걸러낸 신규 조각과 중복 조각의 소유 기록은 pending 상태로 유지되고, Milvus 삽입 후 commit()으로 저장됩니다.
+    chunk_hashes.source는 조각이 실제로 저장된 Milvus 행의 파일(보관 파일), chunk_owners는 그 조각을 가진 모든 파일입니다.
+    """
+
+    def __init__(self, manifest, collection: str, near_dup: bool = False, max_distance: int = 3):
+        self.conn = manifest.conn  # IngestManifest와 같은 SQLite 연결
+        self._lock = manifest.lock  # 같은 연결을 쓰는 매니페스트 메서드(다른 스레드)와 섞이지 않게
+        self.collection = collection
+        self.near_dup = near_dup
+        self.max_distance = max_distance
+        self.removed_exact = 0  # 누적 정확 중복 제거 수
+        self.removed_near = 0  # 누적 근접 중복 제거 수
+        self._pending: List[Tuple[str, int, str]] = []  # (해시, simhash, source) 아직 저장 전
+        self._pending_hashes: Set[str] = set()
+        self._pending_bands: List[Dict[int, List[Tuple[int, str]]]] = [dict() for _ in range(SIMHASH_BANDS)]  # 밴드 값 -> (simhash, 해시)
+        self._pending_owners: List[Tuple[str, str]] = []  # (해시, source) 중복으로 건너뛴 조각의 소유 기록
+        with self._lock:
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunk_hashes (
+                       collection TEXT    NOT NULL,
+                       hash       TEXT    NOT NULL,
+                       simhash    INTEGER NOT NULL,
+                       b0 INTEGER, b1 INTEGER, b2 INTEGER, b3 INTEGER,
+                       source     TEXT    NOT NULL,
+                       PRIMARY KEY (collection, hash)
+                   )"""
+            )
+            for i in range(SIMHASH_BANDS):
+                self.conn.execute(f"CREATE INDEX IF NOT EXISTS idx_chunk_b{i} ON chunk_hashes (collection, b{i})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_source ON chunk_hashes (collection, source)")
+            has_owners = self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'chunk_owners'"
+            ).fetchone() is not None
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS chunk_owners (
+                       collection TEXT NOT NULL,
+                       hash       TEXT NOT NULL,
+                       source     TEXT NOT NULL,
+                       PRIMARY KEY (collection, hash, source)
+                   )"""
+            )
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_owner_source ON chunk_owners (collection, source)")
+            if not has_owners:
+                # 소유 기록 도입 이전 매니페스트: 보관 파일만 소유자로 등록 (이전에 건너뛴 중복의 소유자는 알 수 없음)
+                self.conn.execute("INSERT OR IGNORE INTO chunk_owners (collection, hash, source) SELECT collection, hash, source FROM chunk_hashes")
+            self.conn.commit()
+
+    # --- 조회 ---
+    def is_empty(self) -> bool:
+        with self._lock:
+            cur = self.conn.execute("SELECT 1 FROM chunk_hashes WHERE collection = ? LIMIT 1", (self.collection,))
+            return cur.fetchone() is None
+
+    def _stored_hashes(self, hashes: List[str]) -> Set[str]:
+        found: Set[str] = set()
+        with self._lock:
+            for i in range(0, len(hashes), SQL_IN_CHUNK):
+                part = hashes[i:i + SQL_IN_CHUNK]
+                marks = ",".join("?" * len(part))
+                cur = self.conn.execute(
+                    f"SELECT hash FROM chunk_hashes WHERE collection = ? AND hash IN ({marks})",
+                    [self.collection, *part],
+                )
+                found.update(r[0] for r in cur.fetchall())
+        return found
+
+    def _near_match(self, sh: int) -> Optional[str]:
+        """같은 밴드 값을 가진 후보들 중 해밍 거리가 기준 이하인 조각의 해시를 반환합니다. (없으면 None)"""
+        bands = _bands(sh)
+        for i, b in enumerate(bands):
+            for cand, h in self._pending_bands[i].get(b, ()):
+                if bin(cand ^ sh).count("1") <= self.max_distance:
+                    return h
+        where = " OR ".join(f"b{i} = ?" for i in range(SIMHASH_BANDS))
+        with self._lock:
+            rows = self.conn.execute(
+                f"SELECT simhash, hash FROM chunk_hashes WHERE collection = ? AND ({where})",
+                [self.collection, *bands],
+            ).fetchall()
+        for cand, h in rows:
+            if bin((cand & ((1 << 64) - 1)) ^ sh).count("1") <= self.max_distance:
+                return h
+        return None
+
+    # --- 필터링 ---
+    def filter(self, docs: List[Document], source: str) -> Tuple[List[Document], int, int]:
+        """source(파일명)의 조각들에서 중복을 제거한 리스트와 (정확 중복 수, 근접 중복 수)를 반환합니다."""
+        normalized = [normalize_text(d.page_content) for d in docs]
+        hashes = [text_hash(n) for n in normalized]
+        stored = self._stored_hashes(list(set(hashes)))
+
+        kept: List[Document] = []
+        n_exact = n_near = 0
+        for doc, norm, h in zip(docs, normalized, hashes):
+            if h in stored or h in self._pending_hashes:
+                n_exact += 1
+                self._pending_owners.append((h, source))  # 건너뛰어도 이 파일이 가진 조각으로 기록
+                continue
+            sh = simhash64(norm) if self.near_dup else 0
+            match = self._near_match(sh) if self.near_dup else None
+            if match is not None:
+                n_near += 1
+                self._pending_owners.append((match, source))
+                continue
+            kept.append(doc)
+            self._pending.append((h, sh, source))
+            self._pending_hashes.add(h)
+            if self.near_dup:
+                for i, b in enumerate(_bands(sh)):
+                    self._pending_bands[i].setdefault(b, []).append((sh, h))
+
+        self.removed_exact += n_exact
+        self.removed_near += n_near
+        return kept, n_exact, n_near
+
+    # --- 저장/삭제 ---
+    def commit(self):
+        """filter()에서 통과한 조각 해시와 소유 기록을 저장합니다. (Milvus 삽입 후 호출)"""
+        if not self._pending and not self._pending_owners:
+            return
+        rows = []
+        for h, sh, source in self._pending:
+            b = _bands(sh)
+            rows.append((self.collection, h, _to_signed(sh), b[0], b[1], b[2], b[3], source))
+        owners = [(self.collection, h, source) for h, _, source in self._pending]
+        owners += [(self.collection, h, source) for h, source in self._pending_owners]
+        with self._lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO chunk_hashes (collection, hash, simhash, b0, b1, b2, b3, source) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self.conn.executemany("INSERT OR IGNORE INTO chunk_owners (collection, hash, source) VALUES (?, ?, ?)", owners)
+            self.conn.commit()
+        self.discard()
+
+    def discard(self):
+        """삽입에 실패한 파일의 pending 해시와 소유 기록을 버립니다."""
+        self._pending = []
+        self._pending_hashes = set()
+        self._pending_bands = [dict() for _ in range(SIMHASH_BANDS)]
+        self._pending_owners = []
+
+    def plan_release(self, source: str) -> Dict[str, str]:
+        """
+        source가 보관한 조각 중 다른 파일도 가진 것의 {해시: 넘겨받을 파일}을 반환합니다.
+        source의 Milvus 행을 지우기 전에 이 조각들을 넘겨받을 파일 이름으로 다시 넣어야 합니다.
+        """
+        with self._lock:
+            return self._plan_release(source)
+
+    def _plan_release(self, source: str) -> Dict[str, str]:
+        cur = self.conn.execute(
+            "SELECT h.hash, MIN(o.source) FROM chunk_hashes h "
+            "JOIN chunk_owners o ON o.collection = h.collection AND o.hash = h.hash AND o.source != h.source "
+            "WHERE h.collection = ? AND h.source = ? GROUP BY h.hash",
+            (self.collection, source),
+        )
+        return dict(cur.fetchall())
+
+    def release_source(self, source: str, moved: Optional[Dict[str, str]] = None) -> Set[str]:
+        """
+        파일을 삭제하거나 다시 적재하기 전에 해당 파일의 소유 기록을 지웁니다.
+        moved(해시 -> 새 보관 파일)에 있는 조각은 보관 파일만 바꾸고, 그 밖에 source가 보관하던 해시는 삭제합니다.
+        옮기지 못했는데 다른 파일도 가지고 있던 조각이 있으면 그 파일들의 이름을 반환합니다. (다시 적재 필요)
+        """
+        moved = moved or {}
+        with self._lock:  # 조회부터 삭제까지 한 번에 (다른 스레드의 기록이 끼어들지 않게)
+            lost = [h for h in self._plan_release(source) if h not in moved]
+            orphaned: Set[str] = set()
+            for i in range(0, len(lost), SQL_IN_CHUNK):
+                part = lost[i:i + SQL_IN_CHUNK]
+                marks = ",".join("?" * len(part))
+                cur = self.conn.execute(
+                    f"SELECT DISTINCT source FROM chunk_owners WHERE collection = ? AND source != ? AND hash IN ({marks})",
+                    [self.collection, source, *part],
+                )
+                orphaned.update(r[0] for r in cur.fetchall())
+            self.conn.execute("DELETE FROM chunk_owners WHERE collection = ? AND source = ?", (self.collection, source))
+            self.conn.executemany(
+                "UPDATE chunk_hashes SET source = ? WHERE collection = ? AND hash = ? AND source = ?",
+                [(new, self.collection, h, source) for h, new in moved.items()],
+            )
+            self.conn.execute("DELETE FROM chunk_hashes WHERE collection = ? AND source = ?", (self.collection, source))
+            if lost:  # 보관 행이 없어진 해시의 남은 소유 기록 (다시 적재될 때 새로 기록됨)
+                self.conn.executemany("DELETE FROM chunk_owners WHERE collection = ? AND hash = ?",
+                                      [(self.collection, h) for h in lost])
+            self.conn.commit()
+        return orphaned
+
+    def clear(self):
+        """컬렉션의 모든 조각 해시와 소유 기록을 지웁니다. (컬렉션이 재생성되어 비었을 때)"""
+        with self._lock:
+            self.conn.execute("DELETE FROM chunk_hashes WHERE collection = ?", (self.collection,))
+            self.conn.execute("DELETE FROM chunk_owners WHERE collection = ?", (self.collection,))
+            self.conn.commit()
+        self.discard()
+
+    def rename_collection(self, new: str):
+        """Milvus 컬렉션 이름이 바뀌었을 때 조각 해시와 소유 기록을 새 이름으로 옮깁니다."""
+        with self._lock:
+            for table in ("chunk_hashes", "chunk_owners"):
+                self.conn.execute(f"UPDATE {table} SET collection = ? WHERE collection = ?", (new, self.collection))
+            self.conn.commit()
+        self.collection = new
+
+    def backfill(self, rows) -> int:
+        """이미 Milvus에 저장된 (source, text) 행들로 해시 테이블을 채웁니다. (매니페스트 도입 이전 데이터용)"""
+        count = 0
+        for source, text in rows:
+            norm = normalize_text(text)
+            h = text_hash(norm)
+            if h in self._pending_hashes:
+                continue
+            sh = simhash64(norm) if self.near_dup else 0
+            self._pending.append((h, sh, source))
+            self._pending_hashes.add(h)
+            count += 1
+            if len(self._pending) >= 10000:
+                self.commit()
+        self.commit()
+        return count
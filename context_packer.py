@@ -0,0 +1,193 @@
+# [개요] 답변 합성(70B) 프롬프트에 넣을 전문가 검색 자료를 토큰 예산 안으로 줄이는 모듈입니다.
+# - 토큰 수는 합성 모델의 토크나이저(transformers, CONTEXT_TOKENIZER)로 셉니다. 기본값은 권한 승인 없이 받을 수 있는
+#   Llama 3.1 토크나이저 사본이며(Llama 3.x 8B/70B는 같은 어휘 사용), 허브 이름 대신 로컬 폴더나 tokenizer.json 경로도 됩니다.
+#   토크나이저를 못 불러오면(transformers 미설치 / 오프라인) llm_client와 같은 근사치(2글자당 1토큰)로 대체합니다.
+# - 여러 전문가(컬렉션)가 같은 문장을 가져오는 경우가 많아, 정규화 텍스트 해시로 중복을 제거하고
+#   가장 관련도가 높은 전문가 쪽에만 남깁니다.
+# - 전문가별 예산은 관련도(Milvus L2 거리 -> 1/(1+거리))의 합에 비례해 나누고, 남은 예산은 관련도 순으로 재분배합니다.
+# - 예산을 넘는 조각은 문장 경계에서 자르며, 버린/자른 토큰 수는 통계(stats)로 돌려줘 로그에 남깁니다.
+
+import os  # 환경 변수
+import re  # 문장 분리
+import logging  # 로그 기록
+import threading  # 토크나이저 지연 로딩 보호
+from typing import Dict, List, Optional, Tuple  # 타입 힌트
+
+from langchain_core.documents import Document  # LangChain 표준 문서 객체
+
+from chunk_dedup import normalize_text, text_hash  # 적재 단계와 같은 중복 판정 기준
+
+logger = logging.getLogger(__name__)
+
+# === 예산 설정 ===
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))  # 합성 프롬프트의 검색 자료 전체 토큰 상한
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))  # 대화 기록 토큰 상한 (최근 내용 우선)
+MIN_CHUNK_TOKENS = 40  # 이보다 적게 남으면 조각을 잘라 넣지 않음 (의미 없는 파편 방지)
+# 합성 모델 토크나이저 (meta-llama/* 원본 저장소는 접근 승인이 필요해 기본값으로 쓰지 않음)
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "NousResearch/Meta-Llama-3.1-8B-Instruct")
+DEFAULT_RELEVANCE = 0.5  # 검색 거리가 없는 문서의 관련도
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?。])\s+|\n+")  # 문장/줄 경계 ("~다." 포함)
+
+
+def relevance(doc: Document) -> float:
+    """문서 관련도 (0~1, 클수록 관련). 검색 시 metadata["score"]에 넣은 L2 거리를 변환합니다."""
+    score = doc.metadata.get("score") if doc.metadata else None
+    if score is None:
+        return DEFAULT_RELEVANCE
+    return 1.0 / (1.0 + max(0.0, float(score)))
+
+
+class ContextPacker:
+    """전문가별 검색 문서를 토큰 예산에 맞춰 중복 제거 / 예산 배분 / 문장 단위 자르기"""
+
+    def __init__(self, max_tokens: int = CONTEXT_TOKEN_BUDGET, tokenizer_name: str = CONTEXT_TOKENIZER):
+        self.max_tokens = max_tokens
+        self.tokenizer_name = tokenizer_name
+        self._tokenizer = None
+        self._tokenizer_loaded = False
+        self._lock = threading.Lock()
+
+    # --- 토큰 세기 ---
+    @property
+    def tokenizer(self):
+        with self._lock:
+            if not self._tokenizer_loaded:
+                self._tokenizer_loaded = True
+                if not self.tokenizer_name:
+                    return None  # 근사치 사용 (CONTEXT_TOKENIZER="")
+                try:
+                    # 무거운 모듈이라 처음 셀 때 import
+                    from transformers import AutoTokenizer, PreTrainedTokenizerFast
+                    if self.tokenizer_name.endswith(".json") and os.path.isfile(self.tokenizer_name):
+                        self._tokenizer = PreTrainedTokenizerFast(tokenizer_file=self.tokenizer_name)  # 함께 배포한 tokenizer.json
+                    else:
+                        self._tokenizer = AutoTokenizer.from_pretrained(self.tokenizer_name)
+                    logger.info(f"[CONTEXT] 토크나이저 로드: {self.tokenizer_name}")
+                except Exception as e:  # ImportError 포함
+                    logger.warning(f"[CONTEXT] 토크나이저({self.tokenizer_name})를 불러오지 못해 근사치(2글자당 1토큰)로 셉니다: {e}")
+            return self._tokenizer
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        tok = self.tokenizer
+        if tok is None:
+            return max(1, len(text) // 2)
+        return len(tok.encode(text, add_special_tokens=False))
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """문장 경계에서 max_tokens 이내로 자릅니다. 첫 문장부터 넘으면 토큰(또는 글자) 단위로 자릅니다."""
+        if self.count(text) <= max_tokens:
+            return text
+        out = []
+        for sentence in _SENTENCE_RE.split(text):
+            if self.count(" ".join(out + [sentence])) > max_tokens:  # 이어 붙인 결과로 세야 경계 토큰까지 맞음
+                break
+            out.append(sentence)
+        if out:
+            return " ".join(out)
+        tok = self.tokenizer
+        if tok is None:
+            return text[:max_tokens * 2]
+        return tok.decode(tok.encode(text, add_special_tokens=False)[:max_tokens])
+
+    def truncate_tail(self, text: str, max_tokens: int) -> str:
+        """뒤(최근)쪽을 남기고 앞을 줄 단위로 버립니다. (대화 기록용)"""
+        if self.count(text) <= max_tokens:
+            return text
+        lines = text.splitlines()
+        kept, used = [], 0
+        for line in reversed(lines):
+            n = self.count(line) + 1  # 줄바꿈 포함
+            if used + n > max_tokens:
+                break
+            kept.append(line)
+            used += n
+        if not kept and lines:
+            return self.truncate(lines[-1], max_tokens)  # 마지막 줄 하나가 예산보다 긴 경우
+        return "\n".join(reversed(kept))
+
+    # --- 패킹 ---
+    def pack(self, expert_docs: Dict[str, List[Document]], max_tokens: Optional[int] = None) -> Tuple[Dict[str, List[str]], Dict]:
+        """
+        {전문가: [문서]} -> ({전문가: [넣을 텍스트]}, 통계).
+        통계: docs_in, docs_kept, duplicates, truncated, tokens_in, tokens_packed, tokens_dropped
+        """
+        budget = self.max_tokens if max_tokens is None else max_tokens
+        stats = {"docs_in": 0, "docs_kept": 0, "duplicates": 0, "truncated": 0,
+                 "tokens_in": 0, "tokens_packed": 0, "tokens_dropped": 0}
+
+        # 1) 전문가 간 중복 제거: 같은 텍스트는 관련도가 가장 높은 전문가 쪽에 하나만 남김
+        best: Dict[str, Tuple[float, str, str, int]] = {}  # 해시 -> (관련도, 전문가, 텍스트, 토큰 수)
+        for name, docs in expert_docs.items():
+            for doc in docs or []:
+                text = (doc.page_content or "").strip()
+                if not text:
+                    continue
+                tokens = self.count(text)
+                stats["docs_in"] += 1
+                stats["tokens_in"] += tokens
+                key = text_hash(normalize_text(text))
+                rel = relevance(doc)
+                if key in best:
+                    stats["duplicates"] += 1
+                    if rel <= best[key][0]:
+                        continue
+                best[key] = (rel, name, text, tokens)
+
+        # 2) 전문가별 예산: 관련도 합에 비례
+        by_expert: Dict[str, List[Tuple[float, str, int]]] = {name: [] for name in expert_docs}
+        for rel, name, text, tokens in best.values():
+            by_expert[name].append((rel, text, tokens))
+        weights = {name: sum(r for r, _, _ in items) for name, items in by_expert.items() if items}
+        total_weight = sum(weights.values()) or 1.0
+
+        packed: Dict[str, List[str]] = {name: [] for name in by_expert}
+        leftovers: List[Tuple[float, str, str, int]] = []  # 1차에서 못 넣은 조각 (2차 재분배 대상)
+        spare = budget  # 1차 배분 후 남는 예산
+        for name, items in by_expert.items():
+            if not items:
+                continue
+            share = int(budget * weights[name] / total_weight)
+            for rel, text, tokens in sorted(items, key=lambda x: -x[0]):
+                if tokens <= share:
+                    packed[name].append(text)
+                    share -= tokens
+                    spare -= tokens
+                else:
+                    leftovers.append((rel, name, text, tokens))
+
+        # 3) 남은 예산을 관련도 순으로 재분배 (넘치는 조각은 문장 경계에서 자름)
+        for rel, name, text, tokens in sorted(leftovers, key=lambda x: -x[0]):
+            if spare < MIN_CHUNK_TOKENS:
+                break
+            if tokens > spare:
+                text = self.truncate(text, spare)
+                tokens = self.count(text)
+                if tokens < MIN_CHUNK_TOKENS:
+                    continue
+                stats["truncated"] += 1
+            packed[name].append(text)
+            spare -= tokens
+
+        packed = {name: texts for name, texts in packed.items() if texts}
+        stats["docs_kept"] = sum(len(t) for t in packed.values())
+        stats["tokens_packed"] = budget - spare
+        stats["tokens_dropped"] = stats["tokens_in"] - stats["tokens_packed"]
+        if stats["tokens_dropped"] > 0:
+            logger.info(f"[CONTEXT] 검색 자료 {stats['tokens_in']} -> {stats['tokens_packed']} 토큰 "
+                        f"(중복 {stats['duplicates']}개, 자름 {stats['truncated']}개, "
+                        f"버림 {stats['docs_in'] - stats['duplicates'] - stats['docs_kept']}개)")
+        return packed, stats
+
+
+_default_packer: Optional[ContextPacker] = None
+
+
+def get_context_packer() -> ContextPacker:
+    """프로세스 공유 ContextPacker (토크나이저를 한 번만 불러옴)"""
+    global _default_packer
+    if _default_packer is None:
+        _default_packer = ContextPacker()
+    return _default_packer
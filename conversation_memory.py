@@ -0,0 +1,113 @@
+# [개요] 대화 기록 문자열(history_str)의 길이를 대화가 길어져도 일정하게 유지하는 대화 메모리입니다.
+# - 최근 MEMORY_KEEP_TURNS 턴(사용자 질문 + 챗봇 답변)은 원문 그대로, 그보다 오래된 턴은 요약문 하나로 넣습니다.
+# - 요약은 턴이 끝난 뒤(after_turn) 백그라운드 스레드에서 8B 모델로 "기존 요약 + 새로 밀려난 턴"을 합쳐 갱신하므로
+#   다음 질문의 응답 경로에 요약 호출이 끼지 않습니다. (LLM 스케줄러에서 가장 낮은 우선순위)
+# - 요약이 아직 끝나지 않았으면 원문 창을 MEMORY_MAX_LAG_TURNS 턴만큼 더 넓혀 쓰고, 그보다 오래된 미요약 턴은 뺍니다.
+#   (요약이 계속 실패해도 프롬프트 크기는 제한됨)
+# 메시지 목록 자체는 호출 측 상태(state["messages"])가 그대로 가지고, 메모리는 "앞에서 몇 개까지 요약했는지"만 기록합니다.
+
+import os  # 환경 변수
+import logging  # 로그 기록
+import threading  # 백그라운드 요약
+from typing import List, Optional  # 타입 힌트
+
+from langchain_core.messages import HumanMessage, BaseMessage  # 메시지 타입
+
+from llm_client import get_llm_client, PRIORITY_SUMMARY  # 공유 LLM 스케줄러
+
+logger = logging.getLogger(__name__)
+
+MEMORY_KEEP_TURNS = int(os.getenv("MEMORY_KEEP_TURNS", "3"))  # 원문 그대로 유지할 최근 턴 수
+MEMORY_MAX_LAG_TURNS = 1  # 요약이 진행 중일 때 원문 창을 추가로 넓힐 턴 수
+MEMORY_SUMMARY_MODEL = "llama-3.1-8b-instant"  # 요약 모델 (빠르고 저렴한 8B)
+MEMORY_SUMMARY_MAX_TOKENS = 300  # 요약문 최대 출력 토큰
+MEMORY_SUMMARY_MAX_WAIT_SECONDS = 30.0  # 사용량 한도로 이보다 오래 기다려야 하면 다음 턴에 다시 시도
+
+
+def format_messages(messages: List[BaseMessage]) -> str:
+    """메시지 목록을 '사용자: ... / 챗봇: ...' 줄로 변환 (기존 history_str 형식)"""
+    return "\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in messages])
+
+
+class ConversationMemory:
+    """최근 N턴 원문 + 이전 대화 요약. history_str()은 현재 질문(마지막 메시지)을 뺀 대화 기록을 돌려줍니다."""
+
+    def __init__(self, keep_turns: int = MEMORY_KEEP_TURNS, llm=None, model: str = MEMORY_SUMMARY_MODEL):
+        self.keep_turns = max(1, keep_turns)
+        self.llm = llm
+        self.model = model
+        self.summary = ""  # 요약된 이전 대화
+        self.summarized_upto = 0  # messages[:summarized_upto]가 summary에 반영됨
+        self._lock = threading.Lock()
+        self._running = False  # 요약 스레드 실행 중 여부
+        self._pending: Optional[List[BaseMessage]] = None  # 실행 중에 들어온 최신 메시지 목록 (끝나면 이어서 처리)
+
+    def history_str(self, messages: List[BaseMessage]) -> str:
+        """현재 질문(messages[-1])을 제외한 대화 기록: [이전 대화 요약] + 최근 턴 원문"""
+        prior = messages[:-1]
+        with self._lock:
+            summary, summarized_upto = self.summary, self.summarized_upto
+        start = max(summarized_upto, len(prior) - 2 * (self.keep_turns + MEMORY_MAX_LAG_TURNS))
+        recent = format_messages(prior[start:])
+        if not summary:
+            return recent
+        return f"[이전 대화 요약] {summary}" + (f"\n{recent}" if recent else "")
+
+    def reset(self):
+        with self._lock:
+            self.summary, self.summarized_upto, self._pending = "", 0, None
+
+    # --- 턴 종료 후 백그라운드 요약 ---
+    def after_turn(self, messages: List[BaseMessage]):
+        """턴이 끝난 뒤 호출. 최근 턴 창에서 밀려난 메시지가 있으면 백그라운드에서 요약을 갱신합니다."""
+        snapshot = list(messages)
+        with self._lock:
+            if len(snapshot) - 2 * self.keep_turns <= self.summarized_upto:
+                return  # 아직 밀려난 턴이 없음
+            if self._running:
+                self._pending = snapshot  # 진행 중인 요약이 끝나면 최신 목록으로 한 번 더
+                return
+            self._running = True
+        threading.Thread(target=self._summarize_loop, args=(snapshot,), name="memory-summary", daemon=True).start()
+
+    def _summarize_loop(self, snapshot: List[BaseMessage]):
+        while snapshot is not None:
+            try:
+                self._summarize(snapshot)
+            except Exception as e:
+                logger.warning(f"[MEMORY] 대화 요약 실패 (다음 턴에 다시 시도): {e}")
+            with self._lock:
+                snapshot, self._pending = self._pending, None
+                if snapshot is None:
+                    self._running = False
+
+    def _summarize(self, snapshot: List[BaseMessage]):
+        with self._lock:
+            summary, start = self.summary, self.summarized_upto
+        end = len(snapshot) - 2 * self.keep_turns
+        if end <= start:
+            return
+        prompt = f"""다음은 농업·요리·영양 상담 챗봇과 사용자의 대화입니다. [기존 요약]에 [새 대화]를 반영해 갱신된 요약을 작성하세요.
+
+[기존 요약]
+{summary or "(없음)"}
+
+[새 대화]
+{format_messages(snapshot[start:end])}
+
+[규칙]
+- 사용자의 조건(지역, 기후, 재료, 건강 상태 등), 추천된 작물/요리, 아직 답하지 않은 요청을 빠짐없이 남기세요.
+- 5문장 이내의 한국어 평문으로만 작성하고, 설명이나 머리말은 쓰지 마세요.
+
+[갱신된 요약]"""
+        llm = self.llm or get_llm_client()
+        completion = llm.complete(
+            messages=[{"role": "user", "content": prompt}],
+            model=self.model, temperature=0.0, max_tokens=MEMORY_SUMMARY_MAX_TOKENS,
+            priority=PRIORITY_SUMMARY, max_wait=MEMORY_SUMMARY_MAX_WAIT_SECONDS
+        )
+        new_summary = completion.choices[0].message.content.strip()
+        with self._lock:
+            if self.summarized_upto == start:  # 그 사이 reset되지 않았을 때만 반영
+                self.summary, self.summarized_upto = new_summary, end
+        logger.info(f"[MEMORY] 대화 요약 갱신: 메시지 {end}개 반영 ({len(new_summary)}자)")
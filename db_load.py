@@ -3,27 +3,42 @@ import os # 운영체제와 상호작용 (파일 경로 등)
 import io # 메모리 내에서 텍스트/바이너리 데이터 처리
 import csv # CSV 파일 처리
 import pathlib # 파일 경로를 객체 지향적으로 다루기
+import time # 단계별 소요 시간 측정
+import random # 재시도 대기 지터
 import logging # 로그 기록 기능
-from typing import TypedDict, List, Optional, Set # 타입 힌트 (코드 가독성 향상)
+import argparse # 명령행 인자 (설정 파일, 대상 컬렉션)
+from concurrent.futures import ThreadPoolExecutor # 파일 미리 읽기용 스레드 풀
+from typing import TypedDict, List, Optional, Set, Dict, Iterator, Tuple # 타입 힌트 (코드 가독성 향상)
 from tqdm import tqdm # 작업 진행률 표시줄
 
 # LangChain / Embedding / Milvus 관련 라이브러리
-from langchain_community.document_loaders import PyPDFLoader, TextLoader # PDF, 텍스트 파일 로더
+from langchain_community.document_loaders import TextLoader # 텍스트 파일 로더 (PDF는 pdf_extract 사용)
 from langchain.text_splitter import RecursiveCharacterTextSplitter # 텍스트를 작은 조각으로 나누는 도구
-from langchain_huggingface import HuggingFaceEmbeddings # 허깅페이스 모델을 이용한 임베딩 생성
 from langchain_core.documents import Document # LangChain의 표준 문서 객체
 
 from pymilvus import connections, utility, FieldSchema, CollectionSchema, DataType, Collection # Milvus 데이터베이스 상호작용
 
+# 적재 매니페스트 (파일 변경 감지 및 조각 ID 범위 기록)
+from ingest_manifest import IngestManifest, MANIFEST_PATH, STATUS_NEW, STATUS_UNCHANGED, STATUS_MODIFIED, file_sha256
+# 조각 중복 제거 (정규화 해시 + 선택적 SimHash, 조각별 소유 파일 기록)
+from chunk_dedup import ChunkDeduplicator, normalize_text, text_hash
+# 임베딩 디스크 캐시 ((모델, 텍스트 해시) -> 벡터)
+from embedding_cache import EmbeddingCache, CachedEmbeddings
+# 길이 버킷 임베딩 (길이가 비슷한 텍스트끼리 배치 계산)
+from embedding_batching import LengthBucketedEmbeddings
+# 임베딩 백엔드 선택 (torch / onnx-int8, 환경 변수 EMBEDDING_BACKEND)
+from embedding_backend import load_embeddings, embedding_model_key, EMBEDDING_BACKEND
+# 데이터 폴더 감시 (--watch 모드)
+from ingest_watch import DirectoryWatcher, EVENT_DELETED
+# PDF 페이지 구간 병렬 추출 (pymupdf/pypdf 백엔드, 빈/반복 페이지 건너뛰기)
+from pdf_extract import extract_pdf_pages, in_spawned_worker, shutdown_pool as shutdown_pdf_pool
+
 # LangGraph (워크플로우 시각화용)
 from langgraph.graph import StateGraph, END
 
 # 판다스 (데이터 처리, 특히 CSV/Excel)
 import pandas as pd
 
-# [추가] GPU 사용 확인을 위한 torch
-import torch
-
 # === 선택적 의존성: chardet 라이브러리가 설치되어 있으면 인코딩 추정에 활용 ===
 try:
     import chardet # chardet 라이브러리 가져오기 시도
@@ -31,19 +46,33 @@ try:
 except ImportError:
     HAS_CHARDET = False # 실패 시 플래그 False
 
+# === 선택적 의존성: openpyxl이 있으면 xlsx/xlsm을 read-only 스트리밍으로 읽음 ===
+try:
+    import openpyxl # openpyxl 라이브러리 가져오기 시도
+    HAS_OPENPYXL = True # 성공 시 플래그 True
+except ImportError:
+    HAS_OPENPYXL = False # 실패 시 시트 단위 pandas 로딩으로 대체
+
 MILVUS_BATCH_SIZE = 5000 # <-- 추가: 한 번에 Milvus에 보낼 조각(Chunk) 개수
+EXCEL_BATCH_ROWS = 5000 # Excel 스트리밍 시 한 번에 DataFrame으로 만드는 행 수
+LOADER_WORKERS = 2 # 임베딩하는 동안 다음 파일을 미리 읽어 둘 스레드 수
+INSERT_RETRIES = 3 # 배치 임베딩/저장 실패 시 시도 횟수 (모두 실패하면 재시도 대기열로)
+INSERT_RETRY_BACKOFF = 2.0 # 재시도 대기 기본 초 (시도마다 2배, 지터 포함)
 
 # ==============================================================================
 # 0. 로깅 설정 (Logging Configuration)
 # ==============================================================================
-logging.basicConfig( # 로깅 기본 설정
-    level=logging.INFO, # 로그 레벨을 INFO로 설정 (INFO, WARNING, ERROR, CRITICAL 메시지 표시)
-    format='%(asctime)s - %(levelname)s - %(message)s', # 로그 메시지 형식 정의 (시간 - 레벨 - 메시지)
-    handlers=[ # 로그를 처리할 핸들러 목록
-        logging.FileHandler("ingest_data.log", encoding='utf-8'), # 'ingest_data.log' 파일에 UTF-8 인코딩으로 로그 기록
-        logging.StreamHandler() # 콘솔(표준 출력)에도 로그 출력
-    ]
-)
+# PDF 추출 프로세스(spawn)가 부모 스크립트와 함께 이 모듈을 다시 import한 경우에는 로그 파일/그래프 초기화를 건너뜀
+SPAWNED_WORKER = in_spawned_worker()
+if not SPAWNED_WORKER:
+    logging.basicConfig( # 로깅 기본 설정
+        level=logging.INFO, # 로그 레벨을 INFO로 설정 (INFO, WARNING, ERROR, CRITICAL 메시지 표시)
+        format='%(asctime)s - %(levelname)s - %(message)s', # 로그 메시지 형식 정의 (시간 - 레벨 - 메시지)
+        handlers=[ # 로그를 처리할 핸들러 목록
+            logging.FileHandler("ingest_data.log", encoding='utf-8'), # 'ingest_data.log' 파일에 UTF-8 인코딩으로 로그 기록
+            logging.StreamHandler() # 콘솔(표준 출력)에도 로그 출력
+        ]
+    )
 logger = logging.getLogger(__name__) # 현재 모듈에 대한 로거 인스턴스 가져오기
 
 
@@ -70,69 +99,147 @@ FORCE_REPROCESS = set([
 # [업데이트] 파일 스캔 시 지원 확장자가 아니더라도 일단 로딩을 시도할 확장자 목록
 FORCE_INCLUDE_EXTS = {".csv", ".tsv"}  # .csv와 .tsv는 확장자가 달라도 일단 CSV/TSV 로더로 시도
 
+# [추가] 임베딩 전 조각 중복 제거 설정
+DEDUP_ENABLED = True # 정규화 텍스트 해시가 같은 조각은 임베딩/저장하지 않음 (파일 간, 기존 저장분 포함)
+DEDUP_NEAR_DUP = False # True면 SimHash로 거의 같은 조각도 제거 (계산 비용 증가)
+DEDUP_NEAR_MAX_DISTANCE = 3 # 근접 중복으로 볼 SimHash 해밍 거리 상한 (64비트 중)
+
+# [추가] 임베딩 디스크 캐시 설정 (재처리/컬렉션 재생성 시 같은 텍스트는 다시 계산하지 않음)
+EMBEDDING_CACHE_ENABLED = True # False면 항상 모델로 계산
+EMBEDDING_CACHE_DIR = "embedding_cache" # 벡터 파일(memmap) + 인덱스(SQLite) 저장 폴더
+EMBEDDING_CACHE_MAX_GB = 4 # 캐시 벡터 파일 최대 크기(GB). 넘으면 오래 안 쓴 항목부터 정리
+
+# [추가] 임베딩 배치 설정 (짧은 행과 긴 PDF 조각이 한 배치에 섞여 패딩 연산이 낭비되지 않도록)
+EMBED_BATCH_SIZE = 64 # 모델에 한 번에 넣는 조각 수 (CPU 기준, GPU면 128~256 권장)
+EMBED_LENGTH_BUCKETING = True # True면 토큰 길이순으로 정렬해 배치를 만들고 원래 순서로 복원
+
 
 # ==============================================================================
 # 2. Milvus 연결 및 컬렉션 준비 (Connect to Milvus and Prepare Collection)
 # ==============================================================================
-def setup_milvus_collection():
-    """Milvus에 연결하고, 정의된 스키마로 컬렉션을 준비합니다."""
+# 벡터 인덱스 기본 파라미터 (설정 파일에서 컬렉션별로 바꿀 수 있음)
+DEFAULT_INDEX_PARAMS = {
+    "metric_type": "L2", # 거리 계산 방식 (유클리드 거리)
+    "index_type": "IVF_FLAT", # 인덱스 유형
+    "params": {"nlist": 128}, # IVF_FLAT의 클러스터 개수
+}
+
+
+def connect_milvus(host: Optional[str] = None, port: Optional[str] = None):
+    """Milvus 기본 연결을 만듭니다. 이미 연결되어 있으면 재사용합니다."""
+    if connections.has_connection("default"):
+        return
+    host = host or MILVUS_HOST
+    port = port or MILVUS_PORT
     try:
-        logger.info(f"Milvus에 연결을 시도합니다... (주소: {MILVUS_HOST}:{MILVUS_PORT})") # 연결 시도 로그
-        connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT) # 연결 수행
+        logger.info(f"Milvus에 연결을 시도합니다... (주소: {host}:{port})") # 연결 시도 로그
+        connections.connect("default", host=host, port=port) # 연결 수행
         logger.info("Milvus에 성공적으로 연결되었습니다.") # 성공 로그
     except Exception as e:
         logger.error(f"Milvus 연결에 실패했습니다: {e}") # 실패 로그
         raise # 오류 발생 시 스크립트 중단
 
+
+def physical_collection_name(name: str) -> str:
+    """
+    별칭(alias)이면 실제 컬렉션 이름을, 아니면 그대로 반환합니다.
+    (reindex.py로 블루/그린 전환한 뒤에는 'farmer' 같은 이름이 'farmer_v<시각>' 컬렉션을 가리키는 별칭이 됨)
+    """
+    try:
+        return Collection(name).describe().get("collection_name") or name
+    except Exception:
+        return name
+
+
+def collection_is_empty(collection: Collection) -> bool:
+    """
+    컬렉션에 행이 하나도 없는지 확인합니다. num_entities는 봉인(flush)된 행만 세므로 0일 때만 flush 후 다시 셉니다.
+    (매번 flush하면 감시 모드처럼 자주 호출될 때 작은 세그먼트가 계속 생김)
+    """
+    if collection.num_entities > 0:
+        return False
+    collection.flush()
+    return collection.num_entities == 0
+
+
+def setup_milvus_collection(collection_name: str = COLLECTION_NAME, dimension: int = DIMENSION,
+                            index_params: Optional[dict] = None, defer_index: bool = False):
+    """
+    Milvus에 연결하고, 정의된 스키마로 컬렉션을 준비합니다.
+    defer_index=True(대량 적재 모드)면 새로 만들었거나 비어 있는 컬렉션에 인덱스 생성/로드를 하지 않고 반환합니다.
+    이 경우 적재가 끝난 뒤 finalize_bulk_load()로 인덱스를 한 번만 만들고 로드합니다.
+    """
+    connect_milvus()
+
     # Milvus 컬렉션의 스키마 필드 정의
     fields = [
         FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True), # 기본 키, 자동 생성 ID
         FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=1024), # 원본 파일명 또는 URL
         FieldSchema(name="page", dtype=DataType.INT32),  # PDF 페이지 번호 또는 CSV/Excel 행 번호
         FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535), # 실제 텍스트 조각
-        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=DIMENSION), # 임베딩 벡터
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dimension), # 임베딩 벡터
     ]
     # 컬렉션 스키마 객체 생성
     schema = CollectionSchema(fields, description="Document Collection with metadata")
 
     # 컬렉션이 이미 존재하는지 확인
-    if utility.has_collection(COLLECTION_NAME):
-        existing_collection = Collection(name=COLLECTION_NAME) # 기존 컬렉션 객체 가져오기
+    if utility.has_collection(collection_name):
+        existing_collection = Collection(name=collection_name) # 기존 컬렉션 객체 가져오기
         # 기존 컬렉션의 스키마와 새로 정의한 스키마가 다른지 필드 이름으로 비교
         if set(f.name for f in existing_collection.schema.fields) != set(f.name for f in schema.fields):
+            # 별칭으로 서비스 중인 컬렉션은 삭제하면 검색이 끊기므로 reindex.py로 새 컬렉션을 만들어 전환해야 함
+            if physical_collection_name(collection_name) != collection_name or getattr(existing_collection, "aliases", None):
+                raise RuntimeError(
+                    f"'{collection_name}'은(는) 별칭으로 서비스 중인 컬렉션이라 삭제/재생성할 수 없습니다. "
+                    f"스키마를 바꾸려면 reindex.py build --alias {collection_name} 를 사용하세요."
+                )
             logger.warning("기존 컬렉션의 스키마가 변경되어 삭제 후 재생성합니다.") # 스키마 불일치 및 삭제 로그
-            utility.drop_collection(COLLECTION_NAME) # 기존 컬렉션 삭제
-            collection = Collection(name=COLLECTION_NAME, schema=schema) # 새 스키마로 컬렉션 생성
+            utility.drop_collection(collection_name) # 기존 컬렉션 삭제
+            collection = Collection(name=collection_name, schema=schema) # 새 스키마로 컬렉션 생성
             logger.info("컬렉션이 성공적으로 생성되었습니다.") # 생성 성공 로그
-            create_index(collection) # 새 컬렉션에 대한 벡터 인덱스 생성
         else:
             # 스키마가 동일하면 기존 컬렉션 사용
-            logger.info(f"기존 컬렉션 '{COLLECTION_NAME}'을(를) 사용합니다.") # 기존 컬렉션 사용 로그
+            logger.info(f"기존 컬렉션 '{collection_name}'을(를) 사용합니다.") # 기존 컬렉션 사용 로그
             collection = existing_collection # 기존 컬렉션 객체 사용
     else:
         # 컬렉션이 존재하지 않으면 새로 생성
-        logger.info(f"컬렉션 '{COLLECTION_NAME}'이(가) 없어 새로 생성합니다.") # 신규 생성 로그
-        collection = Collection(name=COLLECTION_NAME, schema=schema) # 컬렉션 생성
+        logger.info(f"컬렉션 '{collection_name}'이(가) 없어 새로 생성합니다.") # 신규 생성 로그
+        collection = Collection(name=collection_name, schema=schema) # 컬렉션 생성
         logger.info("컬렉션이 성공적으로 생성되었습니다.") # 생성 성공 로그
-        create_index(collection) # 벡터 인덱스 생성
+
+    if not collection.has_index():
+        if defer_index and collection_is_empty(collection):
+            # 대량 적재 모드: 빈 컬렉션은 인덱스/로드 없이 삽입만 하고, 끝난 뒤 한 번에 인덱스 생성
+            logger.info(f"[대량 적재] '{collection_name}' 인덱스 생성과 로드를 적재 완료 후로 미룹니다.")
+            return collection
+        # 새 컬렉션, 또는 이전 대량 적재가 인덱스 생성 전에 중단된 컬렉션
+        create_index(collection, index_params) # 벡터 인덱스 생성
 
     collection.load() # 검색을 위해 컬렉션을 메모리에 로드
     logger.info("컬렉션을 메모리에 로드했습니다. 검색이 준비되었습니다.") # 로드 성공 로그
     return collection # 준비된 컬렉션 객체 반환
 
 
-def create_index(collection: Collection):
+def create_index(collection: Collection, index_params: Optional[dict] = None):
     """새 컬렉션에 대한 벡터 인덱스를 생성합니다."""
     logger.info("새 컬렉션에 대한 벡터 인덱스를 생성합니다...") # 인덱스 생성 시작 로그
-    # 벡터 인덱스 파라미터 정의 (IVF_FLAT은 일반적인 선택)
-    index_params = {
-        "metric_type": "L2", # 거리 계산 방식 (유클리드 거리)
-        "index_type": "IVF_FLAT", # 인덱스 유형
-        "params": {"nlist": 128}, # IVF_FLAT의 클러스터 개수
-    }
+    # 벡터 인덱스 파라미터 (지정하지 않으면 IVF_FLAT 기본값)
+    index_params = index_params or DEFAULT_INDEX_PARAMS
     # 'vector' 필드에 인덱스 생성
     collection.create_index(field_name="vector", index_params=index_params)
-    logger.info("벡터 필드에 인덱스를 생성했습니다.") # 인덱스 생성 완료 로그
+    logger.info(f"벡터 필드에 인덱스를 생성했습니다. ({index_params.get('index_type')})") # 인덱스 생성 완료 로그
+
+
+def finalize_bulk_load(collection: Collection, index_params: Optional[dict] = None) -> float:
+    """대량 적재 후 1회 flush → 인덱스 생성(완료까지 대기) → 로드를 수행하고 소요 시간(초)을 반환합니다."""
+    started = time.perf_counter()
+    collection.flush() # 삽입한 데이터를 봉인(sealed) 세그먼트로 만들어 인덱스 대상에 포함
+    create_index(collection, index_params)
+    utility.wait_for_index_building_complete(collection.name)
+    collection.load() # 인덱스가 모두 만들어진 뒤 한 번만 로드
+    elapsed = time.perf_counter() - started
+    logger.info(f"[대량 적재] '{collection.name}' 인덱스 생성 및 로드 완료 ({elapsed:.1f}s, {collection.num_entities}개 엔티티)")
+    return elapsed
 
 
 # ==============================================================================
@@ -144,6 +251,7 @@ SUPPORTED_EXTS = {
     ".pdf", ".txt", ".csv", ".tsv",
     ".xls", ".xlsx", ".xlsm",
 }
+EXCEL_EXTS = {".xls", ".xlsx", ".xlsm"} # 행 배치 스트리밍으로 적재하는 확장자
 
 
 def _read_head(path: str, n: int = 4096) -> bytes:
@@ -268,20 +376,22 @@ def read_excel_robust(file_path: str) -> List[pd.DataFrame]:
     """
     Excel 파일 (xls, xlsx, xlsm)의 모든 시트를 읽어 DataFrame 리스트로 반환합니다.
     각 DataFrame에는 시트 이름을 담은 '__sheet__' 컬럼이 추가됩니다.
+    (대용량 파일은 iter_excel_batches로 시트/배치 단위 스트리밍 처리를 권장합니다.)
     """
     logger.info(f"Excel 로더 시작: {os.path.basename(file_path)}") # Excel 로딩 시작 로그
     try:
-        # sheet_name=None으로 모든 시트를 읽어 딕셔너리로 반환 (키: 시트명, 값: DataFrame)
-        xls = pd.read_excel(file_path, sheet_name=None)
         frames: List[pd.DataFrame] = [] # 결과를 담을 리스트
-        # 각 시트별로 처리
-        for sheet_name, df in xls.items():
-            if df.empty: # 빈 시트는 건너뛰기
-                 continue
-            df = df.copy() # 원본 수정을 피하기 위해 복사
-            # 맨 앞에 '__sheet__' 컬럼 추가
-            df.insert(0, "__sheet__", str(sheet_name))
-            frames.append(df) # 리스트에 추가
+        current_sheet = None # 현재 모으고 있는 시트 이름
+        parts: List[pd.DataFrame] = [] # 현재 시트의 배치 조각들
+        # 스트리밍 리더가 돌려주는 배치를 시트 단위로 다시 합침
+        for sheet_name, batch, _ in iter_excel_batches(file_path):
+            if sheet_name != current_sheet and parts:
+                frames.append(_concat_sheet_batches(current_sheet, parts))
+                parts = []
+            current_sheet = sheet_name
+            parts.append(batch)
+        if parts:
+            frames.append(_concat_sheet_batches(current_sheet, parts))
         logger.info(f"Excel 읽기 성공: {len(frames)}개 시트 로드됨.") # 성공 로그
         return frames # DataFrame 리스트 반환
     except Exception as e:
@@ -289,29 +399,162 @@ def read_excel_robust(file_path: str) -> List[pd.DataFrame]:
         raise RuntimeError(f"Excel 로드 실패({os.path.basename(file_path)}): {e}")
 
 
-def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterTextSplitter) -> List[Document]:
+def _concat_sheet_batches(sheet_name: str, parts: List[pd.DataFrame]) -> pd.DataFrame:
+    """같은 시트의 배치들을 하나의 DataFrame으로 합치고 맨 앞에 '__sheet__' 컬럼을 추가합니다."""
+    df = parts[0] if len(parts) == 1 else pd.concat(parts) # 배치가 하나면 그대로 사용 (불필요한 복사 방지)
+    df.insert(0, "__sheet__", str(sheet_name)) # 새로 만든 DataFrame이므로 복사 없이 바로 추가
+    return df
+
+
+def _unique_headers(header_row) -> List[str]:
     """
-    지원하는 모든 파일 형식(PDF, TXT, CSV, TSV, Excel)을 읽어 LangChain Document 객체 리스트로 변환합니다.
-    CSV/Excel의 경우, 데이터 명세서 기반으로 내용을 추출합니다.
+    openpyxl에서 읽은 헤더 행을 pandas.read_excel과 같은 규칙의 컬럼명으로 변환합니다.
+    - 빈 헤더: 'Unnamed: {i}'
+    - 중복 헤더: 'A', 'A.1', 'A.2' ...
     """
-    filename = os.path.basename(file_path) # 파일명 추출
-    ext = pathlib.Path(filename).suffix.lower() # 소문자 확장자 추출
+    headers: List[str] = []
+    seen: Dict[str, int] = {}
+    for i, h in enumerate(header_row):
+        name = f"Unnamed: {i}" if h is None or str(h).strip() == "" else str(h)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        headers.append(name)
+    return headers
 
-    # 확장자가 명확하지 않을 때, 파일 헤더 시그니처로 Excel 파일인지 먼저 확인
-    head = _read_head(file_path)
+
+def iter_excel_batches(file_path: str, batch_rows: int = EXCEL_BATCH_ROWS) -> Iterator[Tuple[str, pd.DataFrame, int]]:
+    """
+    Excel 파일을 시트 순서대로 스트리밍하며 (시트명, 행 배치 DataFrame, 배치 시작 행 번호)를 yield 합니다.
+    - xlsx/xlsm: openpyxl read-only 모드로 행을 순회하므로 워크북 전체를 메모리에 올리지 않습니다.
+    - xls 또는 openpyxl 미설치: 시트 하나씩 pandas로 읽은 뒤 배치로 나눕니다.
+    배치 시작 행 번호는 데이터 행 기준 0부터 시작하며, DataFrame 인덱스도 이 번호로 맞춰집니다.
+    """
+    kind = _looks_like_excel_bytes(_read_head(file_path))
+
+    # --- xlsx/xlsm: openpyxl read-only 스트리밍 ---
+    if HAS_OPENPYXL and kind != "xls":
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True) # 읽기 전용 + 수식 대신 값
+        try:
+            for ws in wb.worksheets:
+                rows = ws.iter_rows(values_only=True) # 셀 객체 대신 값 튜플만 생성
+                header_row = next(rows, None)
+                if header_row is None: # 빈 시트는 건너뛰기
+                    continue
+                headers = _unique_headers(header_row)
+                batch: List[tuple] = [] # 현재 배치의 행들
+                start = 0 # 현재 배치의 시작 행 번호
+                for values in rows:
+                    batch.append(values[:len(headers)]) # 헤더보다 긴 행은 잘라서 컬럼 수 맞춤
+                    if len(batch) >= batch_rows:
+                        yield ws.title, pd.DataFrame(batch, columns=headers, index=range(start, start + len(batch))), start
+                        start += len(batch)
+                        batch = []
+                if batch:
+                    yield ws.title, pd.DataFrame(batch, columns=headers, index=range(start, start + len(batch))), start
+        finally:
+            wb.close() # read-only 모드는 파일 핸들을 잡고 있으므로 반드시 닫기
+        return
+
+    # --- xls(OLE) 또는 openpyxl 미설치: 시트 단위로 읽어 배치 분할 ---
+    sheet_names = pd.ExcelFile(file_path).sheet_names # 시트 이름만 먼저 확인
+    for sheet_name in sheet_names:
+        df = pd.read_excel(file_path, sheet_name=sheet_name) # 한 번에 한 시트만 메모리에 올림
+        for start in range(0, len(df), batch_rows):
+            yield str(sheet_name), df.iloc[start:start + batch_rows], start
+        del df # 다음 시트를 읽기 전에 참조 해제
+
+
+def _row_to_page_content(row: pd.Series) -> str:
+    """데이터 명세서 기반으로 CSV/Excel 한 행을 임베딩용 텍스트로 변환합니다."""
+    # [수정] 데이터 명세서 기반으로 필요한 컬럼 추출 (Gemini 로직)
+    title = str(row.get('RCP_TTL', '')) # 레시피 제목
+    intro = str(row.get('CKG_IPDC', '')) # 요리 소개
+    material = str(row.get('CKG_MTRL_CN', '')) # 요리 재료 내용
+
+    # Fallback 로직: 만약 위 3개 컬럼이 모두 비어있다면, 그냥 모든 컬럼 내용을 합침
+    if not title and not intro and not material:
+        return ", ".join([f"{col}: {val}" for col, val in row.astype(str).items()])
+    # 추출한 정보들을 의미있는 텍스트 구조로 결합
+    return f"레시피 제목: {title}\n요리 소개: {intro}\n재료: {material}"
+
+
+def _resolve_ext(file_path: str) -> str:
+    """로더 선택용 확장자. 지원하지 않는 확장자면 파일 헤더 시그니처로 Excel 파일인지 확인합니다."""
+    ext = pathlib.Path(file_path).suffix.lower() # 소문자 확장자 추출
     if ext not in SUPPORTED_EXTS and ext not in FORCE_INCLUDE_EXTS:
-        kind = _looks_like_excel_bytes(head)
+        kind = _looks_like_excel_bytes(_read_head(file_path))
         if kind:
             ext = f".{kind}" # 감지된 Excel 확장자(.xls 또는 .xlsx)로 강제 설정
+    return ext
+
+
+def _iter_excel_documents(file_path: str, text_splitter: RecursiveCharacterTextSplitter) -> Iterator[List[Document]]:
+    """
+    Excel 행 배치(EXCEL_BATCH_ROWS)마다 Document로 변환/분할한 조각 리스트를 yield 합니다.
+    워크북 전체나 파일의 모든 조각을 메모리에 올리지 않으므로, 적재 루프는 배치를 받는 대로 임베딩/삽입합니다.
+    """
+    filename = os.path.basename(file_path)
+    logger.info(f"Excel 스트리밍 로더 사용: {filename}") # 로더 사용 로그
+    n_rows = 0 # 변환된 행 수
+    n_sheets = set() # 내용이 있었던 시트 이름
+    try:
+        # 시트별 행 배치를 순회하며 배치 단위로 변환/분할 (워크북 전체를 DataFrame으로 올리지 않음)
+        for sheet_name, batch, _ in iter_excel_batches(file_path):
+            # 컬럼명 시작의 BOM 문자 제거
+            batch.columns = [c.replace("\ufeff", "") if isinstance(c, str) else c for c in batch.columns]
+            raw_documents: List[Document] = [] # 현재 배치의 Document 리스트
+            for idx, row in batch.iterrows():
+                if row.isnull().all(): continue # 빈 행 건너뛰기
+
+                page_content = _row_to_page_content(row)
+                # 내용 앞에 시트 이름 추가 (예: "[sheet: Sheet1] 레시피 제목: ...")
+                if sheet_name:
+                    page_content = f"[sheet: {sheet_name}] " + page_content
+
+                # 메타데이터 생성 (파일명, 행 번호, 시트명)
+                metadata = {"source": filename, "row": int(idx) + 1, "sheet": sheet_name}
+                raw_documents.append(Document(page_content=page_content, metadata=metadata))
+
+            if raw_documents:
+                n_rows += len(raw_documents)
+                n_sheets.add(sheet_name)
+                yield text_splitter.split_documents(raw_documents) # 배치 단위로 바로 분할해서 넘김
+    except Exception as e:
+        raise RuntimeError(f"Excel 로드 실패({filename}): {e}")
+
+    logger.info(f"Excel 처리 완료: {len(n_sheets)}개 시트, {n_rows}개 행 변환됨.") # 처리 완료 로그
+
+
+def load_file_for_ingest(file_path: str, text_splitter: RecursiveCharacterTextSplitter):
+    """
+    적재 루프용 로더. Excel은 행 배치마다 분할 조각 리스트를 내보내는 제너레이터를 바로 반환하고
+    (조각 수와 관계없이 메모리 사용량 일정), 그 외 형식은 load_file_to_documents와 같이 조각 리스트를 반환합니다.
+    """
+    if _resolve_ext(file_path) in EXCEL_EXTS:
+        return _iter_excel_documents(file_path, text_splitter)
+    return load_file_to_documents(file_path, text_splitter)
+
+
+def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterTextSplitter,
+                           pdf_workers: Optional[int] = None) -> List[Document]:
+    """
+    지원하는 모든 파일 형식(PDF, TXT, CSV, TSV, Excel)을 읽어 LangChain Document 객체 리스트로 변환합니다.
+    CSV/Excel의 경우, 데이터 명세서 기반으로 내용을 추출합니다.
+    pdf_workers: PDF 추출 프로세스 수 (None이면 pdf_extract 기본값, 1이면 현재 프로세스에서 추출)
+    """
+    filename = os.path.basename(file_path) # 파일명 추출
+    # 확장자가 명확하지 않을 때, 파일 헤더 시그니처로 Excel 파일인지 먼저 확인
+    ext = _resolve_ext(file_path)
 
     # --- PDF 처리 ---
     if ext == ".pdf":
         logger.info(f"PDF 로더 사용: {filename}") # 로더 사용 로그
-        loader = PyPDFLoader(file_path) # PDF 로더 초기화
-        docs = loader.load_and_split(text_splitter) # 파일 로드 및 텍스트 분할
-        for d in docs:
-            d.metadata["source"] = filename # 메타데이터에 파일명(source) 보장
-        return docs # 분할된 Document 리스트 반환
+        # 페이지 구간을 여러 프로세스에서 추출 (metadata의 source/page는 PyPDFLoader와 동일)
+        pages = extract_pdf_pages(file_path) if pdf_workers is None else extract_pdf_pages(file_path, workers=pdf_workers)
+        return text_splitter.split_documents(pages) # 페이지별 텍스트 분할
 
     # --- TXT 처리 ---
     if ext == ".txt":
@@ -326,9 +569,9 @@ def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterText
             raw = open(file_path, "rb").read().decode("utf-8", errors="ignore")
             # 전체 내용을 하나의 Document로 만들고 분할
             docs = text_splitter.split_documents([Document(page_content=raw, metadata={"source": filename})])
-        # 메타데이터에 파일명(source) 보장
+        # 메타데이터에 파일명(source) 보장 (TextLoader는 전체 경로를 넣으므로 파일명으로 통일)
         for d in docs:
-            d.metadata.setdefault("source", filename)
+            d.metadata["source"] = filename
         return docs
 
     # --- CSV/TSV 처리 ---
@@ -345,18 +588,8 @@ def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterText
              for idx, row in df.iterrows():
                   if row.isnull().all(): continue # 모든 값이 비어있는 행은 건너뛰기
 
-                  # [수정] 데이터 명세서 기반으로 필요한 컬럼 추출 (Gemini 로직)
-                  title = str(row.get('RCP_TTL', '')) # 레시피 제목
-                  intro = str(row.get('CKG_IPDC', '')) # 요리 소개
-                  material = str(row.get('CKG_MTRL_CN', '')) # 요리 재료 내용
-
-                  # Fallback 로직: 만약 위 3개 컬럼이 모두 비어있다면, 그냥 모든 컬럼 내용을 합침
-                  if not title and not intro and not material:
-                       page_content = ", ".join([f"{col}: {val}" for col, val in row.astype(str).items()])
-                       logger.debug(f"명세서 컬럼 없음(row {idx+1}), 모든 컬럼 사용: {page_content[:100]}...")
-                  else:
-                       # 추출한 정보들을 의미있는 텍스트 구조로 결합
-                       page_content = f"레시피 제목: {title}\n요리 소개: {intro}\n재료: {material}"
+                  # 데이터 명세서 기반 텍스트 변환 (명세서 컬럼이 없으면 모든 컬럼 사용)
+                  page_content = _row_to_page_content(row)
 
                   # 메타데이터 생성 (파일명, 행 번호)
                   metadata = {"source": filename, "row": int(idx) + 1}
@@ -372,7 +605,7 @@ def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterText
              try:
                   loader = TextLoader(file_path, encoding="utf-8") # 일반 TXT 로더 사용
                   docs = loader.load_and_split(text_splitter)
-                  for d in docs: d.metadata.setdefault("source", filename) # source 메타데이터 보장
+                  for d in docs: d.metadata["source"] = filename # source 메타데이터를 파일명으로 통일
                   return docs
              except Exception as txt_err:
                   # TXT 로더마저 실패하면 최종 실패 처리 (원본 CSV 오류 발생)
@@ -380,49 +613,9 @@ def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterText
                   raise csv_err # 원래 발생했던 CSV 관련 오류를 다시 던짐
 
     # --- Excel 처리 ---
-    if ext in (".xls", ".xlsx", ".xlsm"):
-        # 위에서 정의한 강건한 Excel 로더 사용 (모든 시트 읽음)
-        frames = read_excel_robust(file_path)
-        raw_documents: List[Document] = [] # Document 객체를 담을 리스트
-        # 각 시트(DataFrame)별로 처리
-        for df in frames:
-            # 컬럼명 시작의 BOM 문자 제거
-            df.rename(columns=lambda c: c.replace("\ufeff", "") if isinstance(c, str) else c, inplace=True)
-
-            sheet_name = "" # 시트 이름 초기화
-            # '__sheet__' 컬럼에서 시트 이름 추출
-            if "__sheet__" in df.columns and not df.empty:
-                sheet_name = str(df["__sheet__"].iloc[0])
-            # '__sheet__' 컬럼은 실제 내용이 아니므로 제거
-            df_wo = df.drop(columns=["__sheet__"], errors="ignore")
-
-            # 현재 시트의 각 행(row)을 순회
-            for idx, row in df_wo.iterrows():
-                if row.isnull().all(): continue # 빈 행 건너뛰기
-
-                # [수정] 데이터 명세서 기반 내용 추출 (Gemini 로직)
-                title = str(row.get('RCP_TTL', ''))
-                intro = str(row.get('CKG_IPDC', ''))
-                material = str(row.get('CKG_MTRL_CN', ''))
-
-                # Fallback 로직: 명세서 컬럼 없으면 모든 컬럼 합침
-                if not title and not intro and not material:
-                     page_content = ", ".join([f"{col}: {val}" for col, val in row.astype(str).items()])
-                else:
-                     page_content = f"레시피 제목: {title}\n요리 소개: {intro}\n재료: {material}"
-
-                # 내용 앞에 시트 이름 추가 (예: "[sheet: Sheet1] 레시피 제목: ...")
-                if sheet_name:
-                    page_content = f"[sheet: {sheet_name}] " + page_content
-
-                # 메타데이터 생성 (파일명, 행 번호, 시트명)
-                metadata = {"source": filename, "row": int(idx) + 1, "sheet": sheet_name}
-                # Document 객체 생성 및 리스트 추가
-                raw_documents.append(Document(page_content=page_content, metadata=metadata))
-
-        logger.info(f"Excel 처리 완료: {len(raw_documents)}개 행 변환됨.") # 처리 완료 로그
-        # 생성된 Document 리스트를 최종 분할
-        return text_splitter.split_documents(raw_documents)
+    if ext in EXCEL_EXTS:
+        # 행 배치 단위로 변환/분할한 조각을 모아 리스트로 반환 (적재 루프는 load_file_for_ingest로 스트리밍)
+        return [d for part in _iter_excel_documents(file_path, text_splitter) for d in part]
 
     # 모든 로더에서 처리하지 못한 경우, 지원하지 않는 형식으로 간주하고 오류 발생
     raise ValueError(f"지원하지 않거나 처리할 수 없는 파일 형식({filename}): {ext}")
@@ -431,61 +624,154 @@ def load_file_to_documents(file_path: str, text_splitter: RecursiveCharacterText
 # ==============================================================================
 # 4. 데이터 처리 (Data Processing - GPU 설정 추가 및 배치 삽입)
 # ==============================================================================
-def process_and_ingest_data(collection: Collection):
-    """Milvus DB에서 이미 처리된 파일을 확인하고, 신규 또는 강제 재처리 대상 파일을 찾아 처리 후 Milvus에 누적 저장합니다."""
-    logger.info("데이터베이스에서 이미 처리된 파일 목록을 확인합니다...") # 시작 로그
+def _source_expr(source: str) -> str:
+    """파일명(source)으로 조각을 찾는 Milvus 불리언 표현식을 만듭니다. (따옴표/역슬래시 이스케이프)"""
+    escaped = source.replace("\\", "\\\\").replace('"', '\\"')
+    return f'source == "{escaped}"'
+
+
+def _exists_in_milvus(collection: Collection, source: str) -> bool:
+    """매니페스트 도입 이전에 적재된 파일인지 확인하기 위해 source로 1건만 조회합니다."""
     try:
-        # 컬렉션에 데이터가 있는지 확인
-        if collection.num_entities > 0:
-            # Milvus에서 기존 데이터의 'source'(파일명) 필드 조회 (성능상 제한 있음)
-            results = collection.query(expr="id >= 0", output_fields=["source"], limit=16384)
-            # 조회된 파일명들을 Set으로 만들어 중복 제거 및 빠른 조회 가능하게 함
-            processed_files: Set[str] = set(item['source'] for item in results)
-        else:
-            # 컬렉션이 비어있으면 처리된 파일 없음
-            processed_files: Set[str] = set()
-        logger.info(f"총 {len(processed_files)}개의 파일이 이미 데이터베이스에 존재합니다.") # 결과 로그
+        return bool(collection.query(expr=_source_expr(source), output_fields=["id"], limit=1))
     except Exception as e:
-        # DB 조회 중 오류 발생 시, 모든 파일을 처리 대상으로 간주 (안전한 방식)
-        logger.warning(f"DB에서 기존 파일 목록을 가져오는 중 오류 발생: {e}. 모든 파일을 처리 대상으로 간주합니다.")
-        processed_files: Set[str] = set()
+        logger.warning(f"기존 적재 여부 조회 실패({source}): {e}")
+        return False
 
-    # --- 파일 스캔 로직 (GPT 코드) ---
-    scan_log = [] # 스캔 과정을 기록할 리스트
-    all_local_files = [] # 로컬 디렉토리에서 처리 후보가 될 파일 리스트
-    # DATA_PATH 디렉토리 내 모든 항목 순회
-    for f in os.listdir(DATA_PATH):
-        full = os.path.join(DATA_PATH, f) # 전체 경로 생성
-        # 파일인지 확인 (디렉토리는 건너뛰기)
-        if not os.path.isfile(full):
-            scan_log.append((f, "skip", "not a file"))
-            continue
 
-        ext = pathlib.Path(f).suffix.lower() # 소문자 확장자 추출
-        reason = "" # 포함/제외 이유
-        include = False # 처리 대상 포함 여부 플래그
+def iter_rows(collection: Collection, expr: str, output_fields: List[str], batch_size: int = 1000) -> Iterator[Dict]:
+    """
+    expr에 맞는 행(dict)을 순회합니다. query_iterator가 없으면 id 범위로 나누어 조회합니다.
+    방금 삽입/삭제한 행도 보이도록 Strong 일관성으로 조회합니다.
+    """
+    if hasattr(collection, "query_iterator"):
+        it = collection.query_iterator(batch_size=batch_size, expr=expr, output_fields=output_fields,
+                                       consistency_level="Strong")
+        try:
+            while True:
+                rows = it.next()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            it.close()
+        return
+    last_id = -1 # 구버전 pymilvus: id 오름차순 페이지 조회
+    while True:
+        rows = collection.query(expr=f"{expr} and id > {last_id}", output_fields=["id", *output_fields],
+                                limit=batch_size, consistency_level="Strong")
+        if not rows:
+            break
+        yield from rows
+        last_id = max(r["id"] for r in rows)
+
+
+def _iter_stored_chunks(collection: Collection, batch_size: int = 1000):
+    """컬렉션에 저장된 (source, text)를 순회합니다."""
+    for r in iter_rows(collection, "id >= 0", ["source", "text"], batch_size):
+        yield r["source"], r["text"]
+
+
+class IngestResources:
+    """
+    여러 컬렉션을 한 프로세스에서 적재할 때 공유하는 자원 모음.
+    - 임베딩 모델(1회 로드, 처음 필요할 때 로드), 디스크 임베딩 캐시
+    - 텍스트 분할기, 적재 매니페스트
+    - 파일 로딩용 스레드 풀 (다음 파일을 미리 읽어 임베딩과 겹쳐 실행)
+    """
 
-        # 1. 지원 확장자인지 확인
-        if ext in SUPPORTED_EXTS:
-            include = True
-            reason = f"ext ok: {ext}"
-        else:
-            # 2. 지원 확장자가 아니면, Excel 시그니처인지 확인 (잘못된 확장자 처리)
-            try:
-                head = _read_head(full)
-                if _looks_like_excel_bytes(head):
-                    include = True
-                    reason = "excel signature"
-                else:
-                    reason = f"unsupported ext: {ext}"
-            except Exception as e:
-                reason = f"head read err: {e}" # 헤더 읽기 오류 시 로그
+    def __init__(self, embedding_model: str = EMBEDDING_MODEL, dimension: int = DIMENSION,
+                 loader_workers: int = LOADER_WORKERS, embed_batch_size: int = EMBED_BATCH_SIZE):
+        self.embedding_model = embedding_model
+        self.dimension = dimension
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.loader_workers = max(1, loader_workers)
+        self.text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100) # 텍스트 분할기 객체 생성
+        self.manifest = IngestManifest(MANIFEST_PATH) # 로컬 적재 기록 (파일 크기/수정시각/해시/조각 ID 범위)
+        self.loader_pool = ThreadPoolExecutor(max_workers=self.loader_workers, thread_name_prefix="loader")
+        self.embedding_cache: Optional[EmbeddingCache] = None
+        self._embeddings = None
+
+    @property
+    def embeddings(self):
+        """임베딩 모델을 처음 필요할 때 한 번만 로드합니다. (처리할 파일이 없으면 로드하지 않음)"""
+        if self._embeddings is None:
+            # --- [수정됨] 임베딩 모델 초기화 (GPU 설정 추가) ---
+            logger.info(f"임베딩 모델을 초기화합니다: {self.embedding_model}") # 시작 로그
+
+            # [수정] GPU 사용 설정 추가
+            import torch  # GPU 사용 확인 (모델을 로드할 때만 import, PDF 추출 프로세스에서는 불필요)
+            device = 'cuda' if torch.cuda.is_available() else 'cpu'
+            logger.info(f"임베딩 계산에 사용할 장치: {device.upper()}") # 사용할 장치(CPU/GPU) 로그
+
+            # device를 넘겨 GPU 또는 CPU 지정 (onnx-int8 백엔드는 CPU 전용)
+            logger.info(f"임베딩 백엔드: {EMBEDDING_BACKEND}")
+            embeddings = load_embeddings(self.embedding_model, device=device, batch_size=self.embed_batch_size)
+            # [추가] 길이 버킷: 캐시 미스인 조각만 길이순으로 묶어 계산 (순서는 복원됨)
+            if EMBED_LENGTH_BUCKETING:
+                embeddings = LengthBucketedEmbeddings(embeddings, batch_size=self.embed_batch_size)
+            # [추가] 임베딩 캐시: 캐시에 없는 텍스트만 모델로 계산
+            if EMBEDDING_CACHE_ENABLED:
+                self.embedding_cache = EmbeddingCache(EMBEDDING_CACHE_DIR, dim=self.dimension, max_bytes=int(EMBEDDING_CACHE_MAX_GB * 1024 ** 3))
+                embeddings = CachedEmbeddings(embeddings, self.embedding_cache, model_key=embedding_model_key(self.embedding_model))
+            self._embeddings = embeddings
+        return self._embeddings
+
+    def close(self):
+        """캐시 통계 출력 및 정리 후 자원을 해제합니다."""
+        if self.embedding_cache is not None:
+            cache = self.embedding_cache
+            logger.info(f"임베딩 캐시 적중률: {cache.hit_ratio:.1%} (적중 {cache.hits}개 / 미스 {cache.misses}개)")
+            cache.maybe_gc() # 최대 크기를 넘었으면 오래 안 쓴 벡터 정리
+            cache.close()
+            self.embedding_cache = None
+        self.loader_pool.shutdown(wait=True)
+        shutdown_pdf_pool() # PDF 추출 프로세스 종료
+        self.manifest.close()
+
+
+def _scan_file(data_path: str, f: str) -> Tuple[bool, str]:
+    """파일 하나가 적재 후보인지 (포함 여부, 이유)를 판정합니다. (확장자/Excel 시그니처/강제 포함 확장자 기준)"""
+    full = os.path.join(data_path, f) # 전체 경로 생성
+    # 파일인지 확인 (디렉토리는 건너뛰기)
+    if not os.path.isfile(full):
+        return False, "not a file"
+
+    ext = pathlib.Path(f).suffix.lower() # 소문자 확장자 추출
+    reason = "" # 포함/제외 이유
+    include = False # 처리 대상 포함 여부 플래그
+
+    # 1. 지원 확장자인지 확인
+    if ext in SUPPORTED_EXTS:
+        include = True
+        reason = f"ext ok: {ext}"
+    else:
+        # 2. 지원 확장자가 아니면, Excel 시그니처인지 확인 (잘못된 확장자 처리)
+        try:
+            head = _read_head(full)
+            if _looks_like_excel_bytes(head):
+                include = True
+                reason = "excel signature"
+            else:
+                reason = f"unsupported ext: {ext}"
+        except Exception as e:
+            reason = f"head read err: {e}" # 헤더 읽기 오류 시 로그
+
+    # 3. 위 조건에 해당 안되더라도, 강제 포함 확장자(FORCE_INCLUDE_EXTS)면 포함
+    if not include and ext in FORCE_INCLUDE_EXTS:
+        include = True
+        reason = f"force include: {ext}"
+    return include, reason
 
-        # 3. 위 조건에 해당 안되더라도, 강제 포함 확장자(FORCE_INCLUDE_EXTS)면 포함
-        if not include and ext in FORCE_INCLUDE_EXTS:
-            include = True
-            reason = f"force include: {ext}"
 
+def scan_data_path(data_path: str, names: Optional[List[str]] = None) -> List[str]:
+    """데이터 폴더(또는 그 중 names로 지정한 파일들)에서 적재 후보 파일명 목록을 만듭니다."""
+    # --- 파일 스캔 로직 (GPT 코드) ---
+    scan_log = [] # 스캔 과정을 기록할 리스트
+    all_local_files = [] # 로컬 디렉토리에서 처리 후보가 될 파일 리스트
+    # data_path 디렉토리 내 모든 항목 순회 (감시 모드에서는 변경된 파일만)
+    for f in (names if names is not None else os.listdir(data_path)):
+        include, reason = _scan_file(data_path, f)
         # 스캔 결과 기록 및 처리 후보 리스트 추가
         scan_log.append((f, "include" if include else "skip", reason))
         if include:
@@ -494,113 +780,580 @@ def process_and_ingest_data(collection: Collection):
     # 스캔 결과 상세 로그 출력
     for name, act, why in scan_log:
         logger.info(f"[SCAN] {act.upper():7s} | {name} | {why}")
+    return all_local_files
+
+
+def plan_files(collection: Collection, collection_name: str, data_path: str, manifest: IngestManifest,
+               all_local_files: List[str], force_reprocess: Set[str]):
+    """매니페스트와 비교해 처리할 파일 목록과 파일별 (상태, 지문, 기존 매니페스트 항목)을 반환합니다."""
+    # 조건: (매니페스트에 없는 신규 파일) 또는 (내용이 바뀐 파일) 또는 (강제 재처리 목록에 있는 파일)
+    has_entities = collection.num_entities > 0 # 매니페스트 이전 데이터 이관 여부 판단용 (1회 조회)
+    files_to_process = [] # 처리할 파일명 리스트
+    file_plans = {} # 파일명 -> (상태, 지문, 기존 매니페스트 항목)
+    for f in all_local_files:
+        status, fingerprint = manifest.check_file(collection_name, os.path.join(data_path, f))
+        entry = manifest.get(collection_name, f)
+        if manifest.get_checkpoint(collection_name, f) is not None:
+            # 이전 실행에서 적재 도중 중단된 파일: 이어서(--resume) 또는 중단분 삭제 후 처음부터 처리
+            files_to_process.append(f)
+            file_plans[f] = (STATUS_MODIFIED if entry else STATUS_NEW, fingerprint, entry)
+            continue
+        if status == STATUS_NEW and has_entities and f not in force_reprocess and _exists_in_milvus(collection, f):
+            # 매니페스트 도입 이전에 적재된 파일: 다시 임베딩하지 않고 매니페스트에만 이관
+            if not fingerprint.get("sha256"):
+                fingerprint["sha256"] = file_sha256(os.path.join(data_path, f))
+            manifest.record(collection_name, f, fingerprint, None, None, 0)
+            logger.info(f"[MANIFEST] 기존 적재 파일을 매니페스트에 등록: {f}")
+            continue
+        if status == STATUS_UNCHANGED and f not in force_reprocess:
+            continue
+        if f in force_reprocess:
+            status = STATUS_MODIFIED # 강제 재처리는 변경된 파일과 같이 이전 조각을 교체 (없으면 삭제는 무시됨)
+        files_to_process.append(f)
+        file_plans[f] = (status, fingerprint, entry)
+    return files_to_process, file_plans
+
+
+def process_and_ingest_data(collection: Collection, data_path: Optional[str] = None,
+                            resources: Optional[IngestResources] = None,
+                            collection_name: Optional[str] = None,
+                            force_reprocess: Optional[Set[str]] = None, resume: bool = False,
+                            files: Optional[List[str]] = None, index_deferred: bool = False) -> Dict:
+    """
+    매니페스트로 신규/변경/강제 재처리 대상 파일을 찾아 처리 후 Milvus에 누적 저장하고, 변경된 파일의 이전 조각은 교체합니다.
+    resources를 넘기면 임베딩 모델/캐시/스레드 풀을 공유하고, 없으면 이 호출 안에서 만들고 정리합니다.
+    resume=True면 중단된 파일을 체크포인트 위치부터 이어서 적재합니다. (False면 중단분을 지우고 처음부터)
+    files를 넘기면 폴더 전체 대신 그 파일들만 검사합니다. (감시 모드에서 변경된 파일만 처리)
+    index_deferred=True는 대량 적재 모드로 인덱스/로드를 미룬 빈 컬렉션이라는 뜻입니다. (setup_milvus_collection(defer_index=True)
+    가 인덱스 없이 돌려준 경우) 로드 전 컬렉션에는 조건 삭제를 보낼 수 없고 지울 이전 행도 없으므로 재적재 전 삭제를 건너뜁니다.
+    반환값: 컬렉션별 처리 통계 (파일 수, 저장 조각 수, 중복 제거 수, 소요 시간)
+    """
+    own_resources = resources is None
+    if own_resources:
+        resources = IngestResources()
+    try:
+        return _process_and_ingest_data(
+            collection,
+            collection_name or collection.name,
+            data_path or DATA_PATH,
+            resources,
+            set(FORCE_REPROCESS) | set(force_reprocess or ()),
+            resume,
+            files,
+            index_deferred,
+        )
+    finally:
+        if own_resources:
+            resources.close()
+
+
+def _process_and_ingest_data(collection: Collection, collection_name: str, data_path: str,
+                             resources: IngestResources, force_reprocess: Set[str], resume: bool = False,
+                             files: Optional[List[str]] = None, index_deferred: bool = False) -> Dict:
+    started = time.perf_counter()
+    stats = {"collection": collection_name, "files": 0, "failed_files": 0, "chunks": 0, "duplicates": 0, "seconds": 0.0}
+    manifest = resources.manifest
+
+    all_local_files = scan_data_path(data_path, files)
 
-    # --- 처리 대상 파일 최종 결정 (GPT 코드) ---
-    # 조건: (DB에 없는 파일) 또는 (강제 재처리 목록에 있는 파일)
-    files_to_process = [f for f in all_local_files if (f not in processed_files) or (f in FORCE_REPROCESS)]
-    logger.info(f"스캔 결과: 총 {len(all_local_files)}개 후보 / 신규 처리 {len(files_to_process)}개") # 요약 로그
+    # 컬렉션이 재생성(스키마 변경, 대량 적재용 재구축 등)되어 비었는데 매니페스트에 기록이 남아 있으면 초기화
+    collection_reset = manifest.has_records(collection_name) and collection_is_empty(collection)
+    if collection_reset:
+        logger.warning(f"[{collection_name}] 컬렉션이 비어 있어 적재 기록을 초기화하고 모든 파일을 다시 적재합니다.")
+        manifest.reset_collection(collection_name)
+
+    # --- 처리 대상 파일 최종 결정 (매니페스트 기반) ---
+    files_to_process, file_plans = plan_files(collection, collection_name, data_path, manifest, all_local_files, force_reprocess)
+    logger.info(f"[{collection_name}] 스캔 결과: 총 {len(all_local_files)}개 후보 / 처리 대상 {len(files_to_process)}개") # 요약 로그
     # 처리할 파일이 없으면 함수 종료
     if not files_to_process:
-         logger.info("새로 추가/변경되거나 강제 재처리할 파일이 없습니다. 작업을 종료합니다.")
-         return
-    logger.info(f"처리 대상 파일 목록: {files_to_process}") # 처리 대상 파일명 목록 로그
-
-
-    # --- [수정됨] 임베딩 모델 및 텍스트 분할기 초기화 (GPU 설정 추가) ---
-    logger.info(f"임베딩 모델을 초기화합니다: {EMBEDDING_MODEL}") # 시작 로그
-    
-    # [수정] GPU 사용 설정 추가
-    device = 'cuda' if torch.cuda.is_available() else 'cpu'
-    logger.info(f"임베딩 계산에 사용할 장치: {device.upper()}") # 사용할 장치(CPU/GPU) 로그
-    
-    # model_kwargs={'device': device} 를 추가하여 GPU 또는 CPU 지정
-    embeddings = HuggingFaceEmbeddings(
-        model_name=EMBEDDING_MODEL,
-        model_kwargs={'device': device}
-    )
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100) # 텍스트 분할기 객체 생성
+         logger.info(f"[{collection_name}] 새로 추가/변경되거나 강제 재처리할 파일이 없습니다.")
+         stats["seconds"] = time.perf_counter() - started
+         return stats
+    logger.info(f"처리 대상 파일 목록: {[(f, file_plans[f][0]) for f in files_to_process]}") # 처리 대상 파일명/상태 로그
+
+    embeddings = resources.embeddings # 공유 임베딩 모델 (처음 한 번만 로드)
+    text_splitter = resources.text_splitter
+
+    # --- 중복 제거기 준비 (해시는 매니페스트와 같은 SQLite 파일에 저장) ---
+    dedup = None
+    if DEDUP_ENABLED:
+        dedup = ChunkDeduplicator(manifest, collection_name, near_dup=DEDUP_NEAR_DUP, max_distance=DEDUP_NEAR_MAX_DISTANCE)
+        if collection_reset or (not dedup.is_empty() and collection_is_empty(collection)):
+            dedup.clear() # 비워진 컬렉션의 조각 해시가 남아 있으면 모든 조각이 중복으로 걸러짐
+        if collection.num_entities > 0 and dedup.is_empty():
+            # 중복 제거 도입 이전에 저장된 조각도 비교 대상이 되도록 1회 해시 테이블을 채움
+            logger.info("기존 저장 조각으로 중복 판정용 해시 테이블을 채웁니다 (최초 1회)...")
+            n = dedup.backfill(_iter_stored_chunks(collection))
+            logger.info(f"기존 조각 해시 {n}개 등록 완료.")
+
+    # --- 파일 미리 읽기: 현재 파일을 임베딩하는 동안 다음 파일들을 스레드 풀에서 로드 ---
+    pending_loads = {}
+    def _prefetch(idx: int):
+        if idx < len(files_to_process) and idx not in pending_loads:
+            path = os.path.join(data_path, files_to_process[idx])
+            pending_loads[idx] = resources.loader_pool.submit(load_file_for_ingest, path, text_splitter)
+    for idx in range(resources.loader_workers):
+        _prefetch(idx)
 
     # --- 각 파일 처리 루프 ---
-    for filename in tqdm(files_to_process, desc="신규 파일 처리 중"): # tqdm으로 진행률 표시
-        file_path = os.path.join(DATA_PATH, filename) # 전체 파일 경로
+    for idx, filename in enumerate(tqdm(files_to_process, desc=f"[{collection_name}] 파일 처리 중")): # tqdm으로 진행률 표시
+        _prefetch(idx + resources.loader_workers) # 다음 파일 로딩 예약
+        file_path = os.path.join(data_path, filename) # 전체 파일 경로
+        status, fingerprint, old_entry = file_plans[filename]
         try:
             logger.info(f"'{filename}' 로딩 시작...") # 파일 로딩 시작 로그
-            # 1) 통합 파일 로더를 사용하여 파일을 읽고 Document 리스트로 변환 (분할 포함)
-            all_documents = load_file_to_documents(file_path, text_splitter)
-
-            # 내용이 없는 경우 건너뛰기
-            if not all_documents:
-                logger.warning(f"파일 '{filename}'에서 처리할 내용을 찾을 수 없습니다.")
-                continue
-
-            # 2) 임베딩 생성
-            logger.info(f"'{filename}' 임베딩 시작 ({len(all_documents)}개 조각)...") # 임베딩 시작 로그
-            texts = [d.page_content for d in all_documents] # Document에서 텍스트 내용만 추출
-            vectors = embeddings.embed_documents(texts) # 임베딩 계산 수행 (GPU 사용 시 여기서 빨라짐)
-
-            # 3) Milvus 저장을 위한 메타데이터 준비
-            sources = [d.metadata.get("source", filename) for d in all_documents] # source (파일명) 리스트
-            # page (PDF 페이지) 또는 row (CSV/Excel 행 번호) 리스트 (없으면 0)
-            pages = [d.metadata.get("page", d.metadata.get("row", 0)) for d in all_documents]
-
-            # 4) [수정됨] Milvus 배치(Batch) 삽입
-            logger.info(f"'{filename}' Milvus 저장 시작 ({MILVUS_BATCH_SIZE}개씩 나누어 저장)...")
-            total_inserted = 0
-            # 전체 데이터를 배치 크기만큼 나누어 반복 처리
-            for i in range(0, len(all_documents), MILVUS_BATCH_SIZE):
-                # 현재 배치의 시작과 끝 인덱스 계산
-                batch_end = min(i + MILVUS_BATCH_SIZE, len(all_documents))
-                
-                # 현재 배치에 해당하는 데이터 추출
-                batch_sources = sources[i:batch_end]
-                batch_pages = pages[i:batch_end]
-                batch_texts = texts[i:batch_end] # texts 필드도 함께 전달
-                batch_vectors = vectors[i:batch_end]
-                
-                # Milvus에 현재 배치 삽입
-                try:
-                    collection.insert([batch_sources, batch_pages, batch_texts, batch_vectors])
-                    total_inserted += len(batch_sources)
-                    logger.debug(f"  - 배치 {i // MILVUS_BATCH_SIZE + 1} ({len(batch_sources)}개) 저장 성공.")
-                except Exception as batch_e:
-                    logger.error(f"  - 배치 {i // MILVUS_BATCH_SIZE + 1} 저장 중 오류 발생: {batch_e}")
-                    continue # 오류난 배치 건너뛰고 계속
-
-            logger.info(f"파일 '{filename}'의 처리 및 저장이 완료되었습니다. (총 {total_inserted}/{len(all_documents)}개 조각 저장됨)")
-        
+            # 1) 통합 파일 로더를 사용하여 파일을 읽고 Document 리스트로 변환 (분할 포함, 미리 읽기 결과 대기)
+            #    Excel은 행 배치 단위 제너레이터라 여기서는 열기만 하고, 읽기/분할은 임베딩과 번갈아 진행됨
+            documents = pending_loads.pop(idx).result()
+            inserted = _ingest_documents(collection, collection_name, filename, file_path, status, fingerprint,
+                                         old_entry, documents, embeddings, manifest, dedup, resume=resume,
+                                         index_deferred=index_deferred)
+            stats["files"] += 1
+            stats["chunks"] += inserted
+        except PartialIngestError as e:
+            stats["failed_files"] += 1
+            logger.warning(str(e)) # 저장된 배치는 체크포인트에 남아 있음
         except Exception as e:
             # 파일 처리 중 발생하는 모든 예외 처리
+            stats["failed_files"] += 1
             logger.error(f"파일 '{filename}' 처리 중 오류 발생: {e}")
             logger.exception("상세 오류:") # 오류 스택 트레이스 포함하여 로그 기록
+            if dedup is not None:
+                dedup.discard() # 저장되지 않은 조각의 해시는 버림
 
     # --- 최종 Flush ---
-    logger.info("모든 신규 파일의 처리가 완료되었습니다.") # 모든 파일 처리 완료 로그
+    logger.info(f"[{collection_name}] 모든 대상 파일의 처리가 완료되었습니다.") # 모든 파일 처리 완료 로그
+    if dedup is not None:
+        stats["duplicates"] = dedup.removed_exact + dedup.removed_near
+        logger.info(f"중복 제거 결과: 정확 중복 {dedup.removed_exact}개, 근접 중복 {dedup.removed_near}개 조각을 임베딩에서 제외했습니다.")
     collection.flush() # Milvus에 삽입된 데이터를 디스크에 최종 저장 (필수)
-    logger.info(f"'{COLLECTION_NAME}' 컬렉션에 데이터를 저장(Flush)했습니다.")
+    logger.info(f"'{collection_name}' 컬렉션에 데이터를 저장(Flush)했습니다.")
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+class PartialIngestError(RuntimeError):
+    """재시도 후에도 일부 배치를 저장하지 못해 파일 적재가 체크포인트 상태로 남았을 때 발생합니다."""
+
+
+def _release_source(collection: Collection, collection_name: str, filename: str, manifest: IngestManifest,
+                    dedup: ChunkDeduplicator) -> int:
+    """
+    filename의 Milvus 행을 지우기 전에 호출합니다. filename이 보관하던 조각 중 다른 파일도 가진 것(그 파일에서는
+    중복이라 건너뜀)은 남은 소유 파일 이름으로 다시 넣고(조회한 벡터 재사용, 다시 임베딩하지 않음),
+    filename의 조각 해시/소유 기록을 지웁니다. 옮긴 조각 수를 반환합니다.
+    """
+    plan = dedup.plan_release(filename)
+    moved: Dict[str, str] = {}
+    if plan:
+        targets: Dict[str, Tuple[list, list, list]] = {} # 넘겨받을 파일 -> (pages, texts, vectors)
+        for row in iter_rows(collection, _source_expr(filename), ["page", "text", "vector"]):
+            h = text_hash(normalize_text(row["text"]))
+            if h not in plan or h in moved:
+                continue
+            pages, texts, vectors = targets.setdefault(plan[h], ([], [], []))
+            pages.append(row["page"])
+            texts.append(row["text"])
+            vectors.append(row["vector"])
+            moved[h] = plan[h]
+        for target, (pages, texts, vectors) in targets.items():
+            for i in range(0, len(texts), MILVUS_BATCH_SIZE):
+                res = collection.insert([[target] * len(texts[i:i + MILVUS_BATCH_SIZE]), pages[i:i + MILVUS_BATCH_SIZE],
+                                         texts[i:i + MILVUS_BATCH_SIZE], vectors[i:i + MILVUS_BATCH_SIZE]])
+                manifest.extend_id_range(collection_name, target, list(res.primary_keys))
+        logger.info(f"[{collection_name}] '{filename}'의 조각 중 다른 파일과 공유된 {len(moved)}개를 "
+                    f"{len(targets)}개 파일 이름으로 옮겼습니다.")
+    orphaned = dedup.release_source(filename, moved)
+    if orphaned:
+        # 해시는 기록돼 있지만 Milvus에서 행을 찾지 못한 조각 -> 그 조각을 가진 파일은 다음 실행에서 다시 적재
+        logger.warning(f"[{collection_name}] '{filename}'에서 옮기지 못한 공유 조각이 있어 다시 적재합니다: {sorted(orphaned)}")
+        manifest.mark_incomplete(collection_name, orphaned)
+    return len(moved)
+
+
+def remove_source(collection: Collection, collection_name: str, filename: str, manifest: IngestManifest):
+    """삭제된 원본 파일의 조각을 Milvus에서 지우고 매니페스트/체크포인트/조각 해시 기록도 지웁니다."""
+    if DEDUP_ENABLED:
+        # 다른 파일이 중복으로 건너뛴 조각은 지우기 전에 그 파일 이름으로 옮김
+        _release_source(collection, collection_name, filename, manifest, ChunkDeduplicator(manifest, collection_name))
+    collection.delete(expr=_source_expr(filename))
+    manifest.remove(collection_name, filename)
+    manifest.clear_checkpoint(collection_name, filename)
+    logger.info(f"[{collection_name}] 삭제된 파일 '{filename}'의 조각을 제거했습니다.")
+
+
+def _discard_partial(collection: Collection, collection_name: str, filename: str, ckpt: Dict,
+                     manifest: IngestManifest):
+    """중단된 이전 실행이 남긴 조각(이번 버전의 일부)만 지우고 체크포인트를 초기화합니다."""
+    old_last_id = ckpt.get("old_last_id")
+    if old_last_id is None:
+        collection.delete(expr=_source_expr(filename)) # 이전 버전은 시작 전에 이미 삭제됨
+    else:
+        collection.delete(expr=f"{_source_expr(filename)} and id > {old_last_id}") # 이전 버전(id <= old_last_id)은 유지
+    manifest.clear_checkpoint(collection_name, filename)
+    logger.info(f"'{filename}'의 중단된 적재분을 삭제하고 처음부터 다시 적재합니다.")
+
+
+def _insert_batch(collection: Collection, batch_docs: List[Document], filename: str, embeddings,
+                  dedup: Optional[ChunkDeduplicator]) -> List[int]:
+    """
+    조각 한 배치를 중복 제거 → 임베딩 → Milvus 삽입합니다. 실패하면 지수 백오프로 재시도하고,
+    모두 실패하면 마지막 예외를 그대로 던집니다. 삽입된 기본 키 목록을 반환합니다.
+    """
+    if dedup is not None:
+        batch_docs, n_exact, n_near = dedup.filter(batch_docs, filename)
+        if n_exact or n_near:
+            logger.debug(f"  - '{filename}' 중복 조각 제외: 정확 {n_exact}, 근접 {n_near}")
+    if not batch_docs:
+        return []
+
+    texts = [d.page_content for d in batch_docs] # Document에서 텍스트 내용만 추출
+    sources = [d.metadata.get("source", filename) for d in batch_docs] # source (파일명) 리스트
+    # page (PDF 페이지) 또는 row (CSV/Excel 행 번호) 리스트 (없으면 0)
+    pages = [d.metadata.get("page", d.metadata.get("row", 0)) for d in batch_docs]
+
+    vectors = None
+    for attempt in range(1, INSERT_RETRIES + 1):
+        try:
+            if vectors is None:
+                vectors = embeddings.embed_documents(texts) # 캐시 미스만 모델로 계산 (재시도 시 재계산하지 않음)
+            res = collection.insert([sources, pages, texts, vectors])
+            return list(res.primary_keys) # 중복 판정 해시는 체크포인트 기록 후 호출 측에서 commit
+        except Exception as e:
+            if attempt == INSERT_RETRIES:
+                if dedup is not None:
+                    dedup.discard() # 저장되지 않은 조각의 해시는 버림 (재시도 시 다시 판정)
+                raise
+            wait = INSERT_RETRY_BACKOFF * (2 ** (attempt - 1)) * (0.5 + random.random()) # 지수 백오프 + 지터
+            logger.warning(f"  - '{filename}' 배치 저장 실패 ({attempt}/{INSERT_RETRIES}), {wait:.1f}초 후 재시도: {e}")
+            time.sleep(wait)
+
+
+def _iter_chunk_batches(documents, batch_size: int = MILVUS_BATCH_SIZE) -> Iterator[Tuple[int, int, List[Document]]]:
+    """조각 리스트 또는 조각 배치 스트림(Excel)을 (시작 위치, 끝 위치, 조각들) 단위의 삽입 배치로 나눕니다."""
+    if isinstance(documents, list):
+        for b in range(0, len(documents), batch_size):
+            part = documents[b:b + batch_size]
+            yield b, b + len(part), part
+        return
+    buffer: List[Document] = [] # 아직 배치를 채우지 못한 조각 (최대 batch_size + 행 배치 하나 분량)
+    position = 0
+    for part in documents:
+        buffer.extend(part)
+        while len(buffer) >= batch_size:
+            yield position, position + batch_size, buffer[:batch_size]
+            buffer = buffer[batch_size:]
+            position += batch_size
+    if buffer:
+        yield position, position + len(buffer), buffer
+
+
+def _ingest_documents(collection: Collection, collection_name: str, filename: str, file_path: str,
+                      status: str, fingerprint: Dict, old_entry: Optional[Dict],
+                      documents, embeddings, manifest: IngestManifest,
+                      dedup: Optional[ChunkDeduplicator], resume: bool = False, index_deferred: bool = False) -> int:
+    """
+    로드/분할된 한 파일의 조각을 MILVUS_BATCH_SIZE 단위로 중복 제거 → 임베딩 → Milvus 삽입하고,
+    배치마다 체크포인트(다음 조각 위치, 삽입된 ID 범위)를 기록합니다.
+    documents는 조각 리스트 또는 조각 배치 스트림(Excel, load_file_for_ingest)이며, 스트림은 읽는 대로 처리합니다.
+    모든 배치가 저장되면 이전 조각을 교체하고 매니페스트에 기록한 뒤 체크포인트를 지웁니다.
+    resume=True면 같은 내용의 파일에 남은 체크포인트 위치부터 이어서 처리합니다.
+    """
+    if not fingerprint.get("sha256"):
+        fingerprint["sha256"] = file_sha256(file_path) # 매니페스트/체크포인트 기록용 내용 해시
+    # 스트림은 끝까지 읽어야 조각 수를 알 수 있음 (같은 내용 해시면 분할 결과도 같으므로 이어서 처리 판정은 해시로 충분)
+    total = len(documents) if isinstance(documents, list) else None
+
+    # --- 0) 중단된 이전 실행의 체크포인트 처리 ---
+    ckpt = manifest.get_checkpoint(collection_name, filename)
+    if not (ckpt is not None and resume and ckpt["sha256"] == fingerprint["sha256"]
+            and (total is None or ckpt["total_chunks"] == total)):
+        if dedup is not None:
+            # 처음부터 처리: 이 파일의 행을 지우기 전에 다른 파일과 공유한 조각을 넘기고 자기 해시 기록을 지움
+            # (자기 자신의 이전/중단된 해시와 비교하지 않도록)
+            _release_source(collection, collection_name, filename, manifest, dedup)
+        if ckpt is not None:
+            if resume:
+                logger.info(f"'{filename}' 내용이 체크포인트 이후 바뀌어 이어서 처리할 수 없습니다.")
+            _discard_partial(collection, collection_name, filename, ckpt, manifest)
+            ckpt = None
+    # 계획 이후 다른 파일의 조각을 넘겨받았을 수 있으므로 ID 범위는 매니페스트에서 다시 읽음
+    old_entry = manifest.get(collection_name, filename) or old_entry
+    old_last_id = old_entry.get("last_id") if old_entry else None
+
+    if ckpt is not None:
+        # 이어서 처리: 마지막 체크포인트 이후에 삽입됐지만 기록되지 못한 조각을 지워 중복을 막음
+        old_last_id = ckpt["old_last_id"]
+        floor = ckpt["last_id"] if ckpt["last_id"] is not None else old_last_id
+        if floor is None:
+            collection.delete(expr=_source_expr(filename))
+        else:
+            collection.delete(expr=f"{_source_expr(filename)} and id > {floor}")
+        start = ckpt["next_index"]
+        inserted = ckpt["inserted"]
+        first_id, last_id = ckpt["first_id"], ckpt["last_id"]
+        retry_ranges = manifest.failed_batches(collection_name, filename)
+        logger.info(f"'{filename}' 이어서 적재: {start}/{total if total is not None else '?'}번째 조각부터 "
+                    f"(재시도 대기 배치 {len(retry_ranges)}개)")
+    else:
+        # 처음부터 처리: 이전 조각 ID 범위를 알면 새 조각 삽입 후 삭제 (검색 공백 없음), 모르면 먼저 삭제
+        # (대량 적재로 인덱스/로드를 미룬 컬렉션은 비어 있던 컬렉션이라 지울 행이 없고, 로드 전이라 조건 삭제도 실패함)
+        if status == STATUS_MODIFIED and old_last_id is None and not index_deferred:
+            collection.delete(expr=_source_expr(filename))
+            logger.info(f"'{filename}'의 이전 조각을 삭제했습니다. (재적재 전)")
+        start, inserted = 0, 0
+        first_id = last_id = None
+        retry_ranges = []
+
+    seen = start # 지금까지 읽은 조각 수 (스트림의 체크포인트에는 전체 대신 이 값을 기록)
+    def _save(next_index: int):
+        manifest.save_checkpoint(collection_name, filename, fingerprint["sha256"], total if total is not None else seen,
+                                 next_index, inserted, first_id, last_id, old_last_id)
+    position = start # 다음에 처리할 조각 위치 (분할 직후, 중복 제거 전 기준)
+    _save(position)
+
+    # --- 1) 배치 단위 처리: 앞에서부터 읽으며 재시도 대기열의 배치와 남은 배치만 저장 ---
+    retry = dict(retry_ranges) # 시작 위치 -> 끝 위치 (배치 경계는 항상 MILVUS_BATCH_SIZE 배수)
+    remaining = f"{total - start}개 조각" if total is not None else "Excel 행 배치 스트리밍"
+    logger.info(f"'{filename}' 임베딩/저장 시작 ({remaining}, 재시도 배치 {len(retry)}개, {MILVUS_BATCH_SIZE}개씩)...")
+    failed = 0
+    try:
+        for b, e, batch_docs in _iter_chunk_batches(documents):
+            seen = max(seen, e)
+            from_queue = b in retry
+            if from_queue:
+                e = retry.pop(b)
+                batch_docs = batch_docs[:e - b]
+            elif b < start:
+                continue # 이전 실행에서 이미 저장한 배치
+            try:
+                ids = _insert_batch(collection, batch_docs, filename, embeddings, dedup)
+            except Exception as batch_e:
+                failed += 1
+                logger.error(f"  - '{filename}' 조각 [{b}, {e}) 저장 실패, 재시도 대기열에 추가: {batch_e}")
+                manifest.add_failed_batch(collection_name, filename, b, e, str(batch_e))
+                if not from_queue:
+                    position = e # 실패한 배치는 대기열이 기억하므로 진행 위치는 넘어감
+                    _save(position)
+                continue
+            if ids:
+                inserted += len(ids)
+                first_id = min(ids) if first_id is None else min(first_id, min(ids))
+                last_id = max(ids) if last_id is None else max(last_id, max(ids))
+            if from_queue:
+                manifest.remove_failed_batch(collection_name, filename, b)
+            else:
+                position = e
+            _save(position)
+            if dedup is not None:
+                dedup.commit() # 체크포인트에 기록된 조각의 해시만 저장 (중단 시 재삽입될 조각은 다시 판정)
+            logger.debug(f"  - '{filename}' 조각 [{b}, {e}) 저장 성공 ({len(ids)}개).")
+    finally:
+        if hasattr(documents, "close"):
+            documents.close() # 중간에 실패해도 Excel 파일 핸들을 바로 닫음
+    total = seen if total is None else total
+    failed += len(retry) # 읽은 범위에서 찾지 못한 재시도 배치 (배치 크기를 바꾼 경우 등) -> 다음 --resume에서 다시 시도
+
+    if failed:
+        raise PartialIngestError(
+            f"'{filename}': {failed}개 배치가 저장되지 않았습니다 (현재 {inserted}개 조각 저장됨). "
+            f"--resume으로 다시 실행하면 실패한 배치만 재시도합니다."
+        )
+
+    # --- 2) 이전 조각 교체: 새 조각보다 앞선 ID(이전 적재분)만 삭제 ---
+    if old_last_id is not None:
+        collection.delete(expr=f"{_source_expr(filename)} and id <= {old_last_id}")
+        logger.info(f"'{filename}'의 이전 조각(id <= {old_last_id})을 교체했습니다.")
+
+    # --- 3) 매니페스트 기록 후 체크포인트 삭제 ---
+    manifest.record(collection_name, filename, fingerprint, first_id, last_id, inserted)
+    manifest.clear_checkpoint(collection_name, filename)
+    if not inserted:
+        logger.warning(f"파일 '{filename}'에서 처리할 (새) 내용을 찾을 수 없습니다.")
+    logger.info(f"파일 '{filename}'의 처리 및 저장이 완료되었습니다. (총 {inserted}/{total}개 조각 저장됨)")
+    return inserted
 
 
 # ==============================================================================
 # 5. 메인 실행 함수 (Main Execution Function)
 # ==============================================================================
-def main():
+def load_ingest_config(path: str) -> Dict:
+    """
+    적재 설정 파일(YAML 또는 TOML)을 읽어 dict로 반환합니다.
+    형식 예시는 ingest_config.example.yaml 참고:
+      milvus: {host, port}
+      embedding: {model, dimension}
+      collections: {컬렉션명: {data_path, index: {...}, force_reprocess: [...]}}
+    """
+    ext = pathlib.Path(path).suffix.lower()
+    if ext == ".toml":
+        try:
+            import tomllib # Python 3.11+
+        except ImportError:
+            import tomli as tomllib # 구버전 Python용 대체 패키지
+        with open(path, "rb") as f:
+            config = tomllib.load(f)
+    else:
+        import yaml # PyYAML (YAML 설정을 쓸 때만 필요)
+        with open(path, "r", encoding="utf-8") as f:
+            config = yaml.safe_load(f) or {}
+
+    collections_cfg = config.get("collections") or {}
+    if not collections_cfg:
+        raise ValueError(f"설정 파일에 collections 항목이 없습니다: {path}")
+    for name, cfg in collections_cfg.items():
+        if not cfg or not cfg.get("data_path"):
+            raise ValueError(f"컬렉션 '{name}'의 data_path가 없습니다: {path}")
+    return config
+
+
+def print_ingest_summary(summary: List[Dict]):
+    """컬렉션별 처리량 요약 표를 출력합니다."""
+    lines = [
+        "",
+        "=" * 78,
+        f"{'컬렉션':<12} {'파일':>6} {'실패':>6} {'조각':>10} {'중복제거':>10} {'시간(s)':>10} {'조각/s':>10}",
+        "-" * 78,
+    ]
+    for s in summary:
+        rate = s["chunks"] / s["seconds"] if s["seconds"] > 0 else 0.0
+        lines.append(
+            f"{s['collection']:<12} {s['files']:>6} {s['failed_files']:>6} {s['chunks']:>10} "
+            f"{s['duplicates']:>10} {s['seconds']:>10.1f} {rate:>10.1f}"
+        )
+    lines.append("=" * 78)
+    for line in lines:
+        logger.info(line)
+
+
+def watch_and_ingest(targets: List[Dict], resources: IngestResources, resume: bool = False):
+    """
+    대상 컬렉션들의 data_path를 감시하면서 생성/수정된 파일은 적재하고, 삭제된 파일은 조각을 제거합니다.
+    targets: [{"name", "data_path", "collection"(Collection), "physical"(매니페스트용 이름), "force_reprocess"}]
+    Ctrl+C로 종료합니다.
+    """
+    by_path = {os.path.normcase(os.path.abspath(t["data_path"])): t for t in targets}
+    watcher = DirectoryWatcher(list(by_path))
+    watcher.start()
+    logger.info("[WATCH] 변경 감시 중입니다. (종료: Ctrl+C)")
+    try:
+        while True:
+            batch = watcher.wait_batch()
+            for path, events in batch.items():
+                target = by_path.get(path)
+                if target is None:
+                    continue
+                collection, physical = target["collection"], target["physical"]
+                deleted = sorted(f for f, ev in events.items() if ev == EVENT_DELETED)
+                changed = sorted(f for f, ev in events.items() if ev != EVENT_DELETED)
+                logger.info(f"[WATCH] [{target['name']}] 변경 {len(changed)}개, 삭제 {len(deleted)}개: {sorted(events)}")
+                try:
+                    for f in deleted:
+                        remove_source(collection, physical, f, resources.manifest)
+                    if changed:
+                        stats = process_and_ingest_data(
+                            collection, target["data_path"], resources, physical,
+                            force_reprocess=set(target.get("force_reprocess") or ()),
+                            resume=resume, files=changed,
+                        )
+                        logger.info(f"[WATCH] [{target['name']}] {stats['files']}개 파일, {stats['chunks']}개 조각 적재 ({stats['seconds']:.1f}s)")
+                except Exception as e:
+                    # 한 번의 실패로 감시가 멈추지 않도록 기록만 하고 계속 (다음 변경 또는 재시작 시 다시 처리됨)
+                    logger.error(f"[WATCH] [{target['name']}] 처리 중 오류 발생: {e}")
+                    logger.exception("상세 오류:")
+    except KeyboardInterrupt:
+        logger.info("[WATCH] 감시를 종료합니다.")
+    finally:
+        watcher.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="문서 파일을 임베딩하여 Milvus 컬렉션에 적재합니다.")
+    parser.add_argument("--config", help="적재 설정 파일 (YAML/TOML). 없으면 스크립트 상단 상수(COLLECTION_NAME, DATA_PATH) 사용")
+    parser.add_argument("--collections", help="설정 파일 중 적재할 컬렉션 이름 (쉼표 구분, 예: farmer,nutrient)")
+    parser.add_argument("--bulk-load", action="store_true",
+                        help="새로 만들었거나 비어 있는 컬렉션은 인덱스/로드 없이 적재한 뒤 마지막에 인덱스를 한 번만 생성")
+    parser.add_argument("--watch", action="store_true",
+                        help="최초 적재 후 종료하지 않고 data_path를 감시하여 추가/수정/삭제된 파일만 계속 반영")
+    parser.add_argument("--resume", action="store_true",
+                        help="이전 실행에서 중단된 파일을 마지막 체크포인트부터 이어서 적재 (실패 배치 재시도 포함)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
     """스크립트의 메인 실행 흐름을 정의합니다."""
+    args = parse_args(argv)
     logger.info("데이터 처리 및 저장 프로세스를 시작합니다...") # 스크립트 시작 로그
-    milvus_collection = None # finally 블록에서 사용하기 위해 None으로 초기화
+
+    # 1) 적재 대상 결정: 설정 파일이 있으면 컬렉션 목록, 없으면 상단 상수 1개
+    if args.config:
+        config = load_ingest_config(args.config)
+        milvus_cfg = config.get("milvus") or {}
+        embedding_cfg = config.get("embedding") or {}
+        targets = [dict(cfg, name=name) for name, cfg in config["collections"].items()]
+    else:
+        milvus_cfg, embedding_cfg = {}, {}
+        targets = [{"name": COLLECTION_NAME, "data_path": DATA_PATH}]
+    if args.collections:
+        wanted = [c.strip() for c in args.collections.split(",") if c.strip()]
+        unknown = set(wanted) - {t["name"] for t in targets}
+        if unknown:
+            raise SystemExit(f"설정에 없는 컬렉션: {sorted(unknown)}")
+        targets = [t for t in targets if t["name"] in wanted]
+
+    dimension = int(embedding_cfg.get("dimension", DIMENSION))
+    resources = IngestResources( # 임베딩 모델/캐시/스레드 풀은 모든 컬렉션이 공유
+        embedding_model=embedding_cfg.get("model", EMBEDDING_MODEL),
+        dimension=dimension,
+        loader_workers=int(config.get("loader_workers", LOADER_WORKERS)) if args.config else LOADER_WORKERS,
+        embed_batch_size=int(embedding_cfg.get("batch_size", EMBED_BATCH_SIZE)),
+    )
+    summary: List[Dict] = []
+    watch_targets: List[Dict] = [] # --watch 모드에서 감시할 (컬렉션, 폴더) 목록
     try:
-         # Milvus 연결 및 컬렉션 준비
-         milvus_collection = setup_milvus_collection()
-         # 데이터 처리 및 저장 함수 호출
-         process_and_ingest_data(milvus_collection)
+         # Milvus 연결 (모든 컬렉션이 같은 연결 사용)
+         connect_milvus(milvus_cfg.get("host"), str(milvus_cfg["port"]) if milvus_cfg.get("port") else None)
+         for target in targets:
+              name = target["name"]
+              try:
+                   # Milvus 컬렉션 준비 (대량 적재 모드면 빈 컬렉션의 인덱스/로드를 미룸)
+                   bulk = args.bulk_load or bool(target.get("bulk_load"))
+                   milvus_collection = setup_milvus_collection(name, dimension, target.get("index"), defer_index=bulk)
+                   # 데이터 처리 및 저장 함수 호출
+                   # 매니페스트는 실제 컬렉션 이름 기준으로 기록 (별칭 전환 후에도 조각 ID 범위가 맞도록)
+                   stats = process_and_ingest_data(
+                        milvus_collection, target["data_path"], resources, physical_collection_name(name),
+                        force_reprocess=set(target.get("force_reprocess") or ()),
+                        resume=args.resume, index_deferred=bulk and not milvus_collection.has_index(),
+                   )
+                   if bulk and not milvus_collection.has_index():
+                        stats["seconds"] += finalize_bulk_load(milvus_collection, target.get("index"))
+                   summary.append(stats)
+                   watch_targets.append(dict(target, collection=milvus_collection, physical=physical_collection_name(name)))
+              except Exception as e:
+                   # 한 컬렉션 실패가 다른 컬렉션 적재를 막지 않도록 기록만 하고 계속
+                   logger.error(f"컬렉션 '{name}' 적재 중 오류 발생: {e}")
+                   logger.exception("상세 오류:")
+
+         # 2) 감시 모드: 최초 적재 결과를 출력한 뒤 폴더 변경을 계속 반영
+         if args.watch and watch_targets:
+              print_ingest_summary(summary)
+              summary = []
+              watch_and_ingest(watch_targets, resources, resume=args.resume)
     except Exception as e:
          # 예상치 못한 심각한 오류 발생 시 로그 기록
          logger.error(f"스크립트 실행 중 심각한 오류 발생: {e}")
          logger.exception("상세 오류:") # 스택 트레이스 포함
     finally:
          # 오류 발생 여부와 관계없이 항상 실행되는 블록
+         resources.close()
          # Milvus 연결이 열려있으면 닫기
          if connections.has_connection("default"):
               connections.disconnect("default")
               logger.info("Milvus 연결을 종료합니다.") # 연결 종료 로그
+         if summary:
+              print_ingest_summary(summary)
          logger.info("프로세스가 완료되었습니다.") # 스크립트 종료 로그
 
 
@@ -639,12 +1392,14 @@ def create_ingestion_workflow():
     return workflow.compile() # 그래프 컴파일 및 반환
 
 
-# 스크립트 시작 시 시각화용 그래프 객체 생성
-try:
-    rag_app = create_ingestion_workflow()
-except Exception as graph_err:
-     logger.error(f"워크플로우 그래프 생성 실패: {graph_err}") # 생성 실패 시 로그
-     rag_app = None # 실패 시 None으로 설정하여 이후 시각화 단계 건너뛰도록 함
+# 스크립트 시작 시 시각화용 그래프 객체 생성 (PDF 추출 프로세스에서는 생략)
+rag_app = None
+if not SPAWNED_WORKER:
+    try:
+        rag_app = create_ingestion_workflow()
+    except Exception as graph_err:
+        logger.error(f"워크플로우 그래프 생성 실패: {graph_err}") # 생성 실패 시 로그
+        rag_app = None # 실패 시 None으로 설정하여 이후 시각화 단계 건너뛰도록 함
 
 
 # ==============================================================================
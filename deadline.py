@@ -0,0 +1,50 @@
+# [개요] 요청 하나의 전체 시간 예산(Deadline)을 그래프 노드(라우터 → 전문가 → 합성)에 나눠 주는 모듈입니다.
+# - /chat(App.py)와 ask_experts(orchestrate.py)가 요청마다 Deadline을 만들어 상태(state["deadline"])로 넘기고,
+#   각 노드는 budget()으로 "자기 몫의 상한"과 "전체 남은 시간 - 뒤 단계 예약분" 중 작은 값을 제한 시간으로 씁니다.
+# - 라우터가 늦으면 전체 전문가 호출, 전문가가 늦으면 끝난 전문가 자료만으로 합성, 합성이 늦으면 찾은 자료 요약으로
+#   답하므로, 느린 Groq 응답 하나가 요청 전체를 붙잡지 않고 지연 상한(p99)이 예산 근처로 묶입니다.
+
+import os  # 환경 변수
+import time  # 단조 시계
+from typing import Optional  # 타입 힌트
+
+# === 예산 (초). 환경 변수로 조정 가능 ===
+REQUEST_BUDGET_SECONDS = float(os.getenv("REQUEST_BUDGET_SECONDS", "30"))  # 요청 전체
+ROUTER_BUDGET_SECONDS = float(os.getenv("ROUTER_BUDGET_SECONDS", "4"))  # 라우터 노드 상한
+EXPERT_BUDGET_SECONDS = float(os.getenv("EXPERT_BUDGET_SECONDS", "10"))  # 전문가(재작성+검색) 노드 상한
+SYNTHESIS_RESERVE_SECONDS = float(os.getenv("SYNTHESIS_RESERVE_SECONDS", "12"))  # 합성을 위해 남겨 둘 시간
+MIN_STEP_SECONDS = 0.5  # 예산이 거의 없어도 노드에 주는 최소 시간
+
+
+class Deadline:
+    """요청 전체 마감 시각. 노드별 제한 시간은 budget()으로 계산합니다."""
+
+    def __init__(self, budget: float = REQUEST_BUDGET_SECONDS):
+        self.budget = budget
+        self.started = time.monotonic()
+        self.expires = self.started + budget
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires - time.monotonic())
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires
+
+    def budget_for(self, cap: Optional[float] = None, reserve: float = 0.0) -> float:
+        """min(cap, 남은 시간 - reserve). 뒤 단계(reserve)를 위해 남겨 둘 시간을 빼고 최소 MIN_STEP_SECONDS는 보장"""
+        available = self.remaining() - reserve
+        if cap is not None:
+            available = min(cap, available)
+        return max(MIN_STEP_SECONDS, available)
+
+    def __repr__(self):
+        return f"Deadline(remaining={self.remaining():.2f}s of {self.budget:.1f}s)"
+
+
+def deadline_of(state: dict) -> Deadline:
+    """상태에 Deadline이 없으면(단독 실행/예전 호출부) 기본 예산으로 새로 만듭니다."""
+    deadline = state.get("deadline") if state else None
+    return deadline if isinstance(deadline, Deadline) else Deadline()
@@ -0,0 +1,173 @@
+# [개요] 임베딩 모델(jhgan/ko-sroberta-multitask) 로딩을 한 곳에서 처리하는 백엔드 선택 모듈입니다.
+# - torch     : 기존과 동일한 HuggingFaceEmbeddings (PyTorch, float32)
+# - onnx-int8 : 모델을 ONNX로 내보낸 뒤 동적 int8 양자화하여 ONNX Runtime으로 CPU 추론
+# - hash      : 모델 없이 문자 n-gram 해시로 만드는 결정적 벡터 (벤치마크/부하 테스트용, 검색 품질 없음)
+# 백엔드는 환경 변수 EMBEDDING_BACKEND(기본 torch)로 고르며, App.py / orchestrate.py / 에이전트 / db_load.py가
+# 모두 load_embeddings()를 사용하므로 질의 임베딩과 적재 임베딩이 같은 백엔드를 씁니다.
+# 주의: 백엔드가 다르면 벡터가 미세하게 달라지므로, 적재와 검색은 같은 백엔드로 맞추는 것을 권장합니다.
+
+import os  # 경로 / 환경 변수
+import zlib  # hash 백엔드의 n-gram 해시 (실행마다 같은 값)
+import logging  # 로그 기록
+from typing import List, Optional  # 타입 힌트
+
+import numpy as np  # 풀링 계산
+
+from embedding_batching import EMBED_BATCH_SIZE, length_bucketed_embed
+
+# === 선택적 의존성: onnxruntime이 있으면 onnx-int8 백엔드 사용 가능 ===
+try:
+    import onnxruntime as ort  # ONNX Runtime
+    HAS_ONNXRUNTIME = True
+except ImportError:
+    HAS_ONNXRUNTIME = False
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"  # 기본 임베딩 모델
+BACKEND_TORCH = "torch"
+BACKEND_ONNX_INT8 = "onnx-int8"
+BACKEND_HASH = "hash"
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", BACKEND_TORCH).strip().lower()  # 기본 백엔드
+ONNX_MODEL_DIR = os.getenv("EMBEDDING_ONNX_DIR", "onnx_models")  # 내보낸 ONNX 모델 저장 폴더
+ONNX_THREADS = int(os.getenv("EMBEDDING_ONNX_THREADS", "0"))  # intra-op 스레드 수 (0이면 물리 코어 수 추정)
+ONNX_MAX_SEQ_LENGTH = 128  # ko-sroberta-multitask의 sentence-transformers max_seq_length와 동일
+HASH_DIMENSION = 768  # hash 백엔드 벡터 차원 (Milvus 스키마의 DIMENSION과 동일)
+
+
+def embedding_model_key(model_name: str, backend: Optional[str] = None) -> str:
+    """임베딩 캐시 등에서 쓰는 (모델, 백엔드) 식별자. torch는 기존 캐시와 호환되도록 모델명만 사용합니다."""
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    return model_name if backend == BACKEND_TORCH else f"{model_name}@{backend}"
+
+
+def _default_threads() -> int:
+    """하이퍼스레딩을 제외한 코어 수 추정 (행렬 연산은 논리 코어를 모두 쓰면 오히려 느려짐)"""
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+class OnnxInt8Embeddings:
+    """
+    ONNX Runtime + 동적 int8 양자화로 문장 임베딩을 계산하는 LangChain 호환 임베딩 클래스.
+    처음 사용할 때 PyTorch 모델을 ONNX로 내보내고 양자화한 파일을 ONNX_MODEL_DIR에 저장해 재사용합니다.
+    sentence-transformers와 같은 방식(어텐션 마스크 평균 풀링, 정규화 없음)으로 벡터를 만듭니다.
+    """
+
+    def __init__(self, model_name: str = EMBEDDING_MODEL, model_dir: str = ONNX_MODEL_DIR,
+                 intra_op_threads: int = ONNX_THREADS, batch_size: int = EMBED_BATCH_SIZE,
+                 max_length: int = ONNX_MAX_SEQ_LENGTH):
+        if not HAS_ONNXRUNTIME:
+            raise ImportError("onnx-int8 백엔드에는 onnxruntime이 필요합니다: pip install onnxruntime")
+        from transformers import AutoTokenizer  # 토크나이저 (sentence-transformers 의존성에 포함)
+
+        self.model_name = model_name
+        self.batch_size = max(1, batch_size)
+        self.max_length = max_length
+        self.model_path = os.path.join(model_dir, model_name.replace("/", "__"))
+        quantized = os.path.join(self.model_path, "model.int8.onnx")
+        if not os.path.exists(quantized):
+            self._export_and_quantize(quantized)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_path)
+
+        opts = ort.SessionOptions()
+        opts.intra_op_num_threads = intra_op_threads or _default_threads()
+        opts.inter_op_num_threads = 1  # 그래프가 순차 구조라 병렬 실행 이득이 없음
+        opts.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(quantized, sess_options=opts, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(f"ONNX int8 임베딩 로드 완료: {quantized} (intra-op 스레드 {opts.intra_op_num_threads})")
+
+    def _export_and_quantize(self, quantized: str):
+        """PyTorch 모델을 ONNX(동적 배치/길이)로 내보내고 가중치를 int8로 동적 양자화합니다."""
+        import torch  # 내보내기에만 필요
+        from transformers import AutoModel, AutoTokenizer
+        from onnxruntime.quantization import quantize_dynamic, QuantType
+
+        os.makedirs(self.model_path, exist_ok=True)
+        logger.info(f"'{self.model_name}' 모델을 ONNX로 내보내고 int8로 양자화합니다 (최초 1회)...")
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        model = AutoModel.from_pretrained(self.model_name).eval()
+        tokenizer.save_pretrained(self.model_path)
+
+        fp32 = os.path.join(self.model_path, "model.onnx")
+        sample = tokenizer(["임베딩 모델 내보내기용 예시 문장입니다."], return_tensors="pt")
+        names = [n for n in ("input_ids", "attention_mask", "token_type_ids") if n in sample]
+        dynamic = {n: {0: "batch", 1: "sequence"} for n in names}
+        dynamic["last_hidden_state"] = {0: "batch", 1: "sequence"}
+        export_kwargs = dict(input_names=names, output_names=["last_hidden_state"], dynamic_axes=dynamic, opset_version=14)
+        with torch.no_grad():
+            try:
+                # torch 2.5+: TorchScript 기반 내보내기를 명시 (dynamo 내보내기는 onnxscript가 추가로 필요)
+                torch.onnx.export(model, tuple(sample[n] for n in names), fp32, dynamo=False, **export_kwargs)
+            except TypeError:
+                torch.onnx.export(model, tuple(sample[n] for n in names), fp32, **export_kwargs)  # 구버전 torch
+        quantize_dynamic(fp32, quantized, weight_type=QuantType.QInt8)
+        logger.info(f"ONNX int8 모델 저장: {quantized} ({os.path.getsize(quantized) / 1024 ** 2:.1f}MB)")
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        enc = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        feeds = {k: v.astype(np.int64) for k, v in enc.items() if k in self.input_names}
+        hidden = self.session.run(None, feeds)[0]  # (batch, seq, dim)
+        mask = enc["attention_mask"][..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)  # 평균 풀링 (패딩 제외)
+        return pooled.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        # ONNX Runtime은 길이 정렬을 하지 않으므로 길이순 배치로 나눠 패딩을 줄임
+        return length_bucketed_embed(self._embed_batch, list(texts), self.batch_size)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed_batch([text])[0]
+
+
+class HashEmbeddings:
+    """
+    문자 3-gram을 차원에 해시해 세는(feature hashing) 결정적 임베딩. 모델 로드/네트워크가 필요 없고 매우 빠르므로
+    임베딩 비용을 뺀 적재 파이프라인 처리량 측정이나 오프라인 부하 테스트에 씁니다. (글자가 비슷하면 벡터도 가까움)
+    """
+
+    def __init__(self, dimension: int = HASH_DIMENSION, ngram: int = 3):
+        self.dimension = dimension
+        self.ngram = ngram
+
+    def _embed(self, text: str) -> List[float]:
+        vec = np.zeros(self.dimension, dtype=np.float32)
+        s = (text or "").replace(" ", "")
+        for i in range(max(1, len(s) - self.ngram + 1)):
+            h = zlib.crc32(s[i:i + self.ngram].encode("utf-8"))
+            vec[h % self.dimension] += 1.0 if h & 0x80000000 else -1.0
+        norm = np.linalg.norm(vec)
+        return (vec / norm if norm else vec).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def load_embeddings(model_name: str = EMBEDDING_MODEL, backend: Optional[str] = None,
+                    device: Optional[str] = None, batch_size: Optional[int] = None):
+    """
+    설정된 백엔드로 LangChain 호환 임베딩 객체를 만듭니다.
+    backend를 생략하면 EMBEDDING_BACKEND(환경 변수)를 따르고, device는 torch 백엔드에만 적용됩니다.
+    """
+    backend = (backend or EMBEDDING_BACKEND).lower()
+    if backend == BACKEND_ONNX_INT8:
+        if device and device != "cpu":
+            logger.warning(f"onnx-int8 백엔드는 CPU 전용입니다 (요청 장치 {device} 무시).")
+        return OnnxInt8Embeddings(model_name, batch_size=batch_size or EMBED_BATCH_SIZE)
+    if backend == BACKEND_HASH:
+        logger.warning("hash 임베딩 백엔드는 테스트 전용입니다 (의미 검색 불가).")
+        return HashEmbeddings()
+    if backend != BACKEND_TORCH:
+        raise ValueError(f"알 수 없는 임베딩 백엔드: {backend} (torch, onnx-int8 또는 hash)")
+
+    from langchain_huggingface import HuggingFaceEmbeddings  # 허깅페이스 모델을 이용한 임베딩 생성
+    kwargs = {}
+    if device:
+        kwargs["model_kwargs"] = {"device": device}
+    if batch_size:
+        kwargs["encode_kwargs"] = {"batch_size": batch_size}
+    return HuggingFaceEmbeddings(model_name=model_name, **kwargs)
@@ -0,0 +1,69 @@
+# [개요] 임베딩 입력을 토큰 길이순으로 정렬해 길이가 비슷한 텍스트끼리 배치로 묶어 계산하는 래퍼입니다.
+# 짧은 레시피 행과 1000자 가까운 PDF 조각이 한 배치에 섞이면 가장 긴 텍스트 길이에 맞춰 패딩되므로
+# CPU에서 대부분의 연산이 패딩 토큰에 낭비됩니다. 정렬 후 배치로 나눠 계산하고 원래 순서로 되돌려 반환합니다.
+
+import logging  # 로그 기록
+from typing import Callable, List, Optional  # 타입 힌트
+
+logger = logging.getLogger(__name__)
+
+EMBED_BATCH_SIZE = 64  # 모델에 한 번에 넣는 텍스트 수 (CPU 기준, GPU면 더 크게)
+
+
+def _tokenizer_of(embeddings):
+    """LangChain 임베딩 객체에서 HuggingFace 토크나이저를 찾습니다. (없으면 None)"""
+    client = getattr(embeddings, "client", None)  # HuggingFaceEmbeddings.client = SentenceTransformer
+    tokenizer = getattr(client, "tokenizer", None) or getattr(embeddings, "tokenizer", None)
+    return tokenizer if callable(tokenizer) else None
+
+
+def token_lengths(texts: List[str], tokenizer=None) -> List[int]:
+    """텍스트별 토큰 수. 토크나이저가 없으면 문자 수로 근사합니다. (한국어는 문자 수와 토큰 수가 거의 비례)"""
+    if tokenizer is None or not texts:
+        return [len(t) for t in texts]
+    try:
+        encoded = tokenizer(texts, add_special_tokens=False, truncation=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+    except Exception as e:
+        logger.debug(f"토크나이저 길이 계산 실패, 문자 수로 대체: {e}")
+        return [len(t) for t in texts]
+
+
+def length_bucketed_embed(embed_fn: Callable[[List[str]], List[List[float]]], texts: List[str],
+                          batch_size: int = EMBED_BATCH_SIZE,
+                          lengths: Optional[List[int]] = None) -> List[List[float]]:
+    """
+    texts를 길이순으로 정렬해 batch_size개씩 embed_fn으로 계산하고, 결과를 원래 순서로 돌려줍니다.
+    lengths를 주지 않으면 문자 수를 길이로 사용합니다.
+    """
+    if not texts:
+        return []
+    if lengths is None:
+        lengths = [len(t) for t in texts]
+    order = sorted(range(len(texts)), key=lambda i: lengths[i], reverse=True)  # 긴 것부터 (메모리 최대치를 먼저 확인)
+    out: List[Optional[List[float]]] = [None] * len(texts)
+    for b in range(0, len(order), batch_size):
+        idx = order[b:b + batch_size]
+        vectors = embed_fn([texts[i] for i in idx])
+        for i, v in zip(idx, vectors):
+            out[i] = v
+    return out
+
+
+class LengthBucketedEmbeddings:
+    """
+    LangChain Embeddings 인터페이스(embed_documents / embed_query)를 감싸서
+    embed_documents 입력을 길이가 비슷한 배치로 나눠 계산하는 래퍼
+    """
+
+    def __init__(self, embeddings, batch_size: int = EMBED_BATCH_SIZE, use_tokenizer: bool = True):
+        self.embeddings = embeddings  # 실제 임베딩 모델
+        self.batch_size = max(1, batch_size)
+        self.tokenizer = _tokenizer_of(embeddings) if use_tokenizer else None
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        lengths = token_lengths(texts, self.tokenizer)
+        return length_bucketed_embed(self.embeddings.embed_documents, texts, self.batch_size, lengths)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)  # 단일 질의는 배치 구성이 의미 없으므로 그대로 위임
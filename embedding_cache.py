@@ -0,0 +1,264 @@
+# [개요] (모델 이름, 텍스트 해시) -> 임베딩 벡터를 디스크에 보관하는 영구 캐시입니다.
+# 벡터는 float32 원시 배열로 append-only 파일(vectors.f32)에 이어 쓰고 numpy memmap으로 읽으며,
+# 위치(slot)·최근 사용 시각은 SQLite 인덱스(index.sqlite3)에 저장합니다.
+# 여러 프로세스(동시에 도는 db_load, 웹 서버 업로드 적재 등)가 같은 캐시를 쓸 수 있으므로, 파일 끝에 이어 쓰기 + 인덱스 등록과
+# GC는 SQLite 쓰기 잠금(BEGIN IMMEDIATE) 안에서 합니다. 그래서 두 프로세스가 같은 파일 크기를 보고 같은 slot을 쓰지 않습니다.
+# 재처리(FORCE_REPROCESS), 스키마 변경으로 인한 컬렉션 재생성, 다른 컬렉션으로의 이동 시
+# 이미 계산한 임베딩을 다시 계산하지 않도록 embed_documents 앞단에서 조회합니다.
+
+import os  # 파일 경로/크기
+import time  # 최근 사용 시각
+import sqlite3  # 캐시 인덱스
+import hashlib  # 텍스트 해시
+import logging  # 로그 기록
+import threading  # 인덱스/파일 접근 보호
+from typing import Dict, List, Optional  # 타입 힌트
+
+import numpy as np  # 벡터 저장/조회
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_DIR = "embedding_cache"  # 기본 캐시 디렉토리
+EMBEDDING_CACHE_MAX_BYTES = 4 * 1024 ** 3  # 벡터 파일 최대 크기 (기본 4GB, 768차원 기준 약 140만 개)
+GC_TARGET_RATIO = 0.8  # GC 시 최대 크기의 몇 %까지 줄일지
+SQL_IN_CHUNK = 500  # IN (...) 조회 한 번에 넣는 해시 수
+LOCK_TIMEOUT_SECONDS = 60  # 다른 프로세스가 쓰기 잠금을 쥐고 있을 때 기다리는 최대 시간 (GC는 오래 걸릴 수 있음)
+
+
+def text_key(text: str) -> str:
+    """캐시 키로 쓰는 텍스트 sha256 (원문 그대로 해시: 공백 하나만 달라도 임베딩이 달라질 수 있음)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """append-only memmap 벡터 파일 + SQLite 인덱스로 구성된 임베딩 캐시"""
+
+    def __init__(self, cache_dir: str = EMBEDDING_CACHE_DIR, dim: int = 768,
+                 max_bytes: int = EMBEDDING_CACHE_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_dir = cache_dir
+        self.dim = dim
+        self.max_bytes = max_bytes
+        self.row_bytes = dim * 4  # float32
+        self._lock = threading.Lock()
+        self._mm: Optional[np.memmap] = None  # 읽기용 memmap (파일이 커지면 다시 엶)
+        self.hits = 0  # 누적 캐시 적중 수
+        self.misses = 0  # 누적 캐시 미스 수
+
+        self.conn = sqlite3.connect(os.path.join(cache_dir, "index.sqlite3"), check_same_thread=False,
+                                    timeout=LOCK_TIMEOUT_SECONDS)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS entries (
+                   model     TEXT    NOT NULL,
+                   hash      TEXT    NOT NULL,
+                   slot      INTEGER NOT NULL,
+                   last_used REAL    NOT NULL,
+                   PRIMARY KEY (model, hash)
+               )"""
+        )
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('dim', ?)", (str(dim),))
+        elif int(row[0]) != dim:
+            raise ValueError(f"임베딩 캐시 차원 불일치: 캐시={row[0]}, 요청={dim} ({cache_dir})")
+        # 현재 벡터 파일 이름 (GC 때 새 파일로 바꾸고 인덱스와 같은 트랜잭션에서 교체)
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'vectors_file'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta (key, value) VALUES ('vectors_file', 'vectors.f32')")
+        self.conn.commit()
+        self.vectors_path = os.path.join(cache_dir, row[0] if row else "vectors.f32")
+
+        # 크래시 등으로 마지막 행이 잘려 있으면 행 단위로 맞춤 (인덱스보다 파일이 먼저 쓰이므로 안전)
+        # 다른 프로세스가 이어 쓰는 중인 행을 자르지 않도록 쓰기 잠금 안에서 확인
+        self._begin_write()
+        try:
+            if os.path.exists(self.vectors_path):
+                size = os.path.getsize(self.vectors_path)
+                if size % self.row_bytes:
+                    with open(self.vectors_path, "r+b") as fb:
+                        fb.truncate(size - size % self.row_bytes)
+            else:
+                open(self.vectors_path, "wb").close()
+        finally:
+            self.conn.commit()
+
+    # --- 내부 유틸 ---
+    def _begin_write(self):
+        """프로세스 간 쓰기 잠금을 잡습니다. (commit / rollback까지 유지, 다른 프로세스는 timeout까지 대기)"""
+        self.conn.execute("BEGIN IMMEDIATE")
+        self._sync_vectors_path()
+
+    def _sync_vectors_path(self):
+        """다른 프로세스의 GC가 벡터 파일을 바꿨으면 새 파일을 따라갑니다."""
+        name = self.conn.execute("SELECT value FROM meta WHERE key = 'vectors_file'").fetchone()[0]
+        path = os.path.join(self.cache_dir, name)
+        if path != self.vectors_path:
+            self.vectors_path, self._mm = path, None
+
+    def _rows(self) -> int:
+        return os.path.getsize(self.vectors_path) // self.row_bytes
+
+    def _memmap(self, need_rows: int) -> np.memmap:
+        if self._mm is None or self._mm.shape[0] < need_rows:
+            rows = self._rows()
+            self._mm = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+        return self._mm
+
+    # --- 조회/저장 ---
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """캐시에 있는 해시들의 벡터를 {해시: 벡터}로 반환하고 최근 사용 시각을 갱신합니다."""
+        found: Dict[str, int] = {}
+        with self._lock:
+            # slot과 벡터 파일 이름을 한 읽기 트랜잭션(같은 스냅샷)에서 읽음 (다른 프로세스의 GC와 섞이지 않게)
+            self.conn.execute("BEGIN")
+            try:
+                self._sync_vectors_path()
+                for i in range(0, len(hashes), SQL_IN_CHUNK):
+                    part = hashes[i:i + SQL_IN_CHUNK]
+                    marks = ",".join("?" * len(part))
+                    cur = self.conn.execute(
+                        f"SELECT hash, slot FROM entries WHERE model = ? AND hash IN ({marks})", [model, *part]
+                    )
+                    found.update(cur.fetchall())
+            finally:
+                self.conn.commit()
+            if not found:
+                return {}
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE entries SET last_used = ? WHERE model = ? AND hash = ?",
+                [(now, model, h) for h in found],
+            )
+            self.conn.commit()
+            mm = self._memmap(max(found.values()) + 1)
+            return {h: np.array(mm[slot]) for h, slot in found.items()}
+
+    def put_many(self, model: str, hashes: List[str], vectors) -> None:
+        """
+        새 벡터들을 파일 끝에 이어 쓰고 인덱스에 등록합니다. 시작 slot(파일 행 수) 확인부터 인덱스 등록까지
+        프로세스 간 쓰기 잠금 안에서 하므로, 다른 프로세스의 put_many와 같은 slot을 받지 않습니다.
+        """
+        if not hashes:
+            return
+        arr = np.asarray(vectors, dtype=np.float32).reshape(len(hashes), self.dim)
+        with self._lock:
+            self._begin_write()
+            try:
+                start = self._rows()
+                with open(self.vectors_path, "ab") as fb:  # 벡터를 먼저 기록 (인덱스가 가리키는 행은 항상 존재)
+                    fb.write(arr.tobytes())
+                    fb.flush()
+                    os.fsync(fb.fileno())
+                now = time.time()
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO entries (model, hash, slot, last_used) VALUES (?, ?, ?, ?)",
+                    [(model, h, start + i, now) for i, h in enumerate(hashes)],
+                )
+                self.conn.commit()
+            except BaseException:
+                self.conn.rollback()  # 이미 쓴 행은 인덱스가 가리키지 않는 빈 행으로 남고 GC 때 정리됨
+                raise
+
+    # --- 크기 관리 ---
+    def size_bytes(self) -> int:
+        return os.path.getsize(self.vectors_path)
+
+    def maybe_gc(self) -> int:
+        """
+        벡터 파일이 최대 크기를 넘었거나 인덱스에서 참조하지 않는 행이 절반 이상이면,
+        최근 사용 순으로 목표 크기만큼만 남기고 파일을 다시 씁니다. 제거된 항목 수를 반환합니다.
+        """
+        with self._lock:
+            self._begin_write()  # 정리 중에는 다른 프로세스의 이어 쓰기 / GC를 막음
+            try:
+                rows = self._rows()
+                live = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                if rows * self.row_bytes <= self.max_bytes and live * 2 >= rows:
+                    return 0
+                keep_rows = int(self.max_bytes * GC_TARGET_RATIO) // self.row_bytes
+                keep = self.conn.execute(
+                    "SELECT model, hash, slot, last_used FROM entries ORDER BY last_used DESC LIMIT ?", (keep_rows,)
+                ).fetchall()
+                keep.sort(key=lambda r: r[2])  # 원래 파일 순서대로 복사 (순차 읽기)
+
+                src = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(rows, self.dim)) if rows else None
+                new_name = f"vectors.{int(time.time() * 1000)}.f32"
+                new_path = os.path.join(self.cache_dir, new_name)
+                with open(new_path, "wb") as fb:
+                    for i in range(0, len(keep), 10000):
+                        slots = [r[2] for r in keep[i:i + 10000]]
+                        fb.write(np.ascontiguousarray(src[slots]).tobytes())
+                    fb.flush()
+                    os.fsync(fb.fileno())
+                del src
+                self._mm = None
+
+                # 인덱스 재작성과 파일 교체를 한 트랜잭션으로 처리 (중간에 죽어도 이전 파일/인덱스가 그대로 유효)
+                self.conn.execute("DELETE FROM entries")
+                self.conn.executemany(
+                    "INSERT INTO entries (model, hash, slot, last_used) VALUES (?, ?, ?, ?)",
+                    [(m, h, new_slot, used) for new_slot, (m, h, _, used) in enumerate(keep)],
+                )
+                self.conn.execute("UPDATE meta SET value = ? WHERE key = 'vectors_file'", (new_name,))
+                self.conn.commit()
+                old_path, self.vectors_path = self.vectors_path, new_path
+                os.remove(old_path)
+                removed = live - len(keep)
+            finally:
+                if self.conn.in_transaction:
+                    self.conn.rollback()  # 정리할 것이 없거나 도중에 실패: 잠금만 풂
+        logger.info(f"임베딩 캐시 정리: {removed}개 항목 제거, {len(keep)}개 유지 ({self.size_bytes() / 1024 ** 2:.1f}MB)")
+        return removed
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def close(self):
+        with self._lock:
+            self._mm = None
+            self.conn.close()
+
+
+class CachedEmbeddings:
+    """
+    LangChain Embeddings 인터페이스(embed_documents / embed_query)를 감싸서
+    캐시 미스인 텍스트만 실제 모델로 계산하는 래퍼
+    """
+
+    def __init__(self, embeddings, cache: EmbeddingCache, model_key: str):
+        self.embeddings = embeddings  # 실제 임베딩 모델
+        self.cache = cache
+        self.model_key = model_key  # 캐시 키의 모델 부분 (모델/백엔드가 다르면 벡터도 다르므로 구분)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [text_key(t) for t in texts]
+        cached = self.cache.get_many(self.model_key, list(set(keys)))
+
+        # 같은 텍스트가 여러 번 나와도 모델에는 한 번만 보냄
+        miss_keys: List[str] = []
+        miss_texts: List[str] = []
+        seen = set(cached)
+        for k, t in zip(keys, texts):
+            if k not in seen:
+                seen.add(k)
+                miss_keys.append(k)
+                miss_texts.append(t)
+
+        n_hit = sum(1 for k in keys if k in cached)
+        self.cache.hits += n_hit
+        self.cache.misses += len(keys) - n_hit
+
+        if miss_texts:
+            new_vectors = self.embeddings.embed_documents(miss_texts)
+            self.cache.put_many(self.model_key, miss_keys, new_vectors)
+            for k, v in zip(miss_keys, new_vectors):
+                cached[k] = v
+
+        return [list(map(float, cached[k])) for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)  # 질의는 매번 달라 캐시 효과가 적으므로 그대로 위임
@@ -0,0 +1,280 @@
+# [개요] db_load.py가 어떤 파일을 어떤 내용으로 Milvus에 적재했는지 기록하는 로컬 SQLite 매니페스트입니다.
+# 파일 크기·수정시각·내용 해시와 적재된 조각(Chunk)의 ID 범위를 저장해서,
+# 매 실행마다 Milvus를 조회하지 않고도 "변경 없음 / 신규 / 변경됨"을 파일 수에 비례하는 비용으로 판정합니다.
+
+import os  # 파일 stat 조회
+import time  # 기록 시각
+import sqlite3  # 매니페스트 저장소
+import hashlib  # 내용 해시(sha256)
+import threading  # 여러 스레드에서 같은 연결을 쓸 때 보호
+from typing import Dict, List, Optional, Set, Tuple  # 타입 힌트
+
+MANIFEST_PATH = "ingest_manifest.sqlite3"  # 기본 매니페스트 파일 경로 (실행 위치 기준)
+HASH_CHUNK_BYTES = 1024 * 1024  # 해시 계산 시 한 번에 읽는 바이트 수
+
+# 파일 상태 판정 결과
+STATUS_NEW = "new"  # 매니페스트에 없는 파일
+STATUS_UNCHANGED = "unchanged"  # 크기/수정시각 또는 내용 해시가 동일
+STATUS_MODIFIED = "modified"  # 내용이 바뀌었거나 이전 적재가 완료되지 않은 파일
+
+
+def file_sha256(path: str) -> str:
+    """파일 전체를 스트리밍으로 읽어 sha256 16진 문자열을 계산합니다."""
+    h = hashlib.sha256()
+    with open(path, "rb") as fb:
+        for block in iter(lambda: fb.read(HASH_CHUNK_BYTES), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+class IngestManifest:
+    """(컬렉션, 파일명) 단위로 적재 상태를 기록하는 SQLite 매니페스트"""
+
+    def __init__(self, db_path: str = MANIFEST_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)  # 여러 스레드 공유 (self._lock으로 보호)
+        self.conn.execute("PRAGMA journal_mode=WAL")  # 쓰기 중에도 읽기 가능, 크래시 내구성 향상
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingested_files (
+                   collection  TEXT    NOT NULL,
+                   source      TEXT    NOT NULL,
+                   size        INTEGER NOT NULL,
+                   mtime_ns    INTEGER NOT NULL,
+                   sha256      TEXT,
+                   first_id    INTEGER,
+                   last_id     INTEGER,
+                   chunk_count INTEGER NOT NULL DEFAULT 0,
+                   complete    INTEGER NOT NULL DEFAULT 1,
+                   updated_at  REAL    NOT NULL,
+                   PRIMARY KEY (collection, source)
+               )"""
+        )
+        # 파일 적재 진행 상황 (배치 단위 체크포인트): 중단된 파일을 --resume으로 이어서 처리
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                   collection   TEXT    NOT NULL,
+                   source       TEXT    NOT NULL,
+                   sha256       TEXT    NOT NULL,
+                   total_chunks INTEGER NOT NULL,
+                   next_index   INTEGER NOT NULL,
+                   inserted     INTEGER NOT NULL DEFAULT 0,
+                   first_id     INTEGER,
+                   last_id      INTEGER,
+                   old_last_id  INTEGER,
+                   updated_at   REAL    NOT NULL,
+                   PRIMARY KEY (collection, source)
+               )"""
+        )
+        # 재시도 대기열: 재시도 후에도 저장에 실패한 조각 범위 [start_index, end_index)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS failed_batches (
+                   collection  TEXT    NOT NULL,
+                   source      TEXT    NOT NULL,
+                   start_index INTEGER NOT NULL,
+                   end_index   INTEGER NOT NULL,
+                   attempts    INTEGER NOT NULL DEFAULT 0,
+                   last_error  TEXT,
+                   updated_at  REAL    NOT NULL,
+                   PRIMARY KEY (collection, source, start_index)
+               )"""
+        )
+        self.conn.commit()
+
+    @property
+    def lock(self) -> threading.Lock:
+        """self.conn을 함께 쓰는 코드(chunk_dedup.ChunkDeduplicator)가 잡아야 하는 락"""
+        return self._lock
+
+    # --- 조회 ---
+    def get(self, collection: str, source: str) -> Optional[Dict]:
+        """한 파일의 매니페스트 항목을 dict로 반환합니다. 없으면 None."""
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT size, mtime_ns, sha256, first_id, last_id, chunk_count, complete "
+                "FROM ingested_files WHERE collection = ? AND source = ?",
+                (collection, source),
+            )
+            row = cur.fetchone()
+        if row is None:
+            return None
+        keys = ("size", "mtime_ns", "sha256", "first_id", "last_id", "chunk_count", "complete")
+        return dict(zip(keys, row))
+
+    def sources(self, collection: str) -> Set[str]:
+        """컬렉션에 기록된 모든 파일명 집합을 반환합니다."""
+        with self._lock:
+            cur = self.conn.execute("SELECT source FROM ingested_files WHERE collection = ?", (collection,))
+            return {r[0] for r in cur.fetchall()}
+
+    def check_file(self, collection: str, path: str) -> Tuple[str, Dict]:
+        """
+        로컬 파일을 매니페스트와 비교해 (상태, 지문)을 반환합니다.
+        크기와 수정시각이 같으면 해시를 계산하지 않고 바로 '변경 없음'으로 판정합니다.
+        """
+        source = os.path.basename(path)
+        st = os.stat(path)
+        fingerprint = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": None}
+        entry = self.get(collection, source)
+        if entry is None:
+            return STATUS_NEW, fingerprint
+        if not entry["complete"]:
+            return STATUS_MODIFIED, fingerprint  # 이전 적재가 중간에 실패한 파일
+        if entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+            fingerprint["sha256"] = entry["sha256"]
+            return STATUS_UNCHANGED, fingerprint  # 빠른 경로: stat만으로 판정
+
+        # 크기/시각이 달라졌으면 내용 해시로 실제 변경 여부 확인 (복사·touch 등은 변경 아님)
+        fingerprint["sha256"] = file_sha256(path)
+        if entry["size"] == st.st_size and entry["sha256"] == fingerprint["sha256"]:
+            self.touch(collection, source, st.st_mtime_ns)  # 다음 실행부터는 빠른 경로로 판정되도록 시각 갱신
+            return STATUS_UNCHANGED, fingerprint
+        return STATUS_MODIFIED, fingerprint
+
+    # --- 기록 ---
+    def record(self, collection: str, source: str, fingerprint: Dict,
+               first_id: Optional[int], last_id: Optional[int], chunk_count: int,
+               complete: bool = True):
+        """파일 적재 결과를 기록(덮어쓰기)합니다. complete=False면 다음 실행에서 다시 처리됩니다."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ingested_files "
+                "(collection, source, size, mtime_ns, sha256, first_id, last_id, chunk_count, complete, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, source, fingerprint["size"], fingerprint["mtime_ns"], fingerprint.get("sha256"),
+                 first_id, last_id, chunk_count, 1 if complete else 0, time.time()),
+            )
+            self.conn.commit()
+
+    def touch(self, collection: str, source: str, mtime_ns: int):
+        """내용은 같고 수정시각만 바뀐 파일의 시각을 갱신합니다."""
+        with self._lock:
+            self.conn.execute(
+                "UPDATE ingested_files SET mtime_ns = ?, updated_at = ? WHERE collection = ? AND source = ?",
+                (mtime_ns, time.time(), collection, source),
+            )
+            self.conn.commit()
+
+    def extend_id_range(self, collection: str, source: str, ids: List[int]):
+        """
+        다른 파일에서 넘겨받은 조각을 이 파일 이름으로 다시 넣었을 때 기록된 ID 범위를 넓힙니다.
+        (다음 재적재에서 id <= last_id 교체 / 이어서 처리 기준에 새 행도 포함되도록, 진행 중 체크포인트도 함께 갱신)
+        """
+        if not ids:
+            return
+        low, high = min(ids), max(ids)
+        with self._lock:
+            for table in ("ingested_files", "ingest_checkpoints"):
+                self.conn.execute(
+                    f"UPDATE {table} SET first_id = MIN(COALESCE(first_id, ?), ?), last_id = MAX(COALESCE(last_id, ?), ?) "
+                    "WHERE collection = ? AND source = ?",
+                    (low, low, high, high, collection, source),
+                )
+            self.conn.commit()
+
+    def mark_incomplete(self, collection: str, sources: Set[str]):
+        """다음 실행에서 다시 적재하도록 표시합니다. (저장된 조각 일부를 잃었을 때)"""
+        with self._lock:
+            self.conn.executemany(
+                "UPDATE ingested_files SET complete = 0, updated_at = ? WHERE collection = ? AND source = ?",
+                [(time.time(), collection, s) for s in sources],
+            )
+            self.conn.commit()
+
+    def remove(self, collection: str, source: str):
+        """파일 항목을 삭제합니다. (원본 파일이 삭제되었을 때 등)"""
+        with self._lock:
+            self.conn.execute("DELETE FROM ingested_files WHERE collection = ? AND source = ?", (collection, source))
+            self.conn.commit()
+
+    def has_records(self, collection: str) -> bool:
+        """
+        컬렉션에 적재 기록(파일 항목 또는 중단된 체크포인트)이 하나라도 있는지 확인합니다.
+        조각 수는 보지 않습니다. (이관된 파일, 모든 조각이 중복이었던 파일도 조각 0개로 기록됨)
+        """
+        with self._lock:
+            for table in ("ingested_files", "ingest_checkpoints"):
+                cur = self.conn.execute(f"SELECT 1 FROM {table} WHERE collection = ? LIMIT 1", (collection,))
+                if cur.fetchone() is not None:
+                    return True
+            return False
+
+    def reset_collection(self, collection: str):
+        """컬렉션이 삭제/재생성되어 비었을 때 해당 컬렉션의 기록(파일, 체크포인트, 재시도 대기열)을 모두 지웁니다."""
+        with self._lock:
+            for table in ("ingested_files", "ingest_checkpoints", "failed_batches"):
+                self.conn.execute(f"DELETE FROM {table} WHERE collection = ?", (collection,))
+            self.conn.commit()
+
+    def rename_collection(self, old: str, new: str):
+        """Milvus 컬렉션 이름이 바뀌었을 때(reindex.py의 기존 컬렉션 이관) 기록을 새 이름으로 옮깁니다."""
+        with self._lock:
+            for table in ("ingested_files", "ingest_checkpoints", "failed_batches"):
+                self.conn.execute(f"UPDATE {table} SET collection = ? WHERE collection = ?", (new, old))
+            self.conn.commit()
+
+    # --- 체크포인트 (배치 단위 진행 상황) ---
+    def get_checkpoint(self, collection: str, source: str) -> Optional[Dict]:
+        """진행 중(중단된) 파일의 체크포인트를 반환합니다. 없으면 None."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT sha256, total_chunks, next_index, inserted, first_id, last_id, old_last_id "
+                "FROM ingest_checkpoints WHERE collection = ? AND source = ?",
+                (collection, source),
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("sha256", "total_chunks", "next_index", "inserted", "first_id", "last_id", "old_last_id")
+        return dict(zip(keys, row))
+
+    def save_checkpoint(self, collection: str, source: str, sha256: str, total_chunks: int, next_index: int,
+                        inserted: int, first_id: Optional[int], last_id: Optional[int], old_last_id: Optional[int]):
+        """배치 삽입 직후 호출해 진행 위치와 지금까지 삽입된 조각 ID 범위를 기록합니다."""
+        with self._lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO ingest_checkpoints "
+                "(collection, source, sha256, total_chunks, next_index, inserted, first_id, last_id, old_last_id, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (collection, source, sha256, total_chunks, next_index, inserted, first_id, last_id, old_last_id, time.time()),
+            )
+            self.conn.commit()
+
+    def clear_checkpoint(self, collection: str, source: str):
+        """파일 적재가 끝났거나 처음부터 다시 할 때 체크포인트와 재시도 대기열을 지웁니다."""
+        with self._lock:
+            self.conn.execute("DELETE FROM ingest_checkpoints WHERE collection = ? AND source = ?", (collection, source))
+            self.conn.execute("DELETE FROM failed_batches WHERE collection = ? AND source = ?", (collection, source))
+            self.conn.commit()
+
+    def add_failed_batch(self, collection: str, source: str, start_index: int, end_index: int, error: str):
+        """저장에 실패한 조각 범위를 재시도 대기열에 넣습니다. (이미 있으면 시도 횟수 증가)"""
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO failed_batches (collection, source, start_index, end_index, attempts, last_error, updated_at) "
+                "VALUES (?, ?, ?, ?, 1, ?, ?) "
+                "ON CONFLICT (collection, source, start_index) DO UPDATE SET "
+                "attempts = attempts + 1, last_error = excluded.last_error, updated_at = excluded.updated_at",
+                (collection, source, start_index, end_index, error[:1000], time.time()),
+            )
+            self.conn.commit()
+
+    def remove_failed_batch(self, collection: str, source: str, start_index: int):
+        with self._lock:
+            self.conn.execute(
+                "DELETE FROM failed_batches WHERE collection = ? AND source = ? AND start_index = ?",
+                (collection, source, start_index),
+            )
+            self.conn.commit()
+
+    def failed_batches(self, collection: str, source: str) -> List[Tuple[int, int]]:
+        """재시도 대기열에 있는 (start_index, end_index) 목록"""
+        with self._lock:
+            cur = self.conn.execute(
+                "SELECT start_index, end_index FROM failed_batches WHERE collection = ? AND source = ? ORDER BY start_index",
+                (collection, source),
+            )
+            return [(r[0], r[1]) for r in cur.fetchall()]
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,180 @@
+# [개요] db_load.py --watch 모드에서 데이터 폴더의 파일 생성/수정/삭제를 감지하는 감시기입니다.
+# watchdog 라이브러리가 있으면 OS 이벤트(리눅스 inotify, 윈도우 ReadDirectoryChangesW 등)를 쓰고,
+# 없거나 이벤트를 받을 수 없는 경로(네트워크 드라이브 등)면 주기적인 stat 비교(폴링)로 대체합니다.
+# 복사 중인 큰 파일을 반쯤 읽지 않도록, 크기·수정시각이 WATCH_DEBOUNCE_SECONDS 동안 변하지 않은 파일만 내보냅니다.
+
+import os  # 파일 stat / 목록
+import time  # 디바운스 시각
+import logging  # 로그 기록
+import threading  # 이벤트 수집 스레드와 공유 상태 보호
+from typing import Dict, List, Optional, Tuple  # 타입 힌트
+
+# === 선택적 의존성: watchdog이 있으면 OS 파일 이벤트 사용 ===
+try:
+    from watchdog.observers import Observer  # OS별 파일 이벤트 감시기
+    from watchdog.events import FileSystemEventHandler  # 이벤트 콜백 기본 클래스
+    HAS_WATCHDOG = True
+except ImportError:
+    HAS_WATCHDOG = False
+    FileSystemEventHandler = object  # 아래 _Handler 정의용 자리표시
+
+logger = logging.getLogger(__name__)
+
+WATCH_DEBOUNCE_SECONDS = 3.0  # 마지막 변경 후 이 시간 동안 변화가 없어야 처리 (쓰기 완료 판단)
+WATCH_POLL_SECONDS = 5.0  # 폴링 모드의 폴더 검사 주기
+
+EVENT_CHANGED = "changed"  # 생성 또는 수정
+EVENT_DELETED = "deleted"  # 삭제 (또는 다른 이름으로 이동)
+
+
+def _stat_sig(path: str) -> Optional[Tuple[int, int]]:
+    """(크기, 수정시각 ns). 파일이 없으면 None."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+class _Handler(FileSystemEventHandler):
+    """watchdog 이벤트를 DirectoryWatcher에 전달 (폴더 자체 이벤트는 무시)"""
+
+    def __init__(self, watcher: "DirectoryWatcher"):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.mark(event.src_path, EVENT_CHANGED)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.mark(event.src_path, EVENT_CHANGED)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.mark(event.src_path, EVENT_DELETED)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.mark(event.src_path, EVENT_DELETED)
+            self.watcher.mark(event.dest_path, EVENT_CHANGED)
+
+
+class DirectoryWatcher:
+    """
+    여러 데이터 폴더(하위 폴더 제외)를 감시해, 쓰기가 끝난 파일 변경을 폴더별로 묶어 돌려줍니다.
+    wait_batch()는 {폴더: {파일명: changed|deleted}}를 반환합니다.
+    """
+
+    def __init__(self, paths: List[str], debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 poll_interval: float = WATCH_POLL_SECONDS, use_watchdog: bool = True):
+        self.paths = [os.path.normcase(os.path.abspath(p)) for p in paths]  # 윈도우는 대소문자 구분 없음
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.use_watchdog = use_watchdog and HAS_WATCHDOG
+        self._cond = threading.Condition()
+        self._pending: Dict[str, Tuple[str, float, Optional[Tuple[int, int]]]] = {}  # 경로 -> (이벤트, 마지막 시각, stat)
+        self._stop = threading.Event()
+        self._observer = None
+        self._poll_thread: Optional[threading.Thread] = None
+        self._snapshots: Dict[str, Dict[str, Tuple[int, int]]] = {}
+
+    # --- 시작/종료 ---
+    def start(self):
+        if self.use_watchdog:
+            try:
+                self._observer = Observer()
+                for p in self.paths:
+                    self._observer.schedule(_Handler(self), p, recursive=False)
+                self._observer.start()
+                logger.info(f"[WATCH] 파일 이벤트 감시 시작: {self.paths}")
+                return
+            except Exception as e:
+                logger.warning(f"[WATCH] 파일 이벤트 감시를 시작할 수 없어 폴링으로 대체합니다: {e}")
+                self._observer = None
+        for p in self.paths:
+            self._snapshots[p] = self._snapshot(p)
+        self._poll_thread = threading.Thread(target=self._poll_loop, name="watch-poll", daemon=True)
+        self._poll_thread.start()
+        logger.info(f"[WATCH] 폴링 감시 시작 ({self.poll_interval:.0f}초 간격): {self.paths}")
+
+    def stop(self):
+        self._stop.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+        with self._cond:
+            self._cond.notify_all()
+
+    # --- 이벤트 수집 ---
+    def mark(self, path: str, event: str):
+        """파일 이벤트를 기록합니다. 같은 파일에 이벤트가 이어지면 마지막 이벤트와 시각으로 덮어씁니다."""
+        path = os.path.normcase(os.path.abspath(path))
+        if os.path.dirname(path) not in self.paths or os.path.basename(path).startswith((".", "~$")):
+            return  # 하위 폴더, 숨김/임시 파일(엑셀 잠금 파일 ~$...)은 무시
+        sig = _stat_sig(path) if event == EVENT_CHANGED else None
+        with self._cond:
+            self._pending[path] = (event, time.monotonic(), sig)
+            self._cond.notify_all()
+
+    @staticmethod
+    def _snapshot(path: str) -> Dict[str, Tuple[int, int]]:
+        snap = {}
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    if entry.is_file():
+                        st = entry.stat()
+                        snap[entry.name] = (st.st_size, st.st_mtime_ns)
+        except OSError as e:
+            logger.warning(f"[WATCH] 폴더를 읽을 수 없습니다: {path} ({e})")
+        return snap
+
+    def _poll_loop(self):
+        while not self._stop.wait(self.poll_interval):
+            for p in self.paths:
+                old, new = self._snapshots.get(p, {}), self._snapshot(p)
+                for name, sig in new.items():
+                    if old.get(name) != sig:
+                        self.mark(os.path.join(p, name), EVENT_CHANGED)
+                for name in old.keys() - new.keys():
+                    self.mark(os.path.join(p, name), EVENT_DELETED)
+                self._snapshots[p] = new
+
+    # --- 디바운스된 변경 묶음 ---
+    def wait_batch(self, timeout: Optional[float] = None) -> Dict[str, Dict[str, str]]:
+        """
+        디바운스 시간이 지난 변경들을 모아 반환합니다. 아직 쓰는 중인(크기/시각이 변하는) 파일은 다음으로 미룹니다.
+        timeout 동안 준비된 변경이 없거나 stop()이 호출되면 빈 dict를 반환합니다.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._stop.is_set():
+                now = time.monotonic()
+                ready: Dict[str, Dict[str, str]] = {}
+                next_due = None
+                for path, (event, seen, marked_sig) in list(self._pending.items()):
+                    due = seen + self.debounce
+                    if due > now:
+                        next_due = due if next_due is None else min(next_due, due)
+                        continue
+                    sig = _stat_sig(path)
+                    if event == EVENT_CHANGED and sig is not None and sig != marked_sig:
+                        # 디바운스 동안 이벤트 없이 크기/시각이 바뀐 경우 (폴링 모드, 일부 네트워크 드라이브) 한 번 더 대기
+                        self._pending[path] = (event, now, sig)
+                        next_due = now + self.debounce if next_due is None else min(next_due, now + self.debounce)
+                        continue
+                    del self._pending[path]
+                    if event == EVENT_CHANGED and sig is None:
+                        event = EVENT_DELETED  # 만들어졌다가 바로 지워진 임시 파일 등
+                    ready.setdefault(os.path.dirname(path), {})[os.path.basename(path)] = event
+                if ready:
+                    return ready
+                wait = None if next_due is None else max(0.0, next_due - now)
+                if deadline is not None:
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        return {}
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._cond.wait(wait)
+        return {}
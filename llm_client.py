@@ -0,0 +1,622 @@
+# [개요] App.py / orchestrate.py / agent/*.py의 모든 Groq 호출이 함께 쓰는 LLM 호출 계층입니다.
+# - 모델별 토큰 버킷: 분당 요청 수(RPM)와 분당 토큰 수(TPM)를 지키며, 응답의 x-ratelimit-* 헤더로 남은 양을 보정합니다.
+#   기본 한도는 Groq 무료 계정 값이며, LLM_MODEL_LIMITS 환경 변수로 바꿉니다.
+# - 우선순위 대기열: 같은 모델을 기다리는 호출 중 우선순위가 높은 것(답변 합성 > 라우팅 > 질문 재작성 > 대화 요약)이 먼저 나갑니다.
+# - 재시도: 429(사용량 제한)·연결 오류·5xx는 retry-after 헤더 또는 지터를 섞은 지수 백오프 후 다시 시도합니다.
+# - 대기 시간 지표: 우선순위별 대기 횟수/평균/p95/최대, 재시도·429·대기 초과 횟수를 metrics()로 제공합니다.
+# max_wait를 넘게 기다려야 하는 호출(예: 재작성)은 LLMQueueTimeout으로 바로 포기해, 호출 측이 원래 질문으로
+# 검색하는 식으로 품질을 조금 낮춰 계속 진행할 수 있게 합니다. (검색 자체를 건너뛰지 않음)
+# - 출력 예산: 호출 종류(라우터/재작성/요약/합성)마다 max_tokens를 최근 출력 길이 분포(p99 + 여유)로 정하고,
+#   한 줄 출력(라우터/재작성)에는 줄바꿈 stop을 넣습니다. (그래서 이 프롬프트들은 "[라벨]: "처럼 답이 같은 줄에서 시작하도록
+#   끝남) 잘린 비율(truncation_rate)과 빈 출력 수(empty, 호출 측이 기본값으로 대체한 수)는 지표로 제공합니다.
+# acomplete_hedged()는 짧은 8B 호출(라우터/재작성)용으로, 첫 호출이 최근 p95 응답 시간을 넘기면 같은 요청을
+# 한 번 더 보내 먼저 끝난 쪽을 쓰고(헤지), 제한 시간(timeout)을 넘기면 asyncio.TimeoutError를 냅니다.
+# 상태는 스레드 락으로 보호하고 대기는 짧은 sleep 반복이므로, Flask 라우트(llm_transport의 공유 이벤트 루프)와
+# 동기 콘솔 에이전트에서도 같은 제한을 공유합니다. HTTP 연결 풀은 llm_transport가 만든 것을 재사용합니다.
+
+import os  # 한도 설정 환경 변수
+import re  # reset 헤더("1m2.5s") 파싱
+import time  # 버킷 시각 / 지표
+import heapq  # 우선순위 대기열
+import random  # 재시도 지터
+import asyncio  # 비동기 대기
+import inspect  # raw 응답 parse()의 동기/비동기 구분
+import logging  # 로그 기록
+import threading  # 버킷/지표 보호
+import weakref  # 이벤트 루프별 비동기 클라이언트
+from collections import deque  # 최근 대기 시간 (p95 계산)
+from typing import Dict, List, Optional, Tuple  # 타입 힌트
+
+import groq  # Groq SDK (예외 타입 / 클라이언트)
+
+from tracing import span  # LLM 호출 span (대기 시간 / 토큰 수)
+from llm_transport import make_async_http_client, make_sync_http_client, http_timeout, get_event_loop_thread  # 공유 연결 풀
+
+logger = logging.getLogger(__name__)
+
+# === 우선순위 (작을수록 먼저) ===
+PRIORITY_SYNTHESIS = 0  # 사용자에게 바로 보이는 최종 답변
+PRIORITY_ROUTER = 1  # 라우팅 (실패 시 전체 전문가 호출로 대체 가능)
+PRIORITY_REWRITE = 2  # 질문 재작성 (실패 시 원래 질문으로 검색)
+PRIORITY_SUMMARY = 3  # 턴 종료 후 대화 요약 (백그라운드, 응답 경로 밖)
+PRIORITY_NAMES = {PRIORITY_SYNTHESIS: "synthesis", PRIORITY_ROUTER: "router", PRIORITY_REWRITE: "rewrite",
+                  PRIORITY_SUMMARY: "summary"}
+
+# === 모델별 기본 한도 (RPM, TPM): Groq 무료(free tier) 계정 값. 첫 응답 헤더를 받으면 TPM/남은 양은 서버 값으로 보정됨 ===
+# 유료 계정이나 모의 서버에서는 LLM_MODEL_LIMITS="모델=RPM:TPM,..."로 바꿉니다. (0은 제한 없음,
+# "*"를 주면 기본값 대신 설정에 없는 모든 모델에 적용)
+# 예: LLM_MODEL_LIMITS="llama-3.1-8b-instant=1000:250000,llama-3.3-70b-versatile=1000:300000"  /  LLM_MODEL_LIMITS="*=0:0"
+DEFAULT_MODEL_LIMITS: Dict[str, Tuple[int, int]] = {
+    "llama-3.1-8b-instant": (30, 6000),
+    "llama-3.3-70b-versatile": (30, 12000),
+}
+FALLBACK_MODEL_LIMITS = (30, 6000)  # 목록에 없는 모델 (무료 계정 기준)
+LLM_MODEL_LIMITS = os.getenv("LLM_MODEL_LIMITS", "")  # 기본 한도 덮어쓰기 (get_llm_client()가 읽음)
+
+LLM_MAX_RETRIES = 4  # 한 호출의 최대 시도 횟수
+LLM_RETRY_BASE_SECONDS = 1.0  # 재시도 대기 기본값 (시도마다 2배, 지터 포함)
+LLM_RETRY_MAX_SECONDS = 20.0  # 재시도 대기 상한
+LLM_DEFAULT_COMPLETION_TOKENS = 512  # max_tokens가 없을 때 예상 출력 토큰 (사용 후 실제 값으로 정산)
+QUEUE_POLL_SECONDS = 0.05  # 대기열 확인 주기
+QUEUE_WAIT_LOG_SECONDS = 2.0  # 이보다 오래 기다린 호출은 로그로 남김
+HEDGE_MIN_SAMPLES = 20  # p95를 믿을 수 있을 만큼 응답 시간이 쌓이기 전에는 기본 지연을 사용
+HEDGE_DEFAULT_DELAY_SECONDS = 1.5  # 헤지 요청을 보내기 전 기본 대기 (표본 부족 시)
+HEDGE_MIN_DELAY_SECONDS = 0.2  # p95가 아주 짧아도 이보다 빨리 중복 요청을 보내지 않음
+
+# === 호출 종류별 출력 예산: (기본 max_tokens, 최소, 최대, stop) ===
+# 생성 시간은 출력 길이에 비례하므로, 한 줄이면 되는 호출이 길게 이어지지 않게 하고 합성 답변의 꼬리 지연을 줄임
+OUTPUT_BUDGETS: Dict[str, Tuple[int, int, int, Optional[List[str]]]] = {
+    "router": (48, 24, 96, ["\n"]),  # 전문가 이름 목록 한 줄
+    "rewrite": (64, 32, 160, ["\n"]),  # 검색용 질문 한 줄
+    "summary": (300, 150, 400, None),  # 대화 요약
+    "synthesis": (1024, 384, 2048, None),  # 최종 답변
+}
+OUTPUT_BUDGET_MIN_SAMPLES = 30  # 이만큼 출력 길이가 쌓이면 기본값 대신 관측 분포로 예산 결정
+OUTPUT_BUDGET_HEADROOM = 1.25  # 관측 p99에 곱하는 여유 (잘린 응답이 많으면 p99가 예산에 붙어 자연히 늘어남)
+
+_RETRYABLE = (groq.RateLimitError, groq.APIConnectionError, groq.APITimeoutError, groq.InternalServerError)
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+class LLMQueueTimeout(Exception):
+    """max_wait 안에 사용량 한도가 풀리지 않아 호출을 보내지 않았을 때 발생합니다."""
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Groq reset/retry-after 헤더 값("7.66s", "2m59.56s", "120ms", "3")을 초로 변환합니다."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    parts = _DURATION_RE.findall(value)
+    return sum(float(n) * units[u] for n, u in parts) if parts else None
+
+
+def parse_model_limits(value: Optional[str]) -> Dict[str, Tuple[int, int]]:
+    """"모델=RPM:TPM,..." 문자열을 {모델: (RPM, TPM)}으로 변환합니다. ("*"는 목록에 없는 모델, 0은 제한 없음)"""
+    limits = {}
+    for item in (value or "").split(","):
+        if not item.strip():
+            continue
+        try:
+            model, pair = item.rsplit("=", 1)
+            rpm, tpm = pair.split(":")
+            limits[model.strip()] = (int(rpm), int(tpm))
+        except ValueError:
+            raise ValueError(f"LLM_MODEL_LIMITS 형식이 잘못되었습니다: {item!r} (모델=RPM:TPM)")
+    return limits
+
+
+def estimate_tokens(messages: List[Dict], max_tokens: Optional[int] = None) -> int:
+    """요청 토큰 예상치: 한국어 위주 프롬프트는 대략 2글자당 1토큰 + 예상 출력 토큰"""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 2 + (max_tokens or LLM_DEFAULT_COMPLETION_TOKENS)
+
+
+class TokenBucket:
+    """분당 한도를 초 단위로 채우는 토큰 버킷 (호출 측에서 락을 잡고 사용, per_minute가 0이면 제한 없음)"""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        self._refill(now)
+        amount = min(amount, self.capacity)  # 한도보다 큰 요청은 버킷이 가득 찼을 때 보냄
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) * 60.0 / self.capacity
+
+    def take(self, amount: float):
+        if self.capacity > 0:
+            self.tokens -= min(amount, self.capacity)
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], now: float):
+        """서버가 알려준 한도/남은 양으로 보정 (남은 양이 로컬 추정보다 적을 때만 낮춤, 제한 없음으로 설정했으면 무시)"""
+        if self.capacity <= 0:
+            return
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+
+
+class ModelLimiter:
+    """한 모델의 RPM/TPM 버킷과 우선순위 대기열"""
+
+    def __init__(self, model: str, rpm: int, tpm: int):
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.blocked_until = 0.0  # 429 retry-after 또는 일일 한도 소진 시 이 시각까지 보내지 않음
+        self._waiters: List[Tuple[int, int, float]] = []  # (우선순위, 순번, 예상 토큰)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def enqueue(self, priority: int, tokens: float) -> Tuple[int, int, float]:
+        with self._lock:
+            self._seq += 1
+            waiter = (priority, self._seq, tokens)
+            heapq.heappush(self._waiters, waiter)
+            return waiter
+
+    def cancel(self, waiter):
+        with self._lock:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+
+    def try_acquire(self, waiter) -> float:
+        """대기열 맨 앞이고 한도가 남아 있으면 소비하고 0을, 아니면 다시 확인할 때까지의 초를 반환합니다."""
+        with self._lock:
+            if not self._waiters or self._waiters[0] != waiter:
+                return QUEUE_POLL_SECONDS  # 더 높은 우선순위(또는 먼저 온) 호출이 앞에 있음
+            now = time.monotonic()
+            wait = max(self.blocked_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(waiter[2], now))
+            if wait > 0:
+                return wait
+            heapq.heappop(self._waiters)
+            self.requests.take(1)
+            self.tokens.take(waiter[2])
+            return 0.0
+
+    def try_take(self, tokens: float) -> bool:
+        """기다리는 호출이 없고 한도가 바로 남아 있을 때만 소비하고 True를 반환합니다. (대기열에 들어가지 않음)"""
+        with self._lock:
+            if self._waiters:
+                return False
+            now = time.monotonic()
+            if max(self.blocked_until - now, self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now)) > 0:
+                return False
+            self.requests.take(1)
+            self.tokens.take(tokens)
+            return True
+
+    def queued(self) -> int:
+        with self._lock:
+            return len(self._waiters)
+
+    def settle(self, estimated: float, actual: Optional[int]):
+        """실제 사용 토큰으로 정산 (예상보다 적게 썼으면 돌려주고, 많이 썼으면 더 차감)"""
+        if actual is None:
+            return
+        with self._lock:
+            self.tokens.tokens = min(self.tokens.capacity, self.tokens.tokens + estimated - actual)
+
+    def update_from_headers(self, headers):
+        """x-ratelimit-* 응답 헤더 반영. (Groq: requests는 일일 한도, tokens는 분당 한도)"""
+        if not headers:
+            return
+        def _num(name):
+            try:
+                return float(headers.get(name))
+            except (TypeError, ValueError):
+                return None
+        now = time.monotonic()
+        with self._lock:
+            self.tokens.sync(_num("x-ratelimit-limit-tokens"), _num("x-ratelimit-remaining-tokens"), now)
+            remaining_requests = _num("x-ratelimit-remaining-requests")
+            if remaining_requests is not None and remaining_requests <= 0:
+                reset = parse_duration(headers.get("x-ratelimit-reset-requests")) or 60.0
+                self.blocked_until = max(self.blocked_until, now + reset)
+
+    def block_for(self, seconds: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class OutputBudgets:
+    """호출 종류별 max_tokens / stop 결정과 출력 길이·잘림·빈 출력 기록"""
+
+    def __init__(self, budgets: Optional[Dict] = None, window: int = 500):
+        self.budgets = dict(OUTPUT_BUDGETS, **(budgets or {}))
+        self._lock = threading.Lock()
+        self._lengths: Dict[str, deque] = {}
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self.window = window
+
+    def max_tokens(self, call_type: str) -> Optional[int]:
+        if call_type not in self.budgets:
+            return None
+        default, low, high, _ = self.budgets[call_type]
+        with self._lock:
+            lengths = sorted(self._lengths.get(call_type, ()))
+        if len(lengths) < OUTPUT_BUDGET_MIN_SAMPLES:
+            return default
+        p99 = lengths[min(len(lengths) - 1, int(len(lengths) * 0.99))]
+        return max(low, min(high, int(p99 * OUTPUT_BUDGET_HEADROOM) + 8))
+
+    def apply(self, call_type: Optional[str], kwargs: Dict) -> Dict:
+        """호출 측이 max_tokens / stop을 직접 주지 않았으면 예산을 채워 넣은 kwargs를 반환합니다."""
+        if call_type not in self.budgets:
+            return kwargs
+        stop = self.budgets[call_type][3]
+        out = dict(kwargs)
+        if out.get("max_tokens") is None:
+            out["max_tokens"] = self.max_tokens(call_type)
+        if stop and "stop" not in out:
+            out["stop"] = stop
+        return out
+
+    def observe(self, call_type: Optional[str], completion):
+        """
+        출력 길이/잘림을 기록합니다. 한 줄 출력(stop 있음) 호출의 응답이 비면(호출 측이 원래 질문 /
+        전체 전문가로 대체) empty로 셉니다. 프롬프트가 답을 줄바꿈부터 시작하게 만들면 이 값이 올라갑니다.
+        """
+        if not call_type:
+            return
+        usage = getattr(completion, "usage", None)
+        tokens = getattr(usage, "completion_tokens", None)
+        choices = getattr(completion, "choices", None) or []
+        truncated = bool(choices) and getattr(choices[0], "finish_reason", None) == "length"
+        message = getattr(choices[0], "message", None) if choices else None
+        empty = (call_type in self.budgets and bool(self.budgets[call_type][3]) and message is not None
+                 and not (message.content or "").strip())
+        with self._lock:
+            counts = self._counts.setdefault(call_type, {"calls": 0, "truncated": 0, "empty": 0})
+            counts["calls"] += 1
+            counts["truncated"] += int(truncated)
+            counts["empty"] += int(empty)
+            if tokens is not None:
+                self._lengths.setdefault(call_type, deque(maxlen=self.window)).append(int(tokens))
+        if truncated:
+            logger.info(f"[LLM] {call_type} 출력이 max_tokens에서 잘렸습니다.")
+        if empty:
+            logger.warning(f"[LLM] {call_type} 출력이 비어 있어 호출 측 기본값으로 대체됩니다.")
+
+    def snapshot(self) -> Dict:
+        out = {}
+        for call_type in self.budgets:
+            with self._lock:
+                counts = dict(self._counts.get(call_type, {"calls": 0, "truncated": 0, "empty": 0}))
+                lengths = sorted(self._lengths.get(call_type, ()))
+            out[call_type] = {
+                **counts,
+                "truncation_rate": round(counts["truncated"] / counts["calls"], 4) if counts["calls"] else None,
+                "empty_rate": round(counts["empty"] / counts["calls"], 4) if counts["calls"] else None,
+                "max_tokens": self.max_tokens(call_type),
+                "output_p50": lengths[len(lengths) // 2] if lengths else None,
+                "output_p99": lengths[min(len(lengths) - 1, int(len(lengths) * 0.99))] if lengths else None,
+            }
+        return out
+
+
+class _Metrics:
+    """우선순위별 대기 시간과 재시도/제한 횟수"""
+
+    def __init__(self, window: int = 500):
+        self._lock = threading.Lock()
+        self._waits: Dict[str, deque] = {}
+        self._count: Dict[str, int] = {}
+        self._wait_max: Dict[str, float] = {}
+        self._latency: Dict[Tuple[str, int], deque] = {}  # (모델, 우선순위) -> 최근 응답 시간 (대기 제외)
+        self.counters = {"calls": 0, "retries": 0, "rate_limited": 0, "queue_timeouts": 0, "failures": 0,
+                         "hedged": 0, "hedge_wins": 0, "hedge_skipped": 0, "deadline_exceeded": 0}
+        self.window = window
+
+    def wait(self, priority: int, seconds: float):
+        name = PRIORITY_NAMES.get(priority, str(priority))
+        with self._lock:
+            self._waits.setdefault(name, deque(maxlen=self.window)).append(seconds)
+            self._count[name] = self._count.get(name, 0) + 1
+            self._wait_max[name] = max(self._wait_max.get(name, 0.0), seconds)
+
+    def latency(self, model: str, priority: int, seconds: float):
+        with self._lock:
+            self._latency.setdefault((model, priority), deque(maxlen=self.window)).append(seconds)
+
+    def latency_p95(self, model: str, priority: int) -> Optional[float]:
+        with self._lock:
+            values = sorted(self._latency.get((model, priority), ()))
+        if len(values) < HEDGE_MIN_SAMPLES:
+            return None
+        return values[min(len(values) - 1, int(len(values) * 0.95))]
+
+    def incr(self, key: str):
+        with self._lock:
+            self.counters[key] += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = {}
+            for name, values in self._waits.items():
+                ordered = sorted(values)
+                waits[name] = {
+                    "count": self._count[name],
+                    "avg_ms": round(1000 * sum(ordered) / len(ordered), 1),
+                    "p95_ms": round(1000 * ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1),
+                    "max_ms": round(1000 * self._wait_max[name], 1),
+                }
+            return {"queue_wait": waits, **self.counters}
+
+
+class LLMClient:
+    """
+    Groq 채팅 완성 호출을 모델별 사용량 한도와 우선순위에 맞춰 보내는 클라이언트.
+    acomplete()(비동기)와 complete()(동기)는 SDK의 chat.completions.create와 같은 응답 객체를 반환합니다.
+    """
+
+    def __init__(self, async_client=None, sync_client=None, limits: Optional[Dict[str, Tuple[int, int]]] = None):
+        """limits: {모델: (RPM, TPM)}로 기본 한도(DEFAULT_MODEL_LIMITS)를 덮어씀. "*"가 있으면 기본값 대신 나머지 모델 전부에 적용"""
+        self._async_client = async_client
+        self._async_clients = weakref.WeakKeyDictionary()  # 이벤트 루프 -> AsyncGroq (비동기 연결 풀은 루프에 묶임)
+        self._sync_client = sync_client
+        limits = dict(limits or {})
+        self._limits = limits if "*" in limits else dict(DEFAULT_MODEL_LIMITS, **limits)
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self._lock = threading.Lock()
+        self.metrics_ = _Metrics()
+        self.budgets = OutputBudgets()
+
+    # --- 클라이언트 (SDK 자체 재시도는 끄고 여기서 재시도, 연결 풀은 llm_transport 공유) ---
+    @property
+    def async_client(self):
+        """현재 이벤트 루프용 AsyncGroq. 보통은 공유 루프(run_async) 하나뿐이라 연결 풀도 하나입니다."""
+        if self._async_client is not None:
+            return self._async_client
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = get_event_loop_thread().loop
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                if loop is not get_event_loop_thread().loop:
+                    logger.warning("[LLM] 공유 이벤트 루프가 아닌 루프에서 비동기 호출 -> 이 루프 전용 연결 풀을 새로 만듭니다. "
+                                   "(요청마다 asyncio.run 대신 llm_transport.run_async 사용 권장)")
+                client = groq.AsyncGroq(max_retries=0, timeout=http_timeout(), http_client=make_async_http_client())
+                self._async_clients[loop] = client
+            return client
+
+    @property
+    def sync_client(self):
+        with self._lock:
+            if self._sync_client is None:
+                self._sync_client = groq.Groq(max_retries=0, timeout=http_timeout(), http_client=make_sync_http_client())
+            return self._sync_client
+
+    def limiter(self, model: str) -> ModelLimiter:
+        with self._lock:
+            if model not in self._limiters:
+                rpm, tpm = self._limits.get(model, self._limits.get("*", FALLBACK_MODEL_LIMITS))
+                self._limiters[model] = ModelLimiter(model, rpm, tpm)
+            return self._limiters[model]
+
+    def limits(self) -> Dict[str, Tuple[int, int]]:
+        """설정된 모델별 (RPM, TPM) ("*": 목록에 없는 모델). 응답 헤더로 보정되기 전 값입니다."""
+        return {"*": FALLBACK_MODEL_LIMITS, **self._limits}
+
+    def metrics(self) -> Dict:
+        snap = self.metrics_.snapshot()
+        snap["limits"] = self.limits()
+        snap["queued"] = {m: l.queued() for m, l in self._limiters.items()}
+        snap["output"] = self.budgets.snapshot()
+        return snap
+
+    # --- 재시도 판단 ---
+    def _retry_delay(self, error: Exception, attempt: int, limiter: ModelLimiter) -> Optional[float]:
+        if not isinstance(error, _RETRYABLE) or attempt >= LLM_MAX_RETRIES:
+            return None
+        backoff = min(LLM_RETRY_MAX_SECONDS, LLM_RETRY_BASE_SECONDS * 2 ** (attempt - 1)) * (0.5 + random.random())
+        if isinstance(error, groq.RateLimitError):
+            self.metrics_.incr("rate_limited")
+            headers = getattr(getattr(error, "response", None), "headers", None) or {}
+            retry_after = parse_duration(headers.get("retry-after")) if headers else None
+            delay = min(LLM_RETRY_MAX_SECONDS, retry_after) if retry_after else backoff
+            limiter.block_for(delay)  # 같은 모델을 기다리는 다른 호출도 함께 대기
+            limiter.update_from_headers(headers)
+            return delay
+        return backoff
+
+    def _record_call(self, limiter: ModelLimiter, priority: int, waited: float):
+        self.metrics_.wait(priority, waited)
+        self.metrics_.incr("calls")
+        if waited >= QUEUE_WAIT_LOG_SECONDS:
+            logger.info(f"[LLM] {limiter.model} {PRIORITY_NAMES.get(priority, priority)} 호출이 사용량 한도로 {waited:.1f}초 대기했습니다.")
+
+    def _finish(self, limiter: ModelLimiter, estimated: float, raw_headers, completion, call_type: Optional[str], sp):
+        limiter.update_from_headers(raw_headers)
+        usage = getattr(completion, "usage", None)
+        limiter.settle(estimated, getattr(usage, "total_tokens", None))
+        self.budgets.observe(call_type, completion)
+        choices = getattr(completion, "choices", None) or [None]
+        sp.set(prompt_tokens=getattr(usage, "prompt_tokens", None), completion_tokens=getattr(usage, "completion_tokens", None),
+               finish_reason=getattr(choices[0], "finish_reason", None))
+        return completion
+
+    # --- 비동기 ---
+    async def _acquire_async(self, limiter: ModelLimiter, tokens: float, priority: int, max_wait: Optional[float]) -> float:
+        waiter = limiter.enqueue(priority, tokens)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = limiter.try_acquire(waiter)
+                if wait <= 0:
+                    return time.monotonic() - started
+                if max_wait is not None and time.monotonic() - started + wait > max_wait:
+                    self.metrics_.incr("queue_timeouts")
+                    raise LLMQueueTimeout(f"{limiter.model} 사용량 한도 대기가 {max_wait:.1f}초를 넘습니다.")
+                await asyncio.sleep(min(wait, 1.0))
+        except BaseException:
+            limiter.cancel(waiter)  # 취소/시간 초과 시 대기열에서 빼야 뒤의 호출이 막히지 않음
+            raise
+
+    async def acomplete(self, messages: List[Dict], model: str, priority: int = PRIORITY_SYNTHESIS,
+                        max_wait: Optional[float] = None, reserved: bool = False, **kwargs):
+        """
+        비동기 채팅 완성. max_wait(초)를 넘게 기다려야 하면 LLMQueueTimeout.
+        call_type(기본: 우선순위 이름)별 출력 예산(max_tokens / stop)은 호출 측이 주지 않았을 때만 채웁니다.
+        reserved=True면 호출 측이 첫 시도의 한도를 이미 소비한 것으로 보고 대기열을 거치지 않습니다. (헤지 요청)
+        """
+        call_type = kwargs.pop("call_type", None) or PRIORITY_NAMES.get(priority)
+        kwargs = self.budgets.apply(call_type, kwargs)
+        limiter = self.limiter(model)
+        estimated = estimate_tokens(messages, kwargs.get("max_tokens"))
+        with span(f"llm.{call_type}", model=model, priority=PRIORITY_NAMES.get(priority, priority)) as sp:
+            for attempt in range(1, LLM_MAX_RETRIES + 1):
+                waited = 0.0 if reserved and attempt == 1 else await self._acquire_async(limiter, estimated, priority, max_wait)
+                self._record_call(limiter, priority, waited)
+                sp.add("queue_wait_ms", round(waited * 1000, 1))
+                sp.set(attempts=attempt)
+                try:
+                    sent = time.monotonic()
+                    raw = await self.async_client.chat.completions.with_raw_response.create(messages=messages, model=model, **kwargs)
+                    completion = raw.parse()
+                    if inspect.isawaitable(completion):
+                        completion = await completion
+                    self.metrics_.latency(model, priority, time.monotonic() - sent)
+                    return self._finish(limiter, estimated, raw.headers, completion, call_type, sp)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, limiter)
+                    if delay is None:
+                        self.metrics_.incr("failures")
+                        raise
+                    self.metrics_.incr("retries")
+                    logger.warning(f"[LLM] {model} 호출 실패 ({attempt}/{LLM_MAX_RETRIES}), {delay:.1f}초 후 재시도: {e}")
+                    await asyncio.sleep(delay)
+
+    def hedge_delay(self, model: str, priority: int) -> float:
+        """헤지 요청을 보내기까지의 대기: 같은 모델/우선순위의 최근 p95 응답 시간"""
+        p95 = self.metrics_.latency_p95(model, priority)
+        return HEDGE_DEFAULT_DELAY_SECONDS if p95 is None else max(HEDGE_MIN_DELAY_SECONDS, p95)
+
+    async def acomplete_hedged(self, messages: List[Dict], model: str, priority: int = PRIORITY_ROUTER,
+                               timeout: Optional[float] = None, max_wait: Optional[float] = None, **kwargs):
+        """
+        헤지 호출: 첫 요청이 p95를 넘기도록 끝나지 않으면 같은 요청을 한 번 더 보내고 먼저 성공한 응답을 반환합니다.
+        중복 요청은 사용량 한도에 바로 여유가 있을 때만 한도를 먼저 잡고 나갑니다. (없으면 보내지 않고 hedge_skipped로 셈)
+        timeout(초) 안에 성공하지 못하면 남은 요청을 취소하고 asyncio.TimeoutError를 발생시킵니다.
+        """
+        call_type = kwargs.get("call_type") or PRIORITY_NAMES.get(priority)
+        with span(f"llm.{call_type}.hedged", model=model, timeout_s=timeout) as sp:  # 자식: 실제 호출 span (헤지 시 2개)
+            expires = None if timeout is None else time.monotonic() + timeout
+            remaining = lambda: None if expires is None else max(0.0, expires - time.monotonic())
+            first = asyncio.ensure_future(self.acomplete(messages, model, priority, max_wait=max_wait, **kwargs))
+            pending = {first}
+            hedge = None
+            hedge_tried = False
+            error: Optional[BaseException] = None
+            try:
+                delay = self.hedge_delay(model, priority)
+                while pending:
+                    wait_for = remaining()
+                    if not hedge_tried:
+                        wait_for = delay if wait_for is None else min(delay, wait_for)
+                    done, pending = await asyncio.wait(pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        if task.exception() is None:
+                            if task is hedge:
+                                self.metrics_.incr("hedge_wins")
+                                sp.set(hedge_won=True)
+                            return task.result()
+                        error = task.exception()
+                    if expires is not None and time.monotonic() >= expires:
+                        break
+                    if not hedge_tried and not done:
+                        # 첫 요청이 p95를 넘김 -> 한도 여유가 있으면 같은 요청을 한 번 더 (한 번만 확인)
+                        hedge_tried = True
+                        hedge_kwargs = self.budgets.apply(call_type, {k: v for k, v in kwargs.items() if k != "call_type"})
+                        if self.limiter(model).try_take(estimate_tokens(messages, hedge_kwargs.get("max_tokens"))):
+                            self.metrics_.incr("hedged")
+                            sp.set(hedged=True)
+                            hedge = asyncio.ensure_future(self.acomplete(messages, model, priority, max_wait=0, reserved=True,
+                                                                         call_type=call_type, **hedge_kwargs))
+                            pending.add(hedge)
+                        else:
+                            self.metrics_.incr("hedge_skipped")  # 대기 초과(queue_timeouts)로 세지 않음
+                            sp.set(hedge_skipped=True)
+                if error is not None and not pending:
+                    raise error  # 보낸 요청이 모두 실패
+                self.metrics_.incr("deadline_exceeded")
+                raise asyncio.TimeoutError(f"{model} 호출이 {timeout:.1f}초 안에 끝나지 않았습니다.")
+            finally:
+                for task in pending:
+                    task.cancel()
+
+    # --- 동기 (콘솔 에이전트) ---
+    def _acquire_sync(self, limiter: ModelLimiter, tokens: float, priority: int, max_wait: Optional[float]) -> float:
+        waiter = limiter.enqueue(priority, tokens)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = limiter.try_acquire(waiter)
+                if wait <= 0:
+                    return time.monotonic() - started
+                if max_wait is not None and time.monotonic() - started + wait > max_wait:
+                    self.metrics_.incr("queue_timeouts")
+                    raise LLMQueueTimeout(f"{limiter.model} 사용량 한도 대기가 {max_wait:.1f}초를 넘습니다.")
+                time.sleep(min(wait, 1.0))
+        except BaseException:
+            limiter.cancel(waiter)
+            raise
+
+    def complete(self, messages: List[Dict], model: str, priority: int = PRIORITY_SYNTHESIS,
+                 max_wait: Optional[float] = None, **kwargs):
+        """동기 채팅 완성 (acomplete와 같은 규칙)"""
+        call_type = kwargs.pop("call_type", None) or PRIORITY_NAMES.get(priority)
+        kwargs = self.budgets.apply(call_type, kwargs)
+        limiter = self.limiter(model)
+        estimated = estimate_tokens(messages, kwargs.get("max_tokens"))
+        with span(f"llm.{call_type}", model=model, priority=PRIORITY_NAMES.get(priority, priority)) as sp:
+            for attempt in range(1, LLM_MAX_RETRIES + 1):
+                waited = self._acquire_sync(limiter, estimated, priority, max_wait)
+                self._record_call(limiter, priority, waited)
+                sp.add("queue_wait_ms", round(waited * 1000, 1))
+                sp.set(attempts=attempt)
+                try:
+                    raw = self.sync_client.chat.completions.with_raw_response.create(messages=messages, model=model, **kwargs)
+                    return self._finish(limiter, estimated, raw.headers, raw.parse(), call_type, sp)
+                except Exception as e:
+                    delay = self._retry_delay(e, attempt, limiter)
+                    if delay is None:
+                        self.metrics_.incr("failures")
+                        raise
+                    self.metrics_.incr("retries")
+                    logger.warning(f"[LLM] {model} 호출 실패 ({attempt}/{LLM_MAX_RETRIES}), {delay:.1f}초 후 재시도: {e}")
+                    time.sleep(delay)
+
+
+_default_client: Optional[LLMClient] = None
+_default_lock = threading.Lock()
+
+
+def get_llm_client() -> LLMClient:
+    """
+    프로세스 전체가 공유하는 LLMClient (모든 호출 지점이 같은 사용량 한도를 보도록)
+    한도는 처음 만들 때 LLM_MODEL_LIMITS 환경 변수(없으면 무료 계정 기본값)를 읽습니다.
+    """
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            _default_client = LLMClient(limits=parse_model_limits(os.getenv("LLM_MODEL_LIMITS", LLM_MODEL_LIMITS)))
+        return _default_client
@@ -0,0 +1,138 @@
+# [개요] 모든 Groq 호출이 함께 쓰는 HTTP 전송 계층과 프로세스 공유 이벤트 루프입니다.
+# - httpx 연결 풀(keep-alive) 하나를 프로세스 전체가 재사용하므로, 호출마다 TCP/TLS 연결을 새로 맺지 않습니다.
+#   풀 크기/keep-alive 시간은 환경 변수로 조정하고, h2 패키지가 있으면 HTTP/2로 연결 하나에 요청을 다중화합니다.
+# - 비동기 httpx 클라이언트는 처음 연결한 이벤트 루프에 묶이므로, 요청마다 asyncio.run으로 새 루프를 만들면
+#   풀을 재사용할 수 없습니다. run_async()는 데몬 스레드에서 계속 도는 이벤트 루프 하나에 코루틴을 넘겨 실행합니다.
+#   (Flask 요청 스레드는 결과만 기다림)
+# - warm_up()은 시작 시 가벼운 요청(모델 목록 조회)으로 연결을 미리 맺어, 첫 질문에서 연결 지연이 생기지 않게 합니다.
+
+import os  # 환경 변수
+import time  # 예열 시간 측정
+import asyncio  # 공유 이벤트 루프
+import logging  # 로그 기록
+import threading  # 루프 스레드
+from typing import Optional  # 타입 힌트
+
+import httpx  # 연결 풀 / 타임아웃 설정
+import groq  # SDK 기본 httpx 클라이언트 (SDK 기본 설정 유지)
+
+try:
+    import h2  # noqa: F401  HTTP/2 지원 (httpx[http2])
+    HAS_H2 = True
+except ImportError:
+    HAS_H2 = False
+
+logger = logging.getLogger(__name__)
+
+# === 연결 풀 설정 ===
+LLM_POOL_MAX_CONNECTIONS = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "32"))  # 동시에 열 수 있는 최대 연결 수
+LLM_POOL_MAX_KEEPALIVE = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "16"))  # 쉬는 동안 유지할 연결 수
+LLM_POOL_KEEPALIVE_EXPIRY = float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "120"))  # 쉬는 연결 유지 시간(초)
+LLM_HTTP2 = os.getenv("LLM_HTTP2", "auto").lower()  # auto(h2 설치 시 사용) | 1 | 0
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))  # 연결 타임아웃(초)
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "60"))  # 응답 읽기 타임아웃(초)
+LLM_WARMUP_CONNECTIONS = int(os.getenv("LLM_WARMUP_CONNECTIONS", "2"))  # 예열 시 미리 맺을 연결 수 (HTTP/2는 1개면 충분)
+
+
+def http2_enabled() -> bool:
+    if LLM_HTTP2 == "auto":
+        return HAS_H2
+    if LLM_HTTP2 in ("1", "true", "yes") and not HAS_H2:
+        logger.warning("LLM_HTTP2가 켜져 있지만 h2 패키지가 없어 HTTP/1.1을 사용합니다. (pip install 'httpx[http2]')")
+        return False
+    return LLM_HTTP2 in ("1", "true", "yes")
+
+
+def http_timeout() -> httpx.Timeout:
+    return httpx.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(max_connections=LLM_POOL_MAX_CONNECTIONS, max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE,
+                        keepalive_expiry=LLM_POOL_KEEPALIVE_EXPIRY)
+
+
+def make_async_http_client() -> httpx.AsyncClient:
+    """AsyncGroq에 넘길 연결 풀 (공유 이벤트 루프에서만 사용)"""
+    return groq.DefaultAsyncHttpxClient(limits=_limits(), timeout=http_timeout(), http2=http2_enabled())
+
+
+def make_sync_http_client() -> httpx.Client:
+    """Groq(동기)에 넘길 연결 풀 (스레드 간 공유 가능)"""
+    return groq.DefaultHttpxClient(limits=_limits(), timeout=http_timeout(), http2=http2_enabled())
+
+
+class EventLoopThread:
+    """데몬 스레드에서 계속 도는 이벤트 루프. 다른 스레드에서 코루틴을 넘겨 결과를 기다립니다."""
+
+    def __init__(self, name: str = "llm-event-loop"):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """코루틴을 루프에서 실행하고 결과를 반환합니다. (루프 스레드 안에서 호출하면 교착되므로 금지)"""
+        if threading.current_thread() is self._thread:
+            raise RuntimeError("공유 이벤트 루프 안에서는 run_async 대신 await를 사용하세요.")
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()  # 대기 시간 초과/인터럽트 시 루프 쪽 작업도 취소
+            raise
+
+    def submit(self, coro):
+        """결과를 기다리지 않고 루프에 작업을 넘깁니다. (concurrent.futures.Future 반환)"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+
+_loop_thread: Optional[EventLoopThread] = None
+_loop_lock = threading.Lock()
+
+
+def get_event_loop_thread() -> EventLoopThread:
+    global _loop_thread
+    with _loop_lock:
+        if _loop_thread is None:
+            _loop_thread = EventLoopThread()
+        return _loop_thread
+
+
+def run_async(coro, timeout: Optional[float] = None):
+    """동기 코드(Flask 라우트 등)에서 공유 이벤트 루프로 코루틴을 실행합니다. asyncio.run 대신 사용."""
+    return get_event_loop_thread().run(coro, timeout)
+
+
+async def _awarm_up(llm, connections: int):
+    started = time.monotonic()
+    results = await asyncio.gather(*[llm.async_client.models.list() for _ in range(max(1, connections))],
+                                   return_exceptions=True)
+    errors = [r for r in results if isinstance(r, Exception)]
+    if errors:
+        logger.warning(f"[LLM] 연결 예열 실패 ({len(errors)}/{len(results)}): {errors[0]}")
+    else:
+        logger.info(f"[LLM] 연결 {len(results)}개 예열 완료 ({time.monotonic() - started:.2f}s, HTTP/2={http2_enabled()})")
+
+
+def warm_up(llm=None, connections: int = LLM_WARMUP_CONNECTIONS, sync_client: bool = False, wait: bool = False):
+    """
+    시작 시 연결 예열. 기본은 공유 루프의 비동기 클라이언트를 백그라운드에서 예열하고(wait=False) 바로 반환합니다.
+    sync_client=True면 동기 클라이언트(콘솔 에이전트)를 현재 스레드에서 예열합니다.
+    """
+    if llm is None:
+        from llm_client import get_llm_client  # 순환 import 방지
+        llm = get_llm_client()
+    if sync_client:
+        try:
+            started = time.monotonic()
+            llm.sync_client.models.list()
+            logger.info(f"[LLM] 동기 클라이언트 연결 예열 완료 ({time.monotonic() - started:.2f}s)")
+        except Exception as e:
+            logger.warning(f"[LLM] 동기 클라이언트 연결 예열 실패: {e}")
+        return None
+    future = get_event_loop_thread().submit(_awarm_up(llm, connections))
+    return future.result() if wait else future
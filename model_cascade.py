@@ -0,0 +1,135 @@
+# [개요] 답변 합성 모델 단계(cascade) 선택: 쉬운 질문은 8B로 빠르게 답하고, 어려운 질문만 70B를 씁니다.
+# - 사전 판단(choose_tier): 호출한 전문가 수(라우팅 폭), 합성에 넣을 자료 토큰 수, 검색 확신도(가장 가까운 L2 거리)로
+#   "단일 전문가 + 짧은 자료 + 확신도 높음"이면 fast(8B), 아니면 large(70B)를 고릅니다.
+# - 사후 점검(self_check): 8B 답변이 비었거나 너무 짧거나, 출력 한도로 잘렸거나(finish_reason="length"),
+#   자료가 있는데도 "찾지 못했다"류로 답하면 70B로 다시 생성합니다. (추가 LLM 호출 없는 저렴한 점검)
+#   70B 재생성이 늦거나 실패하면(사용량 제한, 연결 오류 등) 이미 받은 8B 답변을 쓰고 escalation_failed로 기록합니다.
+# - 선택 결과(tier / 모델 / 이유 / 승격 여부)는 요청마다 기록해 응답과 지표(cascade_metrics)에 남깁니다.
+
+import os  # 환경 변수
+import time  # 시간 측정
+import asyncio  # 제한 시간
+import logging  # 로그 기록
+import threading  # 지표 보호
+from typing import Dict, List, Optional, Tuple  # 타입 힌트
+
+from langchain_core.documents import Document  # LangChain 표준 문서 객체
+
+from llm_client import PRIORITY_SYNTHESIS  # 합성은 최우선
+
+logger = logging.getLogger(__name__)
+
+TIER_FAST = "fast"
+TIER_LARGE = "large"
+CASCADE_MODELS = {TIER_FAST: "llama-3.1-8b-instant", TIER_LARGE: "llama-3.3-70b-versatile"}
+
+# === 판단 기준 (환경 변수로 조정) ===
+CASCADE_ENABLED = os.getenv("CASCADE_ENABLED", "1") != "0"  # 0이면 항상 70B
+CASCADE_FAST_MAX_EXPERTS = 1  # 이 수 이하의 전문가만 자료를 냈을 때 fast 후보
+CASCADE_FAST_MAX_CONTEXT_TOKENS = int(os.getenv("CASCADE_FAST_MAX_CONTEXT_TOKENS", "1200"))  # 자료 토큰 상한
+# 가장 가까운 문서의 L2 거리 상한 (임베딩 모델/정규화에 따라 달라지므로 실제 질문 분포로 조정)
+CASCADE_FAST_MAX_DISTANCE = float(os.getenv("CASCADE_FAST_MAX_DISTANCE", "60"))
+CASCADE_MIN_ANSWER_CHARS = 20  # 이보다 짧은 8B 답변은 실패로 보고 승격
+CASCADE_MIN_ESCALATE_SECONDS = 3.0  # 남은 시간이 이보다 적으면 승격하지 않고 8B 답변 사용
+# "제공된 자료에는 ~이 나와 있습니다"처럼 정상 답변에도 흔한 표현은 넣지 않음
+_NO_ANSWER_MARKERS = ("찾지 못", "정보가 없", "정보는 없", "알 수 없", "답변할 수 없")
+
+_metrics_lock = threading.Lock()
+_metrics = {"requests": 0, TIER_FAST: 0, TIER_LARGE: 0, "escalated": 0, "escalation_failed": 0,
+            "latency_s": {TIER_FAST: 0.0, TIER_LARGE: 0.0}}
+
+
+def _best_distance(expert_docs: Dict[str, List[Document]]) -> Optional[float]:
+    scores = [d.metadata.get("score") for docs in expert_docs.values() for d in docs if d.metadata]
+    scores = [s for s in scores if s is not None]
+    return min(scores) if scores else None
+
+
+def choose_tier(experts_to_run: List[str], expert_docs: Dict[str, List[Document]], context_tokens: int) -> Dict:
+    """합성 전 단계 선택. {"tier", "model", "reason"}를 반환합니다."""
+    def decision(tier, reason):
+        return {"tier": tier, "model": CASCADE_MODELS[tier], "reason": reason, "escalated": False}
+
+    if not CASCADE_ENABLED:
+        return decision(TIER_LARGE, "cascade 비활성화")
+    experts_with_docs = [name for name, docs in expert_docs.items() if docs]
+    if len(experts_to_run) > CASCADE_FAST_MAX_EXPERTS or len(experts_with_docs) > CASCADE_FAST_MAX_EXPERTS:
+        return decision(TIER_LARGE, f"전문가 {max(len(experts_to_run), len(experts_with_docs))}명 (복합 질문)")
+    if context_tokens > CASCADE_FAST_MAX_CONTEXT_TOKENS:
+        return decision(TIER_LARGE, f"자료 {context_tokens} 토큰")
+    best = _best_distance(expert_docs)
+    if best is not None and best > CASCADE_FAST_MAX_DISTANCE:
+        return decision(TIER_LARGE, f"검색 확신도 낮음 (최소 거리 {best:.1f})")
+    return decision(TIER_FAST, "단일 전문가 / 짧은 자료" + (f" / 최소 거리 {best:.1f}" if best is not None else ""))
+
+
+def self_check(completion, has_context: bool) -> Optional[str]:
+    """8B 답변 점검. 문제가 있으면 승격 이유를, 괜찮으면 None을 반환합니다."""
+    choice = completion.choices[0]
+    text = (choice.message.content or "").strip()
+    if getattr(choice, "finish_reason", None) == "length":
+        return "출력 한도로 잘림"
+    if len(text) < CASCADE_MIN_ANSWER_CHARS:
+        return "답변이 너무 짧음"
+    if has_context and any(marker in text for marker in _NO_ANSWER_MARKERS):
+        return "자료가 있는데 답하지 못함"
+    return None
+
+
+def _record(tier: str, escalated: bool, seconds: float, escalation_failed: bool = False):
+    with _metrics_lock:
+        _metrics["requests"] += 1
+        _metrics[tier] += 1
+        _metrics["latency_s"][tier] += seconds
+        if escalated:
+            _metrics["escalated"] += 1
+        if escalation_failed:
+            _metrics["escalation_failed"] += 1
+
+
+def cascade_metrics() -> Dict:
+    """단계별 요청 수 / 승격 수 / 승격 실패 수 / 평균 합성 시간"""
+    with _metrics_lock:
+        out = {k: v for k, v in _metrics.items() if k != "latency_s"}
+        out["avg_latency_s"] = {t: round(_metrics["latency_s"][t] / _metrics[t], 3) if _metrics[t] else None
+                                for t in (TIER_FAST, TIER_LARGE)}
+        return out
+
+
+async def acascade_complete(llm, messages: List[Dict], decision: Dict, has_context: bool,
+                            timeout: Optional[float] = None, **kwargs) -> Tuple[str, Dict]:
+    """
+    decision에 따라 합성하고 (답변, 기록)을 반환합니다. fast 답변이 self_check에 걸리면 large로 다시 생성합니다.
+    첫 생성이 timeout을 넘기면 asyncio.TimeoutError, 승격한 large 생성이 늦거나 실패하면 fast 답변을 그대로 쓰고
+    기록의 escalation_failed에 이유를 남깁니다.
+    """
+    started = time.monotonic()
+    remaining = lambda: None if timeout is None else max(0.0, timeout - (time.monotonic() - started))
+    record = dict(decision)
+    completion = await asyncio.wait_for(
+        llm.acomplete(messages=messages, model=decision["model"], priority=PRIORITY_SYNTHESIS, **kwargs),
+        timeout=remaining())
+    answer = completion.choices[0].message.content
+    if decision["tier"] == TIER_FAST:
+        problem = self_check(completion, has_context)
+        left = remaining()
+        if problem and (left is None or left >= CASCADE_MIN_ESCALATE_SECONDS):
+            logger.info(f"[CASCADE] 8B 답변 점검 실패({problem}) -> 70B로 다시 생성")
+            try:
+                completion = await asyncio.wait_for(
+                    llm.acomplete(messages=messages, model=CASCADE_MODELS[TIER_LARGE], priority=PRIORITY_SYNTHESIS, **kwargs),
+                    timeout=left)
+                answer = completion.choices[0].message.content
+                record.update(tier=TIER_LARGE, model=CASCADE_MODELS[TIER_LARGE], escalated=True,
+                              reason=f"{decision['reason']} -> 승격: {problem}")
+            except asyncio.TimeoutError:
+                logger.warning("[CASCADE] 70B 재생성이 제한 시간을 넘겨 8B 답변을 사용합니다.")
+                record["escalation_failed"] = f"{problem} -> 70B 제한 시간 초과"
+            except Exception as e:  # 사용량 제한 / 연결 오류 등: 이미 받은 8B 답변을 버리지 않음
+                logger.warning(f"[CASCADE] 70B 재생성 실패, 8B 답변을 사용합니다: {e}")
+                record["escalation_failed"] = f"{problem} -> 70B 오류: {type(e).__name__}"
+    seconds = time.monotonic() - started
+    record["latency_s"] = round(seconds, 3)
+    _record(record["tier"], record["escalated"], seconds, "escalation_failed" in record)
+    logger.info(f"[CASCADE] {record['tier']} ({record['model']}) 사용: {record['reason']} ({seconds:.2f}s)")
+    return answer, record
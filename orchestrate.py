@@ -6,13 +6,20 @@ import time  # 시간 유틸(지연·측정 등)
 import asyncio  # 비동기 실행(LLM 호출/검색 병렬 처리)
 import logging  # 로깅 구성 및 출력
 from dotenv import load_dotenv  # .env 환경변수 로드
-from groq import Groq, AsyncGroq, RateLimitError  # Groq LLM 클라이언트/예외
+from groq import RateLimitError  # Groq 사용량 제한 예외
+from llm_client import get_llm_client, PRIORITY_ROUTER, PRIORITY_REWRITE  # 공유 LLM 스케줄러
+from deadline import Deadline, deadline_of, ROUTER_BUDGET_SECONDS, EXPERT_BUDGET_SECONDS, SYNTHESIS_RESERVE_SECONDS  # 요청 시간 예산
 from typing import TypedDict, List, Literal, Dict  # 타입 힌트용
 from langchain_core.messages import HumanMessage, AIMessage, BaseMessage  # 메시지 타입
 from langchain_core.documents import Document  # 검색 결과 문서 컨테이너
-from langchain_huggingface import HuggingFaceEmbeddings  # HF 임베딩
-from pymilvus import connections, Collection  # Milvus 연결/컬렉션
+from pymilvus import connections  # Milvus 연결
 from langgraph.graph import StateGraph, END  # 상태 그래프 구성요소
+from embedding_backend import load_embeddings  # 임베딩 백엔드 선택(EMBEDDING_BACKEND=torch|onnx-int8)
+from context_packer import get_context_packer, HISTORY_TOKEN_BUDGET  # 합성 프롬프트 토큰 예산(중복 제거·관련도 배분·문장 단위 자르기)
+from conversation_memory import ConversationMemory  # 대화 기록 길이 제한(최근 턴 원문 + 백그라운드 요약)
+from model_cascade import choose_tier, acascade_complete  # 합성 모델 단계 선택(쉬운 질문 8B → 필요 시 70B)
+from vector_store import open_collection, use_memory_store  # 검색 컬렉션(Milvus, VECTOR_STORE=memory면 메모리 저장소)
+from tracing import span, traced  # 노드/LLM/검색 단계별 지연 span(요청 하나 = trace 하나)
 
 # --- 1. 로깅 및 초기 설정 ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')  # 표준 로깅 포맷/레벨 설정
@@ -20,7 +27,7 @@ logger = logging.getLogger(__name__)  # 모듈 로거 획득
 
 load_dotenv()  # .env 파일에서 API 키 등 환경 변수 로드
 try:
-    async_groq_client = AsyncGroq()  # 비동기 Groq 클라이언트 초기화(환경변수 기반)
+    llm = get_llm_client()  # 모델별 사용량 한도·우선순위 대기열·재시도를 처리하는 공유 LLM 클라이언트
 except Exception as e:
     logger.error(f"Groq 클라이언트를 초기화할 수 없습니다: {e}")  # 초기화 실패 로깅
     exit()  # 치명적 오류 시 종료
@@ -29,9 +36,12 @@ MILVUS_HOST = "localhost"  # Milvus 호스트 주소
 MILVUS_PORT = "19530"  # Milvus 포트
 EMBEDDING_MODEL = "jhgan/ko-sroberta-multitask"  # 한국어 멀티태스크 임베딩 모델
 LLM_TEMPERATURE = 0.7  # 답변 다양성 제어 온도
+REWRITE_MAX_WAIT_SECONDS = 3.0  # 재작성 호출의 최대 한도 대기(초과 시 원래 질문으로 검색)
+ROUTER_MAX_WAIT_SECONDS = 5.0  # 라우터 호출의 최대 한도 대기(초과 시 전체 전문가 호출)
+SEARCH_RESERVE_SECONDS = 1.5  # 전문가 예산 중 검색(임베딩 + Milvus)에 남겨 둘 시간
 
 logger.info("임베딩 모델을 로드합니다...")  # 임베딩 로딩 알림
-embeddings = HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL)  # HuggingFace 임베딩 인스턴스 생성
+embeddings = load_embeddings(EMBEDDING_MODEL)  # 임베딩 인스턴스 생성 (torch 또는 ONNX int8)
 
 # --- 2. 전문가 에이전트 클래스 정의 ---
 class BaseExpertAgent:
@@ -45,9 +55,9 @@ class BaseExpertAgent:
 
         logger.info(f"[{self.name}] Milvus에 연결하고 '{self.collection_name}' 컬렉션을 로드합니다...")  # 연결 로그
         try:
-            if not connections.has_connection("default"):  # 기본 연결 존재 확인
+            if not use_memory_store() and not connections.has_connection("default"):  # 기본 연결 존재 확인 (메모리 저장소면 생략)
                 connections.connect("default", host=MILVUS_HOST, port=MILVUS_PORT)  # Milvus 연결 생성
-            self.collection = Collection(self.collection_name)  # 대상 컬렉션 핸들 획득
+            self.collection = open_collection(self.collection_name)  # 대상 컬렉션 핸들 획득 (VECTOR_STORE=memory면 메모리 저장소)
             self.collection.load()  # 검색 대비 컬렉션 메모리 로드
             logger.info(f"[{self.name}] '{self.collection_name}' 컬렉션 로드 완료.")  # 성공 로그
         except Exception as e:
@@ -57,7 +67,8 @@ class BaseExpertAgent:
     async def _rewrite_query(self, state: dict) -> dict:
         messages = state['messages']  # 현재까지의 대화 메시지
         last_message = messages[-1]  # 최신 사용자 메시지
-        history_str = "\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in messages[:-1]])  # 히스토리 텍스트화
+        deadline = deadline_of(state)  # 이 전문가에게 주어진 시간 예산
+        history_str = memory.history_str(messages)  # 히스토리 텍스트화 (최근 턴 원문 + 이전 대화 요약)
 
         # LLM 프롬프트: 전문성 관련성 판단 후 검색 최적화 질문 1줄 산출 또는 "pass" 반환
         rewrite_prompt = f"""당신은 '{self.name}' 전문가입니다. 당신의 임무는 사용자의 최신 질문이 당신의 전문 분야와 관련이 있는지 판단하고, 관련이 있다면 검색에 최적화된 질문으로 재작성하는 것입니다.
@@ -80,14 +91,22 @@ class BaseExpertAgent:
 - 당신의 출력은 오직 '재작성된 검색용 질문' 또는 "pass" 여야 합니다.
 - 절대 당신의 판단 과정이나 '[판단]', '[재작성]'과 같은 단어를 포함해서는 안 됩니다.
 
-[당신의 최종 출력]:"""
+[당신의 최종 출력]: """
 
-        chat_completion = await async_groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": rewrite_prompt}],  # 단일 유저 프롬프트로 호출
-            model="llama-3.1-8b-instant",  # 경량·고속 모델로 쿼리 재작성
-            temperature=0.0  # 결정적 출력 유도
-        )
-        rewritten_query = chat_completion.choices[0].message.content.strip()  # LLM 응답에서 재작성 쿼리 추출
+        try:
+            chat_completion = await llm.acomplete_hedged(  # p95를 넘기면 같은 요청을 한 번 더 보냄(헤지)
+                messages=[{"role": "user", "content": rewrite_prompt}],  # 단일 유저 프롬프트로 호출
+                model="llama-3.1-8b-instant",  # 경량·고속 모델로 쿼리 재작성
+                temperature=0.0,  # 결정적 출력 유도
+                priority=PRIORITY_REWRITE,  # 답변 합성보다 뒤로 (추측성 호출)
+                max_wait=REWRITE_MAX_WAIT_SECONDS,
+                timeout=deadline.budget_for(reserve=SEARCH_RESERVE_SECONDS)  # 검색 시간은 남겨 둠
+            )
+            rewritten_query = chat_completion.choices[0].message.content.strip() or last_message.content  # LLM 응답에서 재작성 쿼리 추출 (줄바꿈 stop으로 빈 출력이면 원래 질문)
+        except Exception as e:  # LLMQueueTimeout(한도 대기 초과) / asyncio.TimeoutError(제한 시간 초과) 포함
+            # 재작성 실패가 검색 생략("pass")으로 이어지지 않도록 원래 질문으로 검색
+            logger.warning(f"[{self.name}] 질문 재작성 실패, 원래 질문으로 검색합니다: {e}")
+            rewritten_query = last_message.content
         logger.info(f"[{self.name}] 재작성된 질문: {rewritten_query}")  # 재작성 결과 로깅
         return {**state, "rewritten_query": rewritten_query}  # 상태에 재작성 쿼리 추가
 
@@ -98,24 +117,29 @@ class BaseExpertAgent:
             return {**state, "documents": []}  # 공백 문서 반환
 
         logger.info(f"[{self.name}] Retriever 실행 (검색 질문: '{rewritten_query[:30]}...')")  # 검색 시작 로그
-        query_vector = embeddings.embed_query(rewritten_query)  # 텍스트→벡터 변환
+        # 동기 호출은 스레드에서 실행 (이벤트 루프를 막지 않아야 다른 전문가와 제한 시간이 계속 동작)
+        with span("embedding.query"):
+            query_vector = await asyncio.to_thread(embeddings.embed_query, rewritten_query)  # 텍스트→벡터 변환
         search_params = {"metric_type": "L2", "params": {"nprobe": 10}}  # Milvus 검색 파라미터(L2 거리, nprobe=10)
-        results = self.collection.search(data=[query_vector], anns_field="vector", param=search_params, limit=3, output_fields=["text", "source", "page"])  # top-3 검색
-        retrieved_docs = [Document(page_content=hit.entity.get('text')) for hit in results[0]] if results and results[0] else []  # 결과를 Document 리스트로 정규화
+        with span("vector.search", collection=self.collection_name) as sp:
+            results = await asyncio.to_thread(self.collection.search, data=[query_vector], anns_field="vector", param=search_params, limit=3, output_fields=["text", "source", "page"])  # top-3 검색
+            sp.set(hits=len(results[0]) if results else 0)  # 검색 결과 수
+        retrieved_docs = [Document(page_content=hit.entity.get('text'), metadata={"score": hit.distance}) for hit in results[0]] if results and results[0] else []  # 결과를 Document 리스트로 정규화 (score=L2 거리, 합성 예산 배분용)
         logger.info(f"[{self.name}] 검색된 문서 {len(retrieved_docs)}개")  # 검색 결과 개수 로깅
         return {**state, "documents": retrieved_docs}  # 상태에 문서 리스트 추가
 
     def _build_workflow(self):
         workflow = StateGraph(dict)  # 간단한 dict 상태를 쓰는 서브그래프 생성
-        workflow.add_node("rewriter", self._rewrite_query)  # 쿼리 재작성 노드 등록
-        workflow.add_node("retriever", self._retrieve)  # 검색 노드 등록
+        workflow.add_node("rewriter", traced(f"expert.{self.collection_name}.rewriter", expert=self.name)(self._rewrite_query))  # 쿼리 재작성 노드 등록 (span 기록)
+        workflow.add_node("retriever", traced(f"expert.{self.collection_name}.retriever", expert=self.name)(self._retrieve))  # 검색 노드 등록 (span 기록)
         workflow.set_entry_point("rewriter")  # 진입점은 재작성
         workflow.add_edge("rewriter", "retriever")  # 재작성→검색 순서 연결
         workflow.add_edge("retriever", END)  # 검색 후 종료
         return workflow.compile()  # 서브그래프 컴파일
 
-    async def run(self, messages: List[BaseMessage]):
-        return await self.workflow.ainvoke({"messages": messages})  # 메시지를 입력으로 비동기 워크플로우 실행
+    async def run(self, messages: List[BaseMessage], deadline: Deadline = None):
+        with span(f"expert.{self.collection_name}", expert=self.name):  # 전문가 전체 span (제한 시간으로 취소되면 cancelled)
+            return await self.workflow.ainvoke({"messages": messages, "deadline": deadline})  # 메시지·시간 예산을 입력으로 비동기 워크플로우 실행
 
 # --- 3. 메타 에이전트 및 메인 워크플로우 정의 ---
 class MetaAgentState(TypedDict):
@@ -125,16 +149,19 @@ class MetaAgentState(TypedDict):
     # 라우터의 결정(예: "farmer")을 저장하는 'route' 대신,
     # 실행할 전문가 목록(예: ["작물 전문가", "영양 전문가"])을 저장하는 'experts_to_run'을 사용합니다.
     experts_to_run: List[str]  # 실행 대상 전문가 이름 리스트
+    deadline: Deadline  # 요청 전체 시간 예산(노드별 제한 시간 계산)
+    model_tier: dict  # 답변 합성에 사용한 모델 단계 기록(fast/large, 이유, 승격 여부)
 
 # ====[수정된 부분 2: 지능형 LLM 라우터로 업그레이드]====
 # 기존의 정적(farmer, recipe, both) 라우터를
 # LLM이 동적으로 전문가 목록을 생성하는 방식으로 변경합니다.
+@traced("node.router")
 async def llm_router_node(state: MetaAgentState) -> dict:
     """LLM을 사용하여 사용자의 질문 의도를 분석하고 필요한 전문가 목록을 결정합니다."""  # 동적 라우팅 노드
 
     logger.info("\n--- LLM 라우터 실행: 사용자 질문 의도 분석 ---")  # 라우터 시작 로그
     question = state["messages"][-1].content  # 최신 사용자 질문 추출
-    history_str = "\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in state["messages"][:-1]])  # 과거 대화 문자열화
+    history_str = memory.history_str(state["messages"])  # 과거 대화 문자열화 (최근 턴 원문 + 이전 대화 요약)
 
     # 이제 expert_agents 딕셔너리에서 동적으로 전문가 목록을 불러옵니다.
     expert_definitions = "\n".join([f"- {agent.name}: {agent.persona_prompt}" for agent in expert_agents.values()])  # 사용 가능 전문가 목록 구성
@@ -161,12 +188,15 @@ async def llm_router_node(state: MetaAgentState) -> dict:
 - 당신의 최종 출력은 오직 전문가 이름 목록이어야 합니다. (예: 작물 전문가,레시피 전문가)
 - 절대 당신의 분석 과정, 설명, 다른 문장을 포함해서는 안 됩니다.
 
-[실제 분류 결과]:"""
+[실제 분류 결과]: """
     try:
-        chat_completion = await async_groq_client.chat.completions.create(
+        chat_completion = await llm.acomplete_hedged(  # p95를 넘기면 헤지, 제한 시간 초과 시 아래 폴백(전체 호출)
             messages=[{"role": "user", "content": routing_prompt}],  # 라우팅 전용 프롬프트 전송
             model="llama-3.1-8b-instant",  # 빠른 분류용 모델
-            temperature=0.0  # 결정적 선택 유도
+            temperature=0.0,  # 결정적 선택 유도
+            priority=PRIORITY_ROUTER,
+            max_wait=ROUTER_MAX_WAIT_SECONDS,  # 오래 기다려야 하면 아래 폴백(전체 호출)
+            timeout=deadline_of(state).budget_for(ROUTER_BUDGET_SECONDS, reserve=SYNTHESIS_RESERVE_SECONDS)
         )
         selected_experts_str = chat_completion.choices[0].message.content.strip()  # 응답 문자열(전문가 목록)
         # LLM의 출력에서 유효한 전문가 이름만 필터링
@@ -185,34 +215,45 @@ async def llm_router_node(state: MetaAgentState) -> dict:
 # ====[수정된 부분 3: 동적 병렬 실행 노드]====
 # 'run_farmer', 'run_recipe', 'run_both' 노드를 하나로 통합하여
 # 라우터가 결정한 전문가 목록(experts_to_run)에 따라 동적으로 병렬 실행합니다.
+@traced("node.run_experts")
 async def run_selected_experts_node(state: MetaAgentState) -> dict:
     """라우터가 선택한 전문가 에이전트들을 병렬로 실행합니다."""  # 병렬 실행 및 결과 모음
 
     experts_to_run = state['experts_to_run']  # 실행 대상 목록
     messages = state['messages']  # 전체 대화(질의·컨텍스트)
+    # 전문가 단계 제한 시간: 합성에 쓸 시간을 남긴 범위에서 EXPERT_BUDGET_SECONDS까지
+    budget = deadline_of(state).budget_for(EXPERT_BUDGET_SECONDS, reserve=SYNTHESIS_RESERVE_SECONDS)
+    expert_deadline = Deadline(budget)  # 전문가 서브그래프(재작성→검색)에 전달할 예산
 
-    tasks = []  # asyncio.gather용 작업 리스트
-    valid_experts_to_run = []  # 유효한 이름만 저장
+    tasks = {}  # 태스크 → 전문가 이름
     for expert_name in experts_to_run:
         if expert_name in expert_agents:  # 등록 여부 확인
             logger.info(f"\n>> {expert_name} 실행...")  # 실행 로그
-            tasks.append(expert_agents[expert_name].run(messages))  # 각 에이전트 서브그래프 실행 태스크 생성
-            valid_experts_to_run.append(expert_name)  # 이름 기록
+            tasks[asyncio.ensure_future(expert_agents[expert_name].run(messages, expert_deadline))] = expert_name  # 서브그래프 실행 태스크 생성
 
     if not tasks:
         logger.info("실행할 전문가가 없습니다.")  # 방어 코드
         return {"expert_docs": {}}  # 빈 결과
 
-    # 선택된 전문가들을 동시에 실행
-    results = await asyncio.gather(*tasks)  # 병렬 실행 후 결과 수집
+    # 선택된 전문가들을 동시에 실행하고, 제한 시간 안에 끝난 전문가만 사용
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    for task in pending:
+        task.cancel()  # 늦은 전문가는 취소 (합성은 끝난 전문가 자료로 진행)
+    if pending:
+        logger.warning(f"제한 시간({budget:.1f}s)을 넘긴 전문가 제외: {[tasks[t] for t in pending]}")
 
     # 결과를 expert_docs에 매핑
     expert_docs = {}
-    for i, expert_name in enumerate(valid_experts_to_run):
-        expert_docs[expert_name] = results[i].get("documents", [])  # 전문가별 문서 리스트 저장
+    for task in done:
+        expert_name = tasks[task]
+        if task.exception() is not None:  # 한 전문가의 오류가 전체 답변을 막지 않도록
+            logger.error(f"[{expert_name}] 실행 중 오류: {task.exception()}")
+            continue
+        expert_docs[expert_name] = task.result().get("documents", [])  # 전문가별 문서 리스트 저장
 
     return {"expert_docs": expert_docs}  # 다음 노드용 컨텍스트 반환
 
+@traced("node.synthesizer")
 async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
     """각 전문가가 검색한 '원본 문서'를 종합하여 최종 답변을 생성합니다."""  # 합성·후처리 노드
 
@@ -220,13 +261,19 @@ async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
     messages = state['messages']  # 대화 히스토리
     expert_docs = state['expert_docs']  # 전문가별 문서
 
+    packer = get_context_packer()
+    with span("context.pack") as sp:
+        packed, pack_stats = await asyncio.to_thread(packer.pack, expert_docs)  # 전문가 간 중복 제거 + 관련도 비례 토큰 예산 (첫 호출은 토크나이저 로드라 스레드에서)
+        sp.set(tokens_in=pack_stats["tokens_in"], tokens_packed=pack_stats["tokens_packed"], duplicates=pack_stats["duplicates"])
+    model_tier = None  # 자료가 없으면 LLM 호출 없음
     context = ""  # 합성용 원문 컨텍스트
-    for name, docs in expert_docs.items():
-        if docs:
-            context += f"### {name}가 찾은 관련 정보\n"  # 섹션 헤더
-            for doc in docs:
-                context += f"- {doc.page_content}\n"  # 원문 내용 나열
-            context += "\n"
+    for name, texts in packed.items():
+        context += f"### {name}가 찾은 관련 정보\n"  # 섹션 헤더
+        for text in texts:
+            context += f"- {text}\n"  # 원문 내용 나열
+        context += "\n"
+    # 대화 기록도 최근 내용 위주로 토큰 상한 적용 (f-string 안에는 역슬래시를 쓸 수 없어 미리 계산)
+    history_str = packer.truncate_tail(memory.history_str(messages), HISTORY_TOKEN_BUDGET)
 
     if not context:
         final_answer = "죄송하지만, 문의하신 내용과 관련된 정보를 데이터베이스에서 찾지 못했습니다."  # 자료 없음 대응
@@ -235,7 +282,7 @@ async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
         synth_prompt = f"""당신은 여러 전문가가 찾아온 '원본 참고 자료'를 모두 검토하여, 사용자의 질문에 대한 하나의 완벽하고 일관된 답변을 작성하는 '수석 AI 커뮤니케이터'입니다.
 
 [이전 대화 기록]
-{"\n".join([f"{'사용자' if isinstance(msg, HumanMessage) else '챗봇'}: {msg.content}" for msg in messages[:-1]])}
+{history_str}
 
 [사용자의 최신 질문]
 {messages[-1].content}
@@ -258,15 +305,29 @@ async def synthesize_final_answer_node(state: MetaAgentState) -> dict:
 
 [실제 작업]
 [최종 답변]"""
-        chat_completion = await async_groq_client.chat.completions.create(
-            messages=[{"role": "user", "content": synth_prompt}],  # 합성 프롬프트 전달
-            model="llama-3.3-70b-versatile",  # 고성능 모델로 자연스러운 종합 답변 생성
-            temperature=LLM_TEMPERATURE  # 약간의 다양성 허용
-        )
-        final_answer = chat_completion.choices[0].message.content  # 최종 답변 텍스트
+        # 단일 전문가·짧은 자료·높은 검색 확신도면 8B, 아니면 70B (8B 답변이 점검에 걸리면 70B로 승격)
+        decision = choose_tier(state['experts_to_run'], expert_docs, pack_stats["tokens_packed"])
+        try:
+            final_answer, model_tier = await acascade_complete(
+                llm, [{"role": "user", "content": synth_prompt}], decision, has_context=True,  # 합성 프롬프트 전달
+                timeout=deadline_of(state).budget_for(),  # 남은 예산 전부 사용
+                temperature=LLM_TEMPERATURE  # 약간의 다양성 허용
+            )
+        except asyncio.TimeoutError:
+            logger.warning("답변 합성이 제한 시간을 넘겨 검색 자료로 대신 답합니다.")  # 부분 답변 폴백
+            final_answer, model_tier = partial_answer(expert_docs), {**decision, "timed_out": True}
 
     final_messages = messages + [AIMessage(content=final_answer)]  # 대화에 AI 답변 추가
-    return {**state, "messages": final_messages}  # 상태 갱신 후 반환
+    return {**state, "messages": final_messages, "model_tier": model_tier}  # 상태 갱신 후 반환 (사용 모델 단계 기록 포함)
+
+def partial_answer(expert_docs: Dict[str, List[Document]]) -> str:
+    """합성 시간 초과 시 전문가별 자료 일부를 그대로 보여주는 대체 답변"""
+    lines = ["답변 생성이 지연되어 찾은 자료를 먼저 전해 드립니다."]
+    for name, docs in expert_docs.items():
+        if docs:
+            lines.append(f"[{name}]")  # 전문가 이름
+            lines += [f"- {doc.page_content[:200]}" for doc in docs[:2]]  # 자료 앞부분
+    return "\n".join(lines)
 
 # --- 4. 메인 워크플로우 구축 및 실행 ---
 
@@ -312,21 +373,29 @@ app = main_workflow.compile()
 
 # 4) 대화 상태(메모리) 초기값
 current_state = {"messages": [], "expert_docs": {}, "experts_to_run": []}
+memory = ConversationMemory()  # 라우터·재작성·합성이 쓰는 대화 기록 (최근 턴 원문 + 이전 대화 요약)
 
 
 # 5) 웹/서버에서 한 번 질문 → 한 번 답변용 함수
-async def ask_experts(user_input: str) -> str:
+async def ask_experts(user_input: str, request_id: str = None) -> str:
     """
     웹 서버(Flask)나 다른 코드에서 호출할 수 있는
-    '한 번 질문 → 한 번 답변' 함수
+    '한 번 질문 → 한 번 답변' 함수 (request_id: 추적 ID, 생략 시 새로 만듦)
     """
     global current_state
 
     # 사용자 메시지 히스토리에 추가
-    current_state["messages"].append(HumanMessage(content=user_input))
+    user_message = HumanMessage(content=user_input)
+    current_state["messages"].append(user_message)
 
-    # LangGraph 실행
-    final_state = await app.ainvoke(current_state)
+    # LangGraph 실행 (실패 시 답이 없는 질문을 히스토리에서 빼서 다음 턴의 대화 기록이 어긋나지 않게 함)
+    try:
+        with span("ask_experts", trace_id=request_id, turn=len(current_state["messages"]) // 2):  # 요청 루트 span
+            final_state = await app.ainvoke({**current_state, "deadline": Deadline()})  # 질문마다 새 시간 예산
+    except Exception:
+        # 마지막 메시지가 아니라 이번에 넣은 질문 객체를 뺌 (그사이 다른 요청이 질문을 붙였을 수 있음)
+        current_state["messages"][:] = [m for m in current_state["messages"] if m is not user_message]
+        raise
 
     # 다음 질문을 위해 상태 업데이트 (문서/라우팅 정보는 비움)
     current_state = {
@@ -334,6 +403,7 @@ async def ask_experts(user_input: str) -> str:
         "expert_docs": {},
         "experts_to_run": [],
     }
+    memory.after_turn(current_state["messages"])  # 밀려난 턴 요약은 백그라운드에서 (응답을 기다리게 하지 않음)
 
     # 최신 AI 메시지(챗봇 답변) 추출
     final_bot_message = final_state["messages"][-1]
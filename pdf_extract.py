@@ -0,0 +1,165 @@
+# [개요] 수백 쪽짜리 PDF(영농 매뉴얼 등)의 텍스트 추출을 페이지 구간 단위로 여러 프로세스에 나눠 처리합니다.
+# - 기존 PyPDFLoader(...).load_and_split()과 같은 결과(페이지별 Document, metadata["page"]는 0부터)를 만듭니다.
+# - 백엔드: pymupdf(설치되어 있으면, 훨씬 빠름) 또는 pypdf(PyPDFLoader와 같은 추출기)
+# - 빈 페이지와 같은 문서 안에서 텍스트가 반복되는 페이지(표지/판권/간지 등)는 해시로 판별해 건너뜁니다.
+# 추출 프로세스는 플랫폼과 관계없이 spawn으로 띄웁니다. (리눅스 기본값 fork는 멀티스레드 프로세스를 그대로 복사함)
+# 작업 함수는 이 모듈의 최상위 함수라 자식에게 필요한 것은 pdf_extract뿐이지만, spawn 자식은 부모의 __main__ 스크립트를
+# __mp_main__이라는 이름으로 다시 import합니다. (그 스크립트가 import하는 db_load 등도 함께) 그래서 db_load.py와 App.py는
+# 모듈 수준의 무거운 초기화(로그 파일 핸들러, 그래프 생성, 모델/Milvus/Groq 준비)를 in_spawned_worker()가 False일 때만 실행합니다.
+# 웹 서버의 업로드 적재는 이 풀을 쓰지 않고 현재 프로세스에서 추출합니다. (upload_ingest.UPLOAD_PDF_WORKERS)
+
+import os  # CPU 수 / 환경 변수
+import time  # 추출 속도(pages/s) 측정
+import logging  # 로그 기록
+import threading  # 프로세스 풀 지연 생성 보호
+import multiprocessing  # spawn 컨텍스트
+from concurrent.futures import ProcessPoolExecutor  # 페이지 구간 병렬 추출
+from typing import Dict, List, Optional, Set, Tuple  # 타입 힌트
+
+from langchain_core.documents import Document  # LangChain 표준 문서 객체
+
+from chunk_dedup import normalize_text, text_hash  # 조각 중복 제거와 같은 정규화/해시
+
+# === 선택적 의존성: PyMuPDF가 있으면 빠른 추출 백엔드 사용 ===
+try:
+    import pymupdf  # PyMuPDF 1.24+
+    HAS_PYMUPDF = True
+except ImportError:
+    try:
+        import fitz as pymupdf  # 구버전 PyMuPDF
+        HAS_PYMUPDF = True
+    except ImportError:
+        HAS_PYMUPDF = False
+
+# === 선택적 의존성: pypdf (PyPDFLoader가 내부적으로 사용하는 추출기) ===
+try:
+    import pypdf
+    HAS_PYPDF = True
+except ImportError:
+    HAS_PYPDF = False
+
+logger = logging.getLogger(__name__)
+
+BACKEND_AUTO = "auto"
+BACKEND_PYMUPDF = "pymupdf"
+BACKEND_PYPDF = "pypdf"
+PDF_BACKEND = os.getenv("PDF_BACKEND", BACKEND_AUTO).strip().lower()  # auto면 pymupdf 우선, 없으면 pypdf
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", "0"))  # 추출 프로세스 수 (0이면 CPU 수 - 1, 최대 8)
+PDF_PAGES_PER_TASK = 16  # 프로세스 하나가 한 번에 맡는 페이지 수
+PDF_PARALLEL_MIN_PAGES = 32  # 이보다 짧은 PDF는 프로세스 전달 비용이 더 커서 현재 프로세스에서 추출
+PDF_SKIP_DUPLICATE_PAGES = True  # 같은 문서 안에서 텍스트가 같은 페이지는 한 번만 사용
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def in_spawned_worker() -> bool:
+    """
+    추출 프로세스(spawn 자식) 안이면 True. 부모의 __main__ 스크립트를 다시 import하는 준비 단계(_inheriting)도 포함하므로,
+    스크립트와 그 스크립트가 import하는 모듈이 모듈 수준 초기화를 건너뛸 때 씁니다.
+    """
+    return multiprocessing.parent_process() is not None or getattr(multiprocessing.current_process(), "_inheriting", False)
+
+
+def _default_workers() -> int:
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def resolve_backend(backend: Optional[str] = None) -> str:
+    """설정값(auto/pymupdf/pypdf)을 실제 사용할 백엔드로 바꿉니다. 사용할 수 있는 백엔드가 없으면 ImportError."""
+    backend = (backend or PDF_BACKEND).lower()
+    if backend == BACKEND_AUTO:
+        backend = BACKEND_PYMUPDF if HAS_PYMUPDF else BACKEND_PYPDF
+    if backend == BACKEND_PYMUPDF and not HAS_PYMUPDF:
+        raise ImportError("pymupdf 백엔드에는 PyMuPDF가 필요합니다: pip install pymupdf")
+    if backend == BACKEND_PYPDF and not HAS_PYPDF:
+        raise ImportError("pypdf 백엔드에는 pypdf가 필요합니다: pip install pypdf")
+    if backend not in (BACKEND_PYMUPDF, BACKEND_PYPDF):
+        raise ValueError(f"알 수 없는 PDF 백엔드: {backend} (auto, pymupdf, pypdf)")
+    return backend
+
+
+def page_count(file_path: str, backend: str) -> int:
+    if backend == BACKEND_PYMUPDF:
+        with pymupdf.open(file_path) as doc:
+            return doc.page_count
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def extract_page_range(file_path: str, start: int, end: int, backend: str) -> List[Tuple[int, str]]:
+    """[start, end) 페이지의 (페이지 번호, 텍스트) 목록. 자식 프로세스에서 실행되므로 파일을 직접 엽니다."""
+    pages = []
+    if backend == BACKEND_PYMUPDF:
+        with pymupdf.open(file_path) as doc:
+            for i in range(start, min(end, doc.page_count)):
+                pages.append((i, doc.load_page(i).get_text("text")))
+    else:
+        reader = pypdf.PdfReader(file_path)
+        for i in range(start, min(end, len(reader.pages))):
+            pages.append((i, reader.pages[i].extract_text() or ""))
+    return pages
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """추출용 프로세스 풀 (파일마다 새로 띄우지 않고 프로세스 전체에서 공유)"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def shutdown_pool():
+    """추출용 프로세스 풀을 종료합니다. (db_load의 IngestResources.close()에서 호출)"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True)
+            _pool = None
+
+
+def extract_pdf_pages(file_path: str, backend: Optional[str] = None, workers: int = PDF_WORKERS,
+                      pages_per_task: int = PDF_PAGES_PER_TASK, skip_duplicates: bool = PDF_SKIP_DUPLICATE_PAGES,
+                      stats: Optional[Dict] = None) -> List[Document]:
+    """
+    PDF를 페이지별 Document 리스트로 추출합니다. (분할 전, metadata: source=파일명, page=0부터 시작하는 페이지 번호)
+    긴 문서는 페이지 구간을 프로세스 풀에 나눠 추출하고, 결과는 페이지 순서대로 합칩니다.
+    skip_duplicates면 같은 문서 안에서 텍스트가 반복되는 페이지를 건너뜁니다. (다른 파일과의 반복은 조각 중복 제거가 소유 기록과 함께 처리)
+    stats에 dict를 넘기면 pages / skipped_pages / seconds / pages_per_second / backend를 채웁니다.
+    """
+    started = time.perf_counter()
+    backend = resolve_backend(backend)
+    filename = os.path.basename(file_path)
+    total = page_count(file_path, backend)
+    workers = workers or _default_workers()
+    step = max(1, pages_per_task)
+
+    if workers > 1 and total >= PDF_PARALLEL_MIN_PAGES:
+        pool = _get_pool(workers)
+        futures = [pool.submit(extract_page_range, file_path, s, s + step, backend) for s in range(0, total, step)]
+        pages = [p for fut in futures for p in fut.result()]  # 제출 순서 = 페이지 순서
+    else:
+        pages = extract_page_range(file_path, 0, total, backend)
+
+    seen: Set[str] = set()  # 이 문서에서 이미 나온 페이지 텍스트 해시
+    docs, skipped = [], 0
+    for page_no, text in pages:
+        normalized = normalize_text(text)
+        if not normalized:
+            skipped += 1  # 빈 페이지 (스캔 이미지만 있는 페이지 등)
+            continue
+        if skip_duplicates:
+            h = text_hash(normalized)
+            if h in seen:
+                skipped += 1
+                continue
+            seen.add(h)
+        docs.append(Document(page_content=text, metadata={"source": filename, "page": page_no}))
+
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else 0.0
+    logger.info(f"PDF 추출 완료: {filename} ({backend}, {total}쪽, 건너뜀 {skipped}쪽, {elapsed:.2f}s, {rate:.1f} pages/s)")
+    if stats is not None:
+        stats.update({"backend": backend, "pages": total, "skipped_pages": skipped,
+                      "seconds": elapsed, "pages_per_second": rate})
+    return docs
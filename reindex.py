@@ -0,0 +1,316 @@
+# [개요] Milvus 컬렉션 별칭(alias)을 이용한 무중단 블루/그린 재색인 도구입니다.
+# 스키마·임베딩 모델·인덱스 유형을 바꿀 때 서비스 중인 컬렉션을 지우지 않고,
+#   1) 새 실제 컬렉션 '<별칭>_v<시각>'(섀도)을 대량 적재 모드로 만들고
+#   2) 행 수와 표본 검색 재현율(recall)로 검증한 뒤
+#   3) 검색 쪽(App.py / orchestrate.py / 에이전트)이 쓰는 별칭을 새 컬렉션으로 한 번에 전환합니다.
+# 전환 이력은 REINDEX_HISTORY_PATH(JSON)에 남아 rollback으로 이전 컬렉션으로 되돌릴 수 있습니다.
+#
+# 사용 예:
+#   python reindex.py build --alias farmer --config ingest_config.yaml --switch
+#   python reindex.py status --alias farmer
+#   python reindex.py rollback --alias farmer
+#   python reindex.py drop-old --alias farmer --keep 1
+
+import os  # 파일 경로
+import json  # 전환 이력 저장
+import time  # 버전 이름 / 시각
+import random  # 검증용 표본 추출
+import logging  # 로그 기록
+import argparse  # 명령행 인자
+from typing import Dict, List, Optional  # 타입 힌트
+
+from pymilvus import connections, utility, Collection  # Milvus 별칭/컬렉션 관리
+
+import db_load  # 컬렉션 준비, 적재, 대량 적재 마무리 재사용
+from chunk_dedup import ChunkDeduplicator  # 기존 컬렉션 이름 변경 시 조각 해시 이관
+from embedding_backend import EMBEDDING_BACKEND  # 섀도 컬렉션에 사용한 백엔드 기록
+
+logger = logging.getLogger(__name__)
+
+REINDEX_HISTORY_PATH = "reindex_history.json"  # 별칭 전환 이력 파일
+MIN_ROW_RATIO = 0.95  # 섀도 행 수 / 현재 행 수 하한 (임베딩·인덱스만 바꾸면 거의 1.0이어야 함)
+MIN_RECALL = 0.9  # 표본 자기 검색 재현율 하한 (표본 조각이 자기 자신을 top-k 안에서 찾는 비율)
+RECALL_SAMPLES = 50  # 재현율 검증에 쓰는 표본 조각 수
+SAMPLE_SCAN_BATCH = 10000  # 표본 추출 시 id만 훑는 페이지 크기
+RECALL_TOP_K = 5  # 재현율 검증 top-k
+
+
+# ==============================================================================
+# 1. 전환 이력 (History)
+# ==============================================================================
+def load_history(path: str = REINDEX_HISTORY_PATH) -> Dict[str, List[Dict]]:
+    """별칭별 전환 이력 {별칭: [{collection, previous, switched_at, ...}, ...]} (오래된 것부터)"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_history(history: Dict[str, List[Dict]], path: str = REINDEX_HISTORY_PATH):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)  # 쓰는 도중 중단되어도 이전 이력 파일은 온전히 유지
+
+
+# ==============================================================================
+# 2. 별칭 조회/전환 (Alias)
+# ==============================================================================
+def alias_target(alias: str) -> Optional[str]:
+    """별칭이 가리키는 실제 컬렉션 이름. 별칭이 아니라 같은 이름의 실제 컬렉션이거나 없으면 None."""
+    if not utility.has_collection(alias):
+        return None
+    target = db_load.physical_collection_name(alias)
+    return target if target != alias else None
+
+
+def switch_alias(alias: str, collection_name: str, info: Optional[Dict] = None) -> Dict:
+    """
+    별칭을 collection_name으로 전환하고 이력을 기록합니다.
+    - 별칭이 이미 있으면 alter_alias 한 번으로 원자적으로 전환합니다.
+    - 별칭 도입 전처럼 같은 이름의 실제 컬렉션이 있으면, 그 컬렉션을 '<별칭>_v<시각>_legacy'로 이름을 바꾸고
+      곧바로 별칭을 만듭니다. (이름 변경과 별칭 생성 사이의 아주 짧은 순간에만 검색이 실패할 수 있음)
+    """
+    new_col = Collection(collection_name)
+    new_col.load()  # 전환 즉시 검색 가능하도록 미리 로드 (이미 로드되어 있으면 즉시 반환)
+
+    previous = alias_target(alias)
+    if previous == collection_name:
+        logger.info(f"별칭 '{alias}'은(는) 이미 '{collection_name}'을(를) 가리킵니다.")
+        return {}
+    if previous is not None:
+        utility.alter_alias(collection_name=collection_name, alias=alias)
+    elif utility.has_collection(alias):
+        previous = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}_legacy"
+        utility.rename_collection(alias, previous)
+        utility.create_alias(collection_name=collection_name, alias=alias)
+        # 적재 기록(매니페스트/조각 해시)도 바뀐 이름으로 옮겨 롤백 후 증분 적재가 이어지도록 함
+        manifest = db_load.IngestManifest(db_load.MANIFEST_PATH)
+        try:
+            manifest.rename_collection(alias, previous)
+            ChunkDeduplicator(manifest, alias).rename_collection(previous)
+        finally:
+            manifest.close()
+        logger.info(f"기존 컬렉션 '{alias}'의 이름을 '{previous}'(으)로 바꾸고 별칭으로 전환했습니다.")
+    else:
+        utility.create_alias(collection_name=collection_name, alias=alias)
+
+    entry = dict(info or {}, collection=collection_name, previous=previous, switched_at=time.strftime("%Y-%m-%d %H:%M:%S"))
+    history = load_history()
+    history.setdefault(alias, []).append(entry)
+    save_history(history)
+    logger.info(f"별칭 '{alias}' 전환 완료: {previous} -> {collection_name}")
+    return entry
+
+
+def rollback(alias: str) -> Optional[str]:
+    """마지막 전환을 되돌려 별칭을 이전 컬렉션으로 돌립니다. 돌아간 컬렉션 이름을 반환합니다."""
+    history = load_history()
+    entries = history.get(alias) or []
+    if not entries or not entries[-1].get("previous"):
+        logger.error(f"별칭 '{alias}'에 되돌릴 이전 컬렉션 이력이 없습니다.")
+        return None
+    last = entries[-1]
+    previous = last["previous"]
+    if not utility.has_collection(previous):
+        logger.error(f"이전 컬렉션 '{previous}'이(가) 이미 삭제되어 되돌릴 수 없습니다.")
+        return None
+    Collection(previous).load()
+    utility.alter_alias(collection_name=previous, alias=alias)
+    entries.pop()
+    save_history(history)
+    logger.info(f"별칭 '{alias}' 롤백 완료: {last['collection']} -> {previous}")
+    return previous
+
+
+# ==============================================================================
+# 3. 섀도 컬렉션 구축과 검증 (Build & Validate)
+# ==============================================================================
+def _search_params(collection: Collection) -> Dict:
+    """컬렉션 인덱스 유형에 맞는 검증용 검색 파라미터 (App.py와 같은 L2 거리)"""
+    index_type = ""
+    if collection.indexes:
+        index_type = (collection.indexes[0].params or {}).get("index_type", "")
+    if index_type.upper() == "HNSW":
+        return {"metric_type": "L2", "params": {"ef": 64}}
+    return {"metric_type": "L2", "params": {"nprobe": 16}}
+
+
+def _sample_ids(collection: Collection, k: int) -> List[int]:
+    """
+    컬렉션의 id만 페이지 단위로 끝까지 훑으며 k개를 고르게 뽑습니다. (저수지 표집)
+    자동 id는 연속이 아니라 범위에서 무작위 값을 고를 수 없고, 앞쪽 페이지만 쓰면 처음 적재한 파일로 표본이 치우칩니다.
+    """
+    picked: List[int] = []
+    for n, row in enumerate(db_load.iter_rows(collection, "id >= 0", ["id"], batch_size=SAMPLE_SCAN_BATCH)):
+        if n < k:
+            picked.append(row["id"])
+        else:
+            j = random.randint(0, n)
+            if j < k:
+                picked[j] = row["id"]
+    return picked
+
+
+def validate_shadow(shadow: Collection, active_name: Optional[str], embeddings,
+                    min_row_ratio: float = MIN_ROW_RATIO, min_recall: float = MIN_RECALL,
+                    samples: int = RECALL_SAMPLES, top_k: int = RECALL_TOP_K) -> Dict:
+    """섀도 컬렉션의 행 수(현재 컬렉션 대비)와 표본 자기 검색 재현율을 검사해 결과 dict를 반환합니다."""
+    rows = shadow.num_entities
+    result = {"rows": rows, "active_rows": None, "row_ratio": None, "recall": None, "ok": rows > 0}
+    if active_name and utility.has_collection(active_name):
+        active_rows = Collection(active_name).num_entities
+        result["active_rows"] = active_rows
+        if active_rows:
+            result["row_ratio"] = round(rows / active_rows, 4)
+            result["ok"] &= result["row_ratio"] >= min_row_ratio
+    if rows:
+        # 표본 조각의 텍스트로 검색했을 때 그 조각 자신이 top-k에 나오는지 확인 (인덱스/임베딩 이상 탐지)
+        ids = _sample_ids(shadow, samples)
+        picked = shadow.query(expr=f"id in [{', '.join(map(str, ids))}]", output_fields=["id", "text"]) if ids else []
+        vectors = embeddings.embed_documents([r["text"] for r in picked])
+        hits = shadow.search(data=vectors, anns_field="vector", param=_search_params(shadow), limit=top_k)
+        found = sum(1 for r, hit in zip(picked, hits) if r["id"] in {h.id for h in hit})
+        result["recall"] = round(found / len(picked), 4) if picked else None
+        result["ok"] &= result["recall"] is None or result["recall"] >= min_recall
+    logger.info(f"섀도 컬렉션 검증 결과: {result}")
+    return result
+
+
+def build_shadow(alias: str, data_path: str, resources: "db_load.IngestResources",
+                 index_params: Optional[dict] = None) -> Collection:
+    """'<별칭>_v<시각>' 이름의 새 컬렉션을 대량 적재 모드로 만들어 적재하고 인덱스 생성/로드까지 마칩니다."""
+    shadow_name = f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+    logger.info(f"섀도 컬렉션 '{shadow_name}' 구축을 시작합니다. (데이터: {data_path})")
+    shadow = db_load.setup_milvus_collection(shadow_name, resources.dimension, index_params, defer_index=True)
+    db_load.process_and_ingest_data(shadow, data_path, resources, shadow_name, index_deferred=not shadow.has_index())
+    if not shadow.has_index():
+        db_load.finalize_bulk_load(shadow, index_params)
+    return shadow
+
+
+# ==============================================================================
+# 4. 명령행 (CLI)
+# ==============================================================================
+def _target_from_config(args) -> Dict:
+    """--config의 컬렉션 설정(data_path, index)과 명령행 옵션을 합칩니다. (명령행이 우선)"""
+    target: Dict = {}
+    embedding_cfg: Dict = {}
+    if args.config:
+        config = db_load.load_ingest_config(args.config)
+        target = dict(config["collections"].get(args.alias) or {})
+        embedding_cfg = config.get("embedding") or {}
+    if args.data_path:
+        target["data_path"] = args.data_path
+    if args.index_type:
+        target["index"] = {"index_type": args.index_type, "metric_type": "L2", "params": json.loads(args.index_params)}
+    target["model"] = args.model or embedding_cfg.get("model", db_load.EMBEDDING_MODEL)
+    target["dimension"] = int(args.dimension or embedding_cfg.get("dimension", db_load.DIMENSION))
+    if not target.get("data_path"):
+        raise SystemExit(f"'{args.alias}'의 data_path가 없습니다. --data-path 또는 --config를 지정하세요.")
+    return target
+
+
+def cmd_build(args):
+    target = _target_from_config(args)
+    resources = db_load.IngestResources(embedding_model=target["model"], dimension=target["dimension"])
+    try:
+        shadow = build_shadow(args.alias, target["data_path"], resources, target.get("index"))
+        active = alias_target(args.alias) or (args.alias if utility.has_collection(args.alias) else None)
+        result = validate_shadow(shadow, active, resources.embeddings, args.min_row_ratio, args.min_recall)
+    finally:
+        resources.close()
+    info = {"model": target["model"], "backend": EMBEDDING_BACKEND, "dimension": target["dimension"],
+            "index": target.get("index") or db_load.DEFAULT_INDEX_PARAMS, "validation": result}
+    if target["model"] != db_load.EMBEDDING_MODEL:
+        logger.warning(f"섀도 컬렉션의 임베딩 모델({target['model']})이 검색 쪽 EMBEDDING_MODEL과 다릅니다. "
+                       f"전환 전에 App.py / orchestrate.py / 에이전트의 모델 설정도 함께 바꾸세요.")
+    if not result["ok"]:
+        logger.error(f"검증 실패로 전환하지 않습니다. 섀도 컬렉션 '{shadow.name}'은(는) 확인 후 삭제하세요.")
+        raise SystemExit(1)
+    if args.switch:
+        switch_alias(args.alias, shadow.name, info)
+    else:
+        logger.info(f"검증 통과. 전환하려면: python reindex.py switch --alias {args.alias} --collection {shadow.name}")
+
+
+def cmd_switch(args):
+    switch_alias(args.alias, args.collection, {"manual": True})
+
+
+def cmd_rollback(args):
+    if rollback(args.alias) is None:
+        raise SystemExit(1)
+
+
+def cmd_status(args):
+    print(json.dumps({"alias": args.alias, "target": alias_target(args.alias),
+                      "history": load_history().get(args.alias, [])}, ensure_ascii=False, indent=2))
+
+
+def cmd_drop_old(args):
+    """현재 별칭 대상과 최근 --keep개의 이전 컬렉션을 제외한 '<별칭>_v*' 컬렉션을 삭제합니다."""
+    current = alias_target(args.alias)
+    history = load_history().get(args.alias, [])
+    keep = {current} | ({e.get("previous") for e in history[-args.keep:]} if args.keep else set())
+    for name in utility.list_collections():
+        if name.startswith(f"{args.alias}_v") and name not in keep:
+            utility.drop_collection(name)
+            logger.info(f"이전 컬렉션 삭제: {name}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Milvus 별칭 기반 무중단 블루/그린 재색인")
+    parser.add_argument("--host", default=None, help="Milvus 호스트 (기본: db_load.MILVUS_HOST)")
+    parser.add_argument("--port", default=None, help="Milvus 포트 (기본: db_load.MILVUS_PORT)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="섀도 컬렉션을 구축/검증하고 (--switch면) 별칭을 전환")
+    p.add_argument("--alias", required=True, help="검색 쪽이 사용하는 컬렉션 이름 (예: farmer)")
+    p.add_argument("--config", help="적재 설정 파일 (data_path, index, embedding 사용)")
+    p.add_argument("--data-path", help="적재할 데이터 폴더 (설정 파일보다 우선)")
+    p.add_argument("--model", help="섀도 컬렉션에 사용할 임베딩 모델")
+    p.add_argument("--dimension", type=int, help="임베딩 차원")
+    p.add_argument("--index-type", help="벡터 인덱스 유형 (예: IVF_FLAT, HNSW)")
+    p.add_argument("--index-params", default='{"nlist": 128}', help='인덱스 파라미터 JSON (예: \'{"M": 16, "efConstruction": 200}\')')
+    p.add_argument("--min-row-ratio", type=float, default=MIN_ROW_RATIO)
+    p.add_argument("--min-recall", type=float, default=MIN_RECALL)
+    p.add_argument("--switch", action="store_true", help="검증을 통과하면 바로 별칭 전환")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("switch", help="별칭을 지정한 컬렉션으로 전환")
+    p.add_argument("--alias", required=True)
+    p.add_argument("--collection", required=True)
+    p.set_defaults(func=cmd_switch)
+
+    p = sub.add_parser("rollback", help="마지막 전환을 되돌림")
+    p.add_argument("--alias", required=True)
+    p.set_defaults(func=cmd_rollback)
+
+    p = sub.add_parser("status", help="별칭의 현재 대상과 전환 이력 출력")
+    p.add_argument("--alias", required=True)
+    p.set_defaults(func=cmd_status)
+
+    p = sub.add_parser("drop-old", help="롤백용으로 남길 개수를 제외한 이전 버전 컬렉션 삭제")
+    p.add_argument("--alias", required=True)
+    p.add_argument("--keep", type=int, default=1, help="남겨 둘 이전 컬렉션 수")
+    p.set_defaults(func=cmd_drop_old)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    milvus_cfg: Dict = {}
+    if getattr(args, "config", None):
+        milvus_cfg = db_load.load_ingest_config(args.config).get("milvus") or {}
+    db_load.connect_milvus(args.host or milvus_cfg.get("host"),
+                           args.port or (str(milvus_cfg["port"]) if milvus_cfg.get("port") else None))
+    try:
+        args.func(args)
+    finally:
+        if connections.has_connection("default"):
+            connections.disconnect("default")
+
+
+if __name__ == "__main__":
+    main()
@@ -7,14 +7,15 @@ from flask import (
     stream_with_context,
 )
 from flask_cors import CORS
-import asyncio
 import time
 import json
 
 import orchestrate  # 같은 폴더의 orchestrate.py (async def ask_experts(...) 있어야 함)
+from llm_transport import run_async, warm_up  # 공유 이벤트 루프 + 연결 풀 예열
 
 app = Flask(__name__)
 CORS(app)  # React 개발 서버(예: http://localhost:5173)에서 오는 요청 허용
+warm_up()  # Groq 연결을 미리 맺어 첫 질문의 연결 지연 제거 (백그라운드)
 
 
 # ---------------------------------------------------------
@@ -33,8 +34,8 @@ def chat():
         return jsonify({"error": "message 필드가 비어 있습니다."}), 400
 
     try:
-        # ask_experts 는 async 함수라 asyncio.run 으로 감싸서 실행
-        answer = asyncio.run(orchestrate.ask_experts(user_input))
+        # ask_experts 는 async 함수라 공유 이벤트 루프(run_async)에서 실행 (연결 풀 재사용)
+        answer = run_async(orchestrate.ask_experts(user_input, request.headers.get("X-Request-ID")))
         return jsonify({"answer": answer})
 
     except Exception as e:
@@ -70,7 +71,7 @@ def chat_stream():
 
         # 4) 실제 에이전트 호출 (기존 orchestrate.ask_experts)
         try:
-            answer = asyncio.run(orchestrate.ask_experts(user_input))
+            answer = run_async(orchestrate.ask_experts(user_input, request.headers.get("X-Request-ID")))
         except Exception as e:
             # 에러 이벤트 전송
             err_payload = json.dumps({"error": str(e)}, ensure_ascii=False)
@@ -0,0 +1,348 @@
+# [개요] LangGraph 파이프라인(App.py / orchestrate.py)의 단계별 지연을 구조화된 span으로 남기는 가벼운 추적 모듈입니다.
+# - span: 이름, 시작 시각, 소요 시간(ms), 상태(ok / error / cancelled), 속성(모델, 대기 시간, 토큰 수, 검색 결과 수 등)
+#   요청 하나의 span은 같은 trace_id(= 요청 ID)로 묶이고 parent_id로 부모-자식 관계를 가집니다.
+# - 현재 span은 contextvars로 전달되므로 asyncio 작업(LangGraph 노드, asyncio.wait의 전문가 작업)과
+#   asyncio.to_thread(임베딩/검색)로 넘어가도 부모가 이어집니다. run_async처럼 다른 스레드의 루프로 넘길 때는
+#   run_traced()로 코루틴을 감싸 루프 안에서 trace를 시작합니다.
+# - 끝난 span은 백그라운드 스레드가 모아서 파일에 씁니다. TRACE_EXPORTER=jsonl(기본, span당 한 줄) 또는
+#   otlp-file(OpenTelemetry Collector file exporter와 같은 OTLP/JSON 줄 형식)
+# - 요약: python tracing.py [traces/spans.jsonl] -> span 이름별 호출 수 / 오류 수 / p50 / p95 / p99(ms),
+#   LLM span은 대기열 대기 시간과 입력/출력 토큰도 함께 출력합니다.
+# TRACING_ENABLED=0이면 span은 아무것도 기록하지 않습니다.
+
+import os  # 환경 변수 / 경로
+import sys  # 요약 출력
+import json  # 직렬화
+import time  # 시각 / 소요 시간
+import uuid  # trace / span ID
+import queue  # 내보내기 대기열
+import atexit  # 종료 시 남은 span 기록
+import asyncio  # 취소 구분
+import logging  # 로그 기록
+import argparse  # 요약 명령행 인자
+import functools  # 데코레이터
+import threading  # 내보내기 스레드
+import contextvars  # 현재 span 전달
+from contextlib import contextmanager  # span 컨텍스트 매니저
+from typing import Dict, List, Optional  # 타입 힌트
+
+logger = logging.getLogger(__name__)
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+TRACE_EXPORTER = os.getenv("TRACE_EXPORTER", "jsonl").strip().lower()  # jsonl | otlp-file
+TRACE_FILE = os.getenv("TRACE_FILE", os.path.join("traces", "spans.jsonl"))
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "llm-chatbot")
+TRACE_FLUSH_SECONDS = 1.0  # 내보내기 스레드가 모아서 쓰는 주기
+TRACE_QUEUE_SIZE = 10000  # 이보다 밀리면 span을 버림 (요청 경로를 막지 않도록)
+EXPORTER_JSONL = "jsonl"
+EXPORTER_OTLP_FILE = "otlp-file"
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_CANCELLED = "cancelled"
+PERCENTILES = (50, 95, 99)
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """끝난 뒤 내보내기 대기열로 들어가는 span 하나"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attributes", "start_ns", "_t0", "duration_ms", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None, attributes: Optional[Dict] = None):
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.status = STATUS_OK
+        self.error: Optional[str] = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add(self, key: str, value: float):
+        """숫자 속성 누적 (예: 재시도마다 대기 시간 합산)"""
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 3)
+
+    def to_dict(self) -> Dict:
+        return {"trace_id": self.trace_id, "span_id": self.span_id, "parent_id": self.parent_id, "name": self.name,
+                "start_ns": self.start_ns, "duration_ms": self.duration_ms, "status": self.status,
+                "error": self.error, "attributes": self.attributes}
+
+
+class _NoopSpan:
+    """추적을 끈 경우 돌려주는 span (set/add 무시)"""
+    trace_id = span_id = None
+
+    def set(self, **attributes):
+        pass
+
+    def add(self, key: str, value: float):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+# === 내보내기 ===
+def _otlp_value(value) -> Dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _to_otlp(spans: List[Span]) -> Dict:
+    """OTLP/JSON resourceSpans 한 묶음 (trace ID는 32자리, span ID는 16자리 hex)"""
+    out = []
+    for s in spans:
+        item = {"traceId": s.trace_id.ljust(32, "0")[:32], "spanId": s.span_id, "name": s.name, "kind": 1,
+                "startTimeUnixNano": str(s.start_ns), "endTimeUnixNano": str(s.start_ns + int(s.duration_ms * 1e6)),
+                "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items() if v is not None],
+                "status": {"code": 2, "message": s.error or ""} if s.status == STATUS_ERROR else {"code": 1}}
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        if s.status == STATUS_CANCELLED:
+            item["attributes"].append({"key": "cancelled", "value": {"boolValue": True}})
+        out.append(item)
+    return {"resourceSpans": [{"resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TRACE_SERVICE_NAME}}]},
+                               "scopeSpans": [{"scope": {"name": "tracing"}, "spans": out}]}]}
+
+
+class FileExporter:
+    """끝난 span을 모아 TRACE_FILE에 덧붙여 쓰는 백그라운드 작업자"""
+
+    def __init__(self, path: str = TRACE_FILE, fmt: str = TRACE_EXPORTER):
+        if fmt not in (EXPORTER_JSONL, EXPORTER_OTLP_FILE):
+            logger.warning(f"[TRACE] 알 수 없는 TRACE_EXPORTER={fmt}, jsonl로 기록합니다.")
+            fmt = EXPORTER_JSONL
+        self.path = path
+        self.fmt = fmt
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=TRACE_QUEUE_SIZE)
+        self._dropped = 0
+        self._write_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._worker, name="trace-exporter", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self._dropped += 1
+
+    def _drain(self) -> List[Span]:
+        spans = []
+        while True:
+            try:
+                spans.append(self._queue.get_nowait())
+            except queue.Empty:
+                return spans
+
+    def flush(self):
+        spans = self._drain()
+        if not spans:
+            return
+        try:
+            with self._write_lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    if self.fmt == EXPORTER_OTLP_FILE:
+                        f.write(json.dumps(_to_otlp(spans), ensure_ascii=False) + "\n")
+                    else:
+                        f.writelines(json.dumps(s.to_dict(), ensure_ascii=False) + "\n" for s in spans)
+        except OSError as e:
+            logger.warning(f"[TRACE] span {len(spans)}개를 기록하지 못했습니다: {e}")
+        if self._dropped:
+            logger.warning(f"[TRACE] 대기열이 가득 차 span {self._dropped}개를 버렸습니다.")
+            self._dropped = 0
+
+    def _worker(self):
+        while True:
+            time.sleep(TRACE_FLUSH_SECONDS)
+            self.flush()
+
+
+_exporter: Optional[FileExporter] = None
+_exporter_lock = threading.Lock()
+
+
+def get_exporter() -> FileExporter:
+    global _exporter
+    with _exporter_lock:
+        if _exporter is None:
+            _exporter = FileExporter()
+        return _exporter
+
+
+# === span API ===
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def current_span():
+    return _current_span.get() or _NOOP_SPAN
+
+
+def current_trace_id() -> Optional[str]:
+    s = _current_span.get()
+    return s.trace_id if s else None
+
+
+@contextmanager
+def span(name: str, trace_id: Optional[str] = None, **attributes):
+    """
+    span 하나를 열고 닫습니다. 현재 span이 있으면 그 자식이 되고, 없으면 trace_id(생략 시 새 ID)로 새 trace를 시작합니다.
+    예외가 나면 상태를 error(취소는 cancelled)로 기록하고 그대로 다시 발생시킵니다.
+    """
+    if not TRACING_ENABLED:
+        yield _NOOP_SPAN
+        return
+    parent = _current_span.get()
+    s = Span(name, trace_id or (parent.trace_id if parent else new_trace_id()),
+             parent.span_id if parent and not trace_id else None, attributes)
+    token = _current_span.set(s)
+    try:
+        yield s
+    except asyncio.CancelledError:
+        s.status = STATUS_CANCELLED
+        raise
+    except BaseException as e:
+        s.status = STATUS_ERROR
+        s.error = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        _current_span.reset(token)
+        s.end()
+        get_exporter().export(s)
+
+
+def traced(name: str, **attributes):
+    """함수(동기/비동기, LangGraph 노드 포함) 실행 전체를 span으로 감싸는 데코레이터"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, **attributes):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+async def run_traced(name: str, coro, trace_id: Optional[str] = None, **attributes):
+    """코루틴을 새 trace(요청 루트 span) 안에서 실행합니다. run_async로 공유 루프에 넘길 때 사용"""
+    with span(name, trace_id=trace_id, **attributes):
+        return await coro
+
+
+# === 요약 ===
+def _attr_value(value: Dict):
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    return int(value["intValue"]) if "intValue" in value else None
+
+
+def load_spans(path: str) -> List[Dict]:
+    """jsonl / otlp-file 형식 모두 읽어 span dict 목록으로 돌려줍니다."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if "resourceSpans" not in record:
+                spans.append(record)
+                continue
+            for rs in record["resourceSpans"]:
+                for ss in rs.get("scopeSpans", []):
+                    for s in ss.get("spans", []):
+                        attrs = {a["key"]: _attr_value(a["value"]) for a in s.get("attributes", [])}
+                        status = STATUS_ERROR if s.get("status", {}).get("code") == 2 else \
+                            STATUS_CANCELLED if attrs.pop("cancelled", False) else STATUS_OK
+                        spans.append({"trace_id": s["traceId"], "span_id": s["spanId"], "parent_id": s.get("parentSpanId"),
+                                      "name": s["name"], "start_ns": int(s["startTimeUnixNano"]),
+                                      "duration_ms": (int(s["endTimeUnixNano"]) - int(s["startTimeUnixNano"])) / 1e6,
+                                      "status": status, "attributes": attrs})
+    return spans
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    """선형 보간 백분위수 (numpy 없이)"""
+    if len(sorted_values) == 1:
+        return sorted_values[0]
+    k = (len(sorted_values) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_values) - 1)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (k - lo)
+
+
+def summarize(spans: List[Dict]) -> List[Dict]:
+    """span 이름별 통계: count / errors / cancelled / p50 / p95 / p99 / max (ms), LLM span은 대기/토큰 p50·p95 추가"""
+    groups: Dict[str, List[Dict]] = {}
+    for s in spans:
+        groups.setdefault(s["name"], []).append(s)
+    rows = []
+    for name, items in groups.items():
+        durations = sorted(s["duration_ms"] for s in items if s.get("duration_ms") is not None)
+        if not durations:
+            continue
+        row = {"name": name, "count": len(items),
+               "errors": sum(1 for s in items if s.get("status") == STATUS_ERROR),
+               "cancelled": sum(1 for s in items if s.get("status") == STATUS_CANCELLED),
+               **{f"p{p}": round(_percentile(durations, p), 1) for p in PERCENTILES}, "max": round(durations[-1], 1)}
+        for key in ("queue_wait_ms", "prompt_tokens", "completion_tokens"):
+            values = sorted(s["attributes"][key] for s in items if s.get("attributes", {}).get(key) is not None)
+            if values:
+                row[key] = {"p50": round(_percentile(values, 50), 1), "p95": round(_percentile(values, 95), 1)}
+        rows.append(row)
+    return sorted(rows, key=lambda r: -r["p95"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="추적 파일(jsonl / otlp-file)의 단계별 지연 요약")
+    parser.add_argument("path", nargs="?", default=TRACE_FILE, help=f"추적 파일 (기본 {TRACE_FILE})")
+    parser.add_argument("--prefix", default="", help="이 접두어로 시작하는 span만 (예: llm., expert.)")
+    parser.add_argument("--json", action="store_true", help="표 대신 JSON으로 출력")
+    args = parser.parse_args()
+
+    try:
+        spans = [s for s in load_spans(args.path) if s["name"].startswith(args.prefix)]
+    except FileNotFoundError:
+        print(f"추적 파일이 없습니다: {args.path}", file=sys.stderr)
+        sys.exit(1)
+    rows = summarize(spans)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+    traces = len({s["trace_id"] for s in spans})
+    print(f"{args.path}: span {len(spans)}개 / 요청(trace) {traces}개")
+    print(f"{'span':<34}{'count':>7}{'err':>5}{'cxl':>5}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  대기 p95 / 토큰 p50(in→out)")
+    for r in rows:
+        llm = ""
+        if "queue_wait_ms" in r:
+            llm = f"  {r['queue_wait_ms']['p95']:.0f}ms"
+        if "prompt_tokens" in r:
+            llm += f" / {r['prompt_tokens']['p50']:.0f}→{r.get('completion_tokens', {}).get('p50', 0):.0f}"
+        print(f"{r['name']:<34}{r['count']:>7}{r['errors']:>5}{r['cancelled']:>5}"
+              f"{r['p50']:>10.1f}{r['p95']:>10.1f}{r['p99']:>10.1f}{r['max']:>10.1f}{llm}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# [개요] 채팅 중 업로드된 파일을 백그라운드에서 적재해, 같은 세션의 다음 질문부터 검색되도록 하는 모듈입니다.
+# - 요청 스레드는 작업(job)을 큐에 넣고 바로 응답하며, 작업자 스레드가 db_load.py와 같은 로더/분할기로 파일을 읽어
+#   임베딩한 뒤 업로드 전용 컬렉션(UPLOADS_COLLECTION)에 session_id와 함께 저장합니다.
+# - session_id는 파티션 키(is_partition_key) 필드라 Milvus가 세션들을 고정 개수(UPLOAD_NUM_PARTITIONS)의 파티션에 해시로 나눠 담고,
+#   검색/삭제는 session_id 필터로 그 세션의 조각만 봅니다. (세션마다 파티션을 만들면 컬렉션당 파티션 한도 1024개에 걸림)
+# - 검색은 항상 세션 필터를 거치므로 다른 사용자의 업로드 문서는 검색되지 않습니다.
+# - 작업 상태(queued → running → done/failed)는 App.py의 /uploads/<job_id> 등으로 조회합니다.
+# - 마지막 사용 후 UPLOAD_SESSION_TTL_SECONDS가 지난 세션의 조각과 작업 기록은 작업자가 한가할 때 정리합니다.
+
+import os  # 경로
+import time  # 작업 시각 / 세션 만료
+import uuid  # 작업 ID
+import queue  # 작업 큐
+import hashlib  # 세션 ID -> session_id 필드 값
+import logging  # 로그 기록
+import threading  # 백그라운드 작업자
+from typing import Callable, Dict, List, Optional  # 타입 힌트
+
+from langchain_core.documents import Document  # LangChain 표준 문서 객체
+
+logger = logging.getLogger(__name__)
+
+UPLOADS_COLLECTION = "uploads"  # 업로드 문서 전용 Milvus 컬렉션
+UPLOAD_DIMENSION = 768  # 임베딩 차원 (jhgan/ko-sroberta-multitask)
+UPLOAD_WORKERS = 1  # 작업자 스레드 수 (임베딩 모델을 채팅 요청과 공유하므로 1~2 권장)
+UPLOAD_MAX_CHUNKS = 2000  # 파일 하나에서 저장할 최대 조각 수 (거대한 업로드가 작업자를 오래 점유하지 않도록)
+UPLOAD_PDF_WORKERS = 1  # 업로드 PDF는 현재 프로세스에서 추출 (웹 서버 프로세스에서 추출 프로세스를 띄우지 않음)
+UPLOAD_INSERT_BATCH = 256  # 임베딩/삽입 배치 크기
+UPLOAD_SEARCH_LIMIT = 3  # 질문마다 가져올 업로드 문서 조각 수
+UPLOAD_SESSION_TTL_SECONDS = 6 * 3600  # 이 시간 동안 사용하지 않은 세션의 업로드 문서는 삭제
+UPLOAD_NUM_PARTITIONS = 64  # session_id 파티션 키가 나눠 담길 파티션 수 (세션 수와 무관하게 고정)
+UPLOAD_EXPIRE_BATCH = 500  # 만료 세션 삭제 표현식 하나에 넣는 세션 수
+SESSION_FIELD = "session_id"  # 파티션 키 필드 이름
+
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_DONE = "done"
+STATUS_FAILED = "failed"
+
+
+def session_key(session_id: str) -> str:
+    """세션 ID를 session_id 필드 값(고정 길이 16진수, 표현식에 그대로 넣을 수 있음)으로 변환합니다."""
+    return hashlib.sha1(session_id.encode("utf-8")).hexdigest()[:20]
+
+
+def _default_open_collection(name: str, dimension: int):
+    """
+    기본 컬렉션 준비: db_load 스키마에 session_id 파티션 키 필드를 더한 업로드 전용 Milvus 컬렉션을 만들거나 엽니다.
+    VECTOR_STORE=memory면 같은 필드를 가진 메모리 컬렉션을 씁니다.
+    """
+    from vector_store import memory_collection, use_memory_store  # 메모리 저장소 선택
+    if use_memory_store():
+        return memory_collection(name, dimension, extra_fields=[SESSION_FIELD])
+    import db_load  # 무거운 모듈(로깅 설정 포함)이라 작업자가 처음 필요할 때 import
+    from pymilvus import utility, FieldSchema, CollectionSchema, DataType, Collection
+    db_load.connect_milvus()
+    fields = [
+        FieldSchema(name="id", dtype=DataType.INT64, is_primary=True, auto_id=True),
+        FieldSchema(name="source", dtype=DataType.VARCHAR, max_length=1024),  # 업로드 파일명
+        FieldSchema(name="page", dtype=DataType.INT32),  # 페이지 / 행 번호
+        FieldSchema(name="text", dtype=DataType.VARCHAR, max_length=65535),
+        FieldSchema(name="vector", dtype=DataType.FLOAT_VECTOR, dim=dimension),
+        FieldSchema(name=SESSION_FIELD, dtype=DataType.VARCHAR, max_length=64, is_partition_key=True),  # 세션 (파티션 키)
+    ]
+    schema = CollectionSchema(fields, description="Uploaded documents (session_id partition key)")
+    collection = Collection(name=name) if utility.has_collection(name) else None
+    if collection is not None and set(f.name for f in collection.schema.fields) != set(f.name for f in fields):
+        # 세션별 파티션을 쓰던 이전 스키마: 업로드 문서는 세션 동안만 쓰는 임시 데이터라 다시 만듦
+        logger.warning(f"[UPLOAD] '{name}' 컬렉션의 스키마가 달라 삭제 후 session_id 파티션 키 스키마로 다시 만듭니다.")
+        utility.drop_collection(name)
+        collection = None
+    if collection is None:
+        collection = Collection(name=name, schema=schema, num_partitions=UPLOAD_NUM_PARTITIONS)
+    if not collection.has_index():
+        db_load.create_index(collection)
+    collection.load()
+    return collection
+
+
+class UploadIngestor:
+    """
+    업로드 파일 백그라운드 적재기.
+    embeddings: LangChain 호환 임베딩 (App.py의 전역 임베딩을 공유)
+    open_collection: (이름, 차원) -> session_id 필드가 있는 Collection.
+    (테스트/부하 측정에서는 vector_store.MemoryCollection(..., extra_fields=["session_id"])을 돌려주는 함수를 넘길 수 있습니다.)
+    """
+
+    def __init__(self, embeddings, collection_name: str = UPLOADS_COLLECTION, dimension: int = UPLOAD_DIMENSION,
+                 workers: int = UPLOAD_WORKERS, open_collection: Optional[Callable] = None,
+                 session_ttl: float = UPLOAD_SESSION_TTL_SECONDS):
+        self.embeddings = embeddings
+        self.collection_name = collection_name
+        self.dimension = dimension
+        self.workers = max(1, workers)
+        self.open_collection = open_collection or _default_open_collection
+        self.session_ttl = session_ttl
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._jobs: Dict[str, Dict] = {}  # job_id -> 작업 기록
+        self._sessions: Dict[str, float] = {}  # session_id -> 마지막 사용 시각
+        self._lock = threading.Lock()
+        self._collection = None
+        self._collection_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._tools = None  # (db_load 모듈, 분할기) 첫 작업 때 준비
+
+    # --- 작업자 ---
+    def start(self):
+        """작업자 스레드를 시작합니다. 예기치 않게 종료된 작업자가 있으면 새로 띄워 채웁니다."""
+        with self._lock:
+            alive = [t for t in self._threads if t.is_alive()]
+            if len(alive) >= self.workers:
+                return
+            if self._threads:
+                logger.warning(f"[UPLOAD] 종료된 작업자 {self.workers - len(alive)}개를 다시 시작합니다.")
+            self._threads = alive
+            for i in range(len(alive), self.workers):
+                t = threading.Thread(target=self._worker, name=f"upload-ingest-{i}", daemon=True)
+                t.start()
+                self._threads.append(t)
+        logger.info(f"[UPLOAD] 업로드 적재 작업자 {self.workers}개 실행 중 (컬렉션 '{self.collection_name}')")
+
+    def stop(self):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout=5)
+        self._threads = []
+
+    @property
+    def collection(self):
+        with self._collection_lock:
+            if self._collection is None:
+                self._collection = self.open_collection(self.collection_name, self.dimension)
+            return self._collection
+
+    def _loader(self):
+        """(db_load 모듈, 분할기). 첫 작업 때 import하며, 실패하면 그 작업의 오류로 기록되고 다음 작업에서 다시 시도합니다."""
+        if self._tools is None:
+            import db_load  # 로더/분할기 (무거운 모듈이라 첫 작업 때 import)
+            self._tools = (db_load, db_load.RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100))  # db_load와 같은 설정
+        return self._tools
+
+    def _worker(self):
+        while not self._stop.is_set():
+            try:
+                job_id = self._queue.get(timeout=60)
+            except queue.Empty:
+                try:
+                    self.expire_sessions()  # 한가할 때 오래된 세션 정리
+                except Exception as e:
+                    logger.warning(f"[UPLOAD] 만료 세션 정리 실패: {e}")
+                continue
+            try:
+                self._run_job(job_id)
+            except Exception:
+                logger.exception("[UPLOAD] 작업자 오류 (다음 작업을 계속 처리합니다):")
+            finally:
+                self._queue.task_done()
+
+    def _run_job(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return
+        self._update(job, status=STATUS_RUNNING, started_at=time.time())
+        try:
+            db_load, splitter = self._loader()
+            docs = db_load.load_file_to_documents(job["path"], splitter, pdf_workers=UPLOAD_PDF_WORKERS)
+            if len(docs) > UPLOAD_MAX_CHUNKS:
+                logger.warning(f"[UPLOAD] '{job['filename']}' 조각 {len(docs)}개 중 앞의 {UPLOAD_MAX_CHUNKS}개만 저장합니다.")
+                docs = docs[:UPLOAD_MAX_CHUNKS]
+            inserted = self._insert(job, docs)
+            self._update(job, status=STATUS_DONE, chunks=inserted, finished_at=time.time())
+            logger.info(f"[UPLOAD] '{job['filename']}' 적재 완료: {inserted}개 조각 ({job['finished_at'] - job['started_at']:.1f}s)")
+        except Exception as e:
+            self._update(job, status=STATUS_FAILED, error=str(e), finished_at=time.time())
+            logger.error(f"[UPLOAD] '{job['filename']}' 적재 실패: {e}")
+            logger.exception("상세 오류:")
+
+    def _insert(self, job: Dict, docs: List[Document]) -> int:
+        collection = self.collection
+        key = session_key(job["session_id"])
+        # 같은 세션에서 같은 파일을 다시 올리면 이전 조각을 교체
+        escaped = job["filename"].replace("\\", "\\\\").replace('"', '\\"')
+        collection.delete(expr=f'{SESSION_FIELD} == "{key}" and source == "{escaped}"')
+        inserted = 0
+        for s in range(0, len(docs), UPLOAD_INSERT_BATCH):
+            batch = docs[s:s + UPLOAD_INSERT_BATCH]
+            texts = [d.page_content for d in batch]
+            vectors = self.embeddings.embed_documents(texts)
+            collection.insert([
+                [job["filename"]] * len(batch),
+                [d.metadata.get("page", d.metadata.get("row", 0)) for d in batch],
+                texts,
+                vectors,
+                [key] * len(batch),
+            ])
+            inserted += len(batch)
+            self._update(job, chunks=inserted)
+        collection.flush()
+        return inserted
+
+    def _update(self, job: Dict, **fields):
+        with self._lock:
+            job.update(fields)
+
+    # --- 요청 스레드에서 사용하는 API ---
+    def submit(self, session_id: str, file_path: str, filename: Optional[str] = None,
+               content_hash: Optional[str] = None) -> Dict:
+        """
+        업로드 파일 적재 작업을 큐에 넣고 작업 기록(사본)을 반환합니다.
+        content_hash가 같은 파일을 이 세션에서 이미 적재했거나 적재 중이면 새 작업 없이 기존 작업을 반환합니다.
+        """
+        self.start()
+        if content_hash:
+            with self._lock:
+                existing = next((j for j in self._jobs.values() if j["session_id"] == session_id
+                                 and j.get("content_hash") == content_hash and j["status"] != STATUS_FAILED), None)
+                if existing is not None:
+                    self._sessions[session_id] = time.time()
+                    return {k: v for k, v in existing.items() if k != "path"}
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "session_id": session_id,
+            "filename": filename or os.path.basename(file_path),
+            "path": file_path,
+            "content_hash": content_hash,
+            "status": STATUS_QUEUED,
+            "chunks": 0,
+            "error": None,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._sessions[session_id] = time.time()
+        self._queue.put(job["job_id"])
+        return self.job(job["job_id"])
+
+    def job(self, job_id: str) -> Optional[Dict]:
+        """작업 상태 조회 (내부 경로는 빼고 반환)"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {k: v for k, v in job.items() if k != "path"} if job else None
+
+    def session_jobs(self, session_id: str) -> List[Dict]:
+        with self._lock:
+            ids = [j["job_id"] for j in self._jobs.values() if j["session_id"] == session_id]
+        return sorted((self.job(i) for i in ids), key=lambda j: j["created_at"])
+
+    def active_paths(self) -> List[str]:
+        """적재 대기/진행 중인 파일 경로 (업로드 저장소 쿼터 정리에서 제외)"""
+        with self._lock:
+            return [j["path"] for j in self._jobs.values() if j["status"] in (STATUS_QUEUED, STATUS_RUNNING)]
+
+    def has_documents(self, session_id: str) -> bool:
+        with self._lock:
+            return any(j["session_id"] == session_id and j["status"] == STATUS_DONE and j["chunks"]
+                       for j in self._jobs.values())
+
+    def search(self, session_id: str, query: str, limit: int = UPLOAD_SEARCH_LIMIT) -> List[Document]:
+        """세션의 업로드 문서 조각 중 질문과 가까운 것을 찾습니다. 적재된 문서가 없으면 빈 리스트."""
+        if not session_id or not self.has_documents(session_id):
+            return []
+        with self._lock:
+            self._sessions[session_id] = time.time()
+        vector = self.embeddings.embed_query(query)
+        results = self.collection.search(
+            data=[vector], anns_field="vector",
+            param={"metric_type": "L2", "params": {"nprobe": 10}},
+            limit=limit, output_fields=["text", "source", "page"],
+            expr=f'{SESSION_FIELD} == "{session_key(session_id)}"',  # 파티션 키 필터: Milvus가 해당 파티션만 검색
+            consistency_level="Session",  # 같은 프로세스(연결)에서 방금 삽입한 조각도 보이도록
+        )
+        return [
+            Document(page_content=h.entity.get("text"),
+                     metadata={"source": h.entity.get("source"), "page": h.entity.get("page"), "score": h.distance})
+            for h in (results[0] if results else [])
+        ]
+
+    def expire_sessions(self):
+        """오래 사용하지 않은 세션의 업로드 조각과 작업 기록을 삭제합니다."""
+        now = time.time()
+        with self._lock:
+            expired = [s for s, seen in self._sessions.items() if now - seen > self.session_ttl
+                       and not any(j["session_id"] == s and j["status"] in (STATUS_QUEUED, STATUS_RUNNING) for j in self._jobs.values())]
+            for s in expired:
+                del self._sessions[s]
+                for job_id in [j for j, job in self._jobs.items() if job["session_id"] == s]:
+                    del self._jobs[job_id]
+        keys = [session_key(s) for s in expired]
+        for i in range(0, len(keys), UPLOAD_EXPIRE_BATCH):
+            part = keys[i:i + UPLOAD_EXPIRE_BATCH]
+            try:
+                values = ", ".join(f'"{k}"' for k in part)
+                self.collection.delete(expr=f"{SESSION_FIELD} in [{values}]")
+                logger.info(f"[UPLOAD] 만료된 세션 {len(part)}개의 업로드 문서를 삭제했습니다.")
+            except Exception as e:
+                logger.warning(f"[UPLOAD] 만료 세션 업로드 문서 삭제 실패: {e}")
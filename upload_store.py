@@ -0,0 +1,190 @@
+# [개요] /chat 업로드 파일을 스트리밍으로 디스크에 쓰면서 크기 제한과 해시 계산을 동시에 하는 저장소입니다.
+# - Werkzeug가 multipart 본문을 파싱하는 동안 조각(chunk) 단위로 임시 파일에 바로 쓰고, SHA-256을 함께 계산합니다.
+#   (메모리에 통째로 올리거나 임시 파일에 쓴 뒤 다시 복사하지 않음)
+# - MAX_UPLOAD_BYTES를 넘으면 쓰는 도중에 413(RequestEntityTooLarge)으로 중단하고 임시 파일을 지웁니다.
+# - 저장 경로는 내용 해시 기반(objects/ab/abcdef...확장자)이라 같은 파일을 다시 올리면 새로 저장하지 않습니다.
+# - 저장소 전체 크기가 UPLOAD_QUOTA_BYTES를 넘으면 가장 오래 사용하지 않은 파일(LRU, 수정시각 기준)부터 지웁니다.
+
+import os  # 경로 / 파일 이동
+import time  # 임시 파일 정리 기준
+import hashlib  # 내용 해시
+import logging  # 로그 기록
+import pathlib  # 확장자
+import tempfile  # 스트리밍 임시 파일
+import threading  # 쿼터 정리 동시 실행 방지
+from typing import Dict, Iterable, Optional  # 타입 힌트
+
+from flask import Request  # 업로드 스트림 생성 지점을 바꾸기 위한 요청 클래스
+from werkzeug.exceptions import RequestEntityTooLarge  # 413 응답
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_ROOT = "uploads"  # 업로드 저장소 루트
+MAX_UPLOAD_BYTES = 50 * 1024 ** 2  # 파일 하나의 최대 크기 (50MB)
+UPLOAD_QUOTA_BYTES = 2 * 1024 ** 3  # 저장소 전체 최대 크기 (2GB), 넘으면 LRU 정리
+COPY_CHUNK_BYTES = 1024 ** 2  # 스트리밍 복사 단위 (1MB)
+STALE_TMP_SECONDS = 3600  # 이보다 오래된 임시 파일은 중단된 업로드로 보고 삭제
+
+
+class HashingUploadFile:
+    """
+    Werkzeug가 업로드 본문을 써 넣는 파일 객체. 쓰는 즉시 SHA-256과 크기를 갱신하고,
+    최대 크기를 넘으면 파일을 지우고 RequestEntityTooLarge를 발생시킵니다.
+    """
+
+    def __init__(self, tmp_dir: str, max_bytes: int):
+        self._file = tempfile.NamedTemporaryFile(mode="w+b", dir=tmp_dir, prefix="upload_", delete=False)
+        self.path = self._file.name
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._sha = hashlib.sha256()
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.discard()
+            raise RequestEntityTooLarge(f"업로드 파일은 최대 {self.max_bytes // 1024 ** 2}MB까지 가능합니다.")
+        self._sha.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._sha.hexdigest()
+
+    def discard(self):
+        """임시 파일을 닫고 지웁니다. (저장소로 옮긴 뒤에도 안전하게 호출 가능)"""
+        try:
+            self._file.close()
+        finally:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)  # read / readline / seek / tell / close 등은 실제 파일에 위임
+
+
+class UploadStore:
+    """내용 주소 기반 업로드 저장소 (objects/<해시 앞 2자리>/<해시><확장자>)"""
+
+    def __init__(self, root: str = UPLOAD_ROOT, max_bytes: int = MAX_UPLOAD_BYTES, quota_bytes: int = UPLOAD_QUOTA_BYTES):
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.max_bytes = max_bytes
+        self.quota_bytes = quota_bytes
+        self._quota_lock = threading.Lock()
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        self._remove_stale_tmp()
+
+    def _remove_stale_tmp(self):
+        """서버가 업로드 도중 종료되어 남은 임시 파일 정리"""
+        cutoff = time.time() - STALE_TMP_SECONDS
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.is_file() and entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+
+    def open_stream(self) -> HashingUploadFile:
+        """업로드 본문을 받을 스트리밍 파일 (UploadRequest._get_file_stream에서 사용)"""
+        return HashingUploadFile(self.tmp_dir, self.max_bytes)
+
+    def object_path(self, sha256: str, filename: str) -> str:
+        ext = pathlib.Path(filename).suffix.lower()[:16]  # 로더가 확장자로 형식을 판단하므로 유지
+        return os.path.join(self.objects_dir, sha256[:2], sha256 + ext)
+
+    def save(self, file_storage, filename: str) -> Dict:
+        """
+        업로드 파일을 저장소에 넣고 {"sha256", "path", "size", "duplicate"}를 반환합니다.
+        같은 내용이 이미 있으면 새로 쓰지 않고 사용 시각만 갱신합니다(duplicate=True).
+        """
+        stream = file_storage.stream
+        if not isinstance(stream, HashingUploadFile):
+            stream = self._copy_to_stream(stream)  # 다른 경로로 만든 요청(테스트 클라이언트 등)
+        stream.flush()
+        path = self.object_path(stream.sha256, filename)
+        duplicate = os.path.exists(path)
+        if duplicate:
+            stream.discard()
+            os.utime(path)  # LRU 기준 시각 갱신
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            stream._file.close()
+            os.replace(stream.path, path)  # 같은 파일 시스템 안의 이동 (복사 없음)
+            logger.info(f"[UPLOAD] 저장: {filename} -> {path} ({stream.size / 1024:.0f}KB)")
+        return {"sha256": stream.sha256, "path": path, "size": stream.size, "duplicate": duplicate}
+
+    def _copy_to_stream(self, src) -> HashingUploadFile:
+        out = self.open_stream()
+        try:
+            while True:
+                chunk = src.read(COPY_CHUNK_BYTES)
+                if not chunk:
+                    break
+                out.write(chunk)
+        except Exception:
+            out.discard()
+            raise
+        return out
+
+    def enforce_quota(self, protect: Iterable[str] = ()) -> int:
+        """저장소 크기가 쿼터를 넘으면 오래 사용하지 않은 파일부터 삭제합니다. 삭제한 파일 수를 반환합니다."""
+        protected = {os.path.abspath(p) for p in protect}
+        with self._quota_lock:
+            files, total = [], 0
+            for dirpath, _, names in os.walk(self.objects_dir):
+                for name in names:
+                    p = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(p)
+                    except OSError:
+                        continue
+                    files.append((st.st_mtime, st.st_size, p))
+                    total += st.st_size
+            if total <= self.quota_bytes:
+                return 0
+            removed = 0
+            for _, size, p in sorted(files):
+                if total <= self.quota_bytes:
+                    break
+                if os.path.abspath(p) in protected:
+                    continue  # 적재 대기/진행 중인 파일
+                try:
+                    os.remove(p)
+                    total -= size
+                    removed += 1
+                except OSError as e:
+                    logger.warning(f"[UPLOAD] 쿼터 정리 중 삭제 실패: {p} ({e})")
+            logger.info(f"[UPLOAD] 쿼터 초과로 오래된 업로드 {removed}개 삭제 (현재 {total / 1024 ** 2:.0f}MB)")
+            return removed
+
+
+upload_store: Optional[UploadStore] = None  # init_upload_store()로 생성 (UploadRequest가 사용)
+
+
+def init_upload_store(root: str = UPLOAD_ROOT, max_bytes: int = MAX_UPLOAD_BYTES,
+                      quota_bytes: int = UPLOAD_QUOTA_BYTES) -> UploadStore:
+    """업로드 저장소를 만들고 UploadRequest가 쓰도록 등록합니다."""
+    global upload_store
+    upload_store = UploadStore(root, max_bytes, quota_bytes)
+    return upload_store
+
+
+def discard_unsaved(files) -> None:
+    """요청 처리 후 저장소로 옮기지 않은 업로드 임시 파일을 지웁니다. (teardown에서 호출)"""
+    for _, fs in files.items(multi=True):
+        if isinstance(fs.stream, HashingUploadFile):
+            fs.stream.discard()
+
+
+class UploadRequest(Request):
+    """multipart 파일 본문을 upload_store의 해시 계산 스트림으로 바로 받는 Flask 요청 클래스"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if upload_store is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return upload_store.open_stream()
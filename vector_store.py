@@ -0,0 +1,230 @@
+# [개요] Milvus Collection 대신 쓸 수 있는 메모리 내 벡터 저장소입니다. (벤치마크/부하 테스트용)
+# db_load.py와 검색 코드가 사용하는 pymilvus Collection API 일부(insert / delete / query / search / flush /
+# num_entities / 인덱스 관련)를 같은 모양으로 흉내 내므로, Milvus 서버 없이 적재·검색 경로를 실행할 수 있습니다.
+# extra_fields로 vector 뒤에 스칼라 필드를 더 둘 수 있습니다. (업로드 컬렉션의 session_id 파티션 키 등, 표현식으로 필터)
+# 검색은 numpy 전수 비교(L2 또는 IP)이며, 불리언 표현식은 db_load가 쓰는 형태만 지원합니다:
+#   source == "a.pdf" / source in ["a", "b"] / id > 10 / id <= 10 / page >= 0 ... 를 and로 연결
+# VECTOR_STORE=memory 환경 변수를 주면 App.py / orchestrate.py의 검색 컬렉션(open_collection)도 이 저장소를 씁니다.
+
+import os  # 환경 변수
+import re  # 불리언 표현식 파싱
+import threading  # 동시 삽입/검색 보호
+from typing import Dict, List, Optional  # 타입 힌트
+
+import numpy as np  # 벡터 거리 계산
+
+_CLAUSE_RE = re.compile(r'^\s*(\w+)\s*(==|!=|<=|>=|<|>)\s*(".*"|-?\d+)\s*$')
+_IN_RE = re.compile(r'^\s*(\w+)\s+in\s+\[(.*)\]\s*$')
+_STR_RE = re.compile(r'"((?:[^"\\]|\\.)*)"')
+_OPS = {
+    "==": lambda a, b: a == b, "!=": lambda a, b: a != b,
+    "<": lambda a, b: a < b, "<=": lambda a, b: a <= b,
+    ">": lambda a, b: a > b, ">=": lambda a, b: a >= b,
+}
+
+VECTOR_STORE_MILVUS = "milvus"
+VECTOR_STORE_MEMORY = "memory"
+VECTOR_STORE = os.getenv("VECTOR_STORE", VECTOR_STORE_MILVUS).strip().lower()  # 검색 컬렉션 백엔드 (milvus | memory)
+
+_collections: Dict[str, "MemoryCollection"] = {}
+_registry_lock = threading.Lock()
+
+
+def _unescape(s: str) -> str:
+    return s.replace('\\"', '"').replace("\\\\", "\\")
+
+
+def _literal(token: str):
+    return _unescape(token[1:-1]) if token.startswith('"') else int(token)
+
+
+def _compile_expr(expr: Optional[str]):
+    """'a and b and ...' 형태의 표현식을 행(dict) -> bool 함수로 변환합니다."""
+    if not expr or not expr.strip():
+        return lambda row: True
+    preds = []
+    for clause in re.split(r"\s+and\s+", expr.strip()):
+        m = _IN_RE.match(clause)
+        if m:
+            field, body = m.group(1), m.group(2)
+            values = {_unescape(v) for v in _STR_RE.findall(body)} or {int(v) for v in body.split(",") if v.strip()}
+            preds.append(lambda row, f=field, vs=values: row.get(f) in vs)
+            continue
+        m = _CLAUSE_RE.match(clause)
+        if not m:
+            raise ValueError(f"지원하지 않는 표현식입니다: {clause!r}")
+        field, op, value = m.group(1), _OPS[m.group(2)], _literal(m.group(3))
+        preds.append(lambda row, f=field, o=op, v=value: row.get(f) is not None and o(row.get(f), v))
+    return lambda row: all(p(row) for p in preds)
+
+
+class MutationResult:
+    def __init__(self, primary_keys: List[int]):
+        self.primary_keys = primary_keys
+        self.insert_count = len(primary_keys)
+
+
+class _Entity:
+    def __init__(self, fields: Dict):
+        self._fields = fields
+
+    def get(self, name: str):
+        return self._fields.get(name)
+
+
+class Hit:
+    """pymilvus 검색 결과의 Hit와 같은 속성(id, distance, entity.get)"""
+
+    def __init__(self, pk: int, distance: float, fields: Dict):
+        self.id = pk
+        self.distance = distance
+        self.entity = _Entity(fields)
+
+
+class MemoryCollection:
+    """
+    스키마 id(auto_id INT64) / source / page / text / vector (+ extra_fields)를 가진 메모리 컬렉션.
+    insert()는 db_load와 같은 열 순서 [sources, pages, texts, vectors]에 extra_fields 열을 이어서 받습니다.
+    """
+
+    def __init__(self, name: str = "memory", dimension: Optional[int] = None, metric_type: str = "L2",
+                 extra_fields: Optional[List[str]] = None):
+        self.name = name
+        self.dimension = dimension
+        self.metric_type = metric_type
+        self.extra_fields = list(extra_fields or [])
+        self.fields = ["source", "page", "text"] + self.extra_fields
+        self._rows: Dict[int, Dict] = {}
+        self._vectors: Dict[int, np.ndarray] = {}
+        self._next_id = 1
+        self._index = None
+        self._lock = threading.RLock()
+        self._matrix = None  # 검색용 (ids, 행렬) 캐시, 변경 시 무효화
+
+    # --- 적재 ---
+    @property
+    def num_entities(self) -> int:
+        return len(self._rows)
+
+    def insert(self, data) -> MutationResult:
+        sources, pages, texts, vectors, *extra = data
+        if len(extra) != len(self.extra_fields):
+            raise ValueError(f"열 수가 맞지 않습니다: {len(data)} (기대 {4 + len(self.extra_fields)})")
+        vecs = np.asarray(vectors, dtype=np.float32)
+        if self.dimension is None:
+            self.dimension = vecs.shape[1]
+        if vecs.ndim != 2 or vecs.shape[1] != self.dimension:
+            raise ValueError(f"벡터 차원이 맞지 않습니다: {vecs.shape} (기대 {self.dimension})")
+        with self._lock:
+            ids = list(range(self._next_id, self._next_id + len(texts)))
+            self._next_id += len(texts)
+            for i, (pk, s, p, t, v) in enumerate(zip(ids, sources, pages, texts, vecs)):
+                self._rows[pk] = {"id": pk, "source": s, "page": int(p), "text": t,
+                                  **{f: col[i] for f, col in zip(self.extra_fields, extra)}}
+                self._vectors[pk] = v
+            self._matrix = None
+        return MutationResult(ids)
+
+    def delete(self, expr: str) -> MutationResult:
+        pred = _compile_expr(expr)
+        with self._lock:
+            ids = [pk for pk, row in self._rows.items() if pred(row)]
+            for pk in ids:
+                del self._rows[pk]
+                del self._vectors[pk]
+            if ids:
+                self._matrix = None
+        return MutationResult(ids)
+
+    def flush(self, **kwargs):
+        pass  # 메모리 저장소는 즉시 반영
+
+    # --- 인덱스 / 로드 (상태만 기록) ---
+    def has_index(self, **kwargs) -> bool:
+        return self._index is not None
+
+    def create_index(self, field_name: str, index_params: Dict, **kwargs):
+        self._index = dict(index_params or {})
+        self.metric_type = self._index.get("metric_type", self.metric_type)
+
+    def load(self, **kwargs):
+        pass
+
+    def release(self, **kwargs):
+        pass
+
+    # --- 조회 / 검색 ---
+    def query(self, expr: str, output_fields: Optional[List[str]] = None, limit: Optional[int] = None, **kwargs) -> List[Dict]:
+        pred = _compile_expr(expr)
+        fields = ["id"] + [f for f in (output_fields or []) if f != "id"]
+        out = []
+        with self._lock:
+            for pk in sorted(self._rows):
+                row = self._rows[pk]
+                if pred(row):
+                    out.append({f: (self._vectors[pk].tolist() if f == "vector" else row.get(f)) for f in fields})
+                    if limit and len(out) >= limit:
+                        break
+        return out
+
+    def _search_matrix(self):
+        with self._lock:
+            if self._matrix is None:
+                ids = sorted(self._vectors)
+                mat = np.stack([self._vectors[i] for i in ids]) if ids else np.zeros((0, self.dimension or 0), np.float32)
+                self._matrix = (ids, mat)
+            return self._matrix
+
+    def search(self, data, anns_field: str = "vector", param: Optional[Dict] = None, limit: int = 10,
+               expr: Optional[str] = None, output_fields: Optional[List[str]] = None, **kwargs) -> List[List[Hit]]:
+        ids, mat = self._search_matrix()
+        metric = ((param or {}).get("metric_type") or self.metric_type).upper()
+        pred = _compile_expr(expr) if expr else None
+        results = []
+        for q in np.asarray(data, dtype=np.float32):
+            if not ids:
+                results.append([])
+                continue
+            if metric == "IP":
+                dist = -(mat @ q)  # 큰 내적이 가까움 -> 정렬용 부호 반전
+            else:
+                diff = mat - q
+                dist = np.einsum("ij,ij->i", diff, diff)  # 제곱 L2 (Milvus L2와 같음)
+            hits = []
+            for i in np.argsort(dist, kind="stable"):
+                row = self._rows.get(ids[i])
+                if row is None or (pred and not pred(row)):
+                    continue
+                d = float(-dist[i] if metric == "IP" else dist[i])
+                hits.append(Hit(ids[i], d, {f: row.get(f) for f in (output_fields or [])}))
+                if len(hits) >= limit:
+                    break
+            results.append(hits)
+        return results
+
+
+def memory_collection(name: str, dimension: Optional[int] = None,
+                      extra_fields: Optional[List[str]] = None) -> MemoryCollection:
+    """이름별 MemoryCollection을 하나씩 만들어 재사용합니다. (같은 프로세스의 적재/검색 코드가 같은 데이터를 보도록)"""
+    with _registry_lock:
+        if name not in _collections:
+            _collections[name] = MemoryCollection(name, dimension, extra_fields=extra_fields)
+        return _collections[name]
+
+
+def drop_memory_collection(name: str):
+    with _registry_lock:
+        _collections.pop(name, None)
+
+
+def use_memory_store() -> bool:
+    """VECTOR_STORE=memory면 True (Milvus 연결을 건너뜀)"""
+    return VECTOR_STORE == VECTOR_STORE_MEMORY
+
+
+def open_collection(name: str, dimension: Optional[int] = None):
+    """검색용 컬렉션 열기: 기본은 Milvus Collection, VECTOR_STORE=memory면 같은 이름의 MemoryCollection"""
+    if use_memory_store():
+        return memory_collection(name, dimension)
+    from pymilvus import Collection  # Milvus를 쓸 때만 필요
+    return Collection(name)